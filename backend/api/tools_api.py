@@ -78,11 +78,6 @@ try:
 except ImportError:
     ModelManager = None
 
-try:
-    from core.unified_tools_system import unified_tools
-except ImportError:
-    unified_tools = None
-
 # Создаем API router
 router = APIRouter(prefix="/api/tools", tags=["tools"])
 
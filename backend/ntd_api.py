@@ -6,37 +6,183 @@ NTD API - API для доступа к реестру НТД
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+import asyncio
 import logging
+import os
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
 # Импортируем Neo4j
 try:
-    from neo4j import GraphDatabase
+    from neo4j import AsyncGraphDatabase, Query as CypherQuery
     HAS_NEO4J = True
 except ImportError:
     logger.warning("Neo4j not available")
+    AsyncGraphDatabase = None
+    CypherQuery = None
     HAS_NEO4J = False
 
-def get_neo4j_db():
-    """Получение подключения к Neo4j"""
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+NTD_QUERY_TIMEOUT = float(os.getenv("NTD_QUERY_TIMEOUT", "10"))
+NTD_MAX_NETWORK_DEPTH = int(os.getenv("NTD_MAX_NETWORK_DEPTH", "3"))
+NTD_MAX_PAGE_SIZE = 200
+# Повтор создания индексов после неудачи: 1 с, 2 с, 4 с ... не чаще раза в NTD_INDEX_RETRY_MAX
+NTD_INDEX_RETRY_MIN = float(os.getenv("NTD_INDEX_RETRY_MIN", "1"))
+NTD_INDEX_RETRY_MAX = float(os.getenv("NTD_INDEX_RETRY_MAX", "300"))
+
+# Полнотекстовые индексы (русский анализатор): нормы, документы и их разделы
+NTD_FULLTEXT_INDEX = "ntd_fulltext"
+DOCUMENT_FULLTEXT_INDEX = "ntd_document_fulltext"
+SECTION_FULLTEXT_INDEX = "ntd_section_fulltext"
+NTD_INDEX_STATEMENTS = [
+    f"""CREATE FULLTEXT INDEX {NTD_FULLTEXT_INDEX} IF NOT EXISTS
+        FOR (n:NTD) ON EACH [n.canonical_id, n.full_text, n.context]
+        OPTIONS {{indexConfig: {{`fulltext.analyzer`: 'russian'}}}}""",
+    f"""CREATE FULLTEXT INDEX {DOCUMENT_FULLTEXT_INDEX} IF NOT EXISTS
+        FOR (d:Document) ON EACH [d.title, d.canonical_id]
+        OPTIONS {{indexConfig: {{`fulltext.analyzer`: 'russian'}}}}""",
+    f"""CREATE FULLTEXT INDEX {SECTION_FULLTEXT_INDEX} IF NOT EXISTS
+        FOR (s:Section) ON EACH [s.title]
+        OPTIONS {{indexConfig: {{`fulltext.analyzer`: 'russian'}}}}""",
+    "CREATE INDEX ntd_canonical_id IF NOT EXISTS FOR (n:NTD) ON (n.canonical_id)",
+    "CREATE INDEX ntd_document_type IF NOT EXISTS FOR (n:NTD) ON (n.document_type)",
+    "CREATE INDEX document_id IF NOT EXISTS FOR (d:Document) ON (d.id)",
+]
+
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+_driver = None
+_driver_lock = asyncio.Lock()
+_indexes_lock = asyncio.Lock()
+_indexes_ready = False
+_indexes_retry_at = 0.0
+_indexes_retry_delay = NTD_INDEX_RETRY_MIN
+
+
+def build_fulltext_query(text: str) -> str:
+    """
+    Lucene-запрос для полнотекстового индекса.
+
+    Спецсимволы экранируются, все слова обязательны, последнее слово
+    ищется по префиксу ("СП 63.133" находит "СП 63.13330.2018").
+    """
+    terms = [_LUCENE_SPECIAL.sub(r"\\\1", term) for term in text.split()]
+    terms = [term for term in terms if term]
+    if not terms:
+        return ""
+    terms[-1] = f"{terms[-1]}*"
+    return " AND ".join(terms)
+
+
+def build_network_query(depth: int) -> str:
+    """Cypher для сети вокруг НТД; глубина подставляется только после ограничения"""
+    depth = max(1, min(int(depth), NTD_MAX_NETWORK_DEPTH))
+    return f"""
+        MATCH (center:NTD {{canonical_id: $canonical_id}})
+        CALL {{
+            WITH center
+            MATCH path = (center)-[*1..{depth}]-(:NTD)
+            WHERE all(x IN nodes(path) WHERE x:NTD)
+            RETURN path
+            LIMIT $path_limit
+        }}
+        UNWIND relationships(path) AS r
+        WITH DISTINCT r
+        LIMIT $limit
+        RETURN startNode(r) AS n, endNode(r) AS connected, r
+    """
+
+
+def _cypher(text: str):
+    """Запрос с таймаутом транзакции, чтобы ни один эндпоинт не висел дольше NTD_QUERY_TIMEOUT"""
+    return CypherQuery(text, timeout=NTD_QUERY_TIMEOUT)
+
+
+async def ensure_ntd_indexes(driver) -> bool:
+    """Создает полнотекстовые и обычные индексы НТД (идемпотентно)"""
+    try:
+        async with driver.session(database=NEO4J_DATABASE) as session:
+            for statement in NTD_INDEX_STATEMENTS:
+                await session.run(statement)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to create NTD indexes: {e}")
+        return False
+
+
+async def _ensure_indexes_with_backoff(driver):
+    """
+    Создание индексов до первого успеха: неудачная попытка откладывает
+    следующую с экспоненциальной задержкой, одновременно пробует один запрос
+    """
+    global _indexes_ready, _indexes_retry_at, _indexes_retry_delay
+    if _indexes_ready or time.monotonic() < _indexes_retry_at or _indexes_lock.locked():
+        return
+    async with _indexes_lock:
+        if _indexes_ready:
+            return
+        _indexes_ready = await ensure_ntd_indexes(driver)
+        if _indexes_ready:
+            _indexes_retry_delay = NTD_INDEX_RETRY_MIN
+        else:
+            _indexes_retry_at = time.monotonic() + _indexes_retry_delay
+            logger.info(f"NTD indexes will be retried in {_indexes_retry_delay:.0f}s")
+            _indexes_retry_delay = min(_indexes_retry_delay * 2, NTD_INDEX_RETRY_MAX)
+
+
+async def get_neo4j_db():
+    """Общий асинхронный драйвер Neo4j (пул сессий на процесс)"""
+    global _driver
     if not HAS_NEO4J:
         raise HTTPException(status_code=503, detail="Neo4j not available")
     
-    import os
-    neo4j_uri = os.getenv("NEO4J_URI", "neo4j://localhost:7687")
-    neo4j_user = os.getenv("NEO4J_USER", "neo4j")
-    neo4j_password = os.getenv("NEO4J_PASSWORD", "neopassword")
+    if _driver is not None:
+        await _ensure_indexes_with_backoff(_driver)
+        return _driver
     
-    try:
-        if neo4j_user and neo4j_password:
-            driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-        else:
-            driver = GraphDatabase.driver(neo4j_uri)
-        return driver
-    except Exception as e:
-        logger.error(f"Failed to connect to Neo4j: {e}")
-        raise HTTPException(status_code=503, detail=f"Neo4j connection failed: {str(e)}")
+    async with _driver_lock:
+        if _driver is None:
+            neo4j_uri = os.getenv("NEO4J_URI", "neo4j://localhost:7687")
+            neo4j_user = os.getenv("NEO4J_USER", "neo4j")
+            neo4j_password = os.getenv("NEO4J_PASSWORD", "neopassword")
+            
+            try:
+                auth = (neo4j_user, neo4j_password) if neo4j_user and neo4j_password else None
+                _driver = AsyncGraphDatabase.driver(
+                    neo4j_uri, auth=auth, max_connection_pool_size=NEO4J_POOL_SIZE
+                )
+            except Exception as e:
+                logger.error(f"Failed to connect to Neo4j: {e}")
+                raise HTTPException(status_code=503, detail=f"Neo4j connection failed: {str(e)}")
+    
+    await _ensure_indexes_with_backoff(_driver)
+    return _driver
+
+
+async def close_neo4j_db():
+    """Закрывает общий драйвер (вызывается при остановке приложения)"""
+    global _driver, _indexes_ready, _indexes_retry_at, _indexes_retry_delay
+    if _driver is not None:
+        await _driver.close()
+        _driver = None
+        _indexes_ready = False
+        _indexes_retry_at = 0.0
+        _indexes_retry_delay = NTD_INDEX_RETRY_MIN
+
+
+def _ntd_node(node, score: Optional[float] = None) -> "NTDNode":
+    return NTDNode(
+        canonical_id=node["canonical_id"],
+        document_type=node.get("document_type") or "",
+        full_text=node.get("full_text") or "",
+        context=node.get("context") or "",
+        confidence=node.get("confidence") or 0.0,
+        reference_count=node.get("reference_count") or 0,
+        score=score
+    )
 
 # Pydantic модели для API
 class NTDNode(BaseModel):
@@ -46,6 +192,7 @@ class NTDNode(BaseModel):
     context: str
     confidence: float
     reference_count: Optional[int] = 0
+    score: Optional[float] = None
 
 class NTDReference(BaseModel):
     canonical_id: str
@@ -72,6 +219,12 @@ class NTDNetwork(BaseModel):
     nodes: List[NTDNode]
     relationships: List[NTDRelationship]
 
+class NTDSectionHit(BaseModel):
+    doc_id: str
+    title: str
+    section_id: Optional[str] = None
+    score: float
+
 # Создаем роутер
 ntd_router = APIRouter(prefix="/api/ntd", tags=["NTD Registry"])
 
@@ -79,47 +232,41 @@ ntd_router = APIRouter(prefix="/api/ntd", tags=["NTD Registry"])
 async def get_ntd_statistics(neo4j_driver = Depends(get_neo4j_db)):
     """Получает общую статистику по реестру НТД"""
     try:
-        with neo4j_driver.session() as session:
-            # Общее количество узлов НТД
-            ntd_count_result = session.run("MATCH (n:NTD) RETURN count(n) as count")
-            ntd_record = ntd_count_result.single()
-            ntd_count = ntd_record["count"] if ntd_record else 0
-            
-            # Общее количество документов
-            doc_count_result = session.run("MATCH (d:Document) RETURN count(d) as count")
-            doc_record = doc_count_result.single()
-            doc_count = doc_record["count"] if doc_record else 0
-            
-            # Общее количество связей
-            rel_count_result = session.run("MATCH ()-[r]->() RETURN count(r) as count")
-            rel_record = rel_count_result.single()
-            rel_count = rel_record["count"] if rel_record else 0
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
+            # Счетчики по меткам и связям берутся из count store без обхода узлов
+            counts_result = await session.run(_cypher("""
+                CALL { MATCH (n:NTD) RETURN count(n) AS ntd_count }
+                CALL { MATCH (d:Document) RETURN count(d) AS doc_count }
+                CALL { MATCH ()-[r]->() RETURN count(r) AS rel_count }
+                RETURN ntd_count, doc_count, rel_count
+            """))
+            counts = await counts_result.single()
             
             # Статистика по типам
-            type_stats_result = session.run("""
+            type_stats_result = await session.run(_cypher("""
                 MATCH (n:NTD) 
                 RETURN n.document_type as type, count(n) as count
                 ORDER BY count DESC
-            """)
-            by_type = {record["type"]: record["count"] for record in type_stats_result}
+            """))
+            by_type = {record["type"]: record["count"] async for record in type_stats_result}
             
             # Статистика по уверенности
-            confidence_result = session.run("""
+            confidence_result = await session.run(_cypher("""
                 MATCH (n:NTD) 
                 WHERE n.confidence IS NOT NULL
                 RETURN 
                     count(n) as total,
                     sum(CASE WHEN n.confidence >= 0.7 THEN 1 ELSE 0 END) as high_confidence,
                     avg(n.confidence) as avg_confidence
-            """)
-            conf_record = confidence_result.single()
+            """))
+            conf_record = await confidence_result.single()
             high_confidence_count = conf_record["high_confidence"] if conf_record else 0
             average_confidence = conf_record["avg_confidence"] if conf_record else 0.0
             
             return NTDStatistics(
-                total_ntd_nodes=ntd_count,
-                total_documents=doc_count,
-                total_relationships=rel_count,
+                total_ntd_nodes=counts["ntd_count"] if counts else 0,
+                total_documents=counts["doc_count"] if counts else 0,
+                total_relationships=counts["rel_count"] if counts else 0,
                 by_type=by_type,
                 high_confidence_count=high_confidence_count,
                 average_confidence=float(average_confidence) if average_confidence else 0.0
@@ -131,140 +278,161 @@ async def get_ntd_statistics(neo4j_driver = Depends(get_neo4j_db)):
 
 @ntd_router.get("/search", response_model=List[NTDNode])
 async def search_ntd(
-    query: str = Query(..., description="Search query for NTD"),
+    query: str = Query(..., min_length=1, description="Search query for NTD"),
     doc_type: Optional[str] = Query(None, description="Filter by document type"),
     min_confidence: float = Query(0.0, description="Minimum confidence threshold"),
-    limit: int = Query(50, description="Maximum number of results"),
+    limit: int = Query(50, ge=1, le=NTD_MAX_PAGE_SIZE, description="Page size"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
     neo4j_driver = Depends(get_neo4j_db)
 ):
-    """Поиск НТД по запросу"""
+    """Поиск НТД по полнотекстовому индексу, результаты ранжированы по релевантности"""
+    lucene_query = build_fulltext_query(query)
+    if not lucene_query:
+        return []
+    
+    params = {
+        "index": NTD_FULLTEXT_INDEX,
+        "query": lucene_query,
+        "doc_type": doc_type,
+        "min_confidence": min_confidence,
+        "offset": offset,
+        "limit": limit
+    }
     try:
-        with neo4j_driver.session() as session:
-            # Базовый запрос
-            cypher_query = """
-                MATCH (n:NTD)
-                WHERE n.canonical_id CONTAINS $query 
-                   OR n.full_text CONTAINS $query
-                   OR n.context CONTAINS $query
-            """
-            params = {"query": query}
-            
-            # Добавляем фильтры
-            if doc_type:
-                cypher_query += " AND n.document_type = $doc_type"
-                params["doc_type"] = doc_type
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
+            if _indexes_ready:
+                result = await session.run(_cypher("""
+                    CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+                    WHERE ($doc_type IS NULL OR node.document_type = $doc_type)
+                      AND coalesce(node.confidence, 0.0) >= $min_confidence
+                    RETURN node, score
+                    ORDER BY score DESC, node.confidence DESC
+                    SKIP $offset
+                    LIMIT $limit
+                """), params)
+            else:
+                # Индекс не создан (нет прав на схему) - прежний поиск подстрокой, но с пагинацией
+                params["query"] = query
+                result = await session.run(_cypher("""
+                    MATCH (node:NTD)
+                    WHERE (node.canonical_id CONTAINS $query
+                           OR node.full_text CONTAINS $query
+                           OR node.context CONTAINS $query)
+                      AND ($doc_type IS NULL OR node.document_type = $doc_type)
+                      AND coalesce(node.confidence, 0.0) >= $min_confidence
+                    RETURN node, null AS score
+                    ORDER BY node.confidence DESC
+                    SKIP $offset
+                    LIMIT $limit
+                """), params)
             
-            cypher_query += " AND n.confidence >= $min_confidence"
-            params["min_confidence"] = min_confidence
+            return [_ntd_node(record["node"], record["score"]) async for record in result]
             
-            cypher_query += """
-                RETURN n.canonical_id as canonical_id,
-                       n.document_type as document_type,
-                       n.full_text as full_text,
-                       n.context as context,
-                       n.confidence as confidence,
-                       n.reference_count as reference_count
-                ORDER BY n.confidence DESC
+    except Exception as e:
+        logger.error(f"Error searching NTD: {e}")
+        raise HTTPException(status_code=500, detail=f"Error searching NTD: {str(e)}")
+
+@ntd_router.get("/search/sections", response_model=List[NTDSectionHit])
+async def search_ntd_sections(
+    query: str = Query(..., min_length=1, description="Search query for document and section titles"),
+    limit: int = Query(20, ge=1, le=NTD_MAX_PAGE_SIZE, description="Page size"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
+    neo4j_driver = Depends(get_neo4j_db)
+):
+    """Ранжированный поиск по заголовкам документов и их разделов"""
+    lucene_query = build_fulltext_query(query)
+    if not lucene_query:
+        return []
+    if not _indexes_ready:
+        raise HTTPException(status_code=503, detail="NTD full-text indexes are not available")
+    
+    try:
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
+            result = await session.run(_cypher("""
+                CALL {
+                    CALL db.index.fulltext.queryNodes($document_index, $query) YIELD node, score
+                    RETURN coalesce(node.canonical_id, node.id) AS doc_id, node.title AS title,
+                           null AS section_id, score
+                    UNION ALL
+                    CALL db.index.fulltext.queryNodes($section_index, $query) YIELD node, score
+                    RETURN node.doc_id AS doc_id, node.title AS title,
+                           node.section_id AS section_id, score
+                }
+                RETURN doc_id, title, section_id, score
+                ORDER BY score DESC
+                SKIP $offset
                 LIMIT $limit
-            """
-            params["limit"] = limit
+            """), {
+                "document_index": DOCUMENT_FULLTEXT_INDEX,
+                "section_index": SECTION_FULLTEXT_INDEX,
+                "query": lucene_query,
+                "offset": offset,
+                "limit": limit
+            })
             
-            result = session.run(cypher_query, params)
-            ntd_nodes = []
-            
-            for record in result:
-                ntd_nodes.append(NTDNode(
-                    canonical_id=record["canonical_id"],
-                    document_type=record["document_type"],
-                    full_text=record["full_text"],
-                    context=record["context"],
-                    confidence=record["confidence"],
-                    reference_count=record["reference_count"] or 0
-                ))
-            
-            return ntd_nodes
+            return [
+                NTDSectionHit(
+                    doc_id=str(record["doc_id"]),
+                    title=record["title"] or "",
+                    section_id=record["section_id"],
+                    score=record["score"]
+                )
+                async for record in result
+            ]
             
     except Exception as e:
-        logger.error(f"Error searching NTD: {e}")
-        raise HTTPException(status_code=500, detail=f"Error searching NTD: {str(e)}")
+        logger.error(f"Error searching NTD sections: {e}")
+        raise HTTPException(status_code=500, detail=f"Error searching NTD sections: {str(e)}")
 
 @ntd_router.get("/network", response_model=NTDNetwork)
 async def get_ntd_network(
     canonical_id: Optional[str] = Query(None, description="Center the network around this NTD"),
-    depth: int = Query(2, description="Network depth"),
-    limit: int = Query(100, description="Maximum number of nodes"),
+    depth: int = Query(2, ge=1, le=NTD_MAX_NETWORK_DEPTH, description="Network depth"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of relationships"),
     neo4j_driver = Depends(get_neo4j_db)
 ):
     """Получает сеть связей НТД"""
     try:
-        with neo4j_driver.session() as session:
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
             if canonical_id:
-                # Сеть вокруг конкретного НТД
-                cypher_query = """
-                    MATCH (center:NTD {canonical_id: $canonical_id})
-                    MATCH path = (center)-[*1..$depth]-(connected:NTD)
-                    RETURN DISTINCT connected, path
-                    LIMIT $limit
-                """
-                params = {"canonical_id": canonical_id, "depth": depth, "limit": limit}
+                # Сеть вокруг конкретного НТД: глубина и число путей ограничены
+                cypher_query = build_network_query(depth)
+                params = {"canonical_id": canonical_id, "limit": limit, "path_limit": limit * 4}
             else:
                 # Общая сеть
                 cypher_query = """
-                    MATCH (n:NTD)-[r]-(connected:NTD)
-                    RETURN DISTINCT n, connected, r
+                    MATCH (n:NTD)-[r]->(connected:NTD)
+                    RETURN n, connected, r
                     LIMIT $limit
                 """
                 params = {"limit": limit}
             
-            result = session.run(cypher_query, params)
+            result = await session.run(_cypher(cypher_query), params)
             
             nodes = []
             relationships = []
             seen_nodes = set()
             seen_relationships = set()
             
-            for record in result:
+            async for record in result:
                 # Обрабатываем узлы
-                if "n" in record:
-                    node = record["n"]
-                    node_id = node["canonical_id"]
-                    if node_id not in seen_nodes:
-                        nodes.append(NTDNode(
-                            canonical_id=node_id,
-                            document_type=node.get("document_type", ""),
-                            full_text=node.get("full_text", ""),
-                            context=node.get("context", ""),
-                            confidence=node.get("confidence", 0.0),
-                            reference_count=node.get("reference_count", 0)
-                        ))
-                        seen_nodes.add(node_id)
-                
-                if "connected" in record:
-                    connected = record["connected"]
-                    connected_id = connected["canonical_id"]
-                    if connected_id not in seen_nodes:
-                        nodes.append(NTDNode(
-                            canonical_id=connected_id,
-                            document_type=connected.get("document_type", ""),
-                            full_text=connected.get("full_text", ""),
-                            context=connected.get("context", ""),
-                            confidence=connected.get("confidence", 0.0),
-                            reference_count=connected.get("reference_count", 0)
-                        ))
-                        seen_nodes.add(connected_id)
+                for key in ("n", "connected"):
+                    node = record[key]
+                    if node["canonical_id"] not in seen_nodes:
+                        nodes.append(_ntd_node(node))
+                        seen_nodes.add(node["canonical_id"])
                 
                 # Обрабатываем связи
-                if "r" in record:
-                    rel = record["r"]
-                    rel_key = f"{rel.start_node['canonical_id']}-{rel.end_node['canonical_id']}"
-                    if rel_key not in seen_relationships:
-                        relationships.append(NTDRelationship(
-                            source=rel.start_node["canonical_id"],
-                            target=rel.end_node["canonical_id"],
-                            relationship_type=rel.type,
-                            created_at=str(rel.get("created_at", ""))
-                        ))
-                        seen_relationships.add(rel_key)
+                rel = record["r"]
+                rel_key = f"{rel.start_node['canonical_id']}-{rel.type}-{rel.end_node['canonical_id']}"
+                if rel_key not in seen_relationships:
+                    relationships.append(NTDRelationship(
+                        source=rel.start_node["canonical_id"],
+                        target=rel.end_node["canonical_id"],
+                        relationship_type=rel.type,
+                        created_at=str(rel.get("created_at", ""))
+                    ))
+                    seen_relationships.add(rel_key)
             
             return NTDNetwork(nodes=nodes, relationships=relationships)
             
@@ -275,11 +443,12 @@ async def get_ntd_network(
 @ntd_router.get("/document/{doc_id}/references", response_model=List[NTDReference])
 async def get_document_ntd_references(
     doc_id: str,
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of references"),
     neo4j_driver = Depends(get_neo4j_db)
 ):
     """Получает НТД ссылки для конкретного документа"""
     try:
-        with neo4j_driver.session() as session:
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
             cypher_query = """
                 MATCH (doc:Document {id: $doc_id})-[r:REFERENCES_NTD]->(ntd:NTD)
                 RETURN ntd.canonical_id as canonical_id,
@@ -288,12 +457,13 @@ async def get_document_ntd_references(
                        r.context as context,
                        r.position as position
                 ORDER BY r.confidence DESC
+                LIMIT $limit
             """
             
-            result = session.run(cypher_query, {"doc_id": doc_id})
+            result = await session.run(_cypher(cypher_query), {"doc_id": doc_id, "limit": limit})
             references = []
             
-            for record in result:
+            async for record in result:
                 references.append(NTDReference(
                     canonical_id=record["canonical_id"],
                     document_type=record["document_type"],
@@ -311,11 +481,13 @@ async def get_document_ntd_references(
 @ntd_router.get("/ntd/{canonical_id}/documents", response_model=List[Dict[str, Any]])
 async def get_ntd_referencing_documents(
     canonical_id: str,
+    limit: int = Query(100, ge=1, le=NTD_MAX_PAGE_SIZE, description="Page size"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
     neo4j_driver = Depends(get_neo4j_db)
 ):
     """Получает документы, которые ссылаются на конкретный НТД"""
     try:
-        with neo4j_driver.session() as session:
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
             cypher_query = """
                 MATCH (doc:Document)-[r:REFERENCES_NTD]->(ntd:NTD {canonical_id: $canonical_id})
                 RETURN doc.id as doc_id,
@@ -324,12 +496,16 @@ async def get_ntd_referencing_documents(
                        r.confidence as confidence,
                        r.context as context
                 ORDER BY r.confidence DESC
+                SKIP $offset
+                LIMIT $limit
             """
             
-            result = session.run(cypher_query, {"canonical_id": canonical_id})
+            result = await session.run(_cypher(cypher_query), {
+                "canonical_id": canonical_id, "offset": offset, "limit": limit
+            })
             documents = []
             
-            for record in result:
+            async for record in result:
                 documents.append({
                     "doc_id": record["doc_id"],
                     "title": record["title"],
@@ -348,17 +524,17 @@ async def get_ntd_referencing_documents(
 async def get_ntd_types(neo4j_driver = Depends(get_neo4j_db)):
     """Получает список всех типов НТД"""
     try:
-        with neo4j_driver.session() as session:
+        async with neo4j_driver.session(database=NEO4J_DATABASE) as session:
             cypher_query = """
                 MATCH (n:NTD)
                 RETURN n.document_type as type, count(n) as count
                 ORDER BY count DESC
             """
             
-            result = session.run(cypher_query)
+            result = await session.run(_cypher(cypher_query))
             types = []
             
-            for record in result:
+            async for record in result:
                 types.append({
                     "type": record["type"],
                     "count": record["count"]
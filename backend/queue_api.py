@@ -3,7 +3,8 @@
 Queue API - API для работы с очередью задач
 Предоставляет endpoints для управления активными и завершенными задачами
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import logging
@@ -11,6 +12,8 @@ import json
 import os
 from datetime import datetime
 
+from core.queue_index import QueueIndex, tool_type
+
 logger = logging.getLogger(__name__)
 
 # Импортируем Redis
@@ -21,8 +24,11 @@ except ImportError:
     logger.warning("Redis not available")
     HAS_REDIS = False
 
+_redis_pool = None
+
 def get_redis_client():
-    """Получение подключения к Redis"""
+    """Получение подключения к Redis (общий пул соединений)"""
+    global _redis_pool
     if not HAS_REDIS:
         raise HTTPException(status_code=503, detail="Redis not available")
     
@@ -31,14 +37,46 @@ def get_redis_client():
     redis_db = int(os.getenv("REDIS_DB", "0"))
     
     try:
-        client = redis.Redis(host=redis_host, port=redis_port, db=redis_db, decode_responses=True)
-        # Проверяем подключение
-        client.ping()
-        return client
+        if _redis_pool is None:
+            _redis_pool = redis.ConnectionPool(host=redis_host, port=redis_port, db=redis_db, decode_responses=True)
+        return redis.Redis(connection_pool=_redis_pool)
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
         raise HTTPException(status_code=503, detail=f"Redis connection failed: {str(e)}")
 
+def _queue_task(job: Dict[str, Any]) -> "QueueTask":
+    """QueueTask из записи индекса очереди (метаданные + результат Celery)"""
+    result_meta = job.get("result_meta") or {}
+    status_value = job.get("status", "PENDING")
+    result = result_meta.get("result")
+    progress = 100 if status_value == "SUCCESS" else 0
+    if isinstance(result, dict):
+        progress = int(result.get("progress", progress) or progress)
+    started_at = job.get("started_at")
+    return QueueTask(
+        id=job["id"],
+        type=job.get("type") or tool_type(result_meta.get("name")),
+        status=status_value,
+        progress=progress,
+        owner=job.get("owner", "system"),
+        started_at=datetime.fromtimestamp(float(started_at)).isoformat() if started_at else
+            result_meta.get("date_done", datetime.now().isoformat()),
+        eta=result_meta.get("eta"),
+        result=result if isinstance(result, dict) else None,
+        error=str(result) if status_value == "FAILURE" and result else None
+    )
+
+def _group_by_type(jobs: List[Dict[str, Any]]) -> Dict[str, List["QueueTask"]]:
+    grouped: Dict[str, List[QueueTask]] = {}
+    for job in jobs:
+        try:
+            task = _queue_task(job)
+        except Exception as e:
+            logger.warning(f"Error parsing task {job.get('id')}: {e}")
+            continue
+        grouped.setdefault(task.type, []).append(task)
+    return grouped
+
 # Pydantic модели для API
 class QueueTask(BaseModel):
     id: str
@@ -58,107 +96,42 @@ class JobCancelRequest(BaseModel):
 queue_router = APIRouter(prefix="/queue", tags=["Queue Management"])
 
 @queue_router.get("/active", response_model=Dict[str, List[QueueTask]])
-async def get_active_jobs(redis_client = Depends(get_redis_client)):
-    """Получает список активных задач"""
+async def get_active_jobs(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    redis_client = Depends(get_redis_client)
+):
+    """Получает страницу активных задач (новые первыми), сгруппированных по инструментам"""
     try:
-        # Получаем все ключи активных задач
-        active_keys = redis_client.keys("celery-task-meta-*")
-        
-        active_jobs = {}
-        
-        for key in active_keys:
-            try:
-                task_data = redis_client.get(key)
-                if task_data:
-                    task_info = json.loads(task_data)
-                    
-                    # Извлекаем информацию о задаче
-                    task_id = key.replace("celery-task-meta-", "")
-                    tool_type = task_info.get("name", "unknown").split(".")[-1]
-                    
-                    if tool_type not in active_jobs:
-                        active_jobs[tool_type] = []
-                    
-                    task = QueueTask(
-                        id=task_id,
-                        type=tool_type,
-                        status=task_info.get("status", "PENDING"),
-                        progress=task_info.get("progress", 0),
-                        owner=task_info.get("owner", "system"),
-                        started_at=task_info.get("date_done", datetime.now().isoformat()),
-                        eta=task_info.get("eta"),
-                        result=task_info.get("result"),
-                        error=task_info.get("error")
-                    )
-                    
-                    active_jobs[tool_type].append(task)
-                    
-            except Exception as e:
-                logger.warning(f"Error parsing task {key}: {e}")
-                continue
-        
-        return active_jobs
+        jobs, next_cursor = QueueIndex(redis_client).page(finished=False, limit=limit, cursor=cursor)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return _group_by_type(jobs)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting active jobs: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting active jobs: {str(e)}")
 
 @queue_router.get("/completed", response_model=Dict[str, List[QueueTask]])
 async def get_completed_jobs(
+    response: Response,
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of completed jobs to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     redis_client = Depends(get_redis_client)
 ):
-    """Получает список завершенных задач"""
+    """Получает страницу завершенных задач (новые первыми)"""
     try:
-        # Получаем все ключи завершенных задач
-        completed_keys = redis_client.keys("celery-task-meta-*")
-        
-        completed_jobs = {}
-        completed_tasks = []
-        
-        for key in completed_keys:
-            try:
-                task_data = redis_client.get(key)
-                if task_data:
-                    task_info = json.loads(task_data)
-                    
-                    # Проверяем, что задача завершена
-                    if task_info.get("status") in ["SUCCESS", "FAILURE"]:
-                        task_id = key.replace("celery-task-meta-", "")
-                        tool_type = task_info.get("name", "unknown").split(".")[-1]
-                        
-                        task = QueueTask(
-                            id=task_id,
-                            type=tool_type,
-                            status=task_info.get("status", "UNKNOWN"),
-                            progress=100 if task_info.get("status") == "SUCCESS" else 0,
-                            owner=task_info.get("owner", "system"),
-                            started_at=task_info.get("date_done", datetime.now().isoformat()),
-                            eta=None,
-                            result=task_info.get("result"),
-                            error=task_info.get("error")
-                        )
-                        
-                        completed_tasks.append((task, task_info.get("date_done", "")))
-                        
-            except Exception as e:
-                logger.warning(f"Error parsing completed task {key}: {e}")
-                continue
-        
-        # Сортируем по дате завершения (новые первыми)
-        completed_tasks.sort(key=lambda x: x[1], reverse=True)
-        
-        # Ограничиваем количество
-        completed_tasks = completed_tasks[:limit]
-        
-        # Группируем по типам инструментов
-        for task, _ in completed_tasks:
-            if task.type not in completed_jobs:
-                completed_jobs[task.type] = []
-            completed_jobs[task.type].append(task)
-        
-        return completed_jobs
-        
+        jobs, next_cursor = QueueIndex(redis_client).page(finished=True, limit=limit, cursor=cursor,
+                                                          statuses={"SUCCESS", "FAILURE"})
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return _group_by_type(jobs)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting completed jobs: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting completed jobs: {str(e)}")
@@ -191,6 +164,7 @@ async def cancel_job(
         
         # Сохраняем обновленную информацию
         redis_client.set(task_key, json.dumps(task_info))
+        QueueIndex(redis_client).record_state(job_id, "REVOKED", task_info.get("name"))
         
         return {"status": "success", "message": f"Job {job_id} canceled successfully"}
         
@@ -261,56 +235,17 @@ async def download_job_result(
 
 @queue_router.get("/statistics", response_model=Dict[str, Any])
 async def get_queue_statistics(redis_client = Depends(get_redis_client)):
-    """Получает статистику очереди"""
+    """Получает статистику очереди из инкрементальных счетчиков индекса"""
     try:
-        # Получаем все ключи задач
-        task_keys = redis_client.keys("celery-task-meta-*")
-        
-        total_tasks = len(task_keys)
-        active_tasks = 0
-        completed_tasks = 0
-        failed_tasks = 0
-        
-        tool_stats = {}
-        
-        for key in task_keys:
-            try:
-                task_data = redis_client.get(key)
-                if task_data:
-                    task_info = json.loads(task_data)
-                    status = task_info.get("status", "UNKNOWN")
-                    tool_type = task_info.get("name", "unknown").split(".")[-1]
-                    
-                    # Подсчитываем статистику
-                    if status in ["PENDING", "STARTED", "RETRY"]:
-                        active_tasks += 1
-                    elif status == "SUCCESS":
-                        completed_tasks += 1
-                    elif status == "FAILURE":
-                        failed_tasks += 1
-                    
-                    # Статистика по инструментам
-                    if tool_type not in tool_stats:
-                        tool_stats[tool_type] = {"total": 0, "active": 0, "completed": 0, "failed": 0}
-                    
-                    tool_stats[tool_type]["total"] += 1
-                    if status in ["PENDING", "STARTED", "RETRY"]:
-                        tool_stats[tool_type]["active"] += 1
-                    elif status == "SUCCESS":
-                        tool_stats[tool_type]["completed"] += 1
-                    elif status == "FAILURE":
-                        tool_stats[tool_type]["failed"] += 1
-                        
-            except Exception as e:
-                logger.warning(f"Error parsing task {key}: {e}")
-                continue
+        counters = QueueIndex(redis_client).counters()
         
         statistics = {
-            "total_tasks": total_tasks,
-            "active_tasks": active_tasks,
-            "completed_tasks": completed_tasks,
-            "failed_tasks": failed_tasks,
-            "tool_statistics": tool_stats,
+            "total_tasks": counters["total"],
+            "active_tasks": counters["active"],
+            "completed_tasks": counters["completed"],
+            "failed_tasks": counters["failed"],
+            "revoked_tasks": counters["revoked"],
+            "tool_statistics": counters["tools"],
             "last_updated": datetime.now().isoformat()
         }
         
@@ -320,6 +255,17 @@ async def get_queue_statistics(redis_client = Depends(get_redis_client)):
         logger.error(f"Error getting queue statistics: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting queue statistics: {str(e)}")
 
+@queue_router.post("/index/rebuild", response_model=Dict[str, Any])
+async def rebuild_queue_index(redis_client = Depends(get_redis_client)):
+    """Перестраивает индекс очереди по результатам Celery (SCAN, без блокировки Redis)"""
+    try:
+        indexed = await run_in_threadpool(QueueIndex(redis_client).rebuild)
+        return {"status": "success", "indexed_tasks": indexed}
+        
+    except Exception as e:
+        logger.error(f"Error rebuilding queue index: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding queue index: {str(e)}")
+
 # Health check endpoint
 @queue_router.get("/health")
 async def health_check():
@@ -25,7 +25,8 @@ except ImportError as e:
 
 # Import other dependencies
 import numpy as np
-from shapely.geometry import box, Polygon
+
+from core.clash_detection import tessellate_boxes, detect_clashes, DEFAULT_TOLERANCE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,13 +36,17 @@ logger = logging.getLogger(__name__)
 EXPORTS_DIR = Path("exports")
 EXPORTS_DIR.mkdir(exist_ok=True)
 
-def analyze_bentley_model(ifc_path: str, analysis_type: str = 'clash') -> Dict[str, Any]:
+def analyze_bentley_model(ifc_path: str, analysis_type: str = 'clash', tolerance: float = DEFAULT_TOLERANCE,
+                          offset: int = 0, limit: int = 50) -> Dict[str, Any]:
     """
     Analyze Bentley IFC model with real implementation.
     
     Args:
         ifc_path: Path to IFC file
         analysis_type: Type of analysis ('clash', 'quantity', 'compliance')
+        tolerance: Minimum penetration (m) reported as a clash
+        offset: Clash page offset
+        limit: Clash page size
         
     Returns:
         Analysis results
@@ -116,7 +121,7 @@ def analyze_bentley_model(ifc_path: str, analysis_type: str = 'clash') -> Dict[s
         
         # Perform specific analysis based on type
         if analysis_type == 'clash':
-            clash_results = _detect_clashes(elements)
+            clash_results = _detect_clashes(elements, model=model, tolerance=tolerance, offset=offset, limit=limit)
             results["clash_analysis"] = clash_results
         elif analysis_type == 'quantity':
             quantity_results = _calculate_quantities(elements)
@@ -147,66 +152,42 @@ def analyze_bentley_model(ifc_path: str, analysis_type: str = 'clash') -> Dict[s
                 "error": f"Failed to parse IFC model: {str(e)}"
             }
 
-def _detect_clashes(elements: List[Any]) -> Dict[str, Any]:
+def _detect_clashes(elements: List[Any], model: Any = None, tolerance: float = DEFAULT_TOLERANCE,
+                    offset: int = 0, limit: int = 50) -> Dict[str, Any]:
     """
-    Detect clashes between elements using bounding box overlap.
+    Detect clashes between elements using a 3D bounding box sweep.
     
     Args:
         elements: List of IFC elements
+        model: IFC file the elements belong to (taken from the elements if omitted)
+        tolerance: Minimum penetration (m) reported as a clash
+        offset: Clash page offset
+        limit: Clash page size
         
     Returns:
-        Clash detection results
+        Clash detection results (all clashes counted, one page returned)
     """
     # Check if ifcopenshell is available
-    if not IFCOPENSHELL_AVAILABLE:
+    if not IFCOPENSHELL_AVAILABLE or not elements:
         return {
             "clash_count": 0,
             "clashes": [],
             "confidence": 0.0
         }
     
-    clashes = []
-    element_boxes = []
-    
-    # Create bounding boxes for all elements
-    for element in elements:
-        try:
-            settings = ifcopenshell.geom.settings()
-            shape = ifcopenshell.geom.create_shape(settings, element)
-            if shape:
-                geometry = shape.geometry
-                vertices = geometry.verts
-                if vertices:
-                    coords = np.array(vertices).reshape(-1, 3)
-                    bbox_min = coords.min(axis=0)
-                    bbox_max = coords.max(axis=0)
-                    element_box = box(bbox_min[0], bbox_min[1], bbox_max[0], bbox_max[1])
-                    element_boxes.append((element, element_box))
-        except Exception as e:
-            logger.warning(f"Could not create bounding box for element {element.GlobalId}: {e}")
-    
-    # Check for overlaps
-    for i, (elem1, box1) in enumerate(element_boxes):
-        for j, (elem2, box2) in enumerate(element_boxes[i+1:], i+1):
-            try:
-                if box1.intersects(box2):
-                    overlap_area = box1.intersection(box2).area
-                    if overlap_area > 0.01:  # Minimum overlap threshold
-                        clashes.append({
-                            "element1_id": elem1.GlobalId,
-                            "element1_type": elem1.is_a(),
-                            "element2_id": elem2.GlobalId,
-                            "element2_type": elem2.is_a(),
-                            "overlap_area": overlap_area
-                        })
-            except Exception as e:
-                logger.warning(f"Error checking overlap between elements {elem1.GlobalId} and {elem2.GlobalId}: {e}")
+    try:
+        model = model or elements[0].wrapped_data.file
+        boxes = tessellate_boxes(model, elements)
+    except Exception as e:
+        logger.warning(f"Could not tessellate elements for clash detection: {e}")
+        return {
+            "clash_count": 0,
+            "clashes": [],
+            "confidence": 0.0,
+            "error": str(e)
+        }
     
-    return {
-        "clash_count": len(clashes),
-        "clashes": clashes[:50],  # Limit to first 50 clashes
-        "confidence": 0.99 if len(clashes) > 0 else 0.95
-    }
+    return detect_clashes(boxes, tolerance=tolerance, offset=offset, limit=limit)
 
 def _calculate_quantities(elements: List[Any]) -> Dict[str, Any]:
     """
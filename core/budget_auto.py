@@ -10,6 +10,8 @@ from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
 
+from core.rate_catalogue import RateCatalogue, catalogue_from_mapping, get_rate_catalogue
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -61,6 +63,9 @@ def load_gesn_csv(filename: str) -> Dict[str, Any]:
     """
     Load GESN rates from CSV file
     
+    The file is parsed once per process by the shared rate catalogue and
+    re-read only when it changes on disk.
+    
     Args:
         filename: Path to CSV file
         
@@ -68,36 +73,32 @@ def load_gesn_csv(filename: str) -> Dict[str, Any]:
         Dictionary with GESN rates
     """
     try:
-        if pd is not None and HAS_EXCEL_LIBS:
-            df = pd.read_csv(filename, index_col=0)
-            logger.info(f"Successfully loaded GESN rates from {filename} with {len(df)} entries")
-            return df.to_dict('index')
-        else:
-            # Fallback implementation without pandas
-            import csv
-            rates = {}
-            with open(filename, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    code = row.pop('code')
-                    # Convert string values to floats
-                    for key, value in row.items():
-                        try:
-                            row[key] = float(value)
-                        except:
-                            pass
-                    rates[code] = row
-            logger.info(f"Successfully loaded GESN rates from {filename} with {len(rates)} entries (fallback method)")
-            return rates
-    except FileNotFoundError:
-        logger.error(f"GESN CSV file not found: {filename}")
-        # Return empty dict with correct structure
-        return {}
+        rates = get_rate_catalogue([filename]).as_dict()
+        if rates:
+            logger.info(f"Successfully loaded GESN rates from {filename} with {len(rates)} entries")
+        return rates
     except Exception as e:
         logger.error(f"Error loading GESN CSV: {e}")
         # Return empty dict with correct structure
         return {}
 
+def get_gesn_catalogue() -> RateCatalogue:
+    """Shared GESN/FER/TER catalogue, falling back to the built-in sample rates"""
+    global _fallback_catalogue
+    catalogue = get_rate_catalogue()
+    if len(catalogue):
+        return catalogue
+    if _fallback_catalogue is None:
+        _fallback_catalogue = RateCatalogue.from_mapping(FALLBACK_GESN_RATES)
+    return _fallback_catalogue
+
+def _as_catalogue(gesn_rates: Any) -> RateCatalogue:
+    if isinstance(gesn_rates, RateCatalogue):
+        return gesn_rates
+    if gesn_rates:
+        return catalogue_from_mapping(gesn_rates)
+    return get_gesn_catalogue()
+
 def auto_budget(estimate_data: Dict[str, Any], gesn_rates: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate automatic budget based on estimate data and GESN rates with enhanced sophistication
@@ -145,8 +146,13 @@ def auto_budget(estimate_data: Dict[str, Any], gesn_rates: Dict[str, Any]) -> Di
     
     logger.info(f"Processing {len(positions)} estimate positions")
     
+    # Resolve all rates in one batch against the indexed catalogue
+    catalogue = _as_catalogue(gesn_rates)
+    matches = catalogue.resolve_batch(positions)
+    
     for i, position in enumerate(positions):
-        position_cost = calculate_position_cost(position, gesn_rates)
+        match = matches[i]
+        position_cost = calculate_position_cost(position, catalogue, rate_data=match.rate if match else {})
         budget["sections"].append(position_cost)
         total_direct_costs += position_cost["total_direct_cost"]
         materials_total += position_cost["materials_total"]
@@ -208,13 +214,15 @@ def auto_budget(estimate_data: Dict[str, Any], gesn_rates: Dict[str, Any]) -> Di
     logger.info(f"Budget calculation completed. Total cost: {budget['total_cost']:.2f}, ROI: {roi:.2f}%")
     return budget
 
-def calculate_position_cost(position: Dict[str, Any], gesn_rates: Dict[str, Any]) -> Dict[str, Any]:
+def calculate_position_cost(position: Dict[str, Any], gesn_rates: Any,
+                            rate_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Calculate cost for a single position using GESN rates with enhanced sophistication
     
     Args:
         position: Estimate position data
-        gesn_rates: GESN rates data
+        gesn_rates: GESN rates data (dict or RateCatalogue)
+        rate_data: Already resolved rate for the position (skips the lookup)
         
     Returns:
         Position cost breakdown
@@ -223,15 +231,12 @@ def calculate_position_cost(position: Dict[str, Any], gesn_rates: Dict[str, Any]
     quantity = position.get("quantity", 1.0)
     unit = position.get("unit", "шт")
     
-    # Find matching GESN rate
-    rate_data = gesn_rates.get(position_code, {})
-    if not rate_data:
-        # Try to find similar codes
-        for code, data in gesn_rates.items():
-            if position_code in code or code in position_code:
-                rate_data = data
-                logger.debug(f"Found similar GESN code: {position_code} → {code}")
-                break
+    # Find matching GESN rate: exact code, parent/child code, then name
+    if rate_data is None:
+        match = _as_catalogue(gesn_rates).resolve(position_code, position.get("description", ""))
+        rate_data = match.rate if match else {}
+        if match and match.match_type != "exact":
+            logger.debug(f"Found similar GESN code ({match.match_type}): {position_code} → {match.code}")
     
     # Base rate calculation
     base_rate = rate_data.get("base_rate", 0.0) if isinstance(rate_data, dict) else 0.0
@@ -532,31 +537,31 @@ def export_budget_to_excel(budget: Dict[str, Any], filename: Optional[str] = Non
     logger.info(f"Budget exported to JSON (fallback): {json_filename}")
     return json_filename
 
-# Load real GESN rates from CSV file
-SAMPLE_GESN_RATES = load_gesn_csv('data/gesn_rates.csv')
-if not SAMPLE_GESN_RATES:
-    # Fallback sample rates
-    SAMPLE_GESN_RATES = {
-        "ГЭСН 8-1-1": {
-            "base_rate": 15000.0,
-            "materials_cost": 8000.0,
-            "labor_cost": 5000.0,
-            "equipment_cost": 2000.0,
-            "description": "Устройство бетонной подготовки"
-        },
-        "ГЭСН 8-1-2": {
-            "base_rate": 25000.0,
-            "materials_cost": 15000.0,
-            "labor_cost": 7000.0,
-            "equipment_cost": 3000.0,
-            "description": "Устройство монолитных бетонных конструкций"
-        },
-        "ГЭСН 8-6-1.1": {
-            "base_rate": 30000.0,
-            "materials_cost": 20000.0,
-            "labor_cost": 8000.0,
-            "equipment_cost": 2000.0,
-            "description": "Устройство сборных железобетонных фундаментов"
-        }
+# Fallback sample rates (used when no rate sources are available)
+FALLBACK_GESN_RATES = {
+    "ГЭСН 8-1-1": {
+        "base_rate": 15000.0,
+        "materials_cost": 8000.0,
+        "labor_cost": 5000.0,
+        "equipment_cost": 2000.0,
+        "description": "Устройство бетонной подготовки"
+    },
+    "ГЭСН 8-1-2": {
+        "base_rate": 25000.0,
+        "materials_cost": 15000.0,
+        "labor_cost": 7000.0,
+        "equipment_cost": 3000.0,
+        "description": "Устройство монолитных бетонных конструкций"
+    },
+    "ГЭСН 8-6-1.1": {
+        "base_rate": 30000.0,
+        "materials_cost": 20000.0,
+        "labor_cost": 8000.0,
+        "equipment_cost": 2000.0,
+        "description": "Устройство сборных железобетонных фундаментов"
     }
-    logger.warning("Using fallback sample GESN rates. For production use, provide a real GESN CSV file.")
\ No newline at end of file
+}
+_fallback_catalogue: Optional[RateCatalogue] = None
+
+# Load real GESN rates from CSV file
+SAMPLE_GESN_RATES = load_gesn_csv('data/gesn_rates.csv') or FALLBACK_GESN_RATES
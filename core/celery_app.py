@@ -10,7 +10,7 @@ celery_app = Celery(
     'bldr_empire',
     broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
     backend=os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'),
-    include=['core.celery_norms']
+    include=['core.celery_norms', 'core.celery_ingest']
 )
 
 # Configure Celery
@@ -21,6 +21,12 @@ celery_app.conf.update(
     timezone='Europe/Moscow',
     enable_utc=True,
     broker_connection_retry_on_startup=True,
+    # Распределённое обучение (core/celery_ingest.py): GPU-этапы на отдельной очереди
+    task_routes={
+        'core.celery_ingest.ingest_batch': {'queue': os.getenv('INGEST_GPU_QUEUE', 'ingest_gpu')},
+        'core.celery_ingest.plan_ingestion': {'queue': os.getenv('INGEST_QUEUE', 'ingest')},
+        'core.celery_ingest.finalize_ingestion': {'queue': os.getenv('INGEST_QUEUE', 'ingest')},
+    },
     beat_schedule={
         'daily-norms-update': {
             'task': 'core.celery_norms.update_norms_task',
@@ -30,5 +36,13 @@ celery_app.conf.update(
     },
 )
 
+# Keep the queue dashboard index (core/queue_index.py) updated from task signals
+if os.getenv('QUEUE_INDEX_ENABLED', 'true').lower() == 'true':
+    try:
+        from core.queue_index import connect_queue_index_signals
+        connect_queue_index_signals(celery_app)
+    except ImportError as e:
+        print(f"Warning: queue index disabled: {e}")
+
 if __name__ == '__main__':
     celery_app.start()
@@ -0,0 +1,236 @@
+"""
+Distributed RAG ingestion over Celery.
+
+``start_distributed_ingestion`` scans the corpus, drops files already in the
+ingestion ledger (core/ingest_ledger.py) and fans the rest out as a chord of
+small-batch tasks::
+
+    chord(ingest_batch(run, batch_0), ..., ingest_batch(run, batch_n)) | finalize_ingestion(run)
+
+Each batch runs the full ``EnterpriseRAGTrainer`` pipeline per document in a
+worker-local trainer. The pipeline embeds with SBERT on the GPU, so batches go
+to a dedicated queue (``INGEST_GPU_QUEUE``) with a per-worker rate limit;
+start one ``-c 1`` worker per GPU on that queue, on as many machines as needed::
+
+    celery -A core.celery_app worker -Q ingest_gpu -c 1 --prefetch-multiplier 1
+
+Batch tasks are acknowledged late, have deterministic ids and claim every
+document in Redis, so a crash only re-runs the interrupted batch. Calling
+``start_distributed_ingestion`` again with the same ``run_id`` resumes the run.
+
+The ``enterprise_docs`` collection is created or migrated to the configured
+quantization (core/vector_storage.py) once by the planner, before fan-out;
+worker trainers only open it, so concurrent workers never migrate at once.
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from core.celery_app import celery_app
+from core.ingest_ledger import IngestLedger, document_key, make_batches, scan_corpus
+from core.startup import startup
+
+logger = logging.getLogger(__name__)
+
+INGEST_GPU_QUEUE = os.getenv("INGEST_GPU_QUEUE", "ingest_gpu")
+INGEST_QUEUE = os.getenv("INGEST_QUEUE", "ingest")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "8"))
+# Celery rate limit на воркер, например "30/m"; пусто - без лимита
+INGEST_GPU_RATE_LIMIT = os.getenv("INGEST_GPU_RATE_LIMIT") or None
+
+_ledger: Optional[IngestLedger] = None
+
+
+def get_ledger() -> IngestLedger:
+    global _ledger
+    if _ledger is None:
+        import redis
+        backend_url = celery_app.conf.result_backend or os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+        _ledger = IngestLedger(redis.Redis.from_url(backend_url, decode_responses=True))
+    return _ledger
+
+
+def _create_worker_trainer():
+    import enterprise_rag_trainer_full as trainer_module
+    # Коллекцию мигрирует планировщик (prepare_collection), воркеры открывают как есть
+    trainer_module.config.qdrant_migrate = False
+    return trainer_module.EnterpriseRAGTrainer(base_dir=os.getenv("BASE_DIR", "I:/docs"))
+
+
+def prepare_collection(size: int = 768) -> Optional[str]:
+    """Create or migrate ``enterprise_docs`` before batches are enqueued; physical name or None"""
+    try:
+        from qdrant_client import QdrantClient
+        from core.chunk_store import PAYLOAD_FIELDS
+        from core.vector_storage import QuantizedStorage
+
+        client = QdrantClient(host=os.getenv("QDRANT_HOST", "localhost"),
+                              port=int(os.getenv("QDRANT_PORT", "6333")), timeout=300.0)
+        storage = QuantizedStorage(client)
+        physical = storage.ensure_collection("enterprise_docs", size=size)
+        storage.ensure_payload_indexes("enterprise_docs", PAYLOAD_FIELDS)
+        return physical
+    except Exception as e:
+        logger.warning(f"[INGEST] Qdrant collection not prepared, workers use it as is: {e}")
+        return None
+
+
+# Один тренер (SBERT, Qdrant, Neo4j) на процесс воркера
+_trainer_component = startup.register("ingest_trainer", _create_worker_trainer)
+
+
+def ingest_document(trainer, ledger: IngestLedger, run_id: str, path: str, fingerprint: str,
+                    owner: str) -> str:
+    """Process one document through the trainer pipeline and record the outcome"""
+    doc_key = document_key(path, fingerprint)
+    if ledger.is_done(path, fingerprint):
+        ledger.record(run_id, path, fingerprint, "skipped")
+        return "skipped"
+    if not ledger.claim(doc_key, owner):
+        # Документ обрабатывает другой воркер - его результат попадёт в тот же прогон
+        return "claimed"
+    try:
+        if not os.path.exists(path):
+            ledger.record(run_id, path, fingerprint, "failed", error="file not found")
+            return "failed"
+        chunks_before = trainer.stats.get('total_chunks', 0)
+        works_before = trainer.stats.get('total_works', 0)
+        skipped_before = trainer.stats.get('files_skipped', 0)
+        ok = trainer._process_full_training_pipeline(path)
+        if not ok:
+            ledger.record(run_id, path, fingerprint, "failed", error="pipeline returned failure")
+            return "failed"
+        outcome = "skipped" if trainer.stats.get('files_skipped', 0) > skipped_before else "processed"
+        ledger.record(run_id, path, fingerprint, outcome,
+                      chunks=trainer.stats.get('total_chunks', 0) - chunks_before,
+                      works=trainer.stats.get('total_works', 0) - works_before)
+        return outcome
+    except Exception as e:
+        logger.error(f"[INGEST] {path}: {e}")
+        ledger.record(run_id, path, fingerprint, "failed", error=str(e))
+        return "failed"
+    finally:
+        ledger.release(doc_key)
+
+
+@celery_app.task(bind=True, name='core.celery_ingest.ingest_batch', acks_late=True,
+                 reject_on_worker_lost=True, rate_limit=INGEST_GPU_RATE_LIMIT)
+def ingest_batch_task(self, run_id: str, documents: List[List[str]]) -> Dict[str, Any]:
+    """
+    Ingest a small batch of documents.
+
+    Args:
+        run_id: Ingestion run
+        documents: ``[path, fingerprint]`` pairs
+    """
+    started = time.time()
+    ledger = get_ledger()
+    outcomes: Dict[str, int] = {}
+    error = None
+    try:
+        trainer = _trainer_component.get()
+    except Exception as e:
+        # Тренер недоступен (ошибка или backoff) - документы пакета проваливаются, но задача
+        # завершается: упавший заголовок chord'а не даст вызвать finalize_ingestion
+        logger.error(f"[INGEST] Trainer unavailable, batch of {len(documents)} documents failed: {e}")
+        trainer, error = None, f"trainer unavailable: {e}"
+    for path, fingerprint in documents:
+        try:
+            if trainer is None:
+                ledger.record(run_id, path, fingerprint, "failed", error=error)
+                outcome = "failed"
+            else:
+                outcome = ingest_document(trainer, ledger, run_id, path, fingerprint, owner=self.request.id)
+        except Exception as e:
+            logger.error(f"[INGEST] {path}: {e}")
+            error = error or str(e)
+            outcome = "failed"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    result = {
+        "run_id": run_id,
+        "documents": len(documents),
+        "outcomes": outcomes,
+        "worker": socket.gethostname(),
+        "elapsed_seconds": round(time.time() - started, 2),
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+@celery_app.task(name='core.celery_ingest.finalize_ingestion')
+def finalize_ingestion_task(batch_results: List[Dict[str, Any]], run_id: str) -> Dict[str, Any]:
+    """Chord callback: aggregate the run stats"""
+    summary = get_ledger().finish_run(run_id, batch_results)
+    logger.info(f"[INGEST] Run {run_id} {summary.get('status')}: {summary.get('processed')} processed, "
+                f"{summary.get('failed')} failed, {summary.get('chunks')} chunks")
+    return summary
+
+
+@celery_app.task(name='core.celery_ingest.fail_ingestion')
+def fail_ingestion_task(request, exc, traceback, run_id: str) -> Dict[str, Any]:
+    """Chord errback: a batch failed outright, so finalize_ingestion never runs"""
+    logger.error(f"[INGEST] Run {run_id} failed: batch {getattr(request, 'id', None)} raised {exc!r}")
+    return get_ledger().finish_run(run_id, status="failed")
+
+
+def start_distributed_ingestion(base_dir: str, max_files: Optional[int] = None, run_id: Optional[str] = None,
+                                batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Plan a run and enqueue its batches.
+
+    Args:
+        base_dir: Corpus directory
+        max_files: Limit of scanned files
+        run_id: Existing run to resume (files already in the ledger are skipped)
+        batch_size: Documents per Celery task
+
+    Returns:
+        Run id and plan summary
+    """
+    from celery import chord
+
+    run_id = run_id or f"ingest-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    ledger = get_ledger()
+    prepare_collection()
+    files = scan_corpus(base_dir, max_files)
+    pending, already_done = ledger.pending(files)
+    batches = make_batches([[path, fingerprint] for path, fingerprint in pending], batch_size)
+    ledger.create_run(run_id, base_dir, len(files), already_done, len(batches))
+
+    if not batches:
+        summary = ledger.finish_run(run_id)
+        return {"run_id": run_id, "scanned": len(files), "pending": 0, "batches": 0, "status": summary["status"]}
+
+    resume_round = int(ledger.client.hget(ledger.run_key(run_id), "resumes") or 0)
+    # Детерминированные id задач: повторная постановка того же плана видна в очереди как те же задачи
+    header = [
+        ingest_batch_task.signature((run_id, batch), queue=INGEST_GPU_QUEUE,
+                                    task_id=f"{run_id}-r{resume_round}-b{n:06d}")
+        for n, batch in enumerate(batches)
+    ]
+    callback = finalize_ingestion_task.signature((run_id,), queue=INGEST_QUEUE,
+                                                 task_id=f"{run_id}-r{resume_round}-final")
+    callback.link_error(fail_ingestion_task.signature((run_id,), queue=INGEST_QUEUE))
+    chord(header)(callback)
+    logger.info(f"[INGEST] Run {run_id}: {len(pending)} of {len(files)} files in {len(batches)} batches")
+    return {"run_id": run_id, "scanned": len(files), "pending": len(pending), "already_done": already_done,
+            "batches": len(batches), "status": "running"}
+
+
+@celery_app.task(name='core.celery_ingest.plan_ingestion')
+def plan_ingestion_task(base_dir: str, max_files: Optional[int] = None, run_id: Optional[str] = None,
+                        batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, Any]:
+    """Scan and fan out on a worker (large corpora take a while to scan)"""
+    return start_distributed_ingestion(base_dir, max_files, run_id, batch_size)
+
+
+def get_run_progress(run_id: str) -> Optional[Dict[str, Any]]:
+    progress = get_ledger().progress(run_id)
+    if progress is not None and progress.get("failed"):
+        progress["failures"] = get_ledger().failures(run_id, limit=20)
+    return progress
@@ -0,0 +1,201 @@
+"""
+Side store for chunk texts and metadata of the ``enterprise_docs`` collection.
+
+Qdrant points used to carry the whole metadata dict of their document:
+section trees, extracted works, NTD references were repeated on every chunk
+and dominated both upsert time and payload transfer on search. Points now
+carry only the fields searches filter by (``doc_type``, ``file_hash``,
+``canonical_id``) and a ``chunk_key``; everything else lives here, in SQLite
+next to the other training state. Document-level metadata is stored once per
+document, chunks keep only the metadata keys that differ from it::
+
+    store = ChunkStore(base_dir / "chunk_store.db")
+    stale = store.save_document(file_hash, file_path, doc_metadata, chunk_rows)
+    records = store.fetch([hit.payload["chunk_key"] for hit in hits])
+
+``fetch`` is meant for the final top-k of a search: one query per batch of
+keys, joined with the document rows.
+"""
+
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from core.ntd_registry_store import RegistryStore
+
+logger = logging.getLogger(__name__)
+
+# Поля payload точки: по ним фильтрует поиск, для них создаются payload-индексы
+PAYLOAD_FIELDS = ("doc_type", "file_hash", "canonical_id")
+_IN_CHUNK = 500
+# Пространство имен для детерминированных ключей чанков (uuid5)
+_CHUNK_NAMESPACE = uuid.UUID("6f1c3c1e-54a1-4c1b-9d67-1f6d3a2b7e10")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_hash TEXT PRIMARY KEY,
+    file_path TEXT,
+    doc_type TEXT,
+    canonical_id TEXT,
+    quality_score REAL,
+    near_duplicate_of TEXT,
+    metadata TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_key TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chunk_id TEXT,
+    section_id TEXT,
+    chunk_type TEXT,
+    content TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_file_hash ON chunks(file_hash);
+"""
+
+
+def chunk_key(file_hash: str, position: int, chunk_id: str = "") -> str:
+    """Stable chunk key, also used as the Qdrant point id (re-ingestion overwrites points)"""
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, f"{file_hash}:{position}:{chunk_id}"))
+
+
+def _dumps(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def _loads(value: Optional[str]) -> Dict[str, Any]:
+    return json.loads(value) if value else {}
+
+
+def chunk_overrides(chunk_metadata: Dict[str, Any], doc_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys of the chunk metadata that are absent from or differ from the document metadata"""
+    return {key: value for key, value in (chunk_metadata or {}).items()
+            if key not in doc_metadata or doc_metadata[key] != value}
+
+
+class ChunkStore:
+    """
+    Chunk texts and metadata keyed by ``chunk_key``.
+
+    Args:
+        db_path: SQLite file
+    """
+
+    def __init__(self, db_path):
+        self.store = RegistryStore(str(Path(db_path)))
+        self.store.executescript(SCHEMA)
+
+    def close(self):
+        self.store.close()
+
+    def save_document(self, file_hash: str, file_path: str, metadata: Dict[str, Any],
+                      chunks: Sequence[Dict[str, Any]], near_duplicate_of: Optional[str] = None) -> List[str]:
+        """
+        Replace the stored chunks of a document.
+
+        Args:
+            metadata: Document-level metadata (doc_type, canonical_id, quality_score ... included)
+            chunks: Dicts with chunk_key, position, chunk_id, section_id, chunk_type,
+                content and metadata (full chunk metadata; only overrides are stored)
+            near_duplicate_of: Canonical document when this one is a near-duplicate
+
+        Returns:
+            Keys of previously stored chunks of this document that are gone now
+        """
+        metadata = metadata or {}
+        document = (
+            file_hash, file_path, metadata.get("doc_type", "unknown"), metadata.get("canonical_id", ""),
+            metadata.get("quality_score", 0.0), near_duplicate_of, _dumps(metadata),
+        )
+        rows = [(
+            chunk["chunk_key"], file_hash, chunk.get("position", i), chunk.get("chunk_id", ""),
+            chunk.get("section_id", ""), chunk.get("chunk_type", ""), chunk.get("content", ""),
+            _dumps(chunk_overrides(chunk.get("metadata") or {}, metadata)),
+        ) for i, chunk in enumerate(chunks)]
+        keys = {row[0] for row in rows}
+
+        with self.store.transaction() as conn:
+            previous = [key for (key,) in conn.execute(
+                "SELECT chunk_key FROM chunks WHERE file_hash = ?", (file_hash,))]
+            conn.execute("DELETE FROM chunks WHERE file_hash = ?", (file_hash,))
+            conn.execute(
+                "INSERT INTO documents (file_hash, file_path, doc_type, canonical_id, quality_score, "
+                "near_duplicate_of, metadata) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(file_hash) DO UPDATE SET file_path = excluded.file_path, "
+                "doc_type = excluded.doc_type, canonical_id = excluded.canonical_id, "
+                "quality_score = excluded.quality_score, near_duplicate_of = excluded.near_duplicate_of, "
+                "metadata = excluded.metadata, updated_at = CURRENT_TIMESTAMP",
+                document)
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_key, file_hash, position, chunk_id, section_id, "
+                "chunk_type, content, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return [key for key in previous if key not in keys]
+
+    def delete_document(self, file_hash: str) -> List[str]:
+        """Remove a document and its chunks; returns the removed chunk keys"""
+        with self.store.transaction() as conn:
+            keys = [key for (key,) in conn.execute(
+                "SELECT chunk_key FROM chunks WHERE file_hash = ?", (file_hash,))]
+            conn.execute("DELETE FROM chunks WHERE file_hash = ?", (file_hash,))
+            conn.execute("DELETE FROM documents WHERE file_hash = ?", (file_hash,))
+        return keys
+
+    def fetch(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Full chunk records for ``keys`` (missing keys are left out).
+
+        The record has the shape of the former point payload: content, file_path,
+        file_hash, chunk_id, section_id, chunk_type, doc_type, canonical_id,
+        quality_score, near_duplicate_of and metadata (document metadata with
+        the chunk overrides applied).
+        """
+        keys = list(dict.fromkeys(k for k in keys if k))
+        records: Dict[str, Dict[str, Any]] = {}
+        documents: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(keys), _IN_CHUNK):
+            batch = keys[start:start + _IN_CHUNK]
+            rows = self.store.execute(
+                "SELECT c.chunk_key, c.file_hash, c.chunk_id, c.section_id, c.chunk_type, c.content, c.metadata, "
+                "d.file_path, d.doc_type, d.canonical_id, d.quality_score, d.near_duplicate_of, d.metadata "
+                "FROM chunks c LEFT JOIN documents d ON d.file_hash = c.file_hash "
+                f"WHERE c.chunk_key IN ({', '.join('?' for _ in batch)})", batch)
+            for (key, file_hash, chunk_id, section_id, chunk_type, content, overrides,
+                 file_path, doc_type, canonical_id, quality_score, near_duplicate_of, doc_metadata) in rows:
+                # Метаданные документа разбираются один раз на документ
+                if file_hash not in documents:
+                    documents[file_hash] = _loads(doc_metadata)
+                record = {
+                    "content": content,
+                    "file_path": file_path,
+                    "file_hash": file_hash,
+                    "chunk_key": key,
+                    "chunk_id": chunk_id,
+                    "section_id": section_id,
+                    "chunk_type": chunk_type,
+                    "metadata": {**documents[file_hash], **_loads(overrides)},
+                    "doc_type": doc_type,
+                    "canonical_id": canonical_id,
+                    "quality_score": quality_score,
+                }
+                if near_duplicate_of:
+                    record["near_duplicate_of"] = near_duplicate_of
+                records[key] = record
+        return records
+
+    def document(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Document-level row with parsed metadata"""
+        rows = self.store.execute(
+            "SELECT file_path, doc_type, canonical_id, quality_score, near_duplicate_of, metadata "
+            "FROM documents WHERE file_hash = ?", (file_hash,))
+        if not rows:
+            return None
+        file_path, doc_type, canonical_id, quality_score, near_duplicate_of, metadata = rows[0]
+        return {"file_hash": file_hash, "file_path": file_path, "doc_type": doc_type,
+                "canonical_id": canonical_id, "quality_score": quality_score,
+                "near_duplicate_of": near_duplicate_of, "metadata": _loads(metadata)}
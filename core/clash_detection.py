@@ -0,0 +1,186 @@
+"""
+Clash detection for IFC models.
+
+Elements are tessellated in parallel with ifcopenshell's geometry iterator
+into world-space 3D axis-aligned boxes (AABB) stored as NumPy arrays. The
+broad phase is a sort-and-sweep along X that emits candidate pairs in
+vectorized batches; the narrow phase checks the overlap of candidate
+pairs only, on all three axes, with a configurable tolerance. Cost is O(n log n + candidates)
+instead of O(n²) pair checks.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+try:
+    import ifcopenshell
+    import ifcopenshell.geom
+    IFCOPENSHELL_AVAILABLE = True
+except ImportError:
+    IFCOPENSHELL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Элементы, которые не являются физическими телами и не участвуют в проверке
+EXCLUDED_TYPES = ("IfcOpeningElement", "IfcVirtualElement", "IfcSpace", "IfcAnnotation")
+DEFAULT_TOLERANCE = float(os.getenv("CLASH_TOLERANCE", "0.01"))
+PAIR_BATCH_SIZE = 2_000_000
+
+
+@dataclass
+class ElementBoxes:
+    """World-space AABBs of model elements (row i describes element i)"""
+    ids: List[str]
+    types: List[str]
+    mins: np.ndarray  # (n, 3)
+    maxs: np.ndarray  # (n, 3)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_arrays(cls, ids: List[str], types: List[str], mins: Iterable, maxs: Iterable) -> "ElementBoxes":
+        return cls(list(ids), list(types),
+                   np.asarray(mins, dtype=float).reshape(-1, 3),
+                   np.asarray(maxs, dtype=float).reshape(-1, 3))
+
+
+def tessellate_boxes(model, elements: Optional[List[Any]] = None,
+                     num_workers: Optional[int] = None) -> ElementBoxes:
+    """
+    Compute element AABBs with the multi-process geometry iterator.
+
+    Args:
+        model: Opened ifcopenshell file
+        elements: Elements to include (default: all IfcElement except EXCLUDED_TYPES)
+        num_workers: Tessellation processes (default: CPU count)
+    """
+    if not IFCOPENSHELL_AVAILABLE:
+        raise ImportError("ifcopenshell not available")
+
+    if elements is None:
+        elements = [e for e in model.by_type("IfcElement") if e.is_a() not in EXCLUDED_TYPES]
+    else:
+        elements = [e for e in elements if e.is_a() not in EXCLUDED_TYPES]
+    if not elements:
+        return ElementBoxes.from_arrays([], [], [], [])
+
+    settings = ifcopenshell.geom.settings()
+    settings.set(settings.USE_WORLD_COORDS, True)
+    iterator = ifcopenshell.geom.iterator(settings, model, num_workers or os.cpu_count() or 1, include=elements)
+
+    ids, types, mins, maxs = [], [], [], []
+    if iterator.initialize():
+        while True:
+            shape = iterator.get()
+            verts = shape.geometry.verts
+            if verts:
+                coords = np.asarray(verts, dtype=float).reshape(-1, 3)
+                element = model.by_id(shape.id)
+                ids.append(shape.guid)
+                types.append(element.is_a())
+                mins.append(coords.min(axis=0))
+                maxs.append(coords.max(axis=0))
+            if not iterator.next():
+                break
+
+    logger.info(f"Tessellated {len(ids)} of {len(elements)} elements")
+    return ElementBoxes.from_arrays(ids, types, mins, maxs)
+
+
+def candidate_pairs(boxes: ElementBoxes, tolerance: float = DEFAULT_TOLERANCE) -> np.ndarray:
+    """
+    Broad + narrow phase: index pairs (i, j), i < j, whose boxes overlap by
+    more than ``tolerance`` on every axis (negative tolerance finds soft
+    clashes - elements closer than ``-tolerance``).
+
+    Returns:
+        int64 array of shape (k, 2)
+    """
+    n = len(boxes)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    order = np.argsort(boxes.mins[:, 0], kind="stable")
+    mins = boxes.mins[order]
+    maxs = boxes.maxs[order]
+    # Sweep по X: для i кандидаты - все j > i, у которых min_x[j] < max_x[i] - tolerance
+    ends = np.searchsorted(mins[:, 0], maxs[:, 0] - tolerance, side="left")
+    counts = np.maximum(ends - np.arange(n) - 1, 0)
+
+    found = []
+    start = 0
+    cumulative = np.cumsum(counts)
+    while start < n:
+        # Пары генерируются пакетами, чтобы ограничить память на плотных моделях
+        base = cumulative[start - 1] if start else 0
+        stop = int(np.searchsorted(cumulative, base + PAIR_BATCH_SIZE, side="right"))
+        stop = max(stop, start + 1)
+        batch_counts = counts[start:stop]
+        total = int(batch_counts.sum())
+        if total:
+            left = np.repeat(np.arange(start, stop), batch_counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+            right = left + 1 + offsets
+            overlap = np.minimum(maxs[left], maxs[right]) - np.maximum(mins[left], mins[right])
+            hit = (overlap > tolerance).all(axis=1)
+            if hit.any():
+                pairs = np.stack([order[left[hit]], order[right[hit]]], axis=1)
+                found.append(np.sort(pairs, axis=1))
+        start = stop
+
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(found)
+
+
+def detect_clashes(boxes: ElementBoxes, tolerance: float = DEFAULT_TOLERANCE,
+                   offset: int = 0, limit: Optional[int] = 100) -> Dict[str, Any]:
+    """
+    Detect clashes between element boxes.
+
+    Clashes are ordered by penetration depth (deepest first) and paged with
+    ``offset``/``limit``; ``clash_count`` is always the full count.
+    """
+    pairs = candidate_pairs(boxes, tolerance)
+    if len(pairs):
+        a, b = pairs[:, 0], pairs[:, 1]
+        extents = np.minimum(boxes.maxs[a], boxes.maxs[b]) - np.maximum(boxes.mins[a], boxes.mins[b])
+        extents = np.clip(extents, 0.0, None)
+        penetration = extents.min(axis=1)
+        volume = extents.prod(axis=1)
+        area = extents[:, 0] * extents[:, 1]
+        ranking = np.lexsort((b, a, -penetration))
+    else:
+        ranking = np.empty(0, dtype=np.int64)
+
+    total = len(ranking)
+    page = ranking[offset:offset + limit] if limit is not None else ranking[offset:]
+    clashes = [
+        {
+            "element1_id": boxes.ids[a[k]],
+            "element1_type": boxes.types[a[k]],
+            "element2_id": boxes.ids[b[k]],
+            "element2_type": boxes.types[b[k]],
+            "penetration": float(penetration[k]),
+            "overlap_volume": float(volume[k]),
+            "overlap_area": float(area[k]),
+        }
+        for k in page.tolist()
+    ]
+    next_offset = offset + len(clashes)
+
+    return {
+        "clash_count": total,
+        "clashes": clashes,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < total else None,
+        "elements_indexed": len(boxes),
+        "tolerance": tolerance,
+        "confidence": 0.99 if total > 0 else 0.95
+    }
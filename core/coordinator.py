@@ -1,8 +1,11 @@
 import json
 import base64
 import threading
+import time
 from typing import Dict, Any, List, Optional
 from core.model_manager import ModelManager
+from core.plan_executor import PlanExecutor, run_parallel, LLM_SEMAPHORE
+from core.tracing.execution_tracer import get_tracer, TraceType, TraceStatus
 
 class Coordinator:
     def __init__(self, model_manager: ModelManager, tools_system: Any, rag_system: Any):
@@ -25,6 +28,9 @@ class Coordinator:
         
         # Получить клиента координатора
         self.coordinator_client = self.model_manager.get_model_client("coordinator")
+        
+        # Трассировка шагов плана (длительность, ожидание зависимостей)
+        self.tracer = get_tracer()
     
     def _add_to_history(self, entry: Dict[str, Any]):
         """Добавить запись в историю с блокировкой и ограничением длины"""
@@ -487,101 +493,138 @@ class Coordinator:
                 ]
             }
     
+    def _run_tool(self, tool_name: str, tool_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Выполнение одного инструмента с приведением результата к словарю"""
+        try:
+            result = self.tools_system.execute_tool(tool_name, **tool_params)
+        except Exception as e:
+            return {"tool_name": tool_name, "result": str(e), "status": "error"}
+        
+        # Обработка результата
+        if hasattr(result, 'data'):
+            result_data = result.data
+        elif hasattr(result, 'is_success') and result.is_success():
+            result_data = getattr(result, 'data', str(result))
+        else:
+            result_data = str(result)
+        
+        return {
+            "tool_name": tool_name,
+            "result": result_data,
+            "status": "success" if hasattr(result, 'is_success') and result.is_success() else "error"
+        }
+    
     def execute_tools(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Выполнение инструментов из плана.
         
+        Независимые инструменты выполняются параллельно; шаг, аргументы которого
+        ссылаются на результат другого шага ($имя_инструмента, ${id}, {{step_0}}),
+        ждёт его завершения (см. core/plan_executor.py). У каждого шага свой
+        таймаут ("timeout" в шаге плана или COORDINATOR_TOOL_TIMEOUT).
+        
         Args:
             plan: JSON-план действий
             
         Returns:
-            Результаты выполнения инструментов
+            Результаты выполнения инструментов в порядке плана
         """
-        tool_results = []
-        
-        if "tools" in plan and plan["tools"]:
-            print(f"Выполнение {len(plan['tools'])} инструментов...")
-            # Выполняем каждый инструмент из плана
-            for i, tool_info in enumerate(plan["tools"]):
-                if isinstance(tool_info, dict) and "name" in tool_info:
-                    tool_name = tool_info["name"]
-                    # Используем "arguments" вместо "params" согласно структуре плана
-                    tool_params = tool_info.get("arguments", {})
-                    print(f"  → Выполнение {tool_name} с аргументами: {tool_params}")
-                    
-                    try:
-                        result = self.tools_system.execute_tool(tool_name, **tool_params)
-                        print(f"  ← Результат: {result}")
-                        
-                        # Обработка результата
-                        if hasattr(result, 'data'):
-                            result_data = result.data
-                        elif hasattr(result, 'is_success') and result.is_success():
-                            result_data = getattr(result, 'data', str(result))
-                        else:
-                            result_data = str(result)
-                        
-                        tool_results.append({
-                            "tool_name": tool_name,
-                            "result": result_data,
-                            "status": "success" if hasattr(result, 'is_success') and result.is_success() else "error"
-                        })
-                    except Exception as e:
-                        print(f"  ← Ошибка: {e}")
-                        tool_results.append({
-                            "tool_name": tool_name,
-                            "result": str(e),
-                            "status": "error"
-                        })
-        else:
+        steps = [t for t in (plan.get("tools") or []) if isinstance(t, dict) and "name" in t]
+        if not steps:
             print("Инструменты не требуются или не найдены в плане")
-        
+            return []
+        
+        print(f"Выполнение {len(steps)} инструментов...")
+        span_id = self.tracer.start_span(
+            operation_name="execute_tools",
+            trace_type=TraceType.COORDINATOR_PLAN,
+            metadata={"tools": [t["name"] for t in steps]}
+        )
+        started = time.perf_counter()
+        executor = PlanExecutor(self._run_tool, tracer=self.tracer, parent_span_id=span_id)
+        tool_results = executor.execute(steps)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        for result in tool_results:
+            print(f"  ← {result['tool_name']}: {result['status']} за {result['duration_ms']:.0f} мс"
+                  f"{' (после ' + ', '.join(steps[j]['name'] for j in result['depends_on']) + ')' if result['depends_on'] else ''}")
+        sequential_ms = sum(r["duration_ms"] for r in tool_results)
+        self.tracer.finish_span(span_id, TraceStatus.COMPLETED, metadata={
+            "duration_ms": round(elapsed_ms, 1),
+            "sequential_ms": round(sequential_ms, 1),
+            "failed": [r["tool_name"] for r in tool_results if r["status"] != "success"]
+        })
+        print(f"Инструменты выполнены за {elapsed_ms:.0f} мс (последовательно было бы {sequential_ms:.0f} мс)")
         return tool_results
     
+    def _query_specialist(self, role: str, plan: Dict[str, Any], tool_results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Запрос к одному специалисту"""
+        # Получить клиента модели для роли
+        model_client = self.model_manager.get_model_client(role)
+        if not model_client:
+            return None
+        
+        # Подготовить промт для специалиста
+        specialist_prompt = self._create_specialist_prompt(role, plan, tool_results)
+        
+        # Выполнить запрос к специалисту
+        messages = [
+            {
+                "role": "system",
+                "content": self.model_manager.get_capabilities_prompt(role)
+            },
+            {
+                "role": "user",
+                "content": specialist_prompt
+            }
+        ]
+        
+        span_id = self.tracer.start_span(
+            operation_name=f"specialist:{role}",
+            trace_type=TraceType.LLM_CALL,
+            metadata={"role": role}
+        )
+        try:
+            response_content = self.model_manager.query(role, messages)
+        except Exception as e:
+            self.tracer.finish_span(span_id, TraceStatus.FAILED, e)
+            raise
+        self.tracer.finish_span(span_id, TraceStatus.COMPLETED)
+        return {
+            "role": role,
+            "response": response_content,
+            "tool_results": tool_results
+        }
+    
     def _coordinate_with_specialists(self, plan: Dict[str, Any], tool_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Координация с специалистами на основе плана и результатов инструментов.
         
+        Специалисты опрашиваются параллельно под общим лимитом одновременных
+        запросов к LLM (LLM_MAX_CONCURRENCY).
+        
         Args:
             plan: JSON-план действий
             tool_results: Результаты выполнения инструментов
             
         Returns:
-            Ответы специалистов
+            Ответы специалистов в порядке ролей плана
         """
+        # Координатор не отвечает сам себе
+        roles = [role for role in (plan.get("roles_involved") or []) if role != "coordinator"]
+        if not roles:
+            return []
+        
+        responses = run_parallel(
+            [lambda role=role: self._query_specialist(role, plan, tool_results) for role in roles],
+            semaphore=LLM_SEMAPHORE
+        )
         specialist_responses = []
-        
-        if "roles_involved" in plan and plan["roles_involved"]:
-            for role in plan["roles_involved"]:
-                if role != "coordinator":  # Координатор не отвечает сам себе
-                    try:
-                        # Получить клиента модели для роли
-                        model_client = self.model_manager.get_model_client(role)
-                        if model_client:
-                            # Подготовить промт для специалиста
-                            specialist_prompt = self._create_specialist_prompt(role, plan, tool_results)
-                            
-                            # Выполнить запрос к специалисту
-                            messages = [
-                                {
-                                    "role": "system",
-                                    "content": self.model_manager.get_capabilities_prompt(role)
-                                },
-                                {
-                                    "role": "user",
-                                    "content": specialist_prompt
-                                }
-                            ]
-                            
-                            response_content = self.model_manager.query(role, messages)
-                            response = {
-                                "role": role,
-                                "response": response_content,
-                                "tool_results": tool_results
-                            }
-                            specialist_responses.append(response)
-                    except Exception as e:
-                        print(f"Ошибка получения ответа от специалиста {role}: {e}")
+        for role, response in zip(roles, responses):
+            if isinstance(response, Exception):
+                print(f"Ошибка получения ответа от специалиста {role}: {response}")
+            elif response:
+                specialist_responses.append(response)
         
         return specialist_responses
     
@@ -0,0 +1,438 @@
+"""
+Critical path engine (CPM) for construction schedules.
+
+Works on integer task indices and NumPy arrays: tasks are rows, links are
+parallel ``src/dst/type/lag`` arrays. Forward and backward passes run level
+by level over the topological order, each level as one vectorized update,
+so the cost scales with the number of levels (the longest dependency
+chain) rather than the number of activities. Supports FS/SS/FF/SF links with lags, a working calendar,
+total/free float, cycle diagnostics and incremental recomputation after a
+single duration change.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from core.exceptions import ScheduleCycleError, ToolValidationError
+
+logger = logging.getLogger(__name__)
+
+LINK_FS, LINK_SS, LINK_FF, LINK_SF = 0, 1, 2, 3
+LINK_TYPES = {
+    "FS": LINK_FS, "SS": LINK_SS, "FF": LINK_FF, "SF": LINK_SF,
+    "finish_to_start": LINK_FS, "start_to_start": LINK_SS,
+    "finish_to_finish": LINK_FF, "start_to_finish": LINK_SF,
+}
+LINK_TYPE_NAMES = {LINK_FS: "finish_to_start", LINK_SS: "start_to_start",
+                   LINK_FF: "finish_to_finish", LINK_SF: "start_to_finish"}
+FLOAT_EPS = 1e-6
+
+
+def work_name(work: Dict[str, Any], index: int) -> str:
+    """Display name of a work; unnamed works are labelled by position"""
+    return work.get("name") or f"Работа {index + 1}"
+
+
+def _gather(ptr: np.ndarray, items: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Concatenate CSR rows ``items[ptr[u]:ptr[u + 1]]`` for all nodes without a Python loop"""
+    starts = ptr[nodes]
+    counts = ptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return items[offsets + np.arange(total)]
+
+
+@dataclass
+class WorkCalendar:
+    """Project calendar: maps working-day offsets to dates"""
+    start_date: datetime = field(default_factory=datetime.now)
+    weekmask: str = "1111111"  # Пн..Вс, по умолчанию без выходных
+    holidays: List[str] = field(default_factory=list)
+
+    def to_datetimes(self, offsets: np.ndarray) -> List[datetime]:
+        offsets = np.asarray(offsets, dtype=float)
+        if self.weekmask == "1111111" and not self.holidays:
+            return [self.start_date + timedelta(days=float(o)) for o in offsets]
+        whole = np.floor(offsets).astype(np.int64)
+        start_day = np.datetime64(self.start_date.date(), "D")
+        days = np.busday_offset(start_day, whole, roll="forward",
+                                weekmask=self.weekmask, holidays=self.holidays)
+        time_of_day = self.start_date - datetime.combine(self.start_date.date(), datetime.min.time())
+        return [
+            datetime.combine(day.astype(datetime), datetime.min.time()) + time_of_day + timedelta(days=float(frac))
+            for day, frac in zip(days, offsets - whole)
+        ]
+
+
+@dataclass
+class CPMResult:
+    """Result of a CPM computation (arrays are indexed by task)"""
+    early_start: np.ndarray
+    early_finish: np.ndarray
+    late_start: np.ndarray
+    late_finish: np.ndarray
+    total_float: np.ndarray
+    free_float: np.ndarray
+    project_duration: float
+
+    @property
+    def critical(self) -> np.ndarray:
+        return self.total_float <= FLOAT_EPS
+
+    def critical_path(self) -> List[int]:
+        """Critical task indices ordered by early start"""
+        indices = np.flatnonzero(self.critical)
+        order = np.lexsort((indices, self.early_start[indices]))
+        return indices[order].tolist()
+
+
+class CPMEngine:
+    """Critical path method over integer task ids and NumPy arrays"""
+
+    def __init__(self, durations: Iterable[float], src: Iterable[int] = (), dst: Iterable[int] = (),
+                 link_types: Optional[Iterable[int]] = None, lags: Optional[Iterable[float]] = None,
+                 keys: Optional[List[Any]] = None):
+        """
+        Args:
+            durations: Task durations in working days
+            src, dst: Link endpoints (predecessor -> successor task index)
+            link_types: LINK_FS/SS/FF/SF per link (default FS)
+            lags: Lag per link in working days (default 0, may be negative)
+            keys: Task labels for diagnostics (ids or names)
+        """
+        self.durations = np.asarray(list(durations), dtype=float)
+        self.n = len(self.durations)
+        self.src = np.asarray(list(src), dtype=np.int64)
+        self.dst = np.asarray(list(dst), dtype=np.int64)
+        m = len(self.src)
+        self.link_types = np.asarray(list(link_types), dtype=np.int8) if link_types is not None else np.zeros(m, np.int8)
+        self.lags = np.asarray(list(lags), dtype=float) if lags is not None else np.zeros(m)
+        self.keys = keys if keys is not None else list(range(self.n))
+        self.warnings: List[str] = []
+        self.result: Optional[CPMResult] = None
+
+        self._build_structure()
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_works(cls, works: List[Dict[str, Any]],
+                   dependency_keys: Iterable[str] = ("dependencies", "deps", "predecessors")) -> "CPMEngine":
+        """
+        Build an engine from work dicts.
+
+        Each work has ``duration`` and optional ``id``/``name``. Dependencies
+        reference a predecessor by id or name, either as plain values or as
+        dicts ``{"id"|"name": ..., "type": "FS"|"SS"|"FF"|"SF", "lag": 2}``.
+        A name shared by several works resolves to the nearest preceding one,
+        so duplicate names never merge tasks.
+
+        Raises:
+            ToolValidationError: a work is not a dict or a lag is not a number
+        """
+        by_id: Dict[Any, int] = {}
+        by_name: Dict[str, List[int]] = {}
+        keys = []
+        durations = []
+        for index, work in enumerate(works):
+            if not isinstance(work, dict):
+                raise ToolValidationError("cpm_engine", f"works[{index}]", work, "object")
+            if work.get("id") is not None:
+                by_id[work["id"]] = index
+            name = work_name(work, index)
+            by_name.setdefault(name, []).append(index)
+            keys.append(work.get("id", name))
+            try:
+                durations.append(max(0.0, float(work.get("duration", 1.0) or 0.0)))
+            except (TypeError, ValueError):
+                durations.append(1.0)
+
+        warnings = []
+        src, dst, types, lags = [], [], [], []
+        for index, work in enumerate(works):
+            dependencies = []
+            for key in dependency_keys:
+                value = work.get(key)
+                if value:
+                    dependencies.extend(value if isinstance(value, (list, tuple)) else [value])
+            for dep in dependencies:
+                ref, link_type, lag = dep, LINK_FS, 0.0
+                if isinstance(dep, dict):
+                    ref = dep.get("id", dep.get("name"))
+                    link_type = LINK_TYPES.get(str(dep.get("type", "FS")), LINK_FS)
+                    try:
+                        lag = float(dep.get("lag", 0.0) or 0.0)
+                    except (TypeError, ValueError):
+                        raise ToolValidationError("cpm_engine", f"works[{index}].dependencies.lag",
+                                                  dep.get("lag"), "number") from None
+                pred = cls._resolve_reference(ref, index, by_id, by_name)
+                if pred is None:
+                    warnings.append(f"Работа '{keys[index]}': неизвестная зависимость '{ref}'")
+                    continue
+                if pred == index:
+                    continue
+                src.append(pred)
+                dst.append(index)
+                types.append(link_type)
+                lags.append(lag)
+
+        duplicates = [name for name, indices in by_name.items() if len(indices) > 1]
+        if duplicates:
+            warnings.append(f"Повторяющиеся наименования работ: {', '.join(map(str, duplicates[:10]))}")
+
+        engine = cls(durations, src, dst, types, lags, keys=keys)
+        engine.warnings.extend(warnings)
+        return engine
+
+    @staticmethod
+    def _resolve_reference(ref: Any, index: int, by_id: Dict[Any, int], by_name: Dict[str, List[int]]) -> Optional[int]:
+        if ref in by_id:
+            return by_id[ref]
+        candidates = by_name.get(ref)
+        if not candidates:
+            return None
+        preceding = [c for c in candidates if c < index]
+        return preceding[-1] if preceding else candidates[0]
+
+    def _build_structure(self) -> None:
+        """CSR adjacency, topological levels and level-sorted link orders"""
+        n = self.n
+        indegree = np.bincount(self.dst, minlength=n)
+
+        succ_order = np.argsort(self.src, kind="stable")
+        self._succ_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.src, minlength=n))))
+        self._succ_links = succ_order
+        pred_order = np.argsort(self.dst, kind="stable")
+        self._pred_ptr = np.concatenate(([0], np.cumsum(indegree)))
+        self._pred_links = pred_order
+
+        # Kahn по уровням: уровень задачи = длина самой длинной цепочки предшественников
+        level = np.zeros(n, dtype=np.int64)
+        remaining = indegree.copy()
+        frontier = np.flatnonzero(remaining == 0)
+        visited = len(frontier)
+        depth = 0
+        while len(frontier):
+            links = _gather(self._succ_ptr, self._succ_links, frontier)
+            if not len(links):
+                break
+            targets = self.dst[links]
+            np.subtract.at(remaining, targets, 1)
+            depth += 1
+            unique_targets = np.unique(targets)
+            frontier = unique_targets[remaining[unique_targets] == 0]
+            level[frontier] = depth
+            visited += len(frontier)
+
+        if visited < n:
+            raise ScheduleCycleError(self._find_cycle(np.flatnonzero(remaining > 0)))
+
+        self.level = level
+        self.max_level = int(level.max()) if n else 0
+        self._nodes_by_level = np.argsort(level, kind="stable")
+        self._node_level_ptr = np.searchsorted(level[self._nodes_by_level], np.arange(self.max_level + 2))
+        # Связи, упорядоченные по уровню преемника (прямой проход) и предшественника (обратный)
+        starts_from_start = (self.link_types == LINK_SS) | (self.link_types == LINK_SF)
+        ends_at_finish = ((self.link_types == LINK_FF) | (self.link_types == LINK_SF)).astype(float)
+        self._passes = {}
+        for name, link_level in (("fwd", level[self.dst]), ("bwd", level[self.src])):
+            order = np.argsort(link_level, kind="stable")
+            self._passes[name] = (
+                np.searchsorted(link_level[order], np.arange(self.max_level + 2)),
+                self.src[order], self.dst[order], self.lags[order],
+                starts_from_start[order], ends_at_finish[order],
+            )
+        self._starts_from_start = starts_from_start
+        self._ends_at_finish = ends_at_finish
+
+    def _find_cycle(self, candidates: np.ndarray) -> List[Any]:
+        """Diagnostic path of one dependency cycle among nodes left by Kahn"""
+        in_cycle_set = set(candidates.tolist())
+        state: Dict[int, int] = {}
+        for start in candidates.tolist():
+            if start in state:
+                continue
+            stack = [(start, iter(self._successors(start)))]
+            path = [start]
+            state[start] = 1
+            while stack:
+                node, successors = stack[-1]
+                advanced = False
+                for succ in successors:
+                    if succ not in in_cycle_set:
+                        continue
+                    if state.get(succ) == 1:
+                        cycle = path[path.index(succ):] + [succ]
+                        return [self.keys[i] for i in cycle]
+                    if succ not in state:
+                        state[succ] = 1
+                        path.append(succ)
+                        stack.append((succ, iter(self._successors(succ))))
+                        advanced = True
+                        break
+                if not advanced:
+                    state[node] = 2
+                    path.pop()
+                    stack.pop()
+        return [self.keys[i] for i in candidates.tolist()]
+
+    def _successors(self, node: int) -> List[int]:
+        links = self._succ_links[self._succ_ptr[node]:self._succ_ptr[node + 1]]
+        return self.dst[links].tolist()
+
+    # ------------------------------------------------------------------
+    # Passes
+    # ------------------------------------------------------------------
+
+    def compute(self) -> CPMResult:
+        """Full forward/backward pass"""
+        es = np.zeros(self.n)
+        ef = self.durations.copy()
+        self._forward(es, ef, from_level=1, mask=None)
+        project_duration = float(ef.max()) if self.n else 0.0
+        lf = np.full(self.n, project_duration)
+        ls = lf - self.durations
+        self._backward(ls, lf, mask=None)
+        self.result = self._finish(es, ef, ls, lf, project_duration)
+        return self.result
+
+    def update_duration(self, task: int, duration: float) -> CPMResult:
+        """
+        Change one task's duration and recompute only what it can affect:
+        the forward pass for its descendants and, while the project duration
+        is unchanged, the backward pass for its ancestors.
+        """
+        if self.result is None:
+            self.durations[task] = max(0.0, float(duration))
+            return self.compute()
+
+        self.durations[task] = max(0.0, float(duration))
+        previous = self.result
+        es, ef = previous.early_start.copy(), previous.early_finish.copy()
+
+        # Сама задача тоже пересчитывается: входящие FF/SF связи зависят от ее длительности
+        descendants = self._reachable(task, forward=True)
+        es[descendants] = 0.0
+        ef[descendants] = self.durations[descendants]
+        self._forward(es, ef, from_level=int(self.level[task]), mask=descendants)
+        project_duration = float(ef.max()) if self.n else 0.0
+
+        if abs(project_duration - previous.project_duration) <= FLOAT_EPS:
+            ls, lf = previous.late_start.copy(), previous.late_finish.copy()
+            ancestors = self._reachable(task, forward=False)
+            lf[ancestors] = project_duration
+            ls[ancestors] = lf[ancestors] - self.durations[ancestors]
+            self._backward(ls, lf, mask=ancestors, to_level=int(self.level[task]))
+        else:
+            lf = np.full(self.n, project_duration)
+            ls = lf - self.durations
+            self._backward(ls, lf, mask=None)
+
+        self.result = self._finish(es, ef, ls, lf, project_duration)
+        return self.result
+
+    def _reachable(self, task: int, forward: bool) -> np.ndarray:
+        """Boolean mask of the task and all its descendants (or ancestors)"""
+        mask = np.zeros(self.n, dtype=bool)
+        mask[task] = True
+        frontier = np.array([task])
+        ptr, links, ends = (self._succ_ptr, self._succ_links, self.dst) if forward else \
+            (self._pred_ptr, self._pred_links, self.src)
+        while len(frontier):
+            nodes = ends[_gather(ptr, links, frontier)]
+            nodes = np.unique(nodes[~mask[nodes]])
+            mask[nodes] = True
+            frontier = nodes
+        return mask
+
+    def _forward(self, es: np.ndarray, ef: np.ndarray, from_level: int, mask: Optional[np.ndarray]) -> None:
+        # FS: ES_j >= EF_i + lag, SS: ES_i + lag, FF: EF_i + lag - d_j, SF: ES_i + lag - d_j
+        d = self.durations
+        ptr, src, dst, lags, from_start, to_finish = self._passes["fwd"]
+        for lvl in range(max(from_level, 1), self.max_level + 1):
+            a, b = ptr[lvl], ptr[lvl + 1]
+            s, t, lag, fs, tf = src[a:b], dst[a:b], lags[a:b], from_start[a:b], to_finish[a:b]
+            if mask is not None:
+                selected = mask[t]
+                if not selected.any():
+                    continue
+                s, t, lag, fs, tf = s[selected], t[selected], lag[selected], fs[selected], tf[selected]
+            np.maximum.at(es, t, np.where(fs, es[s], ef[s]) + lag - tf * d[t])
+            nodes = self._nodes_by_level[self._node_level_ptr[lvl]:self._node_level_ptr[lvl + 1]]
+            ef[nodes] = es[nodes] + d[nodes]
+
+    def _backward(self, ls: np.ndarray, lf: np.ndarray, mask: Optional[np.ndarray], to_level: int = None) -> None:
+        # FS: LF_i <= LS_j - lag, SS: LS_j - lag + d_i, FF: LF_j - lag, SF: LF_j - lag + d_i
+        d = self.durations
+        ptr, src, dst, lags, from_start, to_finish = self._passes["bwd"]
+        top = self.max_level if to_level is None else to_level
+        for lvl in range(top, -1, -1):
+            a, b = ptr[lvl], ptr[lvl + 1]
+            s, t, lag, fs, tf = src[a:b], dst[a:b], lags[a:b], from_start[a:b], to_finish[a:b]
+            if mask is not None:
+                selected = mask[s]
+                s, t, lag, fs, tf = s[selected], t[selected], lag[selected], fs[selected], tf[selected]
+            if len(s):
+                np.minimum.at(lf, s, np.where(tf > 0, lf[t], ls[t]) - lag + fs * d[s])
+            nodes = self._nodes_by_level[self._node_level_ptr[lvl]:self._node_level_ptr[lvl + 1]]
+            ls[nodes] = lf[nodes] - d[nodes]
+
+    def _finish(self, es, ef, ls, lf, project_duration: float) -> CPMResult:
+        total_float = ls - es
+        # Свободный резерв: насколько можно сдвинуть задачу, не сдвигая ни одного преемника
+        free_float = project_duration - ef
+        if len(self.src):
+            s, t = self.src, self.dst
+            slack = (np.where(self._ends_at_finish > 0, ef[t], es[t]) - self.lags
+                     - np.where(self._starts_from_start, es[s], ef[s]))
+            free_float = free_float.copy()
+            has_successors = np.zeros(self.n, dtype=bool)
+            has_successors[s] = True
+            free_float[has_successors] = np.inf
+            np.minimum.at(free_float, s, slack)
+        free_float = np.clip(np.minimum(free_float, total_float), 0.0, None)
+        return CPMResult(es, ef, ls, lf, np.where(np.abs(total_float) <= FLOAT_EPS, 0.0, total_float),
+                         free_float, project_duration)
+
+    # ------------------------------------------------------------------
+    # Presentation
+    # ------------------------------------------------------------------
+
+    def schedule(self, calendar: Optional[WorkCalendar] = None) -> List[Dict[str, Any]]:
+        """Per-task schedule records in topological order"""
+        result = self.result or self.compute()
+        calendar = calendar or WorkCalendar()
+        starts = calendar.to_datetimes(result.early_start)
+        finishes = calendar.to_datetimes(result.early_finish)
+        order = np.lexsort((np.arange(self.n), result.early_start, self.level))
+        return [
+            {
+                "index": int(i),
+                "key": self.keys[i],
+                "start": starts[i].isoformat(),
+                "end": finishes[i].isoformat(),
+                "duration": float(self.durations[i]),
+                "early_start": float(result.early_start[i]),
+                "early_finish": float(result.early_finish[i]),
+                "late_start": float(result.late_start[i]),
+                "late_finish": float(result.late_finish[i]),
+                "total_float": float(result.total_float[i]),
+                "free_float": float(result.free_float[i]),
+                "critical": bool(result.critical[i]),
+            }
+            for i in order.tolist()
+        ]
+
+    def links(self) -> List[Dict[str, Any]]:
+        return [
+            {"source": int(s), "target": int(t), "type": LINK_TYPE_NAMES[int(k)], "lag": float(lag)}
+            for s, t, k, lag in zip(self.src, self.dst, self.link_types, self.lags)
+        ]
@@ -6,8 +6,6 @@
 import pandas as pd
 import re
 import uuid
-import os
-import tempfile
 from typing import List, Dict, Any, Optional, Tuple, Set
 from pathlib import Path
 from enum import Enum
@@ -23,6 +21,8 @@ except ImportError:
     openpyxl = None
     load_workbook = None
 
+from core.streaming_estimate_parser import StreamingEstimateParser
+
 logger = logging.getLogger(__name__)
 
 class EstimateFormat(Enum):
@@ -120,130 +120,95 @@ class EnhancedSmetaParser:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     text_content = f.read()[:5000]  # Первые 5000 символов
             
-            # Анализируем сигнатуры
-            for format_type, signatures in self.format_signatures.items():
-                score = 0
-                
-                # Проверяем ключевые слова
-                for keyword in signatures['keywords']:
-                    if keyword.lower() in text_content.lower():
-                        score += 2
-                
-                # Проверяем паттерны заголовков
-                for pattern in signatures['header_patterns']:
-                    if pattern.lower() in text_content.lower():
-                        score += 1
-                
-                # Проверяем паттерны стоимости
-                for pattern in signatures['cost_patterns']:
-                    if pattern.lower() in text_content.lower():
-                        score += 1
-                
-                # Если набрали достаточно очков, считаем формат определенным
-                if score >= 3:
-                    self.detected_format = format_type
-                    logger.info(f"Определен формат: {format_type.value} (очков: {score})")
-                    return format_type
-            
-            logger.warning("Не удалось определить формат сметы")
-            return EstimateFormat.UNKNOWN
+            return self._detect_format_from_text(text_content)
             
         except Exception as e:
             logger.error(f"Ошибка определения формата: {e}")
             return EstimateFormat.UNKNOWN
     
-    def _process_merged_cells(self, file_path: str) -> str:
-        """🚨 КРИТИЧЕСКИЙ ФИКС: Обработка объединенных ячеек"""
-        if not HAS_OPENPYXL:
-            logger.warning("openpyxl недоступен, пропускаем обработку объединенных ячеек")
-            return file_path
-        
-        try:
-            # 1. Загружаем файл через openpyxl
-            workbook = load_workbook(file_path, data_only=True)
-            sheet = workbook.active
-            
-            logger.info(f"🔍 Обработка объединенных ячеек в файле: {file_path}")
-            
-            # 2. Обрабатываем все объединенные диапазоны
-            merged_ranges = list(sheet.merged_cells.ranges)
-            logger.info(f"📊 Найдено {len(merged_ranges)} объединенных диапазонов")
-            
-            for merged_range in merged_ranges:
-                # Получаем границы объединенного диапазона
-                min_row, min_col, max_row, max_col = merged_range.bounds
-                
-                # Получаем значение из первой ячейки
-                top_left_cell = sheet.cell(row=min_row, column=min_col)
-                top_left_value = top_left_cell.value
-                
-                if top_left_value is not None:
-                    # Присваиваем значение всем ячейкам в диапазоне
-                    for row in range(min_row, max_row + 1):
-                        for col in range(min_col, max_col + 1):
-                            cell = sheet.cell(row=row, column=col)
-                            if cell.value is None:
-                                cell.value = top_left_value
-                                logger.debug(f"📝 Заполнена ячейка {cell.coordinate}: {top_left_value}")
-            
-            # 3. Разъединяем все ячейки
-            for merged_range in merged_ranges:
-                sheet.unmerge_cells(str(merged_range))
-            
-            # 4. Сохраняем временный файл
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            temp_file_path = temp_file.name
-            temp_file.close()
-            
-            workbook.save(temp_file_path)
-            logger.info(f"💾 Создан временный файл без объединенных ячеек: {temp_file_path}")
-            
-            return temp_file_path
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обработки объединенных ячеек: {e}")
-            return file_path  # Возвращаем оригинальный файл
-    
+    def _detect_format_from_text(self, text_content: str) -> EstimateFormat:
+        """Определение формата по образцу текста сметы"""
+        text_lower = text_content.lower()
+        for format_type, signatures in self.format_signatures.items():
+            score = 0
+            score += 2 * sum(1 for keyword in signatures['keywords'] if keyword.lower() in text_lower)
+            score += sum(1 for pattern in signatures['header_patterns'] if pattern.lower() in text_lower)
+            score += sum(1 for pattern in signatures['cost_patterns'] if pattern.lower() in text_lower)
+            if score >= 3:
+                self.detected_format = format_type
+                logger.info(f"Определен формат: {format_type.value} (очков: {score})")
+                return format_type
+        logger.warning("Не удалось определить формат сметы")
+        return EstimateFormat.UNKNOWN
+
     def parse_excel_estimate(self, file_path: str) -> Dict[str, Any]:
         """Парсинг Excel сметы с улучшенной логикой"""
-        temp_file_path = None
+        if not HAS_OPENPYXL or str(file_path).lower().endswith('.xls'):
+            # openpyxl не читает старый формат .xls
+            return self._parse_excel_with_pandas(file_path)
+
         try:
-            # 🚨 КРИТИЧЕСКИЙ ФИКС: Обрабатываем объединенные ячейки
-            temp_file_path = self._process_merged_cells(file_path)
-            
-            # Определяем формат
-            format_type = self.detect_format(temp_file_path)
-            
-            # Читаем Excel файл (теперь без объединенных ячеек!)
-            df = pd.read_excel(temp_file_path, sheet_name=None)
-            
-            # Выбираем основной лист
-            main_sheet = None
-            if len(df) == 1:
-                main_sheet = list(df.values())[0]
-            else:
-                # Ищем лист с наибольшим количеством данных
-                max_rows = 0
-                for sheet_name, sheet_df in df.items():
-                    if len(sheet_df) > max_rows:
-                        max_rows = len(sheet_df)
-                        main_sheet = sheet_df
-            
+            # 🚨 Объединенные ячейки разрешаются при потоковом чтении, без временной копии
+            workbook = StreamingEstimateParser().parse_workbook(file_path)
+            sheets = workbook['sheets']
+            if not sheets:
+                raise ValueError("Не удалось найти основной лист с данными")
+
+            # Основной лист - с наибольшим количеством позиций
+            positions_by_sheet: Dict[str, List[Dict[str, Any]]] = {}
+            for position in workbook['positions']:
+                positions_by_sheet.setdefault(position['sheet'], []).append(position)
+            main_sheet = max(sheets, key=lambda sheet: len(positions_by_sheet.get(sheet['sheet'], [])))
+            positions = positions_by_sheet.get(main_sheet['sheet'], [])
+
+            format_type = self._detect_format_from_text(main_sheet['sample_text'])
+            total_cost = sum(pos.get('total_cost', 0) for pos in positions)
+
+            return {
+                'format': format_type.value,
+                'positions': positions,
+                'total_cost': total_cost,
+                'positions_count': len(positions),
+                'metadata': {
+                    'file_path': file_path,
+                    'parsed_at': pd.Timestamp.now().isoformat(),
+                    'columns_mapping': main_sheet['columns'],
+                    'main_sheet': main_sheet['sheet'],
+                    'header_row': main_sheet['header_row'],
+                    'sheets': [
+                        {key: value for key, value in sheet.items() if key != 'sample_text'}
+                        for sheet in sheets
+                    ],
+                    'merged_cells_processed': workbook['merged_ranges_count'] > 0
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"Ошибка парсинга Excel файла: {e}")
+            return {
+                'format': 'unknown',
+                'positions': [],
+                'total_cost': 0,
+                'positions_count': 0,
+                'error': str(e)
+            }
+
+    def _parse_excel_with_pandas(self, file_path: str) -> Dict[str, Any]:
+        """Парсинг Excel через pandas (для .xls и при отсутствии openpyxl)"""
+        try:
+            format_type = self.detect_format(file_path)
+            df = pd.read_excel(file_path, sheet_name=None)
+
+            # Ищем лист с наибольшим количеством данных
+            main_sheet = max(df.values(), key=len) if df else None
             if main_sheet is None:
                 raise ValueError("Не удалось найти основной лист с данными")
-            
-            # Очищаем данные
+
             main_sheet = main_sheet.dropna(how='all')
-            
-            # Определяем структуру колонок
             columns_mapping = self._detect_columns_structure(main_sheet, format_type)
-            
-            # Парсим позиции
             positions = self._parse_positions(main_sheet, columns_mapping, format_type)
-            
-            # Вычисляем итоги
             total_cost = sum(pos.get('total_cost', 0) for pos in positions)
-            
+
             return {
                 'format': format_type.value,
                 'positions': positions,
@@ -253,10 +218,10 @@ class EnhancedSmetaParser:
                     'file_path': file_path,
                     'parsed_at': pd.Timestamp.now().isoformat(),
                     'columns_mapping': columns_mapping,
-                    'merged_cells_processed': temp_file_path != file_path
+                    'merged_cells_processed': False
                 }
             }
-            
+
         except Exception as e:
             logger.error(f"Ошибка парсинга Excel файла: {e}")
             return {
@@ -266,14 +231,6 @@ class EnhancedSmetaParser:
                 'positions_count': 0,
                 'error': str(e)
             }
-        finally:
-            # 🧹 Очищаем временный файл
-            if temp_file_path and temp_file_path != file_path and os.path.exists(temp_file_path):
-                try:
-                    os.unlink(temp_file_path)
-                    logger.debug(f"🗑️ Удален временный файл: {temp_file_path}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Не удалось удалить временный файл: {e}")
     
     def _detect_columns_structure(self, df: pd.DataFrame, format_type: EstimateFormat) -> Dict[str, str]:
         """Определение структуры колонок"""
@@ -90,6 +90,18 @@ class ToolResourceError(ToolException):
         super().__init__(message, context)
 
 
+class ScheduleCycleError(ToolException):
+    """Циклическая зависимость в графике работ"""
+
+    def __init__(self, cycle: list):
+        message = f"Циклическая зависимость работ: {' → '.join(str(task) for task in cycle)}"
+        context = {
+            "cycle": [str(task) for task in cycle]
+        }
+        super().__init__(message, context)
+        self.cycle = cycle
+
+
 # === ИСКЛЮЧЕНИЯ ДЛЯ АГЕНТОВ ===
 
 class AgentException(BldrBaseException):
@@ -5,7 +5,9 @@ GPP (Graphical Production Plan) creator module
 import json
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-import networkx as nx
+
+from core.cpm_engine import CPMEngine, WorkCalendar
+from core.exceptions import ScheduleCycleError, ToolValidationError
 
 # Optional imports for PDF export
 HAS_PDF = False
@@ -41,14 +43,30 @@ def create_gpp(works_seq: List[Dict[str, Any]], timeline: Optional[Dict[str, Any
         "resources": {}
     }
     
+    # One CPM computation shared by tasks, links and critical path
+    try:
+        engine = build_schedule_engine(works_seq)
+        engine.compute()
+    except ScheduleCycleError as e:
+        engine = None
+        gpp["cycle"] = [str(task) for task in e.cycle]
+    except ToolValidationError as e:
+        # Некорректная работа или лаг - график без расчета, как для цикла
+        engine = None
+        gpp["warnings"] = [e.message]
+    
     # Generate tasks for Gantt chart
-    gpp["tasks"] = generate_gantt_tasks(works_seq, timeline)
+    gpp["tasks"] = generate_gantt_tasks(works_seq, timeline, engine=engine)
     
     # Generate links/dependencies
-    gpp["links"] = generate_task_links(works_seq)
+    gpp["links"] = generate_task_links(works_seq, engine=engine)
     
     # Calculate critical path
-    gpp["critical_path"] = calculate_critical_path(works_seq)
+    gpp["critical_path"] = calculate_critical_path(works_seq, engine=engine) if engine else []
+    if engine is not None:
+        gpp["project_duration"] = engine.result.project_duration
+        if engine.warnings:
+            gpp["warnings"] = engine.warnings
     
     # Add milestones
     gpp["milestones"] = generate_milestones(gpp["tasks"])
@@ -58,35 +76,85 @@ def create_gpp(works_seq: List[Dict[str, Any]], timeline: Optional[Dict[str, Any
     
     return gpp
 
-def generate_gantt_tasks(works_seq: List[Dict[str, Any]], timeline: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+def _task_id(index: int) -> str:
+    return f"TASK_{index+1:03d}"
+
+def _timeline_calendar(timeline: Optional[Dict[str, Any]]) -> WorkCalendar:
+    """Work calendar from optional timeline info (start_date, weekmask, holidays)"""
+    timeline = timeline or {}
+    start_date = timeline.get("start_date")
+    if isinstance(start_date, str):
+        try:
+            start_date = datetime.fromisoformat(start_date)
+        except ValueError:
+            start_date = None
+    return WorkCalendar(
+        start_date=start_date or datetime.now(),
+        weekmask=timeline.get("weekmask", "1111111"),
+        holidays=list(timeline.get("holidays", [])),
+    )
+
+def build_schedule_engine(works_seq: List[Dict[str, Any]]) -> CPMEngine:
+    """
+    Build a CPM engine from work sequences (dependencies in "deps")
+    
+    Raises:
+        ScheduleCycleError: if dependencies form a cycle
+        ToolValidationError: if a work is not an object or a lag is not a number
+    """
+    return CPMEngine.from_works(works_seq)
+
+def generate_gantt_tasks(works_seq: List[Dict[str, Any]], timeline: Optional[Dict[str, Any]] = None,
+                         engine: Optional[CPMEngine] = None) -> List[Dict[str, Any]]:
     """
     Generate tasks for Gantt chart
     
     Args:
         works_seq: Work sequences
         timeline: Optional timeline information
+        engine: Precomputed CPM engine (built from works_seq if omitted)
         
     Returns:
         List of task dictionaries for Recharts
     """
-    tasks = []
-    start_date = datetime.now()
+    if engine is None:
+        try:
+            engine = build_schedule_engine(works_seq)
+        except (ScheduleCycleError, ToolValidationError):
+            engine = None
+    
+    calendar = _timeline_calendar(timeline)
+    schedule = {}
+    if engine is not None:
+        schedule = {record["index"]: record for record in engine.schedule(calendar)}
     
+    tasks = []
     for i, work in enumerate(works_seq):
-        # Calculate start and end dates
         duration = work.get("duration", 1.0)
-        task_start = start_date + timedelta(days=i * 2)  # Simplified scheduling
-        task_end = task_start + timedelta(days=duration)
+        record = schedule.get(i)
+        if record is None:
+            # Без расчета (цикл или некорректные данные) - последовательная раскладка
+            task_start = calendar.start_date + timedelta(days=i * 2)
+            record = {
+                "start": task_start.isoformat(),
+                "end": (task_start + timedelta(days=duration)).isoformat(),
+                "total_float": None,
+                "free_float": None,
+                "critical": False,
+            }
         
         task = {
-            "id": f"TASK_{i+1:03d}",
+            "id": _task_id(i),
             "name": work.get("name", f"Работа {i+1}"),
-            "start": task_start.isoformat(),
-            "end": task_end.isoformat(),
+            "start": record["start"],
+            "end": record["end"],
             "duration": duration,
             "progress": 0,
             "dependencies": work.get("deps", []),
             "resources": work.get("resources", {}),
+            "total_float": record["total_float"],
+            "free_float": record["free_float"],
+            "critical": record["critical"],
             "type": "task"
         }
         
@@ -94,113 +162,53 @@ def generate_gantt_tasks(works_seq: List[Dict[str, Any]], timeline: Optional[Dic
     
     return tasks
 
-def generate_task_links(works_seq: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def generate_task_links(works_seq: List[Dict[str, Any]], engine: Optional[CPMEngine] = None) -> List[Dict[str, Any]]:
     """
     Generate links between tasks (dependencies)
     
     Args:
         works_seq: Work sequences
+        engine: Precomputed CPM engine (built from works_seq if omitted)
         
     Returns:
         List of link dictionaries
     """
+    if engine is None:
+        try:
+            engine = build_schedule_engine(works_seq)
+        except (ScheduleCycleError, ToolValidationError):
+            return []
+
     links = []
-    task_mapping = {work.get("name", f"Работа {i+1}"): f"TASK_{i+1:03d}" 
-                   for i, work in enumerate(works_seq)}
-    
-    for i, work in enumerate(works_seq):
-        task_id = f"TASK_{i+1:03d}"
-        dependencies = work.get("deps", [])
-        
-        for dep in dependencies:
-            # Find the dependency task ID
-            dep_task_id = task_mapping.get(dep)
-            if dep_task_id:
-                links.append({
-                    "id": f"LINK_{len(links)+1:03d}",
-                    "source": dep_task_id,
-                    "target": task_id,
-                    "type": "finish_to_start"
-                })
+    for link in engine.links():
+        links.append({
+            "id": f"LINK_{len(links)+1:03d}",
+            "source": _task_id(link["source"]),
+            "target": _task_id(link["target"]),
+            "type": link["type"],
+            "lag": link["lag"]
+        })
     
     return links
 
-def calculate_critical_path(works_seq: List[Dict[str, Any]]) -> List[str]:
+def calculate_critical_path(works_seq: List[Dict[str, Any]], engine: Optional[CPMEngine] = None) -> List[str]:
     """
     Calculate critical path for the project
     
     Args:
         works_seq: Work sequences
+        engine: Precomputed CPM engine (built from works_seq if omitted)
         
     Returns:
-        List of task IDs in critical path
-    """
-    # Create directed graph
-    G = nx.DiGraph()
-    
-    # Add nodes
-    for i, work in enumerate(works_seq):
-        task_id = f"TASK_{i+1:03d}"
-        duration = work.get("duration", 1.0)
-        G.add_node(task_id, duration=duration, name=work.get("name", f"Работа {i+1}"))
-    
-    # Add edges (dependencies)
-    task_mapping = {work.get("name", f"Работа {i+1}"): f"TASK_{i+1:03d}" 
-                   for i, work in enumerate(works_seq)}
-    
-    for i, work in enumerate(works_seq):
-        task_id = f"TASK_{i+1:03d}"
-        dependencies = work.get("deps", [])
-        
-        for dep in dependencies:
-            dep_task_id = task_mapping.get(dep)
-            if dep_task_id and dep_task_id in G.nodes():
-                G.add_edge(dep_task_id, task_id)
-    
-    # Calculate critical path using network analysis
-    try:
-        # Topological sort
-        topological_order = list(nx.topological_sort(G))
+        List of task IDs in critical path, ordered by early start
         
-        # Initialize earliest start and finish times
-        earliest_start = {node: 0 for node in G.nodes()}
-        earliest_finish = {node: 0 for node in G.nodes()}
-        
-        # Forward pass
-        for node in topological_order:
-            duration = G.nodes[node].get("duration", 0.0)
-            earliest_finish[node] = earliest_start[node] + duration
-            
-            # Update successors
-            for successor in G.successors(node):
-                earliest_start[successor] = max(earliest_start[successor], earliest_finish[node])
-        
-        # Initialize latest start and finish times
-        project_duration = max(earliest_finish.values()) if earliest_finish else 0
-        latest_finish = {node: project_duration for node in G.nodes()}
-        latest_start = {node: project_duration for node in G.nodes()}
-        
-        # Backward pass
-        for node in reversed(topological_order):
-            duration = G.nodes[node].get("duration", 0.0)
-            latest_start[node] = latest_finish[node] - duration
-            
-            # Update predecessors
-            for predecessor in G.predecessors(node):
-                latest_finish[predecessor] = min(latest_finish[predecessor], latest_start[node])
-        
-        # Identify critical path (activities with zero slack)
-        critical_path = []
-        for node in G.nodes():
-            slack = latest_start[node] - earliest_start[node]
-            if abs(slack) < 1e-6:  # Essentially zero
-                critical_path.append(node)
-        
-        return critical_path
-        
-    except (nx.NetworkXError, nx.NetworkXUnfeasible):
-        # Fallback to simple approach if graph has issues
-        return [f"TASK_{i+1:03d}" for i in range(min(5, len(works_seq)))]  # First 5 tasks
+    Raises:
+        ScheduleCycleError: if dependencies form a cycle
+    """
+    if engine is None:
+        engine = build_schedule_engine(works_seq)
+    result = engine.result or engine.compute()
+    return [_task_id(i) for i in result.critical_path()]
 
 def generate_milestones(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -5,7 +5,6 @@
 import asyncio
 import httpx
 from bs4 import BeautifulSoup
-import sqlite3
 import json
 import re
 import random
@@ -15,15 +14,29 @@ from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime
 
+from core.ntd_registry_store import RegistryStore, UpsertResult, get_registry_store
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ntd_registry_test (
+    canonical_id VARCHAR(255) PRIMARY KEY,
+    ntd_synonyms TEXT,  -- JSON строка
+    source_url VARCHAR(500),
+    status_rag VARCHAR(20) DEFAULT 'NOT_ON_DISK',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_status_rag ON ntd_registry_test(status_rag);
+"""
+
 class ImprovedNTDRegistryManager:
     """Улучшенный менеджер реестра НТД с обходом защиты"""
     
     def __init__(self, db_path: str = "test_registry/ntd_registry_test.db"):
         self.db_path = db_path
+        self._schema_ready = False
         
         # Обновленные источники с актуальными URL
         self.sources = {
@@ -276,63 +289,46 @@ class ImprovedNTDRegistryManager:
         
         return documents
     
-    def _save_to_database(self, documents: List[Dict[str, Any]]) -> int:
-        """Сохраняем документы в базу данных"""
+    def _store(self) -> RegistryStore:
+        """Долгоживущее соединение с реестром (WAL, один на файл БД)"""
+        store = get_registry_store(self.db_path)
+        if not self._schema_ready:
+            store.executescript(REGISTRY_SCHEMA)
+            self._schema_ready = True
+        return store
+    
+    def _save_to_database(self, documents: List[Dict[str, Any]]) -> UpsertResult:
+        """
+        Сохраняем документы в базу данных пакетным upsert
+        
+        Returns:
+            UpsertResult: сколько записей добавлено, обновлено и не изменилось
+        """
         if not documents:
-            return 0
+            return UpsertResult()
         
+        rows = [
+            {
+                'canonical_id': doc.get('canonical_id'),
+                'ntd_synonyms': json.dumps(doc.get('ntd_synonyms', []), ensure_ascii=False),
+                'source_url': doc.get('source_url'),
+            }
+            for doc in documents
+        ]
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            saved_count = 0
-            
-            for doc in documents:
-                try:
-                    # Проверяем, есть ли уже такая запись
-                    cursor.execute(
-                        "SELECT canonical_id FROM ntd_registry_test WHERE canonical_id = ?",
-                        (doc['canonical_id'],)
-                    )
-                    
-                    if cursor.fetchone():
-                        # Обновляем существующую запись
-                        cursor.execute("""
-                            UPDATE ntd_registry_test 
-                            SET ntd_synonyms = ?, source_url = ?, created_at = CURRENT_TIMESTAMP
-                            WHERE canonical_id = ?
-                        """, (
-                            json.dumps(doc['ntd_synonyms'], ensure_ascii=False),
-                            doc['source_url'],
-                            doc['canonical_id']
-                        ))
-                    else:
-                        # Создаем новую запись
-                        cursor.execute("""
-                            INSERT INTO ntd_registry_test 
-                            (canonical_id, ntd_synonyms, source_url, status_rag)
-                            VALUES (?, ?, ?, 'NOT_ON_DISK')
-                        """, (
-                            doc['canonical_id'],
-                            json.dumps(doc['ntd_synonyms'], ensure_ascii=False),
-                            doc['source_url']
-                        ))
-                    
-                    saved_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error saving document {doc['canonical_id']}: {e}")
-                    continue
-            
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"Saved {saved_count} documents to database")
-            return saved_count
-            
+            # status_rag новой записи берётся из DEFAULT 'NOT_ON_DISK', у существующей не меняется
+            result = self._store().upsert(
+                'ntd_registry_test', 'canonical_id', rows,
+                columns=('canonical_id', 'ntd_synonyms', 'source_url'),
+                touch='created_at'
+            )
         except Exception as e:
             logger.error(f"Database error: {e}")
-            return 0
+            return UpsertResult(failed=len(documents))
+        
+        logger.info(f"Registry upsert: {result.inserted} inserted, {result.updated} updated, "
+                    f"{result.unchanged} unchanged, {result.skipped} skipped, {result.failed} failed")
+        return result
     
     async def update_registry_improved(self, categories: Optional[List[str]] = None) -> Dict[str, Any]:
         """
@@ -349,6 +345,9 @@ class ImprovedNTDRegistryManager:
             "sources_processed": [],
             "documents_found": 0,
             "documents_saved": 0,
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
             "errors": []
         }
         
@@ -372,17 +371,21 @@ class ImprovedNTDRegistryManager:
                 
                 if documents:
                     # Сохраняем в БД
-                    saved_count = self._save_to_database(documents)
+                    saved = self._save_to_database(documents)
+                    saved_count = saved.written
                     
                     results["sources_processed"].append({
                         "source": source_name,
                         "priority": source_config['priority'],
                         "documents_found": len(documents),
-                        "documents_saved": saved_count
+                        "documents_saved": saved_count,
+                        **{k: v for k, v in saved.to_dict().items() if k != "written"}
                     })
                     
                     results["documents_found"] += len(documents)
                     results["documents_saved"] += saved_count
+                    for key in ("inserted", "updated", "unchanged"):
+                        results[key] += getattr(saved, key)
                     
                     logger.info(f"Source {source_name}: {len(documents)} found, {saved_count} saved")
                 else:
@@ -407,19 +410,16 @@ class ImprovedNTDRegistryManager:
     def get_registry_stats(self) -> Dict[str, Any]:
         """Получаем статистику реестра"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            store = self._store()
             
             # Общее количество
-            cursor.execute("SELECT COUNT(*) FROM ntd_registry_test")
-            total_count = cursor.fetchone()[0]
+            total_count = store.execute("SELECT COUNT(*) FROM ntd_registry_test")[0][0]
             
             # По статусам
-            cursor.execute("SELECT status_rag, COUNT(*) FROM ntd_registry_test GROUP BY status_rag")
-            status_counts = dict(cursor.fetchall())
+            status_counts = dict(store.execute("SELECT status_rag, COUNT(*) FROM ntd_registry_test GROUP BY status_rag"))
             
             # По категориям
-            cursor.execute("""
+            category_counts = dict(store.execute("""
                 SELECT 
                     CASE 
                         WHEN source_url LIKE '%minstroy%' OR source_url LIKE '%stroyinf%' THEN 'construction'
@@ -431,20 +431,16 @@ class ImprovedNTDRegistryManager:
                     COUNT(*) as count
                 FROM ntd_registry_test 
                 GROUP BY category
-            """)
-            category_counts = dict(cursor.fetchall())
+            """))
             
             # Топ канонических имен
-            cursor.execute("""
+            top_names = store.execute("""
                 SELECT canonical_id, COUNT(*) as count 
                 FROM ntd_registry_test 
                 GROUP BY canonical_id 
                 ORDER BY count DESC 
                 LIMIT 10
             """)
-            top_names = cursor.fetchall()
-            
-            conn.close()
             
             return {
                 "total_documents": total_count,
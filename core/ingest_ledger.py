@@ -0,0 +1,265 @@
+"""
+Redis ledger and run accounting for distributed (Celery) ingestion.
+
+The corpus is split into small batches of documents, each processed by its
+own Celery task (core/celery_ingest.py). Everything those tasks share lives
+in Redis, so any number of workers on the same broker can take part and a
+crashed or redelivered task never corrupts the run:
+
+* ``bldr:ingest:ledger`` - hash ``path -> {fingerprint, run_id, chunks}`` of
+  successfully ingested files; planning skips files whose fingerprint
+  (size + mtime) is unchanged, which makes a run resumable;
+* ``bldr:ingest:claim:<doc_key>`` - short-lived claim so that two workers
+  never process the same document at once (a redelivered task re-acquires
+  its own claim);
+* ``bldr:ingest:run:<run_id>`` - run metadata and chunk/work counters;
+  ``...:processed`` / ``...:skipped`` sets and ``...:failed`` hash hold
+  document keys, so counts are idempotent under redelivery.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = os.getenv("INGEST_KEY_PREFIX", "bldr:ingest")
+LEDGER_KEY = f"{KEY_PREFIX}:ledger"
+CLAIM_TTL_SECONDS = int(os.getenv("INGEST_CLAIM_TTL", "3600"))
+RUN_TTL_SECONDS = int(os.getenv("INGEST_RUN_TTL", str(30 * 24 * 3600)))
+
+# Те же правила отбора, что и в Stage 0 EnterpriseRAGTrainer
+FILE_EXTENSIONS = {'.pdf', '.docx', '.doc', '.txt', '.rtf', '.xlsx', '.xls'}
+MIN_FILE_SIZE = 1024
+MAX_FILE_SIZE = 150 * 1024 * 1024
+EXCLUDE_PATTERNS = ('temp', 'tmp', 'cache', '__pycache__', '.git', 'backup')
+
+
+def file_fingerprint(path: str, stat: Optional[os.stat_result] = None) -> str:
+    """Cheap change detector: size and mtime, no file read"""
+    stat = stat or os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def document_key(path: str, fingerprint: str) -> str:
+    """Idempotency key of one document version"""
+    return hashlib.sha1(f"{path}|{fingerprint}".encode("utf-8")).hexdigest()
+
+
+def scan_corpus(base_dir: str, max_files: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Find ingestible files under ``base_dir``.
+
+    Returns:
+        Sorted list of ``(resolved path, fingerprint)``
+    """
+    found: List[Tuple[str, str]] = []
+    root = str(Path(base_dir).resolve())
+    stack = [root]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError as e:
+            logger.warning(f"Cannot scan directory: {e}")
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in FILE_EXTENSIONS:
+                continue
+            # Шаблоны исключения проверяются относительно корня корпуса
+            relative = os.path.relpath(entry.path, root).lower()
+            if any(pattern in relative for pattern in EXCLUDE_PATTERNS):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if MIN_FILE_SIZE <= stat.st_size <= MAX_FILE_SIZE:
+                found.append((entry.path, file_fingerprint(entry.path, stat)))
+    found.sort()
+    return found[:max_files] if max_files else found
+
+
+def make_batches(items: List[Any], batch_size: int) -> List[List[Any]]:
+    batch_size = max(1, batch_size)
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+class IngestLedger:
+    """Shared state of distributed ingestion runs"""
+
+    def __init__(self, client):
+        """
+        Args:
+            client: redis.Redis client created with ``decode_responses=True``
+        """
+        self.client = client
+
+    @staticmethod
+    def run_key(run_id: str, suffix: str = "") -> str:
+        return f"{KEY_PREFIX}:run:{run_id}" + (f":{suffix}" if suffix else "")
+
+    # ------------------------------------------------------------------
+    # Ledger of ingested files
+    # ------------------------------------------------------------------
+
+    def is_done(self, path: str, fingerprint: str) -> bool:
+        raw = self.client.hget(LEDGER_KEY, path)
+        if not raw:
+            return False
+        try:
+            return json.loads(raw).get("fingerprint") == fingerprint
+        except ValueError:
+            return False
+
+    def pending(self, files: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], int]:
+        """Split scanned files into not yet ingested ones and the number already done"""
+        pending: List[Tuple[str, str]] = []
+        done = 0
+        for start in range(0, len(files), 1000):
+            chunk = files[start:start + 1000]
+            raws = self.client.hmget(LEDGER_KEY, [path for path, _ in chunk])
+            for (path, fingerprint), raw in zip(chunk, raws):
+                try:
+                    entry = json.loads(raw) if raw else None
+                except ValueError:
+                    entry = None
+                if entry and entry.get("fingerprint") == fingerprint:
+                    done += 1
+                else:
+                    pending.append((path, fingerprint))
+        return pending, done
+
+    # ------------------------------------------------------------------
+    # Claims
+    # ------------------------------------------------------------------
+
+    def claim(self, doc_key: str, owner: str, ttl: int = CLAIM_TTL_SECONDS) -> bool:
+        """Take the document; the same owner (redelivered task) may re-take it"""
+        key = f"{KEY_PREFIX}:claim:{doc_key}"
+        if self.client.set(key, owner, nx=True, ex=ttl):
+            return True
+        return self.client.get(key) == owner
+
+    def release(self, doc_key: str):
+        self.client.delete(f"{KEY_PREFIX}:claim:{doc_key}")
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+
+    def create_run(self, run_id: str, base_dir: str, total: int, already_done: int, batches: int):
+        key = self.run_key(run_id)
+        pipe = self.client.pipeline()
+        if self.client.exists(key):
+            # Возобновление: счётчики сохраняются, обновляется план
+            pipe.hset(key, mapping={"status": "running", "resumed_at": time.time(), "batches": batches})
+            pipe.hincrby(key, "resumes", 1)
+        else:
+            pipe.hset(key, mapping={
+                "run_id": run_id, "base_dir": base_dir, "status": "running",
+                "total": total, "already_done": already_done, "batches": batches,
+                "chunks": 0, "works": 0, "started_at": time.time(),
+            })
+        pipe.expire(key, RUN_TTL_SECONDS)
+        pipe.execute()
+
+    def record(self, run_id: str, path: str, fingerprint: str, outcome: str,
+               chunks: int = 0, works: int = 0, error: Optional[str] = None):
+        """
+        Record the outcome of one document: ``processed``, ``skipped`` or ``failed``.
+
+        Counters only move the first time a document key reaches a final
+        state, so a redelivered batch does not double count.
+        """
+        doc_key = document_key(path, fingerprint)
+        processed_key = self.run_key(run_id, "processed")
+        skipped_key = self.run_key(run_id, "skipped")
+        failed_key = self.run_key(run_id, "failed")
+
+        if outcome == "failed":
+            pipe = self.client.pipeline()
+            pipe.hset(failed_key, doc_key, json.dumps({"path": path, "error": error}, ensure_ascii=False))
+            pipe.expire(failed_key, RUN_TTL_SECONDS)
+            pipe.execute()
+            return
+
+        target = processed_key if outcome == "processed" else skipped_key
+        pipe = self.client.pipeline()
+        pipe.sadd(target, doc_key)
+        pipe.hdel(failed_key, doc_key)
+        pipe.expire(target, RUN_TTL_SECONDS)
+        added = pipe.execute()[0]
+        if added:
+            pipe = self.client.pipeline()
+            if chunks:
+                pipe.hincrby(self.run_key(run_id), "chunks", chunks)
+            if works:
+                pipe.hincrby(self.run_key(run_id), "works", works)
+            pipe.hset(LEDGER_KEY, path, json.dumps({
+                "fingerprint": fingerprint, "run_id": run_id, "chunks": chunks, "at": time.time(),
+            }))
+            pipe.execute()
+
+    def progress(self, run_id: str) -> Optional[Dict[str, Any]]:
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.run_key(run_id))
+        pipe.scard(self.run_key(run_id, "processed"))
+        pipe.scard(self.run_key(run_id, "skipped"))
+        pipe.hlen(self.run_key(run_id, "failed"))
+        meta, processed, skipped, failed = pipe.execute()
+        if not meta:
+            return None
+        total = int(meta.get("total", 0))
+        finished = processed + skipped + failed
+        started = float(meta.get("started_at", 0) or 0)
+        elapsed = (float(meta.get("completed_at") or time.time()) - started) if started else 0.0
+        return {
+            "run_id": run_id,
+            "status": meta.get("status"),
+            "base_dir": meta.get("base_dir"),
+            "total": total,
+            "already_done": int(meta.get("already_done", 0)),
+            "processed": processed,
+            "skipped": skipped,
+            "failed": failed,
+            "remaining": max(total - finished, 0),
+            "progress": round(100.0 * finished / total, 1) if total else 100.0,
+            "chunks": int(meta.get("chunks", 0)),
+            "works": int(meta.get("works", 0)),
+            "batches": int(meta.get("batches", 0)),
+            "resumes": int(meta.get("resumes", 0)),
+            "elapsed_seconds": round(elapsed, 1),
+            "docs_per_minute": round(60.0 * (processed + skipped) / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    def failures(self, run_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        result = []
+        for _, raw in self.client.hscan_iter(self.run_key(run_id, "failed"), count=limit):
+            result.append(json.loads(raw))
+            if len(result) >= limit:
+                break
+        return result
+
+    def finish_run(self, run_id: str, batch_results: Iterable[Dict[str, Any]] = (),
+                   status: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Mark the run finished (chord callback) and return the aggregated stats.
+
+        ``status`` overrides the derived one (``failed`` from the chord errback).
+        """
+        progress = self.progress(run_id) or {"run_id": run_id}
+        if status is None:
+            status = "completed" if not progress.get("failed") else "completed_with_errors"
+        self.client.hset(self.run_key(run_id), mapping={"status": status, "completed_at": time.time()})
+        progress = self.progress(run_id) or progress
+        batch_results = [r for r in batch_results if isinstance(r, dict)]
+        progress["batch_seconds_total"] = round(sum(r.get("elapsed_seconds", 0.0) for r in batch_results), 1)
+        progress["workers"] = sorted({r["worker"] for r in batch_results if r.get("worker")})
+        return progress
@@ -4,57 +4,28 @@ import os
 import json
 import time
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from functools import lru_cache
 import hashlib
 from datetime import datetime, timedelta
 
-# Try to import optional dependencies with proper error handling
-OLLAMA_AVAILABLE = False
-try:
-    import ollama
-    OLLAMA_AVAILABLE = True
-    logging.info("Ollama client successfully imported")
-except ImportError as e:
-    logging.warning(f"Ollama not available: {e}")
+# Optional dependencies: only check availability - importing torch/scipy/ifcopenshell
+# here would cost seconds on every server start, and this module never uses them directly
+from importlib.util import find_spec as _find_spec
 
-EZDXF_AVAILABLE = False
-try:
-    import ezdxf
-    EZDXF_AVAILABLE = True
-    logging.info("ezdxf successfully imported")
-except ImportError as e:
-    logging.warning(f"ezdxf not available: {e}")
-
-IFCOPENSHELL_AVAILABLE = False
-try:
-    import ifcopenshell
-    IFCOPENSHELL_AVAILABLE = True
-    logging.info("ifcopenshell successfully imported")
-except ImportError as e:
-    logging.warning(f"ifcopenshell not available: {e}")
-
-TORCH_AVAILABLE = False
-try:
-    import torch
-    TORCH_AVAILABLE = True
-    logging.info("torch successfully imported")
-except ImportError as e:
-    logging.warning(f"torch not available: {e}")
-
-SCIPY_AVAILABLE = False
-try:
-    import scipy
-    SCIPY_AVAILABLE = True
-    logging.info("scipy successfully imported")
-except ImportError as e:
-    logging.warning(f"scipy not available: {e}")
+def _available(module: str) -> bool:
+    try:
+        return _find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
 
+OLLAMA_AVAILABLE = _available("ollama")
+EZDXF_AVAILABLE = _available("ezdxf")
+IFCOPENSHELL_AVAILABLE = _available("ifcopenshell")
+TORCH_AVAILABLE = _available("torch")
+SCIPY_AVAILABLE = _available("scipy")
 DOCX2PDF_AVAILABLE = False
-try:
-    pass
-except ImportError as e:
-    logging.warning(f"docx2pdf not available: {e}")
 
 # Import configuration
 from core.config import MODELS_CONFIG, get_capabilities_prompt
@@ -112,6 +83,8 @@ class ModelManager:
         self.model_cache: Dict[str, Dict[str, Any]] = {}
         self.last_access: Dict[str, datetime] = {}
         self.active_models: List[str] = []  # Порядок использования моделей
+        # Специалисты опрашиваются параллельно: загрузка, выгрузка и кеш - под одной блокировкой
+        self._lock = threading.RLock()
         
         # Preload only coordinator
         self._preload_priority_models()
@@ -156,55 +129,56 @@ class ModelManager:
         config = _merge_config(base_cfg, override)
         cache_key = f"{role}_{config.get('base_url')}_{config.get('model')}"
         
-        # Check cache first
-        if cache_key in self.model_cache:
-            cached_entry = self.model_cache[cache_key]
-            if datetime.now() - self.last_access[cache_key] < timedelta(minutes=self.ttl_minutes):
-                # Обновляем порядок использования
-                if cache_key in self.active_models:
-                    self.active_models.remove(cache_key)
-                self.active_models.append(cache_key)
-                self.last_access[cache_key] = datetime.now()
-                return cached_entry['client']
-            else:
-                # Remove expired entry
-                self._unload_model(cache_key)
+        with self._lock:
+            # Check cache first
+            if cache_key in self.model_cache:
+                cached_entry = self.model_cache[cache_key]
+                if datetime.now() - self.last_access[cache_key] < timedelta(minutes=self.ttl_minutes):
+                    # Обновляем порядок использования
+                    if cache_key in self.active_models:
+                        self.active_models.remove(cache_key)
+                    self.active_models.append(cache_key)
+                    self.last_access[cache_key] = datetime.now()
+                    return cached_entry['client']
+                else:
+                    # Remove expired entry
+                    self._unload_model(cache_key)
         
-        # Проверяем лимит памяти - выгружаем старые модели
-        self._enforce_memory_limit()
+            # Проверяем лимит памяти - выгружаем старые модели
+            self._enforce_memory_limit()
         
-        # Если это не координатор, выгружаем все остальные модели
-        if role != "coordinator":
-            self._unload_non_coordinator_models()
+            # Если это не координатор, выгружаем все остальные модели
+            if role != "coordinator":
+                self._unload_non_coordinator_models()
         
-        try:
-            # Import LangChain components
-            from langchain_openai import ChatOpenAI
+            try:
+                # Import LangChain components
+                from langchain_openai import ChatOpenAI
             
-            # For local models via LM Studio, we don't need an API key
-            os.environ["OPENAI_API_KEY"] = "not-needed"
+                # For local models via LM Studio, we don't need an API key
+                os.environ["OPENAI_API_KEY"] = "not-needed"
             
-            client = ChatOpenAI(
-                model=config['model'],
-                temperature=config['temperature'],
-                max_tokens=config['max_tokens'],
-                base_url=config['base_url'],
-                timeout=config.get('timeout', 30.0)
-            )
+                client = ChatOpenAI(
+                    model=config['model'],
+                    temperature=config['temperature'],
+                    max_tokens=config['max_tokens'],
+                    base_url=config['base_url'],
+                    timeout=config.get('timeout', 30.0)
+                )
             
-            # Cache the client
-            self.model_cache[cache_key] = {
-                'client': client,
-                'config': config,
-                'created_at': datetime.now()
-            }
-            self.last_access[cache_key] = datetime.now()
+                # Cache the client
+                self.model_cache[cache_key] = {
+                    'client': client,
+                    'config': config,
+                    'created_at': datetime.now()
+                }
+                self.last_access[cache_key] = datetime.now()
             
-            return client
+                return client
             
-        except Exception as e:
-            logging.error(f"Failed to create model client for role {role}: {e}")
-            return None
+            except Exception as e:
+                logging.error(f"Failed to create model client for role {role}: {e}")
+                return None
     
     def query(self, role: str, messages: List[Dict[str, str]], **kwargs) -> str:
         """
@@ -267,6 +241,10 @@ class ModelManager:
         return role_tool_mapping.get(role, [])
     
     def get_model_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._model_stats()
+
+    def _model_stats(self) -> Dict[str, Any]:
         return {
             "loaded_models": len(self.model_cache),
             "max_cache_size": self.cache_size,
@@ -289,66 +267,84 @@ class ModelManager:
         ov = _get_role_override(role)
         cfg = _merge_config(base_cfg, ov)
         cache_key = f"{role}_{cfg.get('base_url')}_{cfg.get('model')}"
-        return len([key for key in self.last_access.keys() if key.startswith(role)])
+        with self._lock:
+            return len([key for key in self.last_access.keys() if key.startswith(role)])
     
     def _enforce_memory_limit(self):
         """Строгое соблюдение лимита памяти - выгружаем старые модели."""
-        while len(self.model_cache) >= self.cache_size:
-            if not self.active_models:
-                break
-            # Выгружаем самую старую модель
-            oldest_model = self.active_models.pop(0)
-            self._unload_model(oldest_model)
+        with self._lock:
+            while len(self.model_cache) >= self.cache_size:
+                if not self.active_models:
+                    break
+                # Выгружаем самую старую модель
+                oldest_model = self.active_models.pop(0)
+                self._unload_model(oldest_model)
     
     def _unload_non_coordinator_models(self):
         """Выгружаем все модели кроме координатора для экономии памяти."""
-        coordinator_keys = [key for key in self.model_cache.keys() if key.startswith("coordinator_")]
-        other_keys = [key for key in self.model_cache.keys() if not key.startswith("coordinator_")]
+        with self._lock:
+            coordinator_keys = [key for key in self.model_cache.keys() if key.startswith("coordinator_")]
+            other_keys = [key for key in self.model_cache.keys() if not key.startswith("coordinator_")]
         
-        for key in other_keys:
-            self._unload_model(key)
+            for key in other_keys:
+                self._unload_model(key)
     
     def _unload_model(self, cache_key: str):
         """Выгружаем конкретную модель из памяти."""
-        if cache_key in self.model_cache:
-            print(f"🗑️ Выгружаем модель из памяти: {cache_key}")
-            del self.model_cache[cache_key]
-            if cache_key in self.last_access:
-                del self.last_access[cache_key]
-            if cache_key in self.active_models:
-                self.active_models.remove(cache_key)
+        with self._lock:
+            if cache_key in self.model_cache:
+                print(f"🗑️ Выгружаем модель из памяти: {cache_key}")
+                del self.model_cache[cache_key]
+                if cache_key in self.last_access:
+                    del self.last_access[cache_key]
+                if cache_key in self.active_models:
+                    self.active_models.remove(cache_key)
     
     def force_cleanup(self):
         """Принудительная очистка всех моделей кроме координатора."""
         print("🧹 Принудительная очистка памяти (кроме координатора)...")
-        coordinator_keys = [key for key in self.model_cache.keys() if key.startswith("coordinator_")]
+        with self._lock:
+            coordinator_keys = [key for key in self.model_cache.keys() if key.startswith("coordinator_")]
         
-        # Сохраняем только координатора
-        new_cache = {}
-        new_access = {}
-        new_active = []
+            # Сохраняем только координатора
+            new_cache = {}
+            new_access = {}
+            new_active = []
         
-        for key in coordinator_keys:
-            if key in self.model_cache:
-                new_cache[key] = self.model_cache[key]
-            if key in self.last_access:
-                new_access[key] = self.last_access[key]
-            if key in self.active_models:
-                new_active.append(key)
+            for key in coordinator_keys:
+                if key in self.model_cache:
+                    new_cache[key] = self.model_cache[key]
+                if key in self.last_access:
+                    new_access[key] = self.last_access[key]
+                if key in self.active_models:
+                    new_active.append(key)
         
-        self.model_cache = new_cache
-        self.last_access = new_access
-        self.active_models = new_active
+            self.model_cache = new_cache
+            self.last_access = new_access
+            self.active_models = new_active
         
-        print(f"✅ Очистка завершена. Осталось моделей: {len(self.model_cache)}")
+            print(f"✅ Очистка завершена. Осталось моделей: {len(self.model_cache)}")
 
     def clear_all_models(self):
         """Полная очистка кеша моделей (включая координатора)."""
         print("🧹 Полная очистка кеша моделей...")
-        self.model_cache.clear()
-        self.last_access.clear()
-        self.active_models.clear()
+        with self._lock:
+            self.model_cache.clear()
+            self.last_access.clear()
+            self.active_models.clear()
         print("✅ Полная очистка завершена. Кеш пуст.")
 
-# Global instance
-model_manager = ModelManager()
+# Global instance: created on first use (or by startup warm-up), not at import time,
+# because the constructor preloads the coordinator model
+from core.startup import startup as _startup
+
+_model_manager_component = _startup.register("model_manager", ModelManager, warmup=True)
+
+def get_model_manager() -> ModelManager:
+    return _model_manager_component.get()
+
+def __getattr__(name: str):
+    # `from core.model_manager import model_manager` keeps working
+    if name == "model_manager":
+        return get_model_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,316 @@
+"""
+Near-duplicate detection for the training corpus (MinHash + LSH).
+
+Byte hashes only catch identical files; the same SP downloaded as a scan, as
+a text PDF and as an amended edition differs byte-wise but shares most of its
+text. Every document (and every chunk) gets a MinHash signature over word
+shingles of its normalized text; signatures are banded into an LSH index kept
+in SQLite next to the other training state, so candidate siblings are found
+with a handful of indexed lookups instead of comparing against the corpus::
+
+    index = NearDuplicateIndex(base_dir / "near_duplicates.db")
+    verdict = index.classify(file_hash, text)
+    verdict.status        # "duplicate" | "near_duplicate" | "new"
+    verdict.similarity    # Jaccard estimate against the closest sibling
+    verdict.canonical     # first-seen document of the duplicate group
+    index.add_document(file_hash, text, canonical=verdict.canonical)
+
+Chunk level (Stage 14): ``filter_chunks`` drops chunks that repeat content
+already stored for other documents or earlier in the same document;
+``add_chunks`` records the kept ones once they are actually saved.
+"""
+
+import hashlib
+import logging
+import re
+import zlib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.ntd_registry_store import RegistryStore
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+# 16 полос по 8 строк: порог LSH ~0.71, пара с J=0.8 попадает в кандидаты с p~0.95
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = 0.8
+DUPLICATE_THRESHOLD = 0.95
+CHUNK_THRESHOLD = 0.9
+# Короткие чанки (заголовки, подписи) не сравниваются и не индексируются
+MIN_CHUNK_WORDS = 8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_HASH_BLOCK = 8192  # шинглов за один проход numpy (блок x NUM_PERM uint64)
+_IN_CHUNK = 500
+_WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    canonical TEXT,
+    signature BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_minhash_owner ON minhash_signatures(kind, owner);
+CREATE TABLE IF NOT EXISTS minhash_buckets (
+    kind TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_minhash_bucket ON minhash_buckets(kind, bucket);
+CREATE INDEX IF NOT EXISTS idx_minhash_bucket_key ON minhash_buckets(key);
+"""
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lower-cased words without punctuation and layout noise"""
+    return _WORD_RE.findall(str(text or "").lower().replace("ё", "е"))
+
+
+def shingle_hashes(words: Sequence[str], size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Distinct 32-bit hashes of word ``size``-grams (whole text if shorter)"""
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) <= size:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash over universal hash permutations ``(a * x + b) mod p``"""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature of ``text`` or None when it has no words"""
+        hashes = shingle_hashes(normalize_words(text), self.shingle_size)
+        if not hashes.size:
+            return None
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, hashes.size, _HASH_BLOCK):
+            block = hashes[start:start + _HASH_BLOCK, None]
+            # Переполнение uint64 допустимо: остаётся хорошая хеш-функция
+            with np.errstate(over="ignore"):
+                permuted = ((block * self.a + self.b) % _MERSENNE_PRIME) & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+
+def jaccard(first: np.ndarray, second: np.ndarray) -> float:
+    """Jaccard similarity estimate from two signatures"""
+    return float(np.count_nonzero(first == second)) / len(first)
+
+
+@dataclass
+class DuplicateVerdict:
+    """Classification of a document against the corpus"""
+    status: str                       # "new" | "near_duplicate" | "duplicate"
+    similarity: float = 0.0           # оценка Jaccard с ближайшим соседом
+    sibling: Optional[str] = None     # ближайший документ
+    canonical: Optional[str] = None   # первый документ группы дубликатов
+
+    @property
+    def is_duplicate(self) -> bool:
+        return self.status == "duplicate"
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+@dataclass
+class ChunkFilterResult:
+    """Chunks to keep and the redundant ones with their siblings"""
+    keep: List[int] = field(default_factory=list)
+    dropped: List[Tuple[int, str, float]] = field(default_factory=list)  # (индекс, ключ соседа, сходство)
+    signatures: Dict[int, np.ndarray] = field(default_factory=dict)
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash LSH index of documents and chunks.
+
+    Args:
+        db_path: SQLite file
+        num_perm: Signature length; must stay the same for an existing file
+        bands: LSH bands (``num_perm`` must be divisible by it)
+        near_threshold: Jaccard estimate from which a document is a near-duplicate
+        duplicate_threshold: Jaccard estimate from which it is a duplicate
+        chunk_threshold: Jaccard estimate from which a chunk is redundant
+    """
+
+    def __init__(self, db_path, num_perm: int = NUM_PERM, bands: int = LSH_BANDS,
+                 near_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 duplicate_threshold: float = DUPLICATE_THRESHOLD,
+                 chunk_threshold: float = CHUNK_THRESHOLD,
+                 shingle_size: int = SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm={num_perm} is not divisible by bands={bands}")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.near_threshold = near_threshold
+        self.duplicate_threshold = duplicate_threshold
+        self.chunk_threshold = chunk_threshold
+        self.store = RegistryStore(str(Path(db_path)))
+        self.store.executescript(SCHEMA)
+
+    def close(self):
+        self.store.close()
+
+    # ------------------------------------------------------------ LSH
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        """One signed 64-bit bucket id per band (band number is part of the hash)"""
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                                     digest_size=8, person=band.to_bytes(2, "little")).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return buckets
+
+    def _candidates(self, kind: str, buckets: Iterable[int]) -> Dict[int, List[str]]:
+        """bucket -> keys stored under it"""
+        found: Dict[int, List[str]] = {}
+        buckets = list(set(buckets))
+        for start in range(0, len(buckets), _IN_CHUNK):
+            chunk = buckets[start:start + _IN_CHUNK]
+            rows = self.store.execute(
+                f"SELECT bucket, key FROM minhash_buckets WHERE kind = ? AND bucket IN ({', '.join('?' for _ in chunk)})",
+                [kind, *chunk])
+            for bucket, key in rows:
+                found.setdefault(bucket, []).append(key)
+        return found
+
+    def _signatures(self, keys: Iterable[str]) -> Dict[str, Tuple[str, Optional[str], np.ndarray]]:
+        """key -> (owner, canonical, signature)"""
+        result = {}
+        keys = list(set(keys))
+        for start in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[start:start + _IN_CHUNK]
+            rows = self.store.execute(
+                f"SELECT key, owner, canonical, signature FROM minhash_signatures "
+                f"WHERE key IN ({', '.join('?' for _ in chunk)})", chunk)
+            for key, owner, canonical, blob in rows:
+                result[key] = (owner, canonical, np.frombuffer(blob, dtype=np.uint64))
+        return result
+
+    def _insert(self, kind: str, owner: str, entries: List[Tuple[str, Optional[str], np.ndarray]]):
+        """Replace ``owner``'s entries of ``kind`` with ``entries`` (key, canonical, signature)"""
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM minhash_buckets WHERE key IN "
+                         "(SELECT key FROM minhash_signatures WHERE kind = ? AND owner = ?)", (kind, owner))
+            conn.execute("DELETE FROM minhash_signatures WHERE kind = ? AND owner = ?", (kind, owner))
+            conn.executemany(
+                "INSERT OR REPLACE INTO minhash_signatures (key, kind, owner, canonical, signature) VALUES (?, ?, ?, ?, ?)",
+                [(key, kind, owner, canonical, signature.tobytes()) for key, canonical, signature in entries])
+            conn.executemany(
+                "INSERT INTO minhash_buckets (kind, bucket, key) VALUES (?, ?, ?)",
+                [(kind, bucket, key) for key, _, signature in entries for bucket in self._buckets(signature)])
+
+    # ------------------------------------------------------------ documents
+
+    def classify(self, doc_id: str, text: str) -> DuplicateVerdict:
+        """Compare a document with the indexed corpus (the document itself is ignored)"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return DuplicateVerdict("new")
+        return self._classify_signature(doc_id, signature)
+
+    def _classify_signature(self, doc_id: str, signature: np.ndarray) -> DuplicateVerdict:
+        candidates = {key for keys in self._candidates("doc", self._buckets(signature)).values() for key in keys}
+        candidates.discard(doc_id)
+        best_key, best_similarity, best_canonical = None, 0.0, None
+        for key, (_, canonical, other) in self._signatures(candidates).items():
+            similarity = jaccard(signature, other)
+            if similarity > best_similarity:
+                best_key, best_similarity, best_canonical = key, similarity, canonical or key
+        if best_key is None or best_similarity < self.near_threshold:
+            return DuplicateVerdict("new", best_similarity)
+        status = "duplicate" if best_similarity >= self.duplicate_threshold else "near_duplicate"
+        return DuplicateVerdict(status, best_similarity, best_key, best_canonical)
+
+    def add_document(self, doc_id: str, text: str, canonical: Optional[str] = None) -> bool:
+        """Index a document; ``canonical`` links it to its duplicate group"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return False
+        self._insert("doc", doc_id, [(doc_id, canonical, signature)])
+        return True
+
+    def remove(self, doc_id: str):
+        """Forget a document and its chunks"""
+        for kind in ("doc", "chunk"):
+            self._insert(kind, doc_id, [])
+
+    # ------------------------------------------------------------ chunks
+
+    def filter_chunks(self, owner: str, texts: Sequence[str]) -> ChunkFilterResult:
+        """
+        Split chunk texts into kept and redundant.
+
+        A chunk is redundant when it matches, above ``chunk_threshold``, a chunk
+        of another document in the index or an earlier kept chunk of ``texts``.
+        Chunks shorter than ``MIN_CHUNK_WORDS`` words are always kept.
+        """
+        result = ChunkFilterResult()
+        pending: Dict[int, Tuple[np.ndarray, List[int]]] = {}
+        for i, text in enumerate(texts):
+            if len(normalize_words(text)) < MIN_CHUNK_WORDS:
+                result.keep.append(i)
+                continue
+            signature = self.hasher.signature(text)
+            pending[i] = (signature, self._buckets(signature))
+
+        stored = self._candidates("chunk", (b for _, buckets in pending.values() for b in buckets))
+        stored_keys = {key for keys in stored.values() for key in keys}
+        signatures = {key: value for key, value in self._signatures(stored_keys).items() if value[0] != owner}
+
+        local: Dict[int, List[int]] = {}  # корзина -> индексы уже оставленных чанков этого документа
+        for i in range(len(texts)):
+            if i not in pending:
+                continue
+            signature, buckets = pending[i]
+            best_key, best_similarity = None, 0.0
+            for key in {key for bucket in buckets for key in stored.get(bucket, ())}:
+                if key in signatures:
+                    similarity = jaccard(signature, signatures[key][2])
+                    if similarity > best_similarity:
+                        best_key, best_similarity = key, similarity
+            for j in {j for bucket in buckets for j in local.get(bucket, ())}:
+                similarity = jaccard(signature, result.signatures[j])
+                if similarity > best_similarity:
+                    best_key, best_similarity = f"{owner}#{j}", similarity
+            if best_key is not None and best_similarity >= self.chunk_threshold:
+                result.dropped.append((i, best_key, best_similarity))
+                continue
+            result.keep.append(i)
+            result.signatures[i] = signature
+            for bucket in buckets:
+                local.setdefault(bucket, []).append(i)
+        result.keep.sort()
+        return result
+
+    def add_chunks(self, owner: str, result: ChunkFilterResult):
+        """Index the kept chunks of ``owner`` (replaces its previous chunks)"""
+        self._insert("chunk", owner, [(f"{owner}#{i}", None, signature)
+                                      for i, signature in sorted(result.signatures.items())])
+
+    def stats(self) -> Dict[str, int]:
+        rows = self.store.execute("SELECT kind, COUNT(*) FROM minhash_signatures GROUP BY kind")
+        counts = dict(rows)
+        return {"documents": counts.get("doc", 0), "chunks": counts.get("chunk", 0)}
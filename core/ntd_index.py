@@ -0,0 +1,267 @@
+"""
+Lookup index for the normative documents database (NormativeDatabase).
+
+Built once from the loaded documents and pickled next to the JSON source
+(``ntd_full_db.json`` -> ``ntd_full_db.index.pkl``); the pickle is reused
+while the SHA-256 of the JSON content is unchanged.
+
+* normalized-code hash map: ``"sp_63.13330.2018"``, ``"СП63.13330.2018"`` and
+  ``"СП 63.13330.2018"`` resolve to the same document;
+* code prefix index: sorted normalized codes searched with bisect (a
+  flattened trie), so ``"СП 63"`` or ``"ГОСТ Р 21.1101"`` list all editions;
+* code segment index: the same over code suffixes starting at every token or
+  number segment, so ``"63.13330"``, ``"13330"`` or ``"Р 21.1101"`` find
+  ``"СП 63.13330.2018"`` / ``"ГОСТ Р 21.1101-2013"`` from the middle of the code;
+* token inverted index over titles and descriptions with stems cut to six
+  characters, the same rough Russian stemming as the rate catalogue.
+
+Results are ranked: actual documents first, then newer editions.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+ACTUAL_STATUSES = ("Обязательный", "Актуальный", "Рекомендательный")
+
+# Латинские написания префиксов в именах файлов
+_LATIN_PREFIXES = {
+    "SP": "СП", "GOST": "ГОСТ", "SNIP": "СНИП", "SN": "СН", "MDS": "МДС", "GESN": "ГЭСН",
+    "FER": "ФЕР", "TER": "ТЕР", "RD": "РД", "TSN": "ТСН", "PPR": "ППР", "POS": "ПОС", "FZ": "ФЗ", "R": "Р",
+}
+_CODE_TOKEN_RE = re.compile(r"[A-ZА-Я]+|\d+(?:[.\-:/]\d+)*")
+# Год редакции в конце кода: ".2018", "-2013", "-83"
+_EDITION_RE = re.compile(r"(?:[.\-](?:19|20)\d{2}|-\d{2})$")
+# Начала сегментов кода: после пробела и разделителей номера
+_SEGMENT_START_RE = re.compile(r"(?<=[ .\-:/])[^ .\-:/]")
+_WORD_RE = re.compile(r"\w{2,}")
+STEM_LENGTH = 6
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+CODE_PREFIX_SCORE = 10
+CODE_EXACT_SCORE = 20
+CODE_SEGMENT_SCORE = 5
+HASH_BLOCK = 1 << 20
+
+
+def normalize_ntd_code(code: str) -> str:
+    """``"sp_63.13330.2018"`` -> ``"СП 63.13330.2018"``"""
+    text = str(code or "").upper().replace("Ё", "Е").replace("_", " ")
+    return " ".join(_LATIN_PREFIXES.get(token, token) for token in _CODE_TOKEN_RE.findall(text))
+
+
+def edition_base(normalized_code: str) -> str:
+    """Code without the edition year: ``"СП 63.13330.2018"`` -> ``"СП 63.13330"``"""
+    return _EDITION_RE.sub("", normalized_code)
+
+
+def code_segments(normalized_code: str) -> List[int]:
+    """Offsets where a code token or number segment starts: ``"СП 63.13330"`` -> ``[0, 3, 6]``"""
+    return [0] + [m.start() for m in _SEGMENT_START_RE.finditer(normalized_code)]
+
+
+def _stems(text: str) -> List[str]:
+    return [word[:STEM_LENGTH] for word in _WORD_RE.findall(str(text or "").lower().replace("ё", "е"))]
+
+
+class NTDIndex:
+    """Code map, code prefix and segment indexes and title token index over documents"""
+
+    def __init__(self):
+        self.codes: List[str] = []             # порядковый номер -> исходный код
+        self.by_code: Dict[str, int] = {}      # нормализованный код -> номер
+        self.sorted_codes: List[str] = []      # нормализованные коды по алфавиту
+        self.sorted_ordinals: List[int] = []
+        self.sorted_segments: List[str] = []   # суффиксы кодов с начала сегмента, по алфавиту
+        self.segment_ordinals: List[int] = []
+        self.vocabulary: List[str] = []        # основы слов по алфавиту
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}  # основа -> [(номер, вес)]
+        self.categories: List[str] = []
+        self.rank: List[Tuple[int, int]] = []  # (актуален, год) для сортировки
+
+    # ------------------------------------------------------------ build
+
+    @classmethod
+    def build(cls, documents: Iterable[Any]) -> "NTDIndex":
+        """Build from objects with code, title, description, category, year and status"""
+        index = cls()
+        pairs = []
+        segments = []
+        postings: Dict[str, Dict[int, int]] = {}
+        for ordinal, doc in enumerate(documents):
+            index.codes.append(doc.code)
+            index.categories.append(doc.category)
+            index.rank.append((int(doc.status in ACTUAL_STATUSES), int(doc.year or 0)))
+            normalized = normalize_ntd_code(doc.code)
+            if normalized:
+                pairs.append((normalized, ordinal))
+                segments.extend((normalized[offset:], ordinal) for offset in code_segments(normalized)[1:])
+                current = index.by_code.get(normalized)
+                if current is None or index.rank[ordinal] > index.rank[current]:
+                    index.by_code[normalized] = ordinal
+            for weight, text in ((TITLE_WEIGHT, doc.title), (DESCRIPTION_WEIGHT, doc.description)):
+                for stem in set(_stems(text)):
+                    docs = postings.setdefault(stem, {})
+                    docs[ordinal] = max(docs.get(ordinal, 0), weight)
+        pairs.sort()
+        index.sorted_codes = [code for code, _ in pairs]
+        index.sorted_ordinals = [ordinal for _, ordinal in pairs]
+        segments.sort()
+        index.sorted_segments = [segment for segment, _ in segments]
+        index.segment_ordinals = [ordinal for _, ordinal in segments]
+        index.postings = {stem: list(docs.items()) for stem, docs in postings.items()}
+        index.vocabulary = sorted(index.postings)
+        return index
+
+    # ------------------------------------------------------------ persistence
+
+    @staticmethod
+    def cache_path(json_path: Path) -> Path:
+        return Path(json_path).with_suffix(".index.pkl")
+
+    @staticmethod
+    def _signature(json_path: Path) -> Tuple[int, str]:
+        # Хэш содержимого: размер и mtime совпадают после копирования или восстановления из бэкапа
+        digest = hashlib.sha256()
+        with open(json_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+        return INDEX_VERSION, digest.hexdigest()
+
+    def save(self, json_path: Path):
+        path = self.cache_path(json_path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"signature": self._signature(json_path), "index": self.__dict__}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, json_path: Path) -> Optional["NTDIndex"]:
+        """Cached index for ``json_path`` or None if missing or stale"""
+        path = cls.cache_path(json_path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("signature") != cls._signature(json_path):
+                return None
+            index = cls()
+            index.__dict__.update(data["index"])
+            return index
+        except Exception as e:
+            logger.warning(f"NTD index cache unreadable, rebuilding: {e}")
+            return None
+
+    @classmethod
+    def load_or_build(cls, json_path: Path, documents: Iterable[Any]) -> "NTDIndex":
+        index = cls.load(json_path)
+        if index is not None:
+            return index
+        index = cls.build(documents)
+        try:
+            index.save(json_path)
+        except OSError as e:
+            logger.warning(f"Could not save NTD index cache: {e}")
+        return index
+
+    # ------------------------------------------------------------ lookups
+
+    def _ranked(self, ordinals: Iterable[int], category: Optional[str] = None) -> List[int]:
+        ordinals = [o for o in ordinals if category is None or self.categories[o] == category]
+        return sorted(ordinals, key=lambda o: (self.rank[o][0], self.rank[o][1]), reverse=True)
+
+    def _unique_codes(self, ordinals: Iterable[int], limit: Optional[int] = None) -> List[str]:
+        """Codes of ranked ordinals, each code once (the JSON may list a document twice)"""
+        codes = list(dict.fromkeys(self.codes[o] for o in ordinals))
+        return codes[:limit]
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> range:
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\uffff")
+        return range(start, end)
+
+    def code_prefix(self, prefix: str, category: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """Documents whose normalized code starts with ``prefix``, ranked"""
+        normalized = normalize_ntd_code(prefix)
+        if not normalized:
+            return []
+        ordinals = {self.sorted_ordinals[i] for i in self._prefix_range(self.sorted_codes, normalized)}
+        return self._unique_codes(self._ranked(ordinals, category), limit)
+
+    def lookup(self, code: str) -> Optional[str]:
+        """
+        Exact code, or - when the query has no edition year - the best
+        edition of the same document (``"СП 63.13330"`` -> ``"СП 63.13330.2018"``).
+        """
+        normalized = normalize_ntd_code(code)
+        ordinal = self.by_code.get(normalized)
+        if ordinal is not None:
+            return self.codes[ordinal]
+        if not normalized or edition_base(normalized) != normalized:
+            return None
+        editions = self.editions(normalized)
+        return editions[0] if editions else None
+
+    def editions(self, code: str) -> List[str]:
+        """All editions of a document (same code without year), ranked"""
+        base = edition_base(normalize_ntd_code(code))
+        if not base:
+            return []
+        ordinals = {self.sorted_ordinals[i] for i in self._prefix_range(self.sorted_codes, base)
+                    if edition_base(self.sorted_codes[i]) == base}
+        return self._unique_codes(self._ranked(ordinals))
+
+    def _token_matches(self, stem: str) -> Dict[int, int]:
+        matches: Dict[int, int] = {}
+        for i in self._prefix_range(self.vocabulary, stem):
+            for ordinal, weight in self.postings[self.vocabulary[i]]:
+                if weight > matches.get(ordinal, 0):
+                    matches[ordinal] = weight
+        return matches
+
+    def search(self, query: str, category: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Ranked search by code and title/description words.
+
+        A query with digits matches codes from the start (``"СП 63"``) or from
+        any code segment (``"13330"``, ``"Р 21.1101"``). Every query word must
+        match the start of a word in the title or description; code matches
+        rank above word matches.
+        """
+        scores: Dict[int, int] = {}
+        if any(ch.isdigit() for ch in query):
+            normalized = normalize_ntd_code(query)
+            if normalized:
+                for i in self._prefix_range(self.sorted_segments, normalized):
+                    scores[self.segment_ordinals[i]] = CODE_SEGMENT_SCORE
+                for i in self._prefix_range(self.sorted_codes, normalized):
+                    exact = self.sorted_codes[i] == normalized
+                    scores[self.sorted_ordinals[i]] = CODE_EXACT_SCORE if exact else CODE_PREFIX_SCORE
+
+        stems = list(dict.fromkeys(_stems(query)))
+        if stems:
+            candidates: Optional[Dict[int, int]] = None
+            for stem in stems:
+                matches = self._token_matches(stem)
+                if candidates is None:
+                    candidates = matches
+                else:
+                    candidates = {o: s + matches[o] for o, s in candidates.items() if o in matches}
+                if not candidates:
+                    break
+            for ordinal, score in (candidates or {}).items():
+                scores[ordinal] = scores.get(ordinal, 0) + score
+
+        ordinals = [o for o in scores if category is None or self.categories[o] == category]
+        ordinals.sort(key=lambda o: (scores[o], self.rank[o][0], self.rank[o][1]), reverse=True)
+        return self._unique_codes(ordinals, limit)
@@ -7,9 +7,11 @@ import hashlib
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
-import sqlite3
 import logging
 
+from core.ntd_index import ACTUAL_STATUSES, NTDIndex
+from core.ntd_registry_store import UpsertResult, get_registry_store
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -41,6 +43,7 @@ class NormativeDatabase:
         self.db_path = Path(db_path or default_db_path)
         self.json_path = Path(json_path or default_json_path)
         self.documents: Dict[str, NormativeDocument] = {}
+        self.index = NTDIndex()
         self.categories = {
             "construction": "Строительство",
             "finance": "Финансы и бюджет",
@@ -59,18 +62,19 @@ class NormativeDatabase:
     def _init_db(self):
         """Initialize SQLite database for processed documents tracking"""
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.execute('''CREATE TABLE IF NOT EXISTS processed_docs 
+        # Долгоживущее соединение в режиме WAL, общее для процесса
+        self.store = get_registry_store(str(self.db_path))
+        self.conn = self.store.conn
+        self.store.executescript('''CREATE TABLE IF NOT EXISTS processed_docs 
                             (id INTEGER PRIMARY KEY, 
                              code TEXT UNIQUE, 
                              title TEXT, 
                              file_path TEXT, 
                              processed_at REAL,
                              status TEXT)''')
-        self.conn.commit()
     
     def _load_documents(self):
-        """Load documents from JSON database"""
+        """Load documents from JSON database and its lookup index"""
         if self.json_path.exists():
             with open(self.json_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -78,35 +82,32 @@ class NormativeDatabase:
                     doc = NormativeDocument(**doc_data)
                     self.documents[doc.code] = doc
             logger.info(f"Loaded {len(self.documents)} normative documents from JSON")
+            self.index = NTDIndex.load_or_build(self.json_path, self.documents.values())
         else:
             logger.warning(f"Normative documents JSON not found: {self.json_path}")
+            self.index = NTDIndex.build(self.documents.values())
     
     def get_document(self, code: str) -> Optional[NormativeDocument]:
-        """Get document by code"""
-        return self.documents.get(code.upper())
+        """Get document by code (case, spacing and latin prefixes are normalized)"""
+        found = self.index.lookup(code)
+        return self.documents.get(found) if found else None
     
-    def search_documents(self, query: str, category: Optional[str] = None) -> List[NormativeDocument]:
-        """Search documents by query and category"""
-        results = []
-        query_lower = query.lower()
-        
-        for doc in self.documents.values():
-            if category and doc.category != category:
-                continue
-            
-            if (query_lower in doc.code.lower() or 
-                query_lower in doc.title.lower() or
-                query_lower in doc.description.lower()):
-                results.append(doc)
-        
-        return results
+    def find_by_code_prefix(self, prefix: str, category: Optional[str] = None,
+                            limit: Optional[int] = 20) -> List[NormativeDocument]:
+        """Documents whose code starts with prefix, e.g. "СП 63" or "ГОСТ Р 21.1101"; actual and newest first"""
+        return [self.documents[code] for code in self.index.code_prefix(prefix, category, limit)]
+    
+    def search_documents(self, query: str, category: Optional[str] = None,
+                         limit: Optional[int] = None) -> List[NormativeDocument]:
+        """Search documents by query and category, best matches first"""
+        return [self.documents[code] for code in self.index.search(query, category, limit)]
     
     def is_document_actual(self, code: str) -> bool:
         """Check if document is actual (not outdated)"""
         doc = self.get_document(code)
         if not doc:
             return False
-        return doc.status in ["Обязательный", "Актуальный", "Рекомендательный"]
+        return doc.status in ACTUAL_STATUSES
     
     def get_replacement_document(self, code: str) -> Optional[NormativeDocument]:
         """Get replacement document if current is outdated"""
@@ -114,26 +115,54 @@ class NormativeDatabase:
         if not doc or "устарел" not in doc.status.lower():
             return None
         
-        # Search for replacement documents in official databases
-        # For now, we'll just return None
+        # Актуальная более новая редакция того же документа из локальной базы
+        for edition_code in self.index.editions(doc.code):
+            edition = self.documents[edition_code]
+            if edition.status in ACTUAL_STATUSES and (edition.year or 0) > (doc.year or 0):
+                return edition
         return None
     
     def mark_as_processed(self, code: str, file_path: str, status: str = "processed"):
         """Mark document as processed in database"""
+        self.mark_many_as_processed([(code, file_path, status)])
+    
+    def mark_many_as_processed(self, entries: List[Tuple[str, str, str]]) -> UpsertResult:
+        """
+        Mark documents as processed in one transaction per batch
+        
+        Args:
+            entries: (code, file_path, status) tuples
+            
+        Returns:
+            UpsertResult; a document re-marked with the same title, path and
+            status counts as unchanged and keeps its processed_at
+        """
+        now = time.time()
+        rows = []
+        result = UpsertResult()
+        for code, file_path, status in entries:
+            doc = self.documents.get(code)
+            if doc is None:
+                logger.error(f"Error marking document as processed: unknown code {code!r}")
+                result.failed += 1
+                continue
+            rows.append({"code": code, "title": doc.title, "file_path": file_path,
+                         "processed_at": now, "status": status})
         try:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO processed_docs (code, title, file_path, processed_at, status) VALUES (?, ?, ?, ?, ?)",
-                (code, self.documents[code].title, file_path, time.time(), status)
-            )
-            self.conn.commit()
+            result.merge(self.store.upsert(
+                "processed_docs", "code", rows,
+                columns=("code", "title", "file_path", "processed_at", "status"),
+                compare=("title", "file_path", "status")
+            ))
         except Exception as e:
-            logger.error(f"Error marking document as processed: {e}")
+            logger.error(f"Error marking documents as processed: {e}")
+            result.failed += len(rows)
+        return result
     
     def is_processed(self, code: str) -> bool:
         """Check if document is already processed"""
         try:
-            cursor = self.conn.execute("SELECT code FROM processed_docs WHERE code = ?", (code,))
-            return cursor.fetchone() is not None
+            return bool(self.store.execute("SELECT code FROM processed_docs WHERE code = ?", (code,)))
         except Exception as e:
             logger.error(f"Error checking if document is processed: {e}")
             return False
@@ -0,0 +1,233 @@
+"""
+Bulk SQLite storage for the NTD registry.
+
+One long-lived connection per database file (``get_registry_store``) in WAL
+mode with tuned pragmas. Writes go through ``RegistryStore.upsert``: rows are
+deduplicated by key and written with ``INSERT ... ON CONFLICT DO UPDATE`` via
+``executemany``, one ``BEGIN IMMEDIATE`` transaction per batch. The upsert only
+touches a row when one of the compared columns actually differs, which gives
+exact inserted / updated / unchanged counts::
+
+    store = get_registry_store("ntd_registry.db")
+    result = store.upsert("ntd_registry_test", "canonical_id", rows,
+                          columns=("canonical_id", "ntd_synonyms", "source_url"),
+                          touch="created_at")
+    result.inserted, result.updated, result.unchanged
+
+The SQL text of every upsert shape is built once and reused, so the
+connection's statement cache keeps it prepared across batches.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = int(os.getenv("NTD_REGISTRY_BATCH_SIZE", "5000"))
+CACHE_SIZE_KB = int(os.getenv("NTD_REGISTRY_CACHE_KB", "65536"))
+BUSY_TIMEOUT_MS = int(os.getenv("NTD_REGISTRY_BUSY_TIMEOUT_MS", "30000"))
+# Лимит параметров в одном IN (...) с запасом под старые сборки SQLite
+_IN_CHUNK = 500
+
+
+@dataclass
+class UpsertResult:
+    """Outcome of a bulk upsert"""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0  # строки без ключа и повторы ключа внутри вызова
+    failed: int = 0
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+    def merge(self, other: "UpsertResult"):
+        for field in ("inserted", "updated", "unchanged", "skipped", "failed"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def to_dict(self) -> Dict[str, int]:
+        return {**asdict(self), "written": self.written}
+
+
+class RegistryStore:
+    """
+    Long-lived SQLite connection with bulk upserts.
+
+    Args:
+        db_path: Database file
+        cache_kb: Page cache size in KiB (``PRAGMA cache_size``)
+    """
+
+    def __init__(self, db_path: str, cache_kb: int = CACHE_SIZE_KB):
+        self.db_path = str(db_path)
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: транзакции открываются явно (BEGIN IMMEDIATE) на каждый батч
+        self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                    isolation_level=None, check_same_thread=False,
+                                    cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL режим NORMAL не теряет целостность, fsync только на checkpoint
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA cache_size=-{int(cache_kb)}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._lock = threading.RLock()
+        self._sql: Dict[Tuple, str] = {}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; the write lock is taken up front"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Read query under the store lock"""
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def executescript(self, script: str):
+        with self._lock:
+            self.conn.executescript(script)
+
+    # ------------------------------------------------------------------
+    # Upsert
+    # ------------------------------------------------------------------
+
+    def _upsert_sql(self, table: str, key: str, columns: Tuple[str, ...], compare: Tuple[str, ...],
+                    update: Tuple[str, ...], touch: Optional[str]) -> str:
+        shape = (table, key, columns, compare, update, touch)
+        sql = self._sql.get(shape)
+        if sql is None:
+            assignments = [f"{column} = excluded.{column}" for column in update]
+            if touch:
+                assignments.append(f"{touch} = CURRENT_TIMESTAMP")
+            changed = " OR ".join(f"{table}.{column} IS NOT excluded.{column}" for column in compare)
+            sql = (
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT({key}) DO UPDATE SET {', '.join(assignments)} WHERE {changed}"
+            )
+            self._sql[shape] = sql
+        return sql
+
+    def _count_existing(self, table: str, key: str, keys: List[Any]) -> int:
+        existing = 0
+        for start in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[start:start + _IN_CHUNK]
+            existing += self.conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE {key} IN ({', '.join('?' for _ in chunk)})", chunk
+            ).fetchone()[0]
+        return existing
+
+    def upsert(self, table: str, key: str, rows: Iterable[Dict[str, Any]], columns: Sequence[str],
+               compare: Optional[Sequence[str]] = None, update: Optional[Sequence[str]] = None,
+               touch: Optional[str] = None, batch_size: int = UPSERT_BATCH_SIZE) -> UpsertResult:
+        """
+        Insert or update rows in batches.
+
+        Args:
+            table: Table name; ``key`` must be its primary key or UNIQUE column
+            key: Conflict column
+            rows: Dicts with at least the ``columns`` keys (missing values are NULL)
+            columns: Columns written on insert (must include ``key``)
+            compare: Columns whose change makes an existing row "updated"
+                (default: all non-key columns)
+            update: Columns overwritten on update (default: all non-key columns)
+            touch: Timestamp column set to CURRENT_TIMESTAMP on update
+
+        Returns:
+            UpsertResult with exact inserted / updated / unchanged counts
+        """
+        columns = tuple(columns)
+        if key not in columns:
+            raise ValueError(f"Key column {key!r} must be one of the written columns")
+        non_key = tuple(c for c in columns if c != key)
+        compare = tuple(compare) if compare is not None else non_key
+        update = tuple(update) if update is not None else non_key
+        sql = self._upsert_sql(table, key, columns, compare, update, touch)
+
+        result = UpsertResult()
+        # Дедупликация по ключу: последняя версия строки побеждает
+        latest: Dict[Any, tuple] = {}
+        for row in rows:
+            value = row.get(key)
+            if value is None or value == "":
+                result.skipped += 1
+                continue
+            if value in latest:
+                result.skipped += 1
+            latest[value] = tuple(row.get(column) for column in columns)
+
+        params = list(latest.values())
+        keys = list(latest.keys())
+        for start in range(0, len(params), max(1, batch_size)):
+            result.merge(self._upsert_batch(table, key, sql, keys[start:start + batch_size],
+                                            params[start:start + batch_size]))
+        return result
+
+    def _upsert_batch(self, table: str, key: str, sql: str, keys: List[Any], params: List[tuple]) -> UpsertResult:
+        try:
+            with self.transaction() as conn:
+                existing = self._count_existing(table, key, keys)
+                before = conn.total_changes
+                conn.executemany(sql, params)
+                changed = conn.total_changes - before
+        except sqlite3.Error as e:
+            logger.warning(f"Batch upsert into {table} failed ({e}), retrying row by row")
+            return self._upsert_rows(table, key, sql, keys, params)
+
+        inserted = len(params) - existing
+        updated = changed - inserted
+        return UpsertResult(inserted=inserted, updated=updated, unchanged=existing - updated)
+
+    def _upsert_rows(self, table: str, key: str, sql: str, keys: List[Any], params: List[tuple]) -> UpsertResult:
+        """Slow path: isolate rows that violate constraints, still in one transaction"""
+        result = UpsertResult()
+        with self.transaction() as conn:
+            for value, row in zip(keys, params):
+                try:
+                    exists = conn.execute(f"SELECT 1 FROM {table} WHERE {key} = ?", (value,)).fetchone()
+                    before = conn.total_changes
+                    conn.execute(sql, row)
+                except sqlite3.Error as e:
+                    logger.error(f"Error saving {table} row {value!r}: {e}")
+                    result.failed += 1
+                    continue
+                if conn.total_changes == before:
+                    result.unchanged += 1
+                elif exists:
+                    result.updated += 1
+                else:
+                    result.inserted += 1
+        return result
+
+
+_stores: Dict[str, RegistryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_registry_store(db_path: str) -> RegistryStore:
+    """Process-wide store for ``db_path`` (one connection per file)"""
+    path = os.path.abspath(str(db_path))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = RegistryStore(path)
+        return store
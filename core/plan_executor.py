@@ -0,0 +1,317 @@
+"""
+Dependency-aware parallel execution of coordinator plans.
+
+A plan step may use the output of an earlier step by referencing it in its
+arguments; every other pair of steps is independent and runs concurrently::
+
+    {"tools": [
+        {"id": "rag", "name": "search_rag_database", "arguments": {"query": "..."}},
+        {"name": "parse_gesn_estimate", "arguments": {"file_path": "smeta.xlsx"}},
+        {"name": "monte_carlo_sim", "arguments": {"project_data": "$parse_gesn_estimate.data"}}
+    ]}
+
+References are ``$ref``, ``${ref}`` or ``{{ref}}`` with an optional dotted path
+into the result; ``ref`` is a step ``id``, a step index (``step_0``) or the
+name of an earlier tool. Steps may also list ``depends_on`` explicitly. Only
+backward references count, so a plan can never deadlock.
+
+End-to-end latency becomes the longest dependency chain instead of the sum
+of all steps. Each step gets its own timeout and an execution tracer span.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+TOOL_WORKERS = int(os.getenv("COORDINATOR_TOOL_WORKERS", "4"))
+TOOL_TIMEOUT = float(os.getenv("COORDINATOR_TOOL_TIMEOUT", "120"))
+# Как часто проверять, не начал ли выполняться шаг из очереди (его дедлайн считается со старта)
+QUEUE_POLL_S = 0.05
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+
+# Общий для процесса лимит одновременных запросов к LLM (локальный сервер моделей один)
+LLM_SEMAPHORE = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+_REFERENCE = re.compile(r"\$\{([A-Za-z_][\w.\[\]]*)\}|\{\{\s*([A-Za-z_][\w.\[\]]*)\s*\}\}|\$([A-Za-z_][\w.\[\]]*)")
+
+
+def _references(value: Any) -> Set[str]:
+    """All reference expressions inside an argument value"""
+    found: Set[str] = set()
+    if isinstance(value, str):
+        for match in _REFERENCE.finditer(value):
+            found.add(next(group for group in match.groups() if group))
+    elif isinstance(value, dict):
+        for item in value.values():
+            found |= _references(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            found |= _references(item)
+    return found
+
+
+def _step_aliases(steps: Sequence[Dict[str, Any]]) -> List[Set[str]]:
+    return [
+        {f"step_{i}", f"steps[{i}]", str(step.get("id", "")) or f"step_{i}", str(step.get("name", ""))}
+        for i, step in enumerate(steps)
+    ]
+
+
+def _resolve_target(head: str, index: int, aliases: List[Set[str]]) -> Optional[int]:
+    """Nearest earlier step matching ``head``"""
+    for j in range(index - 1, -1, -1):
+        if head in aliases[j]:
+            return j
+    return None
+
+
+def _split_reference(reference: str) -> List[str]:
+    # steps[0].data -> ["steps[0]", "data"]
+    match = re.match(r"(steps\[\d+\])(.*)", reference)
+    if match:
+        rest = match.group(2).lstrip(".")
+        return [match.group(1)] + ([part for part in rest.split(".") if part] if rest else [])
+    return reference.split(".")
+
+
+def infer_dependencies(steps: Sequence[Dict[str, Any]]) -> List[Set[int]]:
+    """For each step, the indices of earlier steps whose output it needs"""
+    aliases = _step_aliases(steps)
+    dependencies: List[Set[int]] = []
+    for i, step in enumerate(steps):
+        needed: Set[int] = set()
+        for reference in _references(step.get("arguments", {})):
+            target = _resolve_target(_split_reference(reference)[0], i, aliases)
+            if target is not None:
+                needed.add(target)
+        explicit = step.get("depends_on") or []
+        if not isinstance(explicit, (list, tuple)):
+            explicit = [explicit]
+        for ref in explicit:
+            target = ref if isinstance(ref, int) and 0 <= ref < i else _resolve_target(str(ref), i, aliases)
+            if target is not None:
+                needed.add(target)
+        dependencies.append(needed)
+    return dependencies
+
+
+def _lookup(value: Any, path: List[str]) -> Any:
+    for part in path:
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, (list, tuple)) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            value = getattr(value, part, None)
+    return value
+
+
+def substitute_references(value: Any, index: int, aliases: List[Set[str]], outputs: Dict[int, Any]) -> Any:
+    """Replace references with step outputs (a whole-string reference keeps the output type)"""
+    if isinstance(value, dict):
+        return {k: substitute_references(v, index, aliases, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [substitute_references(v, index, aliases, outputs) for v in value]
+    if not isinstance(value, str) or ("$" not in value and "{{" not in value):
+        return value
+
+    def resolve(reference: str):
+        parts = _split_reference(reference)
+        target = _resolve_target(parts[0], index, aliases)
+        if target is None or target not in outputs:
+            return None, False
+        return _lookup(outputs[target], parts[1:]), True
+
+    whole = _REFERENCE.fullmatch(value.strip())
+    if whole:
+        resolved, ok = resolve(next(group for group in whole.groups() if group))
+        return resolved if ok else value
+
+    def replace(match):
+        resolved, ok = resolve(next(group for group in match.groups() if group))
+        return str(resolved) if ok else match.group(0)
+
+    return _REFERENCE.sub(replace, value)
+
+
+class PlanExecutor:
+    """
+    Runs plan steps concurrently in dependency order.
+
+    Args:
+        run_step: Synchronous function ``(name, arguments) -> dict`` returning
+            at least ``status`` and ``result``
+        max_workers: Concurrently running steps
+        default_timeout: Timeout of a step without its own ``timeout``
+        tracer: Optional ExecutionTracer for per-step spans
+        parent_span_id: Parent span of the step spans
+    """
+
+    def __init__(self, run_step: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 max_workers: int = TOOL_WORKERS, default_timeout: float = TOOL_TIMEOUT,
+                 tracer=None, parent_span_id: Optional[str] = None):
+        self.run_step = run_step
+        self.max_workers = max(1, max_workers)
+        self.default_timeout = default_timeout
+        self.tracer = tracer
+        self.parent_span_id = parent_span_id
+
+    def _timeout(self, step: Dict[str, Any]) -> float:
+        return float(step.get("timeout") or self.default_timeout)
+
+    def _start_span(self, index: int, step: Dict[str, Any], depends_on: Set[int]) -> Optional[str]:
+        if self.tracer is None:
+            return None
+        try:
+            from core.tracing.execution_tracer import TraceType
+            return self.tracer.start_span(
+                operation_name=f"tool:{step.get('name')}",
+                trace_type=TraceType.TOOL_EXECUTION,
+                parent_span_id=self.parent_span_id,
+                metadata={"step": index, "depends_on": sorted(depends_on)},
+            )
+        except Exception as e:
+            logger.debug(f"Tracer span start failed: {e}")
+            return None
+
+    def _finish_span(self, span_id: Optional[str], result: Dict[str, Any]):
+        if span_id is None:
+            return
+        try:
+            from core.tracing.execution_tracer import TraceStatus
+            status = {
+                "success": TraceStatus.COMPLETED,
+                "timeout": TraceStatus.TIMEOUT,
+                "skipped": TraceStatus.CANCELLED,
+            }.get(result["status"], TraceStatus.FAILED)
+            self.tracer.finish_span(span_id, status, metadata={
+                "duration_ms": result.get("duration_ms"),
+                "queue_ms": result.get("queue_ms"),
+                "status": result["status"],
+            })
+        except Exception as e:
+            logger.debug(f"Tracer span finish failed: {e}")
+
+    def execute(self, steps: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run all steps; results are returned in plan order.
+
+        A step whose dependency failed or timed out is not run and gets
+        ``status="skipped"``. A timed-out step keeps running in its worker
+        thread, but nothing waits for it.
+        """
+        steps = [s for s in steps if isinstance(s, dict) and s.get("name")]
+        if not steps:
+            return []
+        dependencies = infer_dependencies(steps)
+        aliases = _step_aliases(steps)
+        results: Dict[int, Dict[str, Any]] = {}
+        outputs: Dict[int, Any] = {}
+        waiting = set(range(len(steps)))
+        running: Dict[Any, int] = {}
+        submitted_at: Dict[int, float] = {}
+        started_at: Dict[int, float] = {}
+        deadlines: Dict[int, float] = {}
+        spans: Dict[int, Optional[str]] = {}
+
+        def timed_call(index: int, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+            # Таймаут и span считаются с начала выполнения, а не с постановки в очередь
+            spans[index] = self._start_span(index, steps[index], dependencies[index])
+            started = time.perf_counter()
+            deadlines[index] = started + self._timeout(steps[index])
+            started_at[index] = started
+            return self.run_step(name, arguments)
+
+        def finish(index: int, result: Dict[str, Any]):
+            step = steps[index]
+            now = time.perf_counter()
+            began = started_at.get(index, now)
+            result.setdefault("tool_name", step["name"])
+            result["step"] = index
+            result["depends_on"] = sorted(dependencies[index])
+            result["duration_ms"] = round((now - began) * 1000, 1)
+            result["queue_ms"] = round((began - submitted_at.get(index, began)) * 1000, 1)
+            results[index] = result
+            if result.get("status") == "success":
+                outputs[index] = result.get("result")
+            self._finish_span(spans.get(index), result)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plan-step")
+        try:
+            while waiting or running:
+                # Запускаем все шаги, зависимости которых завершены
+                for index in sorted(waiting):
+                    needed = dependencies[index]
+                    if not needed <= results.keys():
+                        continue
+                    waiting.discard(index)
+                    submitted_at[index] = time.perf_counter()
+                    failed = [j for j in needed if results[j].get("status") != "success"]
+                    if failed:
+                        spans[index] = self._start_span(index, steps[index], needed)
+                        finish(index, {"status": "skipped",
+                                       "result": f"dependency failed: {', '.join(steps[j]['name'] for j in failed)}"})
+                        continue
+                    arguments = substitute_references(steps[index].get("arguments") or {}, index, aliases, outputs)
+                    future = executor.submit(timed_call, index, steps[index]["name"], arguments)
+                    running[future] = index
+
+                if not running:
+                    continue
+                now = time.perf_counter()
+                started = [deadlines[i] for i in running.values() if i in deadlines]
+                timeout = max(0.0, min(started) - now) if started else None
+                if len(started) < len(running):
+                    # Шаг из очереди может начаться в любой момент: его дедлайн появится после старта
+                    timeout = QUEUE_POLL_S if timeout is None else min(timeout, QUEUE_POLL_S)
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        finish(index, future.result())
+                    except Exception as e:
+                        finish(index, {"status": "error", "result": str(e)})
+                now = time.perf_counter()
+                for future, index in list(running.items()):
+                    if index in deadlines and now >= deadlines[index]:
+                        running.pop(future)
+                        future.cancel()
+                        finish(index, {"status": "timeout",
+                                       "result": f"timed out after {self._timeout(steps[index]):.0f}s"})
+        finally:
+            # shutdown(cancel_futures=True) есть только с Python 3.9
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return [results[i] for i in range(len(steps))]
+
+
+def run_parallel(calls: Sequence[Callable[[], Any]], semaphore: threading.Semaphore = LLM_SEMAPHORE,
+                 max_workers: Optional[int] = None) -> List[Any]:
+    """
+    Run independent calls concurrently under a shared concurrency limit.
+
+    Returns results in input order; a failed call yields its exception object.
+    """
+    if not calls:
+        return []
+
+    def guarded(call):
+        with semaphore:
+            return call()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(calls), thread_name_prefix="llm-fanout") as executor:
+        futures = [executor.submit(guarded, call) for call in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
@@ -31,6 +31,12 @@ class ProcessStatus(Enum):
     CANCELLED = "cancelled"
     TIMEOUT = "timeout"
 
+class ProcessEvent(Enum):
+    """Kind of change announced to WebSocket clients"""
+    STARTED = "Process started"
+    UPDATED = "Process updated"
+    CANCELLED = "Process cancelled"
+
 @dataclass
 class ProcessInfo:
     """Information about a tracked process"""
@@ -76,7 +82,7 @@ class ProcessTracker:
             metadata=metadata or {}
         )
         self.processes[process_id] = process_info
-        self._send_websocket_update_async(process_info, "Process started")
+        self._send_websocket_update_async(process_info, ProcessEvent.STARTED)
         return process_info
     
     def update_process(self, process_id: str, status: Optional[ProcessStatus] = None, progress: Optional[int] = None, 
@@ -105,7 +111,7 @@ class ProcessTracker:
         if metadata_update is not None:
             process_info.metadata.update(metadata_update)
         
-        self._send_websocket_update_async(process_info, "Process updated")
+        self._send_websocket_update_async(process_info, ProcessEvent.UPDATED)
         return process_info
     
     def get_process(self, process_id: str) -> Optional[ProcessInfo]:
@@ -133,43 +139,73 @@ class ProcessTracker:
         process_info = self.processes[process_id]
         process_info.status = ProcessStatus.CANCELLED
         process_info.completed_at = time.time()
-        self._send_websocket_update_async(process_info, "Process cancelled")
+        self._send_websocket_update_async(process_info, ProcessEvent.CANCELLED)
         return True
     
-    def _send_websocket_update_async(self, process_info: ProcessInfo, message: str):
+    def _send_websocket_update_async(self, process_info: ProcessInfo, event: ProcessEvent):
         """Schedule WebSocket update if manager is available and event loop is running"""
-        if self.websocket_manager:
-            try:
-                # Check if there's a running event loop
-                loop = asyncio.get_running_loop()
-                # Schedule the async update
-                loop.create_task(self._send_websocket_update(process_info, message))
-            except RuntimeError:
-                # No event loop running, skip WebSocket update
-                pass
-    
-    async def _send_websocket_update(self, process_info: ProcessInfo, message: str):
+        if not self.websocket_manager:
+            return
+        if hasattr(self.websocket_manager, "publish"):
+            # Хаб рассылки ставит сообщение в очереди клиентов без ожидания,
+            # в т.ч. из рабочих потоков
+            self._publish_update(process_info, event)
+            return
+        try:
+            # Check if there's a running event loop
+            loop = asyncio.get_running_loop()
+            # Schedule the async update
+            loop.create_task(self._send_websocket_update(process_info, event))
+        except RuntimeError:
+            # No event loop running, skip WebSocket update
+            pass
+
+    def _build_update(self, process_info: ProcessInfo, event: ProcessEvent) -> str:
+        update_data = {
+            "type": "process_update",
+            "process_id": process_info.process_id,
+            "process_type": process_info.process_type.value,
+            "status": process_info.status.value,
+            "name": process_info.name,
+            "progress": process_info.progress,
+            "event": event.name.lower(),
+            "message": event.value,
+            "timestamp": time.time(),
+            "metadata": process_info.metadata
+        }
+
+        if process_info.error_message:
+            update_data["error_message"] = process_info.error_message
+
+        return json.dumps(update_data)
+
+    def _publish_update(self, process_info: ProcessInfo, event: ProcessEvent):
+        if not self.websocket_manager.active_connections:
+            return
+        try:
+            # Промежуточные тики одного процесса схлопываются по process_id;
+            # старт и финальные статусы доставляются всегда
+            progress = event is ProcessEvent.UPDATED and process_info.status in (ProcessStatus.PENDING, ProcessStatus.RUNNING)
+            self.websocket_manager.publish(
+                self._build_update(process_info, event),
+                topics=(f"process:{process_info.process_id}", f"type:{process_info.process_type.value}"),
+                key=process_info.process_id,
+                progress=progress
+            )
+        except Exception as e:
+            logger.error(f"WebSocket update error: {str(e)}")
+
+    async def _send_websocket_update(self, process_info: ProcessInfo, event: ProcessEvent):
         """Send WebSocket update if manager is available"""
-        if self.websocket_manager:
-            try:
-                update_data = {
-                    "type": "process_update",
-                    "process_id": process_info.process_id,
-                    "process_type": process_info.process_type.value,
-                    "status": process_info.status.value,
-                    "name": process_info.name,
-                    "progress": process_info.progress,
-                    "message": message,
-                    "timestamp": time.time(),
-                    "metadata": process_info.metadata
-                }
-                
-                if process_info.error_message:
-                    update_data["error_message"] = process_info.error_message
-                
-                await self.websocket_manager.broadcast(json.dumps(update_data))
-            except Exception as e:
-                logger.error(f"WebSocket update error: {str(e)}")
+        if not self.websocket_manager:
+            return
+        if hasattr(self.websocket_manager, "publish"):
+            self._publish_update(process_info, event)
+            return
+        try:
+            await self.websocket_manager.broadcast(self._build_update(process_info, event))
+        except Exception as e:
+            logger.error(f"WebSocket update error: {str(e)}")
     
     async def _periodic_cleanup(self):
         """Periodically clean up old completed processes"""
@@ -0,0 +1,380 @@
+"""
+Project directory import.
+
+Files of a scanned folder are classified and hashed in a thread pool; the
+content goes into a content-addressed store (one object per SHA-256), so a
+file that is already stored - from this or any other project - is not copied
+again. Objects are created with a reflink where the filesystem supports it
+(btrfs, XFS), optionally with a hardlink, and by copying otherwise. Digests
+of unchanged files (same path, size, mtime) are cached, so re-importing an
+overlapping folder does not even re-read it. File nodes are written to Neo4j
+in UNWIND batches and progress is reported through ProcessTracker.
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTENT_STORE_DIR = os.getenv("PROJECT_CONTENT_STORE", "data/content_store")
+# reflink - reflink или копия; hardlink - ещё и жёсткая ссылка (объект и исходный
+# файл станут одним inode, правка исходника изменит сохранённую копию); copy - только копия
+LINK_MODE = os.getenv("PROJECT_STORE_LINK_MODE", "reflink")
+IMPORT_WORKERS = int(os.getenv("PROJECT_IMPORT_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+NEO4J_BATCH_SIZE = int(os.getenv("PROJECT_IMPORT_BATCH_SIZE", "500"))
+HASH_CHUNK_SIZE = 1024 * 1024
+HEADER_SIZE = 1024
+
+FICLONE = 0x40049409  # ioctl FICLONE (linux/fs.h)
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """Copy-on-write клон файла; False, если ФС не поддерживает"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError as e:
+        if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EBADF):
+            logger.debug(f"Reflink failed for {src}: {e}")
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+class ContentStore:
+    """Content-addressed file store: objects/<aa>/<sha256><ext>"""
+
+    def __init__(self, root: str = CONTENT_STORE_DIR, link_mode: str = LINK_MODE):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.link_mode = link_mode
+        self._db_path = str(self.root / "digests.sqlite")
+        self._local = threading.local()
+        # Один и тот же объект не копируется параллельно двумя потоками
+        self._put_locks = [threading.Lock() for _ in range(64)]
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_digests ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def object_path(self, digest: str, extension: str = "") -> Path:
+        return self.objects / digest[:2] / f"{digest}{extension.lower()}"
+
+    def contains(self, digest: str, extension: str = "") -> bool:
+        return self.object_path(digest, extension).exists()
+
+    def cached_digest(self, path: str, st: os.stat_result) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT digest FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def remember_digests(self, rows: List[tuple]):
+        """rows: (path, size, mtime_ns, digest)"""
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO file_digests VALUES (?, ?, ?, ?)", rows)
+
+    def put(self, src: str, digest: str, extension: str = "") -> tuple:
+        """
+        Store a file under its digest.
+
+        Returns:
+            (path, method) - method: existing, reflink, hardlink или copy
+        """
+        target = self.object_path(digest, extension)
+        if target.exists():
+            return target, "existing"
+        with self._put_locks[int(digest[:4], 16) % len(self._put_locks)]:
+            if target.exists():
+                return target, "existing"
+            return target, self._store_new(src, target)
+
+    def _store_new(self, src: str, target: Path) -> str:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        method = "copy"
+        try:
+            if self.link_mode != "copy" and _reflink(src, str(tmp)):
+                method = "reflink"
+            elif self.link_mode == "hardlink" and self._hardlink(src, tmp):
+                method = "hardlink"
+            else:
+                shutil.copyfile(src, tmp)
+            # Атомарная публикация: параллельный импорт того же содержимого не увидит
+            # недописанный объект
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return method
+
+    @staticmethod
+    def _hardlink(src: str, dst: Path) -> bool:
+        try:
+            os.link(src, dst)
+            return True
+        except OSError:
+            return False
+
+    def is_object(self, path: str) -> bool:
+        try:
+            # Path.is_relative_to появился только в Python 3.9
+            Path(path).resolve().relative_to(self.objects.resolve())
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+def hash_file(path: str) -> tuple:
+    """(sha256, первые HEADER_SIZE байт) за одно чтение файла"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        chunk = f.read(HASH_CHUNK_SIZE)
+        header = chunk[:HEADER_SIZE]
+        while chunk:
+            sha.update(chunk)
+            chunk = f.read(HASH_CHUNK_SIZE)
+    return sha.hexdigest(), header
+
+
+def read_header(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(HEADER_SIZE)
+
+
+class ProjectImporter:
+    """
+    Import a directory tree into a project.
+
+    Args:
+        store: Хранилище содержимого
+        detect_file_type: (filename, header_bytes) -> тип файла проекта
+        driver: Neo4j driver; None - узлы File не пишутся (только хранилище)
+        workers: Потоков для классификации, хеширования и копирования
+        batch_size: Узлов File на одну транзакцию Neo4j
+        tracker: ProcessTracker для прогресса
+    """
+
+    def __init__(self, store: ContentStore, detect_file_type: Callable[[str, bytes], str], driver=None,
+                 workers: int = IMPORT_WORKERS, batch_size: int = NEO4J_BATCH_SIZE, tracker=None):
+        self.store = store
+        self.detect_file_type = detect_file_type
+        self.driver = driver
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.tracker = tracker
+
+    def _scan(self, directory: str) -> List[str]:
+        paths = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            paths.append(entry.path)
+            except OSError as e:
+                logger.warning(f"Cannot scan {current}: {e}")
+        paths.sort()
+        return paths
+
+    def _process_file(self, path: str, directory: str) -> Optional[Dict[str, Any]]:
+        try:
+            st = os.stat(path)
+            digest = self.store.cached_digest(path, st)
+            fresh_digest = digest is None
+            if fresh_digest:
+                digest, header = hash_file(path)
+            else:
+                header = read_header(path)
+            name = os.path.basename(path)
+            extension = Path(name).suffix.lower()
+            stored_path, method = self.store.put(path, digest, extension)
+        except OSError as e:
+            logger.warning(f"Cannot import {path}: {e}")
+            return None
+        return {
+            "name": name,
+            "source_path": path,
+            "relative_path": os.path.relpath(path, directory),
+            "path": str(stored_path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "digest": digest,
+            "type": self.detect_file_type(name, header),
+            "store_method": method,
+            "hashed": fresh_digest,
+        }
+
+    def _existing_digests(self, project_id: str) -> set:
+        if not self.driver:
+            return set()
+        with self.driver.session() as session:
+            result = session.run(
+                """
+                MATCH (p:Project {id: $project_id})-[:HAS_FILE]->(f:File)
+                WHERE f.digest IS NOT NULL
+                RETURN f.digest AS digest, f.relative_path AS relative_path
+                """,
+                project_id=project_id
+            )
+            return {(record["digest"], record["relative_path"]) for record in result}
+
+    def _write_batch(self, project_id: str, rows: List[Dict[str, Any]]):
+        with self.driver.session() as session:
+            session.run(
+                """
+                MATCH (p:Project {id: $project_id})
+                UNWIND $rows AS row
+                CREATE (p)-[:HAS_FILE]->(f:File {
+                    id: row.id,
+                    name: row.name,
+                    path: row.path,
+                    relative_path: row.relative_path,
+                    size: row.size,
+                    type: row.type,
+                    digest: row.digest,
+                    uploaded_at: datetime()
+                })
+                WITH p, count(f) AS added
+                SET p.files_count = coalesce(p.files_count, 0) + added,
+                    p.updated_at = datetime()
+                """,
+                project_id=project_id,
+                rows=rows
+            )
+
+    def _progress(self, process_id: Optional[str], done: int, total: int, **metadata):
+        if self.tracker is None or process_id is None:
+            return
+        from core.process_tracker import ProcessStatus
+        progress = int(done * 100 / total) if total else 100
+        self.tracker.update_process(process_id, status=ProcessStatus.RUNNING, progress=progress,
+                                    metadata_update={"processed": done, "total": total, **metadata})
+
+    def import_directory(self, project_id: str, directory: str, process_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Import all files under ``directory`` into the project.
+
+        Files already attached to the project with the same content and
+        relative path are skipped; new content is stored once.
+        """
+        started = time.perf_counter()
+        if self.tracker is not None and process_id is not None:
+            from core.process_tracker import ProcessType
+            self.tracker.start_process(process_id, ProcessType.DOCUMENT_PROCESSING,
+                                       f"Import {os.path.basename(os.path.normpath(directory))}",
+                                       metadata={"project_id": project_id, "directory": directory})
+
+        try:
+            paths = self._scan(directory)
+            total = len(paths)
+            existing = self._existing_digests(project_id)
+            added_files: List[Dict[str, Any]] = []
+            pending: List[Dict[str, Any]] = []
+            digest_rows = []
+            counters = {"existing": 0, "reflink": 0, "hardlink": 0, "copy": 0}
+            skipped = 0
+            bytes_stored = 0
+            last_report = 0.0
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="project-import") as pool:
+                for done, info in enumerate(pool.map(lambda p: self._process_file(p, directory), paths), 1):
+                    if info is not None:
+                        if info["hashed"]:
+                            digest_rows.append((info["source_path"], info["size"], info["mtime_ns"], info["digest"]))
+                        counters[info["store_method"]] += 1
+                        if info["store_method"] != "existing":
+                            bytes_stored += info["size"]
+                        if (info["digest"], info["relative_path"]) in existing:
+                            skipped += 1
+                        else:
+                            existing.add((info["digest"], info["relative_path"]))
+                            file_row = {
+                                "id": str(uuid.uuid4()),
+                                "name": info["name"],
+                                "path": info["path"],
+                                "relative_path": info["relative_path"],
+                                "size": info["size"],
+                                "type": info["type"],
+                                "digest": info["digest"],
+                            }
+                            added_files.append(file_row)
+                            pending.append(file_row)
+                    if self.driver and len(pending) >= self.batch_size:
+                        self._write_batch(project_id, pending)
+                        pending = []
+                    now = time.perf_counter()
+                    if now - last_report >= 0.5 or done == total:
+                        last_report = now
+                        self._progress(process_id, done, total, added=len(added_files), skipped=skipped)
+
+            if self.driver and pending:
+                self._write_batch(project_id, pending)
+            self.store.remember_digests(digest_rows)
+        except Exception as e:
+            if self.tracker is not None and process_id is not None:
+                from core.process_tracker import ProcessStatus
+                self.tracker.update_process(process_id, status=ProcessStatus.FAILED, error_message=str(e))
+            raise
+
+        elapsed = time.perf_counter() - started
+        if self.tracker is not None and process_id is not None:
+            from core.process_tracker import ProcessStatus
+            self.tracker.update_process(process_id, status=ProcessStatus.COMPLETED, progress=100)
+
+        smeta_paths = [f["path"] for f in added_files if f["type"] == "smeta"]
+        rd_paths = [f["path"] for f in added_files if f["type"] == "rd"]
+        graphs_paths = [f["path"] for f in added_files if f["type"] == "graphs"]
+        logger.info(f"Imported {len(added_files)} files into project {project_id} in {elapsed:.2f}s "
+                    f"(skipped {skipped}, stored {bytes_stored} bytes)")
+
+        return {
+            "added": len(added_files),
+            "files": added_files,
+            "files_count": len(added_files),
+            "smeta_count": len(smeta_paths),
+            "rd_count": len(rd_paths),
+            "graphs_count": len(graphs_paths),
+            "smeta_paths": smeta_paths,
+            "rd_paths": rd_paths,
+            "scanned": total,
+            "skipped": skipped,
+            "deduplicated": counters["existing"],
+            "store_methods": counters,
+            "bytes_stored": bytes_stored,
+            "elapsed_seconds": round(elapsed, 3),
+        }
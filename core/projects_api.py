@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
 import os
 import shutil
@@ -20,6 +21,16 @@ except ImportError as e:
 
 # Import template manager
 from core.template_manager import template_manager
+from core.project_import import ContentStore, ProjectImporter
+
+_content_store = None
+
+def get_content_store() -> ContentStore:
+    """Shared content-addressed store of project files"""
+    global _content_store
+    if _content_store is None:
+        _content_store = ContentStore()
+    return _content_store
 
 router = APIRouter(tags=["projects"])  # Removed the prefix since it's added in main.py
 
@@ -488,133 +499,22 @@ class ProjectManager:
         """Scan a directory and add relevant files to project"""
         if not os.path.exists(directory_path):
             raise HTTPException(status_code=404, detail="Directory not found")
+        if not self.driver:
+            raise HTTPException(status_code=500, detail="Database not available")
         
-        # Supported file extensions
-        smeta_extensions = ['.xlsx', '.xls']
-        rd_extensions = ['.pdf']
-        graphs_extensions = ['.mpp', '.gantt']
-        
-        # Scan directory for files
-        found_files = []
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, directory_path)
-                
-                # Determine file type based on extension and content
-                file_type = "other"
-                file_extension = Path(file).suffix.lower()
-                
-                if file_extension in smeta_extensions:
-                    # Check if it's actually a smeta file by looking at content
-                    try:
-                        with open(file_path, 'rb') as f:
-                            content = f.read(1024)  # Read first 1KB
-                            if b'\xd0\xb3\xd1\x8d\xd1\x81\xd0\xbd' in content.lower():  # 'гэсн' in UTF-8 bytes
-                                file_type = "smeta"
-                            else:
-                                file_type = "smeta"  # Default to smeta for Excel files
-                    except:
-                        file_type = "smeta"  # Default to smeta for Excel files
-                        
-                elif file_extension in rd_extensions:
-                    # Check if it's actually an RD file by looking at content
-                    try:
-                        with open(file_path, 'rb') as f:
-                            content = f.read(1024)  # Read first 1KB
-                            if b'\xd1\x80\xd0\xb4' in content.lower():  # 'рд' in UTF-8 bytes
-                                file_type = "rd"
-                            else:
-                                file_type = "rd"  # Default to rd for PDF files
-                    except:
-                        file_type = "rd"  # Default to rd for PDF files
-                        
-                elif file_extension in graphs_extensions:
-                    file_type = "graphs"
-                
-                found_files.append({
-                    "name": file,
-                    "path": file_path,
-                    "relative_path": relative_path,
-                    "type": file_type,
-                    "size": os.path.getsize(file_path)
-                })
-        
-        # Add found files to project
-        added_count = 0
-        added_files = []
-        
-        # Create project directory if it doesn't exist
-        project_dir = Path(f"data/projects/{project_id}")
-        project_dir.mkdir(parents=True, exist_ok=True)
+        # Check if project exists
+        self.get_project(project_id)
         
         try:
-            for file_info in found_files:
-                # Copy file to project directory
-                file_id = str(uuid.uuid4())
-                file_extension = Path(file_info["name"]).suffix
-                destination_path = project_dir / f"{file_id}{file_extension}"
-                
-                shutil.copy2(file_info["path"], destination_path)
-                
-                # Add file to database
-                with self.driver.session() as session:
-                    session.run(
-                        """
-                        MATCH (p:Project {id: $project_id})
-                        CREATE (p)-[:HAS_FILE]->(f:File {
-                            id: $id,
-                            name: $name,
-                            path: $path,
-                            size: $size,
-                            type: $type,
-                            uploaded_at: datetime()
-                        })
-                        """,
-                        project_id=project_id,
-                        id=file_id,
-                        name=file_info["name"],
-                        path=str(destination_path),
-                        size=file_info["size"],
-                        type=file_info["type"]
-                    )
-                
-                added_files.append({
-                    "id": file_id,
-                    "name": file_info["name"],
-                    "path": str(destination_path),
-                    "size": file_info["size"],
-                    "type": file_info["type"]
-                })
-                added_count += 1
-            
-            # Update project files count
-            with self.driver.session() as session:
-                session.run(
-                    """
-                    MATCH (p:Project {id: $id})
-                    SET p.files_count = p.files_count + $count,
-                        p.updated_at = datetime()
-                    """,
-                    id=project_id,
-                    count=added_count
-                )
-            
-            # Categorize added files
-            smeta_paths = [f["path"] for f in added_files if f["type"] == "smeta"]
-            rd_paths = [f["path"] for f in added_files if f["type"] == "rd"]
-            graphs_paths = [f["path"] for f in added_files if f["type"] == "graphs"]
-            
-            return {
-                "added": added_count,
-                "files": added_files,
-                "files_count": added_count,
-                "smeta_count": len(smeta_paths),
-                "rd_count": len(rd_paths),
-                "graphs_count": len(graphs_paths),
-                "smeta_paths": smeta_paths,
-                "rd_paths": rd_paths
-            }
+            from core.process_tracker import get_process_tracker
+            importer = ProjectImporter(
+                get_content_store(),
+                detect_file_type=self.detect_file_type,
+                driver=self.driver,
+                tracker=get_process_tracker()
+            )
+            return importer.import_directory(project_id, directory_path,
+                                             process_id=f"project_import_{project_id}_{uuid.uuid4().hex[:8]}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to add files from directory: {str(e)}")
     
@@ -640,9 +540,20 @@ class ProjectManager:
                 
                 file_path = record["path"]
                 
-                # Delete file from filesystem
+                # Delete file from filesystem; объект хранилища удаляется, только
+                # если на него не ссылается ни один другой файл
+                shared = False
+                if get_content_store().is_object(file_path):
+                    shared = session.run(
+                        """
+                        MATCH (f:File {path: $path}) WHERE f.id <> $file_id
+                        RETURN count(f) > 0 AS shared
+                        """,
+                        path=file_path,
+                        file_id=file_id
+                    ).single()["shared"]
                 try:
-                    if os.path.exists(file_path):
+                    if not shared and os.path.exists(file_path):
                         os.remove(file_path)
                 except Exception as e:
                     print(f"Warning: Failed to delete file {file_path}: {e}")
@@ -790,7 +701,8 @@ async def delete_project_file(project_id: str, file_id: str):
 @router.post("/{project_id}/scan-directory")
 async def scan_directory_for_project(project_id: str, directory_path: str = Form(...)):
     """Scan a directory and add relevant files to project"""
-    return project_manager.scan_directory_for_project(project_id, directory_path)
+    # Импорт большой папки идёт в пуле потоков, не блокируя цикл событий
+    return await run_in_threadpool(project_manager.scan_directory_for_project, project_id, directory_path)
 
 @router.post("/{project_id}/results", response_model=ProjectResult)
 async def save_project_result(project_id: str, result_data: ResultCreate):
@@ -0,0 +1,357 @@
+"""
+Batched, cached question-answer generation for fine-tuning datasets.
+
+Asking the model about every chunk separately pays the prompt overhead and a
+full generation round-trip per chunk, and re-ingesting a document paid it all
+again. Here chunks are packed into prompts under a token budget, prompts run
+through a bounded worker pool, and the pairs of every chunk are cached in
+SQLite by (chunk content hash, prompt version, model): an unchanged chunk is
+never sent to the model twice. Questions that repeat across the document
+(same words up to order and inflection noise) are dropped::
+
+    engine = QAGenerationEngine(generate, model="rugpt3medium", cache_path=base_dir / "qa_cache.db")
+    result = engine.run(chunks)          # [{"text": ..., "chunk_id": ...}, ...]
+    result.pairs                          # [{"question", "answer", "chunk_id", ...}]
+    result.stats.cache_hit_rate, result.stats.chunks_per_s
+
+``generate`` is any callable ``prompt -> completion``; it may be called from
+several threads at once when ``concurrency > 1``.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.near_duplicates import normalize_words
+from core.ntd_registry_store import RegistryStore
+
+logger = logging.getLogger(__name__)
+
+# Меняется вместе с текстом промпта: старые записи кэша перестают совпадать
+PROMPT_VERSION = "qa-batch-v1"
+TOKEN_BUDGET = 2048
+PAIRS_PER_CHUNK = 2
+CONCURRENCY = 2
+QUESTION_SIMILARITY = 0.8
+MIN_CHUNK_CHARS = 80
+_IN_CHUNK = 500
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+PROMPT_TEMPLATE = """Ты составляешь обучающие вопросы по строительной документации.
+К каждому фрагменту ниже составь до {pairs} вопросов, на которые фрагмент отвечает, и краткие ответы строго по тексту фрагмента.
+Верни только JSON-массив объектов {{"fragment": номер фрагмента, "question": "...", "answer": "..."}}.
+
+{fragments}
+
+JSON:"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qa_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    pairs TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(str(text).split()).encode("utf-8")).hexdigest()
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count when no tokenizer is given (~3 characters per token for Russian BPE)"""
+    return len(text) // 3 + 1
+
+
+@dataclass
+class QARunStats:
+    """Metrics of one ``run``"""
+    chunks: int = 0
+    skipped: int = 0          # слишком короткие чанки
+    cache_hits: int = 0
+    cache_misses: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    unanswered: int = 0       # фрагменты без пар в разобранном ответе, не кэшируются
+    pairs: int = 0
+    duplicates_removed: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        looked_up = self.cache_hits + self.cache_misses
+        return self.cache_hits / looked_up if looked_up else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def pairs_per_s(self) -> float:
+        return self.pairs / self.elapsed_s if self.elapsed_s else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "cache_hit_rate": round(self.cache_hit_rate, 3),
+                "chunks_per_s": round(self.chunks_per_s, 2), "pairs_per_s": round(self.pairs_per_s, 2)}
+
+
+@dataclass
+class QAResult:
+    pairs: List[Dict[str, Any]] = field(default_factory=list)
+    stats: QARunStats = field(default_factory=QARunStats)
+
+
+class QACache:
+    """SQLite cache of generated pairs keyed by (content hash, prompt version, model)"""
+
+    def __init__(self, db_path):
+        self.store = RegistryStore(str(Path(db_path)))
+        self.store.executescript(SCHEMA)
+
+    def close(self):
+        self.store.close()
+
+    @staticmethod
+    def key(chunk_hash: str, prompt_version: str, model: str) -> str:
+        return hashlib.sha1(f"{chunk_hash}|{prompt_version}|{model}".encode("utf-8")).hexdigest()
+
+    def get_many(self, hashes: Sequence[str], prompt_version: str, model: str) -> Dict[str, List[Dict[str, str]]]:
+        """content hash -> cached pairs"""
+        keys = {self.key(h, prompt_version, model): h for h in hashes}
+        found: Dict[str, List[Dict[str, str]]] = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), _IN_CHUNK):
+            batch = key_list[start:start + _IN_CHUNK]
+            rows = self.store.execute(
+                f"SELECT cache_key, pairs FROM qa_cache WHERE cache_key IN ({', '.join('?' for _ in batch)})", batch)
+            for cache_key, pairs in rows:
+                found[keys[cache_key]] = json.loads(pairs)
+        return found
+
+    def put_many(self, entries: Dict[str, List[Dict[str, str]]], prompt_version: str, model: str):
+        rows = [{
+            "cache_key": self.key(chunk_hash, prompt_version, model),
+            "content_hash": chunk_hash,
+            "prompt_version": prompt_version,
+            "model": model,
+            "pairs": json.dumps(pairs, ensure_ascii=False),
+        } for chunk_hash, pairs in entries.items()]
+        self.store.upsert("qa_cache", "cache_key", rows,
+                          columns=("cache_key", "content_hash", "prompt_version", "model", "pairs"),
+                          touch="created_at")
+
+
+def dedupe_questions(pairs: List[Dict[str, Any]], threshold: float = QUESTION_SIMILARITY) -> Tuple[List[Dict[str, Any]], int]:
+    """Drop pairs whose question repeats an earlier one (word-set Jaccard >= threshold)"""
+    kept: List[Dict[str, Any]] = []
+    seen: List[frozenset] = []
+    exact = set()
+    removed = 0
+    for pair in pairs:
+        words = normalize_words(pair.get("question", ""))
+        if not words:
+            removed += 1
+            continue
+        normalized = " ".join(words)
+        word_set = frozenset(words)
+        if normalized in exact or any(len(word_set & other) / len(word_set | other) >= threshold for other in seen):
+            removed += 1
+            continue
+        exact.add(normalized)
+        seen.append(word_set)
+        kept.append(pair)
+    return kept, removed
+
+
+def parse_completion(completion: str, fragments: int) -> Optional[Dict[int, List[Dict[str, str]]]]:
+    """fragment index (0-based) -> pairs, or None when the completion is not a JSON array"""
+    match = _JSON_ARRAY_RE.search(completion or "")
+    if not match:
+        return None
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(items, list):
+        return None
+    result: Dict[int, List[Dict[str, str]]] = {i: [] for i in range(fragments)}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("fragment", 0)) - 1
+        except (TypeError, ValueError):
+            continue
+        question = str(item.get("question", "")).strip()
+        answer = str(item.get("answer", "")).strip()
+        if index in result and question and answer:
+            result[index].append({"question": question, "answer": answer})
+    return result
+
+
+class QAGenerationEngine:
+    """
+    Args:
+        generate: ``prompt -> completion`` model call
+        model: Model name (part of the cache key)
+        cache_path: SQLite cache file, None - no cache
+        prompt_version: Cache key part; bump when the prompt changes
+        token_budget: Max prompt tokens per batch (template included)
+        pairs_per_chunk: Questions asked per chunk
+        concurrency: Prompts in flight at once
+        count_tokens: Token counter of the model's tokenizer (default: approximation)
+    """
+
+    def __init__(self, generate: Callable[[str], str], model: str, cache_path=None,
+                 prompt_version: str = PROMPT_VERSION, token_budget: int = TOKEN_BUDGET,
+                 pairs_per_chunk: int = PAIRS_PER_CHUNK, concurrency: int = CONCURRENCY,
+                 count_tokens: Optional[Callable[[str], int]] = None,
+                 question_similarity: float = QUESTION_SIMILARITY):
+        self.generate = generate
+        self.model = model
+        self.cache = QACache(cache_path) if cache_path else None
+        self.prompt_version = prompt_version
+        self.token_budget = token_budget
+        self.pairs_per_chunk = pairs_per_chunk
+        self.concurrency = max(1, concurrency)
+        self.count_tokens = count_tokens or approx_tokens
+        self.question_similarity = question_similarity
+        self._overhead = self.count_tokens(PROMPT_TEMPLATE.format(pairs=pairs_per_chunk, fragments=""))
+        self._lock = threading.Lock()
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    # ------------------------------------------------------------------
+    # Батчи
+    # ------------------------------------------------------------------
+
+    def _fragment(self, number: int, text: str) -> str:
+        return f"Фрагмент {number}:\n{text}\n"
+
+    def iter_batches(self, texts: Sequence[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+        """
+        Group (content hash, text) items so that every prompt fits the token budget.
+
+        A text longer than the whole budget goes alone, trimmed proportionally.
+        """
+        budget = max(1, self.token_budget - self._overhead)
+        batch: List[Tuple[str, str]] = []
+        used = 0
+        for chunk_hash, text in texts:
+            tokens = self.count_tokens(self._fragment(len(batch) + 1, text))
+            if tokens > budget:
+                text = text[:max(1, int(len(text) * budget / tokens) - 16)]
+                tokens = budget
+            if batch and used + tokens > budget:
+                yield batch
+                batch, used = [], 0
+            batch.append((chunk_hash, text))
+            used += tokens
+        if batch:
+            yield batch
+
+    def build_prompt(self, batch: List[Tuple[str, str]]) -> str:
+        fragments = "\n".join(self._fragment(i + 1, text) for i, (_, text) in enumerate(batch))
+        return PROMPT_TEMPLATE.format(pairs=self.pairs_per_chunk, fragments=fragments)
+
+    def _run_batch(self, batch: List[Tuple[str, str]]) -> Optional[Dict[str, List[Dict[str, str]]]]:
+        """content hash -> pairs for the fragments the model answered, None if unparsable"""
+        completion = self.generate(self.build_prompt(batch))
+        parsed = parse_completion(completion, len(batch))
+        if parsed is None:
+            return None
+        # Пропущенный моделью фрагмент не попадает в результат и кэш - повтор на следующем прогоне
+        return {chunk_hash: parsed[i][:self.pairs_per_chunk]
+                for i, (chunk_hash, _) in enumerate(batch) if parsed[i]}
+
+    # ------------------------------------------------------------------
+    # Запуск
+    # ------------------------------------------------------------------
+
+    def run(self, chunks: Sequence[Dict[str, Any]]) -> QAResult:
+        """
+        Pairs for ``chunks`` (dicts with ``text`` and any extra keys copied into each pair).
+
+        Misses are generated batch by batch. A batch whose completion cannot be
+        parsed, and a fragment the completion has no pairs for, are not cached
+        and are retried on the next run.
+        """
+        started = time.perf_counter()
+        stats = QARunStats()
+        items: List[Tuple[str, Dict[str, Any]]] = []
+        for chunk in chunks:
+            text = str(chunk.get("text") or "").strip()
+            if len(text) < MIN_CHUNK_CHARS:
+                stats.skipped += 1
+                continue
+            items.append((content_hash(text), chunk))
+        stats.chunks = len(items)
+
+        unique = dict((chunk_hash, str(chunk["text"]).strip()) for chunk_hash, chunk in items)
+        generated = self.cache.get_many(list(unique), self.prompt_version, self.model) if self.cache else {}
+        stats.cache_hits = sum(1 for chunk_hash, _ in items if chunk_hash in generated)
+        misses = [(h, text) for h, text in unique.items() if h not in generated]
+        stats.cache_misses = stats.chunks - stats.cache_hits
+
+        if misses:
+            generated.update(self._generate_all(misses, stats))
+
+        pairs = []
+        for chunk_hash, chunk in items:
+            extra = {k: v for k, v in chunk.items() if k != "text"}
+            for pair in generated.get(chunk_hash, []):
+                pairs.append({**pair, **extra, "source": "llm", "prompt_version": self.prompt_version})
+        pairs, stats.duplicates_removed = dedupe_questions(pairs, self.question_similarity)
+        stats.pairs = len(pairs)
+        stats.elapsed_s = round(time.perf_counter() - started, 3)
+        return QAResult(pairs=pairs, stats=stats)
+
+    def _generate_all(self, misses: List[Tuple[str, str]], stats: QARunStats) -> Dict[str, List[Dict[str, str]]]:
+        """Batches through a pool with at most ``concurrency`` prompts in flight"""
+        generated: Dict[str, List[Dict[str, str]]] = {}
+        batches = self.iter_batches(misses)
+
+        sizes: Dict[Any, int] = {}
+
+        def collect(future):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"[QA] Batch generation failed: {e}")
+                result = None
+            with self._lock:
+                if result is None:
+                    stats.failed_batches += 1
+                    return
+                stats.unanswered += sizes.pop(future) - len(result)
+                generated.update(result)
+            if self.cache is not None and result:
+                self.cache.put_many(result, self.prompt_version, self.model)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="qa-gen") as pool:
+            pending = set()
+            for batch in batches:
+                # Промпты строятся лениво: в памяти не больше concurrency батчей
+                if len(pending) >= self.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+                future = pool.submit(self._run_batch, batch)
+                sizes[future] = len(batch)
+                pending.add(future)
+                stats.batches += 1
+            for future in pending:
+                collect(future)
+        return generated
@@ -0,0 +1,405 @@
+"""
+Compact Redis index of Celery jobs for queue introspection.
+
+Celery stores one ``celery-task-meta-<id>`` key per result; listing jobs by
+``KEYS`` + one ``GET`` per key blocks Redis on a busy broker. This index is
+maintained on the write side by Celery signals:
+
+* ``bldr:jobs:active`` / ``bldr:jobs:finished`` - sorted sets of task ids
+  scored by the last state change time, plus ``bldr:jobs:active:<tool>``
+  per tool;
+* ``bldr:jobs:meta:<id>`` - small hash (name, type, status, owner, times);
+* ``bldr:jobs:counters`` - aggregate counters, updated incrementally on each
+  state transition (``total``, ``completed`` ... and ``<tool>:<field>``).
+
+Active counts are the sizes of the active sets rather than counters: a task
+lost by a dead worker never reports a final state, so an incremental counter
+would drift. Such tasks are pruned from the sets once they are older than the
+metadata TTL.
+
+Readers page through the sorted sets with a ``<score>:<task_id>`` cursor and
+fetch metadata and results with one pipeline, so a dashboard poll costs
+O(page size).
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = os.getenv("QUEUE_INDEX_PREFIX", "bldr:jobs")
+ACTIVE_KEY = f"{KEY_PREFIX}:active"
+FINISHED_KEY = f"{KEY_PREFIX}:finished"
+COUNTERS_KEY = f"{KEY_PREFIX}:counters"
+META_TTL_SECONDS = int(os.getenv("QUEUE_INDEX_TTL", str(7 * 24 * 3600)))
+MAX_FINISHED = int(os.getenv("QUEUE_INDEX_MAX_FINISHED", "50000"))
+RESULT_KEY_PREFIX = "celery-task-meta-"
+
+ACTIVE_STATES = {"PENDING", "RECEIVED", "STARTED", "RETRY", "PROGRESS"}
+# Статус задачи -> поле агрегатного счетчика
+STATE_COUNTERS = {
+    "SUCCESS": "completed",
+    "FAILURE": "failed",
+    "REVOKED": "revoked",
+}
+
+
+def state_bucket(status: str) -> str:
+    """Counter field for a Celery state ("active", "completed", "failed", "revoked")"""
+    if status in ACTIVE_STATES:
+        return "active"
+    return STATE_COUNTERS.get(status, "active")
+
+
+def tool_type(task_name: Optional[str]) -> str:
+    return (task_name or "unknown").split(".")[-1]
+
+
+def meta_key(task_id: str) -> str:
+    return f"{KEY_PREFIX}:meta:{task_id}"
+
+
+def active_key(tool: str) -> str:
+    return f"{ACTIVE_KEY}:{tool}"
+
+
+def format_cursor(score: float, task_id: str) -> str:
+    return f"{score!r}:{task_id}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    """``<score>:<task_id>`` -> (score, task_id); ValueError for a malformed cursor"""
+    if cursor is None:
+        return None
+    score, separator, task_id = cursor.partition(":")
+    if not separator or not task_id:
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+    return float(score), task_id
+
+
+class QueueIndex:
+    """Write-side index of Celery jobs with O(page) reads"""
+
+    def __init__(self, client):
+        """
+        Args:
+            client: redis.Redis client created with ``decode_responses=True``
+        """
+        self.client = client
+
+    # ------------------------------------------------------------------
+    # Write side (Celery signals)
+    # ------------------------------------------------------------------
+
+    def record_state(self, task_id: str, status: str, task_name: Optional[str] = None,
+                     owner: Optional[str] = None, timestamp: Optional[float] = None) -> None:
+        """
+        Record a state transition of a task.
+
+        Counters are moved from the previous bucket to the new one inside a
+        WATCH/MULTI transaction, so concurrent signals for the same task do
+        not double count. A task whose metadata has expired but which is
+        still in the active or finished set is not counted again.
+        """
+        timestamp = timestamp or time.time()
+        key = meta_key(task_id)
+
+        def _apply(pipe):
+            previous = pipe.hmget(key, "status", "name", "owner")
+            previous_status, previous_name, previous_owner = previous
+            name = task_name or previous_name
+            tool = tool_type(name)
+            new_bucket = state_bucket(status)
+            if previous_status:
+                old_bucket = state_bucket(previous_status)
+            elif pipe.zscore(ACTIVE_KEY, task_id) is not None:
+                old_bucket = "active"
+            elif pipe.zscore(FINISHED_KEY, task_id) is not None:
+                # Итоговый статус неизвестен - задача уже учтена, счетчики не трогаем
+                old_bucket = new_bucket
+            else:
+                old_bucket = None
+
+            pipe.multi()
+            fields = {"status": status, "name": name or "unknown", "type": tool,
+                      "owner": owner or previous_owner or "system", "updated_at": timestamp}
+            if old_bucket is None:
+                fields["started_at"] = timestamp
+                pipe.hincrby(COUNTERS_KEY, "total", 1)
+                pipe.hincrby(COUNTERS_KEY, f"{tool}:total", 1)
+            if new_bucket != "active":
+                fields["finished_at"] = timestamp
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, META_TTL_SECONDS)
+
+            # Активные считаются по размеру множеств, счетчики - только для завершенных
+            if old_bucket != new_bucket:
+                if old_bucket and old_bucket != "active":
+                    pipe.hincrby(COUNTERS_KEY, old_bucket, -1)
+                    pipe.hincrby(COUNTERS_KEY, f"{tool}:{old_bucket}", -1)
+                if new_bucket != "active":
+                    pipe.hincrby(COUNTERS_KEY, new_bucket, 1)
+                    pipe.hincrby(COUNTERS_KEY, f"{tool}:{new_bucket}", 1)
+
+            if new_bucket == "active":
+                pipe.zadd(ACTIVE_KEY, {task_id: timestamp})
+                pipe.zadd(active_key(tool), {task_id: timestamp})
+            else:
+                pipe.zrem(ACTIVE_KEY, task_id)
+                pipe.zrem(active_key(tool), task_id)
+                pipe.zadd(FINISHED_KEY, {task_id: timestamp})
+                # История ограничена; метаданные вытесненных задач истекут по TTL
+                pipe.zremrangebyrank(FINISHED_KEY, 0, -MAX_FINISHED - 1)
+
+        self.client.transaction(_apply, key)
+
+    # ------------------------------------------------------------------
+    # Read side
+    # ------------------------------------------------------------------
+
+    def page(self, finished: bool = False, limit: int = 100, cursor: Optional[str] = None,
+             with_results: bool = True,
+             statuses: Optional[Set[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Newest-first page of active or finished jobs.
+
+        Args:
+            finished: Page finished jobs instead of active ones
+            limit: Page size
+            cursor: ``next_cursor`` returned by the previous page
+            with_results: Also fetch Celery result payloads (one MGET)
+            statuses: Only return jobs in these states; filtered before the
+                limit is applied, so a page is full unless the index ends
+
+        Returns:
+            (jobs, next_cursor) - next_cursor is None on the last page
+
+        Raises:
+            ValueError: malformed cursor
+        """
+        key = FINISHED_KEY if finished else ACTIVE_KEY
+        position = parse_cursor(cursor)
+        jobs: List[Dict[str, Any]] = []
+        while len(jobs) < limit:
+            entries = self._entries_after(key, position, limit)
+            if not entries:
+                return jobs, None
+            for task_id, score, job in self._load_jobs(key, entries, with_results):
+                position = (score, task_id)
+                if job is None or (statuses is not None and job.get("status") not in statuses):
+                    continue
+                jobs.append(job)
+                if len(jobs) == limit:
+                    break
+            if len(entries) < limit and len(jobs) < limit:
+                return jobs, None
+        return jobs, format_cursor(*position)
+
+    def _entries_after(self, key: str, position: Optional[Tuple[float, str]],
+                       count: int) -> List[Tuple[str, float]]:
+        """Up to ``count`` entries strictly after ``position`` in (score, task_id) descending order"""
+        if position is None:
+            return self.client.zrevrangebyscore(key, "+inf", "-inf", start=0, num=count, withscores=True)
+        score, last_id = position
+        entries: List[Tuple[str, float]] = []
+        offset = 0
+        while len(entries) < count:
+            batch = self.client.zrevrangebyscore(key, score, "-inf", start=offset, num=count, withscores=True)
+            offset += len(batch)
+            # При равной оценке Redis отдает id по убыванию - уже выданные идут первыми
+            entries.extend((task_id, s) for task_id, s in batch if s < score or task_id < last_id)
+            if len(batch) < count:
+                break
+        return entries[:count]
+
+    def _load_jobs(self, key: str, entries: List[Tuple[str, float]],
+                   with_results: bool) -> List[Tuple[str, float, Optional[Dict[str, Any]]]]:
+        """(task_id, score, job) per entry - job is None for entries whose metadata expired"""
+        task_ids = [task_id for task_id, _ in entries]
+        pipe = self.client.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(meta_key(task_id))
+        if with_results:
+            pipe.mget([f"{RESULT_KEY_PREFIX}{task_id}" for task_id in task_ids])
+        replies = pipe.execute()
+
+        metas = replies[:len(task_ids)]
+        results = replies[len(task_ids)] if with_results else [None] * len(task_ids)
+        loaded = []
+        stale = []
+        for (task_id, score), meta, raw_result in zip(entries, metas, results):
+            if not meta and not raw_result:
+                # Метаданные истекли по TTL - убираем задачу из индекса
+                stale.append(task_id)
+                loaded.append((task_id, score, None))
+                continue
+            job = {"id": task_id, **meta}
+            if raw_result:
+                try:
+                    payload = json.loads(raw_result)
+                    job["result_meta"] = payload
+                    # Celery пишет актуальный статус в результат раньше сигналов postrun
+                    job["status"] = payload.get("status", job.get("status"))
+                except (TypeError, ValueError):
+                    logger.warning(f"Malformed result payload for task {task_id}")
+            loaded.append((task_id, score, job))
+        if stale:
+            self.client.zrem(key, *stale)
+        return loaded
+
+    def counters(self) -> Dict[str, Any]:
+        """Aggregate counters: totals and per-tool breakdown; active counts come from the active sets"""
+        raw = self.client.hgetall(COUNTERS_KEY)
+        totals = {"total": 0, "active": 0, "completed": 0, "failed": 0, "revoked": 0}
+        tools: Dict[str, Dict[str, int]] = {}
+        for field, value in raw.items():
+            if ":" in field:
+                tool, name = field.rsplit(":", 1)
+                tools.setdefault(tool, {"total": 0, "active": 0, "completed": 0, "failed": 0, "revoked": 0})
+                if name != "active":
+                    tools[tool][name] = int(value)
+            elif field != "active":
+                totals[field] = int(value)
+
+        keys = [ACTIVE_KEY] + [active_key(tool) for tool in tools]
+        self._prune_lost(keys)
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zcard(key)
+        sizes = pipe.execute()
+        totals["active"] = sizes[0]
+        for tool, size in zip(tools, sizes[1:]):
+            tools[tool]["active"] = size
+        return {**totals, "tools": tools}
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def _prune_lost(self, keys: List[str]) -> None:
+        """
+        Drop lost tasks from the active sets.
+
+        A task whose worker died never reports a final state; once it has not
+        changed state for longer than the metadata TTL and its metadata has
+        expired, it is removed. Only entries past the cutoff are checked.
+        """
+        cutoff = time.time() - META_TTL_SECONDS
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrangebyscore(key, "-inf", f"({cutoff}")
+        candidates = {task_id for old in pipe.execute() for task_id in old}
+        if not candidates:
+            return
+        candidates = sorted(candidates)
+        pipe = self.client.pipeline(transaction=False)
+        for task_id in candidates:
+            pipe.exists(meta_key(task_id))
+        lost = [task_id for task_id, exists in zip(candidates, pipe.execute()) if not exists]
+        if lost:
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.zrem(key, *lost)
+            pipe.execute()
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Rebuild the index from existing Celery result keys.
+
+        Uses SCAN with MGET per batch, so Redis is never blocked by a single
+        long command. Returns the number of indexed tasks.
+        """
+        self.client.delete(ACTIVE_KEY, FINISHED_KEY, COUNTERS_KEY,
+                           *self.client.scan_iter(match=active_key("*"), count=batch_size))
+        indexed = 0
+        batch: List[str] = []
+        for key in self.client.scan_iter(match=f"{RESULT_KEY_PREFIX}*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                indexed += self._index_batch(batch)
+                batch = []
+        if batch:
+            indexed += self._index_batch(batch)
+        return indexed
+
+    def _index_batch(self, keys: List[str]) -> int:
+        indexed = 0
+        task_ids = [key[len(RESULT_KEY_PREFIX):] for key in keys]
+        payloads = self.client.mget(keys)
+        self.client.delete(*[meta_key(task_id) for task_id in task_ids])
+        for task_id, raw in zip(task_ids, payloads):
+            if not raw:
+                continue
+            try:
+                payload = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            self.record_state(task_id, payload.get("status", "PENDING"), payload.get("name"),
+                              timestamp=_parse_timestamp(payload.get("date_done")))
+            indexed += 1
+        return indexed
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        from datetime import datetime
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def connect_queue_index_signals(celery_app, client=None) -> QueueIndex:
+    """
+    Keep the queue index up to date from Celery signals.
+
+    Args:
+        celery_app: Celery application (its result backend URL is used when
+            no client is given)
+        client: Optional redis.Redis client
+    """
+    from celery import signals
+
+    if client is None:
+        import redis
+        backend_url = celery_app.conf.result_backend or os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+        client = redis.Redis.from_url(backend_url, decode_responses=True)
+    index = QueueIndex(client)
+
+    def _safe_record(*args, **kwargs):
+        try:
+            index.record_state(*args, **kwargs)
+        except Exception as e:
+            # Индекс очереди не должен ронять выполнение задач
+            logger.warning(f"Queue index update failed: {e}")
+
+    @signals.before_task_publish.connect(weak=False)
+    def _on_publish(sender=None, headers=None, **kwargs):
+        headers = headers or {}
+        if headers.get("id"):
+            _safe_record(headers["id"], "PENDING", sender, owner=headers.get("owner"))
+
+    @signals.task_prerun.connect(weak=False)
+    def _on_prerun(task_id=None, task=None, **kwargs):
+        _safe_record(task_id, "STARTED", getattr(task, "name", None))
+
+    @signals.task_retry.connect(weak=False)
+    def _on_retry(request=None, **kwargs):
+        if request is not None:
+            _safe_record(request.id, "RETRY", getattr(request, "task", None))
+
+    @signals.task_postrun.connect(weak=False)
+    def _on_postrun(task_id=None, task=None, state=None, **kwargs):
+        if state:
+            _safe_record(task_id, state, getattr(task, "name", None))
+
+    @signals.task_revoked.connect(weak=False)
+    def _on_revoked(request=None, **kwargs):
+        if request is not None:
+            _safe_record(request.id, "REVOKED", getattr(request, "task", None))
+
+    return index
@@ -0,0 +1,405 @@
+"""
+Rate catalogue for GESN/FER/TER unit rates.
+
+Loads rate sources (CSV) once into a compact columnar structure with indexes
+on normalized code and on name tokens, and serves exact-code, prefix, fuzzy
+name and batch lookups. Sources are reloaded automatically when the files
+change on disk, so budget tools can share one catalogue per process instead
+of re-parsing the CSV for every calculation.
+"""
+
+import os
+import re
+import csv
+import time
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+RATE_FIELDS = ("base_rate", "materials_cost", "labor_cost", "equipment_cost")
+DEFAULT_SOURCES = ("data/gesn_rates.csv", "data/fer_rates.csv", "data/ter_rates.csv")
+
+_CODE_RE = re.compile(r"(ГЭСН|ФЕР|ТЕР)\s*([РМП])?[\s\-]*(\d+(?:[\-.]\d+)*)")
+_NUMBER_RE = re.compile(r"(\d+(?:[\-.]\d+)*)")
+_TOKEN_RE = re.compile(r"\w{3,}")
+_COLLECTION_BY_FILENAME = (("gesn", "ГЭСН"), ("гэсн", "ГЭСН"), ("fer", "ФЕР"), ("фер", "ФЕР"), ("ter", "ТЕР"), ("тер", "ТЕР"))
+
+
+def normalize_code(code: str, default_collection: str = "") -> str:
+    """
+    Normalize a rate code to ``<collection>:<number>``.
+
+    ``"ГЭСН 08-01-001-01"``, ``"ГЭСН8-1-1-1"`` and ``"гэсн 8-1-1-1"`` all map to
+    ``"ГЭСН:8-1-1-1"``; a bare ``"08-01-001"`` maps to ``":8-1-1"`` unless a
+    default collection is given.
+    """
+    text = str(code or "").upper().replace("Ё", "Е").strip()
+    match = _CODE_RE.search(text)
+    if match:
+        collection = match.group(1) + (match.group(2) or "").lower()
+        number = match.group(3)
+    else:
+        number_match = _NUMBER_RE.search(text)
+        if not number_match:
+            return ""
+        collection = default_collection
+        number = number_match.group(1)
+    parts = []
+    for part in number.split("-"):
+        parts.append(".".join(str(int(p)) if p.isdigit() else p for p in part.split(".")))
+    return f"{collection}:{'-'.join(parts)}"
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"\s+", " ", str(name or "").lower().replace("ё", "е")).strip()
+
+
+def _name_tokens(name: str) -> List[str]:
+    # Обрезка до 6 символов - грубый стемминг для русских окончаний
+    return [token[:6] for token in _TOKEN_RE.findall(name)]
+
+
+@dataclass
+class RateMatch:
+    """Result of a catalogue lookup"""
+    code: str
+    rate: Dict[str, Any]
+    match_type: str  # exact | number | parent | prefix | fuzzy
+    score: float = 1.0
+
+
+class RateCatalogue:
+    """Columnar, indexed catalogue of unit rates"""
+
+    def __init__(self, sources: Optional[Iterable[str]] = None, fuzzy_threshold: float = 0.55,
+                 check_interval: float = 2.0):
+        """
+        Args:
+            sources: CSV files with rates; ``None`` - no files (see from_mapping)
+            fuzzy_threshold: Minimal score for a fuzzy name match
+            check_interval: Minimal interval between file change checks, seconds
+        """
+        self.sources = list(sources or [])
+        self.fuzzy_threshold = fuzzy_threshold
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature: Tuple = ()
+        self._last_check = 0.0
+        self._dict_view: Optional[Dict[str, Dict[str, Any]]] = None
+        self.stats = {"loads": 0, "load_time": 0.0, "lookups": 0}
+        self._build([])
+        if self.sources:
+            self.reload()
+
+    @classmethod
+    def from_mapping(cls, rates: Dict[str, Dict[str, Any]], **kwargs) -> "RateCatalogue":
+        """Build a catalogue from an in-memory ``{code: rate_dict}`` mapping"""
+        catalogue = cls(**kwargs)
+        catalogue._build((code, data) for code, data in rates.items() if isinstance(data, dict))
+        return catalogue
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _source_signature(self) -> Tuple:
+        signature = []
+        for path in self.sources:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self) -> None:
+        """(Re)load all sources from disk"""
+        with self._lock:
+            started = time.perf_counter()
+            signature = self._source_signature()
+            records: List[Tuple[str, Dict[str, Any]]] = []
+            for path in self.sources:
+                records.extend(self._read_csv(path))
+            self._build(records)
+            self._signature = signature
+            self._last_check = time.monotonic()
+            elapsed = time.perf_counter() - started
+            self.stats["loads"] += 1
+            self.stats["load_time"] = elapsed
+            logger.info(f"Rate catalogue loaded: {len(self)} rates from {len(self.sources)} sources in {elapsed:.3f}s")
+
+    def reload_if_changed(self) -> bool:
+        """Reload when any source file changed; checks at most every check_interval seconds"""
+        if not self.sources:
+            return False
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        if self._source_signature() == self._signature:
+            return False
+        logger.info("Rate sources changed on disk, reloading catalogue")
+        self.reload()
+        return True
+
+    @staticmethod
+    def _read_csv(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        lowered = os.path.basename(path).lower()
+        collection = next((name for key, name in _COLLECTION_BY_FILENAME if key in lowered), "")
+        try:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header:
+                    return
+                code_index = header.index("code") if "code" in header else 0
+                for row in reader:
+                    if len(row) <= code_index or not row[code_index].strip():
+                        continue
+                    data: Dict[str, Any] = {}
+                    for i, key in enumerate(header):
+                        if i == code_index or i >= len(row):
+                            continue
+                        value = row[i]
+                        try:
+                            data[key] = float(value)
+                        except ValueError:
+                            data[key] = value
+                    code = row[code_index].strip()
+                    if collection and not _CODE_RE.search(code.upper()):
+                        data.setdefault("collection", collection)
+                    yield code, data
+        except FileNotFoundError:
+            logger.error(f"Rate source not found: {path}")
+        except Exception as e:
+            logger.error(f"Error loading rate source {path}: {e}")
+
+    def _build(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        codes: List[str] = []
+        names: List[str] = []
+        extras: List[Dict[str, Any]] = []
+        values = {field: array("d") for field in RATE_FIELDS}
+        by_key: Dict[str, int] = {}
+        by_number: Dict[str, int] = {}
+        tokens: Dict[str, List[int]] = {}
+
+        for code, data in records:
+            key = normalize_code(code, data.get("collection", ""))
+            if key in by_key:
+                # Последний источник имеет приоритет (ТЕР поверх ФЕР и т.п.)
+                index = by_key[key]
+            else:
+                index = len(codes)
+                codes.append(code)
+                names.append("")
+                extras.append({})
+                for field in RATE_FIELDS:
+                    values[field].append(0.0)
+                if key:
+                    by_key[key] = index
+                    by_number.setdefault(key.split(":", 1)[1], index)
+            for field in RATE_FIELDS:
+                try:
+                    values[field][index] = float(data.get(field) or 0.0)
+                except (TypeError, ValueError):
+                    values[field][index] = 0.0
+            name = data.get("description") or data.get("name") or ""
+            names[index] = str(name)
+            extras[index] = {k: v for k, v in data.items() if k not in RATE_FIELDS}
+            for token in set(_name_tokens(normalize_name(name))):
+                tokens.setdefault(token, []).append(index)
+
+        # Подмена структур одной операцией: читатели видят либо старый, либо новый индекс
+        self._codes, self._names, self._extras, self._values = codes, names, extras, values
+        self._by_key, self._by_number, self._tokens = by_key, by_number, tokens
+        self._sorted_keys = sorted(by_key)
+        self._dict_view = None
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        # Те же правила, что у get(): ``code in catalogue`` и ``catalogue.get(code)`` согласованы
+        return self.lookup(code) is not None
+
+    def _rate(self, index: int) -> Dict[str, Any]:
+        rate = dict(self._extras[index])
+        for field in RATE_FIELDS:
+            rate[field] = self._values[field][index]
+        if self._names[index]:
+            rate["description"] = self._names[index]
+        return rate
+
+    def _match(self, index: int, match_type: str, score: float = 1.0) -> RateMatch:
+        return RateMatch(code=self._codes[index], rate=self._rate(index), match_type=match_type, score=score)
+
+    def get(self, code: str, default: Any = None) -> Any:
+        """dict-compatible exact lookup returning the rate dict"""
+        match = self.lookup(code)
+        return match.rate if match else default
+
+    def lookup(self, code: str) -> Optional[RateMatch]:
+        """Exact lookup by normalized code"""
+        self.reload_if_changed()
+        self.stats["lookups"] += 1
+        key = normalize_code(code)
+        if not key:
+            return None
+        index = self._by_key.get(key)
+        if index is not None:
+            return self._match(index, "exact")
+        collection, number = key.split(":", 1)
+        if not collection:
+            index = self._by_number.get(number)
+            if index is not None:
+                return self._match(index, "number")
+        return None
+
+    def lookup_prefix(self, prefix: str, limit: int = 50) -> List[RateMatch]:
+        """All rates whose code starts with the given code prefix (by whole parts)"""
+        self.reload_if_changed()
+        key = normalize_code(prefix)
+        if not key:
+            return []
+        keys = self._sorted_keys
+        matches = []
+        position = bisect_left(keys, key)
+        while position < len(keys) and len(matches) < limit:
+            candidate = keys[position]
+            if not candidate.startswith(key):
+                break
+            rest = candidate[len(key):]
+            if not rest or rest[0] in "-.":
+                matches.append(self._match(self._by_key[candidate], "prefix"))
+            position += 1
+        return matches
+
+    def search_name(self, name: str, limit: int = 10) -> List[RateMatch]:
+        """Fuzzy lookup by rate name via the token index"""
+        self.reload_if_changed()
+        normalized = normalize_name(name)
+        query_tokens = set(_name_tokens(normalized))
+        if not query_tokens:
+            return []
+        overlap: Counter = Counter()
+        for token in query_tokens:
+            for index in self._tokens.get(token, ()):
+                overlap[index] += 1
+        scored = []
+        for index, shared in overlap.most_common(max(limit * 5, 20)):
+            candidate = normalize_name(self._names[index])
+            candidate_tokens = set(_name_tokens(candidate))
+            jaccard = shared / len(query_tokens | candidate_tokens)
+            ratio = SequenceMatcher(None, normalized, candidate).ratio()
+            scored.append((0.5 * jaccard + 0.5 * ratio, index))
+        scored.sort(reverse=True)
+        return [self._match(index, "fuzzy", round(score, 3)) for score, index in scored[:limit]]
+
+    def resolve(self, code: str, description: str = "") -> Optional[RateMatch]:
+        """
+        Best rate for an estimate position: exact code, parent code
+        (``8-1-1.1`` -> ``8-1-1``), first child code, then fuzzy name.
+        """
+        match = self.lookup(code)
+        if match:
+            return match
+        key = normalize_code(code)
+        if key:
+            collection, number = key.split(":", 1)
+            parts = re.split(r"([\-.])", number)
+            # Отбрасываем последний уровень номера, пока не останется два
+            while len(parts) > 3:
+                parts = parts[:-2]
+                index = self._by_key.get(f"{collection}:{''.join(parts)}")
+                if index is not None:
+                    return self._match(index, "parent")
+            children = self.lookup_prefix(code, limit=1)
+            if children:
+                return children[0]
+        if description:
+            candidates = self.search_name(description, limit=1)
+            if candidates and candidates[0].score >= self.fuzzy_threshold:
+                return candidates[0]
+        return None
+
+    def resolve_batch(self, positions: List[Dict[str, Any]]) -> List[Optional[RateMatch]]:
+        """Resolve rates for all estimate positions; repeated codes are resolved once"""
+        self.reload_if_changed()
+        cache: Dict[Tuple[str, str], Optional[RateMatch]] = {}
+        results = []
+        for position in positions:
+            key = (str(position.get("code", "") or ""), str(position.get("description", "") or ""))
+            if key not in cache:
+                cache[key] = self.resolve(*key)
+            results.append(cache[key])
+        return results
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Plain ``{code: rate_dict}`` view (cached until the next reload)"""
+        self.reload_if_changed()
+        if self._dict_view is None:
+            self._dict_view = {self._codes[i]: self._rate(i) for i in range(len(self._codes))}
+        return self._dict_view
+
+
+_catalogues: Dict[Tuple[str, ...], RateCatalogue] = {}
+_catalogues_lock = threading.Lock()
+
+
+def default_rate_sources() -> List[str]:
+    """Sources from BLDR_RATE_SOURCES (os.pathsep-separated) or the default data files"""
+    env_sources = os.getenv("BLDR_RATE_SOURCES")
+    if env_sources:
+        return [path for path in env_sources.split(os.pathsep) if path]
+    return [path for path in DEFAULT_SOURCES if os.path.exists(path)]
+
+
+_mapping_catalogues: "OrderedDict[int, Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]], RateCatalogue]]" = OrderedDict()
+MAPPING_CACHE_SIZE = 16
+
+
+def catalogue_from_mapping(rates: Dict[str, Dict[str, Any]]) -> RateCatalogue:
+    """
+    ``RateCatalogue.from_mapping`` cached per dict object.
+
+    The same rates dict is usually passed on every call (module-level sample
+    rates); the index is rebuilt only when its contents changed.
+    """
+    with _catalogues_lock:
+        cached = _mapping_catalogues.get(id(rates))
+        # Ссылка на сам dict в кэше не дает id переиспользоваться другим объектом
+        if cached is not None and cached[0] is rates and cached[1] == rates:
+            _mapping_catalogues.move_to_end(id(rates))
+            return cached[2]
+    catalogue = RateCatalogue.from_mapping(rates)
+    snapshot = {code: dict(data) if isinstance(data, dict) else data for code, data in rates.items()}
+    with _catalogues_lock:
+        _mapping_catalogues[id(rates)] = (rates, snapshot, catalogue)
+        _mapping_catalogues.move_to_end(id(rates))
+        while len(_mapping_catalogues) > MAPPING_CACHE_SIZE:
+            _mapping_catalogues.popitem(last=False)
+    return catalogue
+
+
+def get_rate_catalogue(sources: Optional[Iterable[str]] = None) -> RateCatalogue:
+    """Shared per-process catalogue for the given (or default) sources"""
+    key = tuple(sources) if sources is not None else tuple(default_rate_sources())
+    catalogue = _catalogues.get(key)
+    if catalogue is None:
+        with _catalogues_lock:
+            catalogue = _catalogues.get(key)
+            if catalogue is None:
+                catalogue = RateCatalogue(key)
+                _catalogues[key] = catalogue
+    return catalogue
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SAMPLING PROFILER FOR TRAINING RUNS
+===================================
+
+Низкозатратный сэмплирующий профилировщик для EnterpriseRAGTrainer.
+
+Фоновый поток с заданной частотой снимает стек потока обучения через
+``sys._current_frames()`` - без sys.setprofile, поэтому обучаемый код не
+замедляется на каждом вызове. Каждый сэмпл помечается текущим этапом
+(самый внешний кадр ``_stage*`` в стеке) и текущим документом.
+
+Результат пишется в collapsed-формате (``frame;frame;frame count``), который
+понимают flamegraph.pl, inferno и speedscope:
+
+    <output_dir>/<run_id>/run.collapsed          - все сохранённые сэмплы, корень = этап
+    <output_dir>/<run_id>/docs/<name>.collapsed  - медленные документы
+    <output_dir>/<run_id>/summary.json           - горячие функции по этапам, документы
+
+В режиме ``capture='slow'`` сэмплы документа сохраняются, только если он
+обрабатывался дольше перцентиля ``slow_percentile`` по предыдущим документам
+(или дольше ``slow_seconds``, если порог задан явно).
+
+Интервал сэмплирования адаптивный: если стоимость снятия стека превышает
+``max_overhead`` от интервала, интервал увеличивается.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+PROFILE_CAPTURE = os.getenv('PROFILE_CAPTURE', 'all')  # all | slow
+PROFILE_SLOW_PERCENTILE = float(os.getenv('PROFILE_SLOW_PERCENTILE', '0.95'))
+PROFILE_MAX_OVERHEAD = float(os.getenv('PROFILE_MAX_OVERHEAD', '0.01'))
+
+MAX_STACK_DEPTH = 128
+NO_STAGE = 'other'
+# Сколько документов нужно, чтобы перцентиль имел смысл
+MIN_HISTORY = 20
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', value)[:120] or 'document'
+
+
+class _DocumentProfile:
+    __slots__ = ('name', 'started', 'stacks', 'stage_samples')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.stage_samples: Counter = Counter()
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик одного потока.
+
+    Args:
+        output_dir: Каталог для результатов (подкаталог на каждый запуск)
+        interval: Интервал сэмплирования, секунд
+        capture: 'all' - сохранять все документы, 'slow' - только медленные
+        slow_percentile: Перцентиль длительности документа для режима 'slow'
+        slow_seconds: Явный порог вместо перцентиля
+        max_overhead: Допустимая доля времени на сэмплирование
+        stage_prefix: Префикс имени функции, по которому определяется этап
+    """
+
+    def __init__(self, output_dir: str, interval: float = PROFILE_INTERVAL, capture: str = PROFILE_CAPTURE,
+                 slow_percentile: float = PROFILE_SLOW_PERCENTILE, slow_seconds: Optional[float] = None,
+                 max_overhead: float = PROFILE_MAX_OVERHEAD, stage_prefix: str = '_stage'):
+        if capture not in ('all', 'slow'):
+            raise ValueError(f"capture must be 'all' or 'slow', got {capture!r}")
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.capture = capture
+        self.slow_percentile = slow_percentile
+        self.slow_seconds = slow_seconds
+        self.max_overhead = max_overhead
+        self.stage_prefix = stage_prefix
+
+        self.run_id = time.strftime('%Y%m%d_%H%M%S')
+        self.run_dir = self.output_dir / self.run_id
+        self.run_stacks: Counter = Counter()
+        self.stage_samples: Counter = Counter()
+        self.documents: List[Dict] = []
+        self.durations: Deque[float] = deque(maxlen=500)
+
+        self._current: Optional[_DocumentProfile] = None
+        self._target_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # Счётчики сэмплов меняет поток сэмплирования, читает и сливает поток обучения
+        self._lock = threading.Lock()
+        self._labels: Dict[object, str] = {}
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.started_at: Optional[float] = None
+
+    # ------------------------------------------------------------ lifecycle
+
+    def start(self, thread_id: Optional[int] = None):
+        """Начать сэмплирование потока (по умолчанию - вызывающего)"""
+        if self._thread is not None:
+            return
+        self._target_thread = thread_id or threading.get_ident()
+        self._stop_event.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"[PROFILE] Sampling every {self.interval * 1000:.1f} ms, capture={self.capture}")
+
+    def stop(self) -> Optional[Path]:
+        """Остановить сэмплирование и записать результаты запуска"""
+        if self._thread is None:
+            return None
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        return self.write_run()
+
+    @property
+    def overhead(self) -> float:
+        """Доля времени потока сэмплирования относительно длительности запуска"""
+        if not self.started_at:
+            return 0.0
+        elapsed = time.perf_counter() - self.started_at
+        return self.sampling_time / elapsed if elapsed > 0 else 0.0
+
+    # ------------------------------------------------------------ sampling
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            started = time.perf_counter()
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                # Поток обучения завершился
+                return
+            self._record(frame)
+            del frame
+            cost = time.perf_counter() - started
+            self.sampling_time += cost
+            # Снятие глубокого стека дорого - реже сэмплируем, чтобы уложиться в бюджет
+            if cost > self.interval * self.max_overhead:
+                self.interval = min(self.interval * 2, 1.0)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _record(self, frame):
+        frames = []
+        stage = NO_STAGE
+        depth = 0
+        while frame is not None and depth < MAX_STACK_DEPTH:
+            code = frame.f_code
+            frames.append(self._label(code))
+            if code.co_name.startswith(self.stage_prefix):
+                # Самый внешний этап: вложенные вызовы этапов относятся к нему
+                stage = code.co_name
+            frame = frame.f_back
+            depth += 1
+        frames.reverse()
+        stack = ';'.join(frames)
+        self.samples += 1
+
+        with self._lock:
+            document = self._current
+            if document is not None:
+                document.stacks[(stage, stack)] += 1
+                document.stage_samples[stage] += 1
+            elif self.capture == 'all':
+                self.run_stacks[(stage, stack)] += 1
+                self.stage_samples[stage] += 1
+
+    # ------------------------------------------------------------ documents
+
+    def slow_threshold(self) -> Optional[float]:
+        """Текущий порог медленного документа, секунд (None - ещё мало истории)"""
+        if self.slow_seconds is not None:
+            return self.slow_seconds
+        if len(self.durations) < MIN_HISTORY:
+            return None
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, int(len(ordered) * self.slow_percentile))
+        return ordered[index]
+
+    @contextmanager
+    def document(self, name: str):
+        """Пометить сэмплы внутри блока документом ``name``"""
+        profile = _DocumentProfile(str(name))
+        with self._lock:
+            self._current = profile
+        try:
+            yield profile
+        finally:
+            # После снятия под блокировкой сэмплер профиль документа больше не трогает
+            with self._lock:
+                self._current = None
+            self._finish_document(profile, time.perf_counter() - profile.started)
+
+    def _finish_document(self, profile: _DocumentProfile, duration: float):
+        threshold = self.slow_threshold()
+        self.durations.append(duration)
+        slow = threshold is not None and duration >= threshold
+        if self.capture == 'slow' and not slow:
+            return
+
+        with self._lock:
+            self.run_stacks.update(profile.stacks)
+            self.stage_samples.update(profile.stage_samples)
+        entry = {
+            'document': profile.name,
+            'duration_s': round(duration, 3),
+            'samples': sum(profile.stacks.values()),
+            'slow': slow,
+            'threshold_s': round(threshold, 3) if threshold is not None else None,
+            'stages': dict(profile.stage_samples.most_common()),
+        }
+        if slow and profile.stacks:
+            path = self.run_dir / 'docs' / f"{len(self.documents):04d}_{_safe_name(Path(profile.name).name)}.collapsed"
+            self._write_collapsed(path, profile.stacks)
+            entry['collapsed'] = str(path)
+            logger.info(f"[PROFILE] Slow document {Path(profile.name).name}: {duration:.2f}s "
+                        f"(threshold {threshold:.2f}s) -> {path}")
+        self.documents.append(entry)
+
+    # ------------------------------------------------------------ output
+
+    @staticmethod
+    def _write_collapsed(path: Path, stacks: Counter):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for (stage, stack), count in sorted(stacks.items()):
+                f.write(f"{stage};{stack} {count}\n")
+
+    def _snapshot(self):
+        """Копии счётчиков запуска: сэмплер может дописывать их во время записи"""
+        with self._lock:
+            return Counter(self.run_stacks), Counter(self.stage_samples)
+
+    def hot_functions(self, top: int = 15) -> Dict[str, List[Dict]]:
+        """Функции с наибольшим собственным временем (лист стека) по этапам"""
+        run_stacks, stage_samples = self._snapshot()
+        per_stage: Dict[str, Counter] = {}
+        for (stage, stack), count in run_stacks.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            per_stage.setdefault(stage, Counter())[leaf] += count
+        return {
+            stage: [{'function': name, 'samples': count,
+                     'share': round(count / max(stage_samples[stage], 1), 3)}
+                    for name, count in leaves.most_common(top)]
+            for stage, leaves in per_stage.items()
+        }
+
+    def summary(self) -> Dict:
+        run_stacks, stage_samples = self._snapshot()
+        return {
+            'run_id': self.run_id,
+            'capture': self.capture,
+            'interval_s': self.interval,
+            'samples': self.samples,
+            'kept_samples': sum(run_stacks.values()),
+            'overhead': round(self.overhead, 4),
+            'slow_threshold_s': self.slow_threshold(),
+            'stages': dict(stage_samples.most_common()),
+            'hot_functions': self.hot_functions(),
+            'documents': self.documents,
+        }
+
+    def write_run(self) -> Path:
+        """Записать run.collapsed и summary.json; возвращает каталог запуска"""
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._write_collapsed(self.run_dir / 'run.collapsed', self._snapshot()[0])
+        with open(self.run_dir / 'summary.json', 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        logger.info(f"[PROFILE] {self.samples} samples, overhead {self.overhead * 100:.2f}% -> {self.run_dir}")
+        return self.run_dir
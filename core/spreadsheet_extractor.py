@@ -0,0 +1,264 @@
+"""
+Извлечение текста из Excel-книг для обучения (Stage 3).
+
+Все листы читаются потоково через openpyxl в режиме read_only (объединенные
+ячейки заполняются так же, как в StreamingEstimateParser). Лист делится на
+табличные области пустыми строками; в каждой области ищется строка
+заголовка (роли колонок сметы или строка из текстовых ячеек), строка
+нумерации колонок "1 | 2 | 3" пропускается. Строки таблицы выдаются группами
+по ``rows_per_group`` с повтором заголовка в каждой группе::
+
+    extractor = SpreadsheetExtractor()
+    for group in extractor.iter_row_groups("smeta.xlsx"):
+        group.sheet, group.header, group.first_row, group.text
+    text = extractor.extract_text("smeta.xlsx")
+
+В памяти держится только текущая группа строк и начало текущей области,
+поэтому лист в сотни тысяч строк не загружается целиком.
+"""
+
+import datetime
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional, Tuple
+
+from core.streaming_estimate_parser import HAS_OPENPYXL, StreamingEstimateParser, load_workbook
+
+logger = logging.getLogger(__name__)
+
+ROWS_PER_GROUP = int(os.getenv('EXCEL_ROWS_PER_GROUP', 40))
+# Предел текста с одной книги (символов); 0 - без ограничения
+MAX_CHARS = int(os.getenv('EXCEL_MAX_CHARS', 20_000_000))
+HEADER_SCAN_ROWS = 12
+
+
+def format_cell(value: Any) -> str:
+    """Значение ячейки как текст: 12.0 -> '12', даты в ISO, переносы строк убраны"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'да' if value else 'нет'
+    if isinstance(value, float):
+        return f'{value:.6f}'.rstrip('0').rstrip('.') if value == value else ''
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.date().isoformat() if isinstance(value, datetime.datetime) and not (
+            value.hour or value.minute or value.second) else value.isoformat()
+    return ' '.join(str(value).split())
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text.replace(' ', '').replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class RowGroup:
+    """Группа строк одной таблицы листа"""
+    sheet: str
+    table: int
+    header: List[str]
+    rows: List[List[str]] = field(default_factory=list)
+    first_row: int = 0
+    last_row: int = 0
+    preamble: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        lines = [f"Лист «{self.sheet}», таблица {self.table}, строки {self.first_row}-{self.last_row}"]
+        lines.extend(self.preamble)
+        if self.header:
+            lines.append('| ' + ' | '.join(self.header) + ' |')
+            lines.extend('| ' + ' | '.join(row) + ' |' for row in self.rows)
+        else:
+            # Без заголовка объединенная строка дала бы одно значение по числу колонок
+            lines.extend(' '.join(dict.fromkeys(cell for cell in row if cell)) for row in self.rows)
+        return '\n'.join(lines)
+
+
+@dataclass
+class ExtractionStats:
+    sheets: int = 0
+    tables: int = 0
+    rows: int = 0
+    groups: int = 0
+    chars: int = 0
+    truncated: bool = False
+
+
+class SpreadsheetExtractor:
+    """
+    Потоковое извлечение таблиц из всех листов книги.
+
+    Args:
+        rows_per_group: Строк таблицы в одной группе (заголовок повторяется в каждой)
+        header_scan_rows: Сколько первых строк области просматривать в поиске заголовка
+        max_chars: Предел текста с книги, 0 - без ограничения
+    """
+
+    def __init__(self, rows_per_group: int = ROWS_PER_GROUP, header_scan_rows: int = HEADER_SCAN_ROWS,
+                 max_chars: int = MAX_CHARS):
+        self.rows_per_group = max(1, rows_per_group)
+        self.header_scan_rows = header_scan_rows
+        self.max_chars = max_chars
+        self.stats = ExtractionStats()
+        self._estimate_parser = StreamingEstimateParser()
+
+    # ------------------------------------------------------------------
+    # Публичный API
+    # ------------------------------------------------------------------
+
+    def extract_text(self, file_path: str) -> str:
+        """Текст всех листов: группы строк через пустую строку"""
+        parts = []
+        for group in self.iter_row_groups(file_path):
+            parts.append(group.text)
+        if self.stats.truncated:
+            logger.warning(f"[EXCEL] {file_path}: text limit {self.max_chars} chars reached, rest of the workbook skipped")
+        return '\n\n'.join(parts)
+
+    def iter_row_groups(self, file_path: str) -> Iterator[RowGroup]:
+        """Группы строк всех таблиц всех листов в порядке книги"""
+        if not HAS_OPENPYXL:
+            raise ImportError("openpyxl не установлен")
+        self.stats = ExtractionStats()
+        merged_by_sheet = self._estimate_parser.read_merged_ranges(file_path)
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                if getattr(worksheet, 'sheet_state', 'visible') != 'visible':
+                    continue
+                self.stats.sheets += 1
+                rows = self._estimate_parser.iter_rows(worksheet, merged_by_sheet.get(worksheet.title, []))
+                for group in self._sheet_groups(worksheet.title, rows):
+                    text_length = len(group.text)
+                    if self.max_chars and self.stats.chars + text_length > self.max_chars:
+                        self.stats.truncated = True
+                        return
+                    self.stats.chars += text_length
+                    self.stats.groups += 1
+                    yield group
+        finally:
+            workbook.close()
+
+    # ------------------------------------------------------------------
+    # Области и заголовки
+    # ------------------------------------------------------------------
+
+    def _regions(self, rows: Iterator[Tuple[int, tuple]]) -> Iterator[Iterator[Tuple[int, List[str]]]]:
+        """Потоки непустых строк, разделенные пустыми строками"""
+
+        def region(first):
+            yield first
+            for row_number, values in rows:
+                cells = [format_cell(v) for v in values]
+                if not any(cells):
+                    return
+                yield row_number, cells
+
+        for row_number, values in rows:
+            cells = [format_cell(v) for v in values]
+            if any(cells):
+                stream = region((row_number, cells))
+                yield stream
+                # Область, которую не дочитали, дочитывается здесь
+                for _ in stream:
+                    pass
+
+    def detect_header(self, rows: List[List[str]]) -> Optional[int]:
+        """
+        Индекс строки заголовка среди первых строк области или None.
+
+        Сначала роли колонок сметы (шифр, наименование, ед. изм. ...), затем
+        первая строка, где не меньше двух ячеек и все заполненные - текст,
+        а следующая строка тоже заполнена.
+        """
+        index, roles = self._estimate_parser.detect_header([tuple(row) for row in rows])
+        if index is not None:
+            return index
+        for i, row in enumerate(rows[:-1]):
+            filled = [cell for cell in row if cell]
+            # Объединенная строка-название размножена по колонкам: нужны разные значения
+            if len(set(filled)) >= 2 and not any(_is_number(cell) for cell in filled) \
+                    and sum(1 for cell in rows[i + 1] if cell) >= 2:
+                return i
+        return None
+
+    @staticmethod
+    def _is_numbering_row(row: List[str]) -> bool:
+        """Строка нумерации колонок под заголовком: 1 | 2 | 3 | ..."""
+        filled = [cell for cell in row if cell]
+        return len(filled) >= 2 and all(cell.isdigit() for cell in filled) and \
+            [int(cell) for cell in filled] == list(range(int(filled[0]), int(filled[0]) + len(filled)))
+
+    def _sheet_groups(self, sheet: str, rows: Iterator[Tuple[int, tuple]]) -> Iterator[RowGroup]:
+        table = 0
+        header: List[str] = []
+        for region in self._regions(rows):
+            head: List[Tuple[int, List[str]]] = []
+            for item in region:
+                head.append(item)
+                if len(head) >= self.header_scan_rows:
+                    break
+            header_index = self.detect_header([cells for _, cells in head]) if len(head) > 1 else None
+
+            preamble: List[str] = []
+            body_start = 0
+            if header_index is not None:
+                for _, cells in head[:header_index]:
+                    # dict.fromkeys убирает повторы значения, размноженного по объединенной строке
+                    line = ' '.join(dict.fromkeys(cell for cell in cells if cell))
+                    if line:
+                        preamble.append(line)
+                width = max(self._width(cells) for _, cells in head[header_index:])
+                header = self._header_names(head[header_index][1], width)
+                body_start = header_index + 1
+                if body_start < len(head) and self._is_numbering_row(head[body_start][1]):
+                    body_start += 1
+                table += 1
+                self.stats.tables += 1
+            elif not (header and all(not any(cells[len(header):]) for _, cells in head)):
+                # Не продолжение предыдущей таблицы (шире её заголовка) - просто текст листа
+                header = []
+                table += 1
+
+            group = RowGroup(sheet, table, header, preamble=preamble)
+            for row_number, cells in self._chain(head[body_start:], region):
+                if header:
+                    cells = (cells + [''] * len(header))[:len(header)]
+                if not group.rows:
+                    group.first_row = row_number
+                group.rows.append(cells)
+                group.last_row = row_number
+                self.stats.rows += 1
+                if len(group.rows) >= self.rows_per_group:
+                    yield group
+                    group = RowGroup(sheet, table, header)
+            if group.rows or group.preamble:
+                if not group.rows:
+                    group.first_row = group.last_row = head[0][0]
+                yield group
+
+    @staticmethod
+    def _chain(head: List[Tuple[int, List[str]]], rest: Iterator[Tuple[int, List[str]]]):
+        yield from head
+        yield from rest
+
+    @staticmethod
+    def _width(cells: List[str]) -> int:
+        """Число колонок до последней заполненной ячейки"""
+        return max((i + 1 for i, cell in enumerate(cells) if cell), default=0)
+
+    @staticmethod
+    def _header_names(cells: List[str], width: int) -> List[str]:
+        """Заголовок по ширине таблицы, пустые названия - по номеру колонки"""
+        cells = (cells + [''] * width)[:width]
+        return [cell or f"Колонка {i + 1}" for i, cell in enumerate(cells)]
+
+
+def extract_spreadsheet_text(file_path: str, **kwargs) -> str:
+    """Текст всех листов книги с повтором заголовков таблиц (см. SpreadsheetExtractor)"""
+    return SpreadsheetExtractor(**kwargs).extract_text(file_path)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+STARTUP REGISTRY FOR Bldr API
+=============================
+
+Ленивая инициализация тяжёлых компонентов и быстрый холодный старт.
+
+Тяжёлые компоненты (ModelManager, тренер, система инструментов) регистрируются
+как ленивые синглтоны: фабрика вызывается при первом ``get()`` или фоновым
+прогревом после старта сервера, а не при импорте модуля. У каждого компонента
+есть явное состояние готовности и время инициализации; всё это отдаётся
+эндпоинтом ``/health/startup``.
+
+``timed_import`` замеряет импорт модулей и пишет предупреждение, если импорт
+дольше ``STARTUP_IMPORT_BUDGET`` секунд.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', '0.5'))  # секунд на модуль
+WARMUP_WORKERS = int(os.getenv('STARTUP_WARMUP_WORKERS', '2'))
+
+# Время старта процесса: модуль импортируется одним из первых
+PROCESS_STARTED = time.time()
+
+
+class ComponentState(Enum):
+    """Состояние готовности компонента"""
+    PENDING = "pending"
+    INITIALIZING = "initializing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ComponentUnavailable(RuntimeError):
+    """Компонент не удалось инициализировать"""
+
+    def __init__(self, name: str, error: Optional[str]):
+        super().__init__(f"Component '{name}' is unavailable: {error}")
+        self.name = name
+        self.error = error
+
+
+class LazyComponent:
+    """
+    Ленивый синглтон с состоянием готовности.
+
+    Args:
+        name: Имя компонента в /health/startup
+        factory: Функция без аргументов, создающая компонент
+        warmup: Инициализировать ли в фоне после старта сервера
+        retry_after: Через сколько секунд после ошибки можно пробовать снова
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], warmup: bool = False, retry_after: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.warmup = warmup
+        self.retry_after = retry_after
+        self.state = ComponentState.PENDING
+        self.error: Optional[str] = None
+        self.init_seconds: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._failed_at = 0.0
+        self._instance: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Вернуть экземпляр, при необходимости создав его (потокобезопасно)"""
+        if self.state is ComponentState.READY:
+            return self._instance
+        with self._lock:
+            if self.state is ComponentState.READY:
+                return self._instance
+            if self.state is ComponentState.FAILED and time.time() - self._failed_at < self.retry_after:
+                raise ComponentUnavailable(self.name, self.error)
+
+            self.state = ComponentState.INITIALIZING
+            started = time.perf_counter()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                self.init_seconds = time.perf_counter() - started
+                self.state = ComponentState.FAILED
+                self.error = f"{type(e).__name__}: {e}"
+                self._failed_at = time.time()
+                logger.warning(f"[STARTUP] {self.name} failed after {self.init_seconds:.2f}s: {self.error}")
+                raise ComponentUnavailable(self.name, self.error) from e
+
+            self._instance = instance
+            self.init_seconds = time.perf_counter() - started
+            self.ready_at = time.time()
+            self.error = None
+            self.state = ComponentState.READY
+            logger.info(f"[STARTUP] {self.name} ready in {self.init_seconds:.2f}s")
+            return instance
+
+    def get_or_none(self) -> Any:
+        try:
+            return self.get()
+        except ComponentUnavailable:
+            return None
+
+    @property
+    def ready(self) -> bool:
+        return self.state is ComponentState.READY
+
+    def reset(self):
+        """Забыть экземпляр (следующий get() создаст его заново)"""
+        with self._lock:
+            self._instance = None
+            self.state = ComponentState.PENDING
+            self.error = None
+            self.init_seconds = None
+            self.ready_at = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "warmup": self.warmup,
+            "init_seconds": round(self.init_seconds, 3) if self.init_seconds is not None else None,
+            "ready_after_start_seconds": round(self.ready_at - PROCESS_STARTED, 3) if self.ready_at else None,
+            "error": self.error,
+        }
+
+
+class StartupRegistry:
+    """Реестр ленивых компонентов, фоновый прогрев и замер импортов"""
+
+    def __init__(self, import_budget: float = IMPORT_BUDGET):
+        self.import_budget = import_budget
+        self.components: Dict[str, LazyComponent] = {}
+        self.imports: List[Dict[str, Any]] = []
+        self.server_ready_at: Optional[float] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._warmup_futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], warmup: bool = False,
+                 retry_after: float = 30.0) -> LazyComponent:
+        """Зарегистрировать компонент; повторная регистрация возвращает существующий"""
+        with self._lock:
+            component = self.components.get(name)
+            if component is None:
+                component = self.components[name] = LazyComponent(name, factory, warmup, retry_after)
+            return component
+
+    def get(self, name: str) -> Any:
+        return self.components[name].get()
+
+    def get_or_none(self, name: str) -> Any:
+        component = self.components.get(name)
+        return component.get_or_none() if component else None
+
+    # ------------------------------------------------------------ imports
+
+    @contextmanager
+    def import_timer(self, name: str):
+        """Замерить блок импорта; медленный импорт попадает в лог и /health/startup"""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            slow = elapsed > self.import_budget
+            self.imports.append({"module": name, "seconds": round(elapsed, 3), "slow": slow, "error": error})
+            if slow:
+                logger.warning(f"[STARTUP] Slow import {name}: {elapsed:.2f}s (budget {self.import_budget:.2f}s)")
+
+    def timed_import(self, module: str):
+        """importlib.import_module с замером времени"""
+        with self.import_timer(module):
+            return importlib.import_module(module)
+
+    # ------------------------------------------------------------ warm-up
+
+    def start_warmup(self) -> List[str]:
+        """
+        Запустить фоновую инициализацию компонентов с warmup=True.
+
+        Прогрев идёт в отдельных потоках: event loop сервера сразу отвечает
+        на запросы, а компоненты становятся READY по мере готовности.
+        """
+        self.server_ready_at = self.server_ready_at or time.time()
+        pending = [c for c in self.components.values() if c.warmup and c.state is ComponentState.PENDING]
+        if not pending:
+            return []
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix='startup-warmup')
+        for component in pending:
+            self._warmup_futures.append(self._executor.submit(component.get_or_none))
+        return [c.name for c in pending]
+
+    def shutdown(self):
+        if self._executor is not None:
+            # shutdown(cancel_futures=True) есть только с Python 3.9 - ждущие прогрева отменяем сами
+            for future in self._warmup_futures:
+                future.cancel()
+            self._warmup_futures = []
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def status(self) -> Dict[str, Any]:
+        components = {name: c.status() for name, c in self.components.items()}
+        warmup = [c for c in self.components.values() if c.warmup]
+        return {
+            "uptime_seconds": round(time.time() - PROCESS_STARTED, 3),
+            "server_ready_after_seconds": round(self.server_ready_at - PROCESS_STARTED, 3)
+            if self.server_ready_at else None,
+            "warmup_complete": all(c.state in (ComponentState.READY, ComponentState.FAILED) for c in warmup),
+            "components": components,
+            "import_budget_seconds": self.import_budget,
+            "imports_seconds_total": round(sum(i["seconds"] for i in self.imports), 3),
+            "slow_imports": [i for i in self.imports if i["slow"]],
+            "failed_imports": [i for i in self.imports if i["error"]],
+        }
+
+
+# Глобальный реестр процесса
+startup = StartupRegistry()
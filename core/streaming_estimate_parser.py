@@ -0,0 +1,415 @@
+"""
+Потоковый парсер Excel-смет.
+
+Читает книгу через openpyxl в режиме read_only (без загрузки всей книги в
+память и без временной копии для разъединения ячеек), определяет строку
+заголовка и роли колонок один раз на лист, а классификацию строк (шифры
+ГЭСН/ФЕР/ТЕР, количества, единицы, цены) выполняет векторно через строковые
+операции pandas.
+"""
+
+import re
+import uuid
+import zipfile
+import logging
+import posixpath
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+import numpy as np
+import pandas as pd
+
+try:
+    from openpyxl import load_workbook
+    from openpyxl.utils.cell import column_index_from_string
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+    load_workbook = None
+    column_index_from_string = None
+
+logger = logging.getLogger(__name__)
+
+# Роли колонок в порядке приоритета: более специфичные паттерны проверяются раньше
+# ('стоимость всего' должна попасть в total, а не в price).
+COLUMN_ROLE_PATTERNS: List[Tuple[str, List[str]]] = [
+    ('code', ['шифр', 'код', 'обоснование', 'норматив']),
+    ('description', ['наименование', 'описание', 'название', 'работы и затраты']),
+    ('unit', ['ед.изм', 'ед. изм', 'единица', 'измерени']),
+    ('quantity', ['кол-во', 'количество', 'объем', 'объём', 'к-во']),
+    ('total', ['сумма', 'итого', 'всего', 'общая стоимость', 'стоимость всего']),
+    ('price', ['цена', 'стоимость', 'руб']),
+]
+
+UNIT_MAPPINGS = {
+    'м3': 'м³', 'куб.м': 'м³', 'м³': 'м³', '100 м3': 'м³', 'м3 грунта': 'м³',
+    'м2': 'м²', 'кв.м': 'м²', 'м²': 'м²', '100 м2': 'м²',
+    'м': 'м', 'п.м': 'м', 'м.п': 'м',
+    'кг': 'кг', 'т': 'т', 'тонн': 'т',
+    'шт': 'шт', 'комплект': 'комплект',
+    'ч': 'ч', 'час': 'ч', 'чел.час': 'ч',
+}
+
+# Шифр расценки: необязательный префикс сборника + номер вида 08-01-001-01 / 8-1-1.2
+CODE_PATTERN = (
+    r'(?P<code_prefix>ГЭСН[рмп]?|ФЕР[рмп]?|ТЕР[рмп]?|ФССЦ|ТССЦ|ФСБЦ|ФСЭМ|ТСЭМ)?'
+    r'[\s\-]*(?P<code_number>\d+(?:-\d+){2,}(?:\.\d+)*)'
+)
+WORK_CODE_RE = re.compile(r'^(?:ГЭСН|ФЕР|ТЕР|ФСЭМ|ТСЭМ)', re.IGNORECASE)
+MATERIAL_CODE_RE = re.compile(r'^(?:ФССЦ|ТССЦ|ФСБЦ|МАТ|РЕСУРС)', re.IGNORECASE)
+WORK_KEYWORDS_RE = r'работ|устройств|монтаж|установк|сборк|демонтаж'
+MATERIAL_KEYWORDS_RE = r'материал|бетон|цемент|арматур|кирпич|металл'
+SUMMARY_ROW_RE = r'^(?:итого|всего)\b'
+
+MERGE_CELL_RE = re.compile(rb'<mergeCell ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"')
+_NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class StreamingEstimateParser:
+    """Потоковый парсер Excel-смет с векторной классификацией строк"""
+
+    def __init__(self, header_scan_rows: int = 40, chunk_rows: int = 20000):
+        """
+        Args:
+            header_scan_rows: Сколько первых строк листа просматривать в поиске заголовка
+            chunk_rows: Размер блока строк, классифицируемого за один проход pandas
+        """
+        self.header_scan_rows = header_scan_rows
+        self.chunk_rows = chunk_rows
+
+    # ------------------------------------------------------------------
+    # Публичный API
+    # ------------------------------------------------------------------
+
+    def parse_workbook(self, file_path: str, sheet_names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Парсинг всех (или выбранных) листов книги.
+
+        Returns:
+            Словарь с позициями всех листов, итогами и сводкой по листам
+        """
+        if not HAS_OPENPYXL:
+            raise ImportError("openpyxl не установлен")
+
+        merged_by_sheet = self.read_merged_ranges(file_path)
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for worksheet in workbook.worksheets:
+                if sheet_names and worksheet.title not in sheet_names:
+                    continue
+                sheets.append(self._parse_sheet(worksheet, merged_by_sheet.get(worksheet.title, [])))
+        finally:
+            workbook.close()
+
+        positions: List[Dict[str, Any]] = []
+        for sheet in sheets:
+            positions.extend(sheet.pop('positions'))
+
+        return {
+            'positions': positions,
+            'positions_count': len(positions),
+            'total_cost': float(sum(p['total_cost'] for p in positions)),
+            'sheets': sheets,
+            'merged_ranges_count': sum(len(r) for r in merged_by_sheet.values()),
+        }
+
+    def parse_sheet_frame(self, frame: pd.DataFrame, roles: Dict[str, int]) -> pd.DataFrame:
+        """
+        Векторная классификация блока строк.
+
+        Args:
+            frame: Строки листа (колонки - позиционные индексы 0..N-1)
+            roles: Роль колонки -> позиционный индекс
+
+        Returns:
+            DataFrame позиций с нормализованными полями
+        """
+        result = pd.DataFrame(index=frame.index)
+
+        code = self._text_column(frame, roles.get('code'))
+        description = self._text_column(frame, roles.get('description'))
+        unit = self._text_column(frame, roles.get('unit'))
+
+        extracted = code.str.extract(CODE_PATTERN, expand=True)
+        result['code'] = code
+        result['code_prefix'] = extracted['code_prefix'].fillna('').astype(object)
+        result['code_number'] = extracted['code_number'].fillna('').astype(object)
+        result['description'] = description
+        result['unit'] = unit.str.lower().map(UNIT_MAPPINGS).fillna(unit).astype(object)
+
+        quantity = self._numeric_column(frame, roles.get('quantity'))
+        price = self._numeric_column(frame, roles.get('price'))
+        total = self._numeric_column(frame, roles.get('total'))
+        # Пустая или нулевая сумма восстанавливается как количество * цена
+        computed = quantity * price
+        total = total.where(total != 0, computed)
+
+        result['quantity'] = quantity
+        result['price'] = price
+        result['total_cost'] = total
+        result['type'] = self._classify_types(result['code'], description)
+
+        has_code = code.ne('')
+        has_description = description.ne('')
+        is_summary = code.str.contains(SUMMARY_ROW_RE, case=False, regex=True) | (
+            ~has_code & description.str.contains(SUMMARY_ROW_RE, case=False, regex=True)
+        )
+        result['is_summary'] = is_summary
+        return result[(has_code | has_description)]
+
+    # ------------------------------------------------------------------
+    # Листы и строки
+    # ------------------------------------------------------------------
+
+    def _parse_sheet(self, worksheet, merged_ranges: List[Tuple[int, int, int, int]]) -> Dict[str, Any]:
+        """Разбор одного листа: заголовок один раз, затем классификация блоками"""
+        rows = self.iter_rows(worksheet, merged_ranges)
+
+        head: List[Tuple[int, tuple]] = []
+        for row_number, values in rows:
+            head.append((row_number, values))
+            if len(head) >= self.header_scan_rows:
+                break
+
+        header_index, roles = self.detect_header([values for _, values in head])
+        summary = {
+            'sheet': worksheet.title,
+            'header_row': head[header_index][0] if header_index is not None else None,
+            'columns': roles,
+            'preamble': [],
+            'sample_text': ' '.join(
+                str(v) for _, values in head for v in values if v is not None
+            )[:5000],
+            'rows_processed': 0,
+            'positions': [],
+        }
+        if header_index is None:
+            logger.debug(f"Лист '{worksheet.title}': строка заголовка не найдена")
+            # Поток строк всё равно нужно дочитать, чтобы не держать парсер листа открытым
+            for _ in rows:
+                pass
+            return summary
+
+        for _, values in head[:header_index]:
+            # dict.fromkeys убирает повторы значения, размноженного по объединенной строке
+            cells = dict.fromkeys(str(v).strip() for v in values if v is not None and str(v).strip())
+            if cells:
+                summary['preamble'].append(' '.join(cells))
+
+        width = max(roles.values()) + 1
+        buffer: List[tuple] = []
+        row_numbers: List[int] = []
+
+        def flush():
+            if not buffer:
+                return
+            frame = pd.DataFrame(buffer, columns=list(range(width)), index=row_numbers)
+            parsed = self.parse_sheet_frame(frame, roles)
+            parsed = parsed[~parsed['is_summary']].drop(columns=['is_summary'])
+            parsed.insert(0, 'row_number', parsed.index.astype(int))
+            parsed.insert(1, 'sheet', worksheet.title)
+            summary['positions'].extend(parsed.to_dict('records'))
+            summary['rows_processed'] += len(buffer)
+            buffer.clear()
+            row_numbers.clear()
+
+        def take(row_number: int, values: tuple):
+            if len(values) < width:
+                values = values + (None,) * (width - len(values))
+            buffer.append(values[:width])
+            row_numbers.append(row_number)
+            if len(buffer) >= self.chunk_rows:
+                flush()
+
+        for row_number, values in head[header_index + 1:]:
+            take(row_number, values)
+        for row_number, values in rows:
+            take(row_number, values)
+        flush()
+
+        for position in summary['positions']:
+            position['id'] = str(uuid.uuid4())
+        return summary
+
+    @staticmethod
+    def iter_rows(worksheet, merged_ranges: List[Tuple[int, int, int, int]]) -> Iterator[Tuple[int, tuple]]:
+        """
+        Построчный обход листа с заполнением объединенных ячеек значением
+        левой верхней ячейки диапазона.
+        """
+        try:
+            # Размеры листа в файле часто неверны; без них строки возвращаются как есть
+            worksheet.reset_dimensions()
+        except AttributeError:
+            pass
+
+        starts: Dict[int, List[Tuple[int, int, int, int]]] = {}
+        for bounds in merged_ranges:
+            starts.setdefault(bounds[0], []).append(bounds)
+        active: List[Tuple[int, int, int, Any]] = []  # (max_row, min_col, max_col, value)
+
+        for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            values = tuple(values)
+            if active:
+                active = [item for item in active if item[0] >= row_number]
+            if row_number in starts:
+                for min_row, min_col, max_row, max_col in starts[row_number]:
+                    value = values[min_col - 1] if len(values) >= min_col else None
+                    if value is not None:
+                        active.append((max_row, min_col, max_col, value))
+            if active:
+                row = list(values)
+                for _, min_col, max_col, value in active:
+                    if len(row) < max_col:
+                        row.extend([None] * (max_col - len(row)))
+                    for col in range(min_col - 1, max_col):
+                        if row[col] is None:
+                            row[col] = value
+                values = tuple(row)
+            yield row_number, values
+
+    def detect_header(self, rows: List[tuple]) -> Tuple[Optional[int], Dict[str, int]]:
+        """
+        Поиск строки заголовка среди первых строк листа.
+
+        Returns:
+            (индекс строки в rows, роль -> индекс колонки) или (None, {})
+        """
+        best_index, best_roles = None, {}
+        for index, values in enumerate(rows):
+            roles = self._match_roles(values)
+            if 'code' not in roles and 'description' not in roles:
+                continue
+            if len(roles) >= 2 and len(roles) > len(best_roles):
+                best_index, best_roles = index, roles
+        return best_index, best_roles
+
+    @staticmethod
+    def _match_roles(values: tuple) -> Dict[str, int]:
+        roles: Dict[str, int] = {}
+        for col, value in enumerate(values):
+            if not isinstance(value, str):
+                continue
+            text = value.lower().replace('\n', ' ')
+            if len(text) > 80:
+                continue
+            for role, patterns in COLUMN_ROLE_PATTERNS:
+                if role in roles:
+                    continue
+                if any(p in text for p in patterns):
+                    roles[role] = col
+                    break
+        return roles
+
+    # ------------------------------------------------------------------
+    # Векторные помощники
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _text_column(frame: pd.DataFrame, col: Optional[int]) -> pd.Series:
+        if col is None:
+            return pd.Series('', index=frame.index, dtype=object)
+        series = frame[col]
+        text = series.where(series.notna(), '').astype(str).str.strip()
+        return text.where(~text.isin(['nan', 'None']), '').astype(object)
+
+    @staticmethod
+    def _numeric_column(frame: pd.DataFrame, col: Optional[int]) -> pd.Series:
+        if col is None:
+            return pd.Series(0.0, index=frame.index)
+        series = frame[col]
+        numeric = pd.to_numeric(series, errors='coerce')
+        # Числа, записанные текстом: '1 234,56'
+        as_text = series.map(lambda v: isinstance(v, str))
+        if as_text.any():
+            cleaned = (
+                series[as_text].astype(str)
+                .str.replace(r'[\s ]', '', regex=True)
+                .str.replace(',', '.', regex=False)
+            )
+            numeric.loc[as_text] = pd.to_numeric(cleaned, errors='coerce')
+        return numeric.astype(float).fillna(0.0)
+
+    @staticmethod
+    def _classify_types(code: pd.Series, description: pd.Series) -> pd.Series:
+        upper_code = code.str.upper()
+        conditions = [
+            upper_code.str.contains(WORK_CODE_RE, regex=True),
+            upper_code.str.contains(MATERIAL_CODE_RE, regex=True),
+            description.str.contains(WORK_KEYWORDS_RE, case=False, regex=True),
+            description.str.contains(MATERIAL_KEYWORDS_RE, case=False, regex=True),
+        ]
+        choices = ['work', 'material', 'work', 'material']
+        return pd.Series(np.select(conditions, choices, default='unknown'), index=code.index, dtype=object)
+
+    # ------------------------------------------------------------------
+    # Объединенные ячейки без загрузки книги
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def read_merged_ranges(file_path: str) -> Dict[str, List[Tuple[int, int, int, int]]]:
+        """
+        Чтение диапазонов <mergeCell> прямо из XML листов.
+
+        ReadOnlyWorksheet не предоставляет merged_cells, поэтому XML листа
+        сканируется потоково, без построения дерева.
+
+        Returns:
+            Имя листа -> список (min_row, min_col, max_row, max_col)
+        """
+        result: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                workbook_xml = ET.fromstring(archive.read('xl/workbook.xml'))
+                rels_xml = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+                targets = {rel.get('Id'): rel.get('Target') for rel in rels_xml.iter(f'{_NS_PKG_REL}Relationship')}
+
+                for sheet in workbook_xml.iter(f'{_NS_MAIN}sheet'):
+                    target = targets.get(sheet.get(f'{_NS_REL}id'))
+                    if not target:
+                        continue
+                    path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+                    ranges = []
+                    tail = b''
+                    with archive.open(path) as stream:
+                        while True:
+                            block = stream.read(1 << 20)
+                            if not block:
+                                break
+                            data = tail + block
+                            # Хвост блока может содержать незавершенный тег
+                            cut = data.rfind(b'<')
+                            complete, tail = (data[:cut], data[cut:]) if cut > 0 else (data, b'')
+                            for c1, r1, c2, r2 in MERGE_CELL_RE.findall(complete):
+                                ranges.append((
+                                    int(r1), column_index_from_string(c1.decode()),
+                                    int(r2), column_index_from_string(c2.decode()),
+                                ))
+                        for c1, r1, c2, r2 in MERGE_CELL_RE.findall(tail):
+                            ranges.append((
+                                int(r1), column_index_from_string(c1.decode()),
+                                int(r2), column_index_from_string(c2.decode()),
+                            ))
+                    if ranges:
+                        result[sheet.get('name')] = ranges
+        except (KeyError, zipfile.BadZipFile, ET.ParseError) as e:
+            logger.debug(f"Не удалось прочитать объединенные ячейки из {file_path}: {e}")
+        return result
+
+
+def parse_estimate_streaming(file_path: str, **kwargs) -> Dict[str, Any]:
+    """
+    Потоковый парсинг Excel-сметы
+
+    Args:
+        file_path: Путь к .xlsx файлу
+        **kwargs: Параметры StreamingEstimateParser и sheet_names
+
+    Returns:
+        Словарь с позициями, итогами и сводкой по листам
+    """
+    sheet_names = kwargs.pop('sheet_names', None)
+    return StreamingEstimateParser(**kwargs).parse_workbook(file_path, sheet_names=sheet_names)
@@ -0,0 +1,355 @@
+"""
+Token-aware structural chunker (Stage 13).
+
+Chunk length is measured with the tokenizer of the loaded encoder, so chunks
+fit the SBERT window (512 tokens for rubert) instead of being silently
+truncated at embed time. The text is split in one pass with precompiled
+patterns into structural units:
+
+* numbered clauses (``8.3.4 ...``) with their continuation lines and list
+  items - a clause is never split unless it alone exceeds the budget;
+* paragraphs (blank-line separated), list items attach to the paragraph
+  they follow, so short items do not become chunks of their own;
+* table rows (``|`` or tab separated); a table continued in the next chunk
+  repeats its header row;
+* headings start a new section.
+
+Units are tokenized once and packed greedily up to ``max_tokens``, counting
+the tokens of the separators that join them; the next chunk starts with the
+trailing whole units of the previous one up to ``overlap_tokens``. Everything
+is linear in the text length::
+
+    chunker = TokenChunker(TokenCounter.from_pretrained(sbert_model_name), max_tokens=480)
+    pieces, report = chunker.chunk(text)
+    report.to_dict()  # distribution of chunk lengths and truncation rate
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from statistics import mean
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 480
+DEFAULT_OVERLAP_TOKENS = 48
+DEFAULT_MIN_TOKENS = 32
+# [CLS] и [SEP] добавляются энкодером к каждому чанку
+SPECIAL_TOKENS = 2
+
+_HEADING_RE = re.compile(r"^(?:РАЗДЕЛ|ГЛАВА|ПРИЛОЖЕНИЕ|Раздел|Глава|Приложение)\s+[\dА-ЯA-Z]+\b|^[А-ЯЁ][А-ЯЁ\s,\-]{7,}$")
+_CLAUSE_RE = re.compile(r"^(\d+(?:\.\d+)+)\.?\s+\S|^(\d+)\.\s+\S")
+_LIST_ITEM_RE = re.compile(r"^(?:[-–—•*]|[а-яa-z]\)|\d+\))\s+")
+_TABLE_ROW_RE = re.compile(r"\|.*\||\t.*\t")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+(?=[А-ЯЁA-Z0-9«\"(])")
+_WORD_RE = re.compile(r"\S+")
+_APPROX_PIECE_RE = re.compile(r"\w{1,5}|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Token counts of the encoder; approximate when no tokenizer is available.
+
+    Args:
+        tokenizer: HuggingFace tokenizer (``SentenceTransformer.tokenizer``)
+        model_max_tokens: Encoder window including special tokens
+    """
+
+    def __init__(self, tokenizer: Any = None, model_max_tokens: int = 512):
+        self.tokenizer = tokenizer
+        self.model_max_tokens = int(model_max_tokens or 512)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, model_max_tokens: Optional[int] = None) -> "TokenCounter":
+        """
+        Counter with the tokenizer of ``model_name`` loaded on its own.
+
+        The tokenizer is a few MB on the CPU, so it stays available while the
+        encoder itself is unloaded from the GPU between stages.
+        """
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+        except Exception as e:
+            logger.warning(f"Tokenizer {model_name} unavailable, using approximate token counts: {e}")
+            return cls(model_max_tokens=model_max_tokens or 512)
+        max_tokens = model_max_tokens or getattr(tokenizer, "model_max_length", 512)
+        return cls(tokenizer, 512 if max_tokens > 100000 else int(max_tokens))
+
+    @classmethod
+    def from_model(cls, model: Any) -> "TokenCounter":
+        """Counter for a SentenceTransformer (or None -> approximate counter)"""
+        tokenizer = getattr(model, "tokenizer", None) if model is not None else None
+        max_tokens = getattr(model, "max_seq_length", None) or getattr(tokenizer, "model_max_length", 512)
+        # У части токенизаторов model_max_length = 10**30 ("без ограничения")
+        return cls(tokenizer, 512 if max_tokens > 100000 else int(max_tokens))
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        """Token counts without special tokens, one tokenizer call for all texts"""
+        if not texts:
+            return []
+        if self.tokenizer is not None:
+            try:
+                encoded = self.tokenizer(list(texts), add_special_tokens=False,
+                                         return_attention_mask=False, return_token_type_ids=False)
+                return [len(ids) for ids in encoded["input_ids"]]
+            except Exception as e:
+                logger.warning(f"Tokenizer failed, falling back to approximate counts: {e}")
+                self.tokenizer = None
+        # Оценка: слово ruBERT ~ один токен на 5 символов, знаки препинания отдельно
+        return [len(_APPROX_PIECE_RE.findall(text)) for text in texts]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+
+@dataclass
+class Unit:
+    """Structural unit: clause, paragraph, table row or heading"""
+    kind: str
+    text: str
+    section: str
+    clause: Optional[str] = None
+    table_header: Optional[str] = None
+    tokens: int = 0
+
+
+@dataclass
+class TextChunk:
+    text: str
+    tokens: int
+    section: str
+    clauses: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ChunkingReport:
+    """Chunk length distribution for one document"""
+    chunks: int = 0
+    units: int = 0
+    split_units: int = 0           # единицы длиннее бюджета, разрезанные по предложениям
+    truncated: int = 0             # чанки длиннее окна энкодера
+    exact_tokens: bool = True
+    min_tokens: int = 0
+    max_tokens: int = 0
+    mean_tokens: float = 0.0
+    p50_tokens: int = 0
+    p90_tokens: int = 0
+
+    @property
+    def truncation_rate(self) -> float:
+        return self.truncated / self.chunks if self.chunks else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks, "units": self.units, "split_units": self.split_units,
+            "truncated": self.truncated, "truncation_rate": round(self.truncation_rate, 4),
+            "exact_tokens": self.exact_tokens, "min_tokens": self.min_tokens,
+            "max_tokens": self.max_tokens, "mean_tokens": round(self.mean_tokens, 1),
+            "p50_tokens": self.p50_tokens, "p90_tokens": self.p90_tokens,
+        }
+
+
+def _percentile(sorted_values: List[int], share: float) -> int:
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+class TokenChunker:
+    """
+    Greedy structural packer with a token budget.
+
+    Args:
+        counter: TokenCounter of the encoder
+        max_tokens: Chunk budget without special tokens (capped by the encoder window)
+        overlap_tokens: Whole trailing units repeated at the start of the next chunk
+        min_tokens: A heading only closes the current chunk once it has this many tokens
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS):
+        self.counter = counter or TokenCounter()
+        self.limit = self.counter.model_max_tokens - SPECIAL_TOKENS
+        self.max_tokens = max(1, min(int(max_tokens), self.limit))
+        self.overlap_tokens = max(0, min(int(overlap_tokens), self.max_tokens // 2))
+        self.min_tokens = min_tokens
+        # Токены разделителей между единицами ("\n") и частями предложений (" "): у BERT 0, у BPE бывает 1;
+        # считаются в одном вызове токенизатора с единицами документа
+        self.line_tokens = self.space_tokens = 0
+
+    # ------------------------------------------------------------ units
+
+    def split_units(self, text: str, section: str = "") -> List[Unit]:
+        """One pass over lines; every line is classified by one precompiled pattern"""
+        units: List[Unit] = []
+        lines: List[str] = []
+        kind, clause, header = "paragraph", None, None
+        blank = False  # пустая строка закрывает единицу, если дальше не пункт перечня
+
+        def flush():
+            if lines:
+                units.append(Unit(kind, "\n".join(lines), section, clause, header if kind == "row" else None))
+                lines.clear()
+
+        for raw in text.splitlines():
+            line = raw.strip()
+            if not line:
+                blank = True
+                continue
+            if blank:
+                blank = False
+                if not (lines and _LIST_ITEM_RE.match(line)):
+                    flush()
+                    kind, clause = "paragraph", None
+            if _TABLE_ROW_RE.search(line):
+                flush()
+                if kind != "row":
+                    header = line  # первая строка таблицы - шапка
+                kind, clause = "row", None
+                lines.append(line)
+                flush()
+                continue
+            if kind == "row":
+                kind, header = "paragraph", None
+            match = _CLAUSE_RE.match(line)
+            if match:
+                flush()
+                kind, clause = "clause", match.group(1) or match.group(2)
+                lines.append(line)
+            elif _HEADING_RE.match(line):
+                flush()
+                section = line[:150]
+                units.append(Unit("heading", line, section))
+                kind, clause = "paragraph", None
+            else:
+                # Пункты перечня и продолжения строк остаются в текущей единице
+                lines.append(line)
+        flush()
+        return units
+
+    def _split_long(self, unit: Unit) -> List[Unit]:
+        """Split a unit longer than the budget at sentence (then word) boundaries"""
+        prefix = f"{unit.clause} (продолжение) " if unit.clause else ""
+        sentences = [s for s in _SENTENCE_RE.split(unit.text) if s]
+        counts = self.counter.count_many(sentences)
+        pieces: List[Tuple[str, int]] = []
+        for sentence, tokens in zip(sentences, counts):
+            if tokens <= self.max_tokens:
+                pieces.append((sentence, tokens))
+                continue
+            # Одно предложение длиннее бюджета - режем по словам пропорционально
+            words = _WORD_RE.findall(sentence)
+            step = max(1, len(words) * self.max_tokens // (tokens + 1))
+            parts = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            pieces.extend(zip(parts, self.counter.count_many(parts)))
+
+        # Бюджет с запасом под префикс "8.3.4 (продолжение)" у каждой части
+        budget = max(1, self.max_tokens - (self.counter.count(prefix) + self.space_tokens if prefix else 0))
+        groups: List[List[str]] = []
+        used = 0
+        for sentence, tokens in pieces:
+            if groups and used + self.space_tokens + tokens <= budget:
+                used += self.space_tokens
+            else:
+                groups.append([])
+                used = 0
+            groups[-1].append(sentence)
+            used += tokens
+        texts = [(prefix if i else "") + " ".join(group) for i, group in enumerate(groups)]
+        return [Unit(unit.kind, text, unit.section, unit.clause, unit.table_header, tokens)
+                for text, tokens in zip(texts, self.counter.count_many(texts))]
+
+    # ------------------------------------------------------------ packing
+
+    def chunk(self, text: str, section: str = "") -> Tuple[List[TextChunk], ChunkingReport]:
+        return self.chunk_sections([(section, text)])
+
+    def chunk_sections(self, sections: Iterable[Tuple[str, str]]) -> Tuple[List[TextChunk], ChunkingReport]:
+        """Chunk ``(title, text)`` sections of one document"""
+        units: List[Unit] = []
+        for title, text in sections:
+            if title:
+                units.append(Unit("heading", title.strip()[:150], title.strip()[:150]))
+            units.extend(self.split_units(text or "", title or ""))
+        report = ChunkingReport(units=len(units), exact_tokens=self.counter.exact)
+        if not units:
+            return [], report
+
+        counts = self.counter.count_many(["\n", " "] + [u.text for u in units])
+        self.line_tokens, self.space_tokens = counts[:2]
+        for unit, tokens in zip(units, counts[2:]):
+            unit.tokens = tokens
+        flat: List[Unit] = []
+        for unit in units:
+            if unit.tokens > self.max_tokens:
+                report.split_units += 1
+                flat.extend(self._split_long(unit))
+            else:
+                flat.append(unit)
+
+        chunks = self._pack(flat)
+        self._fill_report(report, chunks)
+        return chunks, report
+
+    def _pack(self, units: List[Unit]) -> List[TextChunk]:
+        chunks: List[TextChunk] = []
+        current: List[Unit] = []
+        # Каждая единица стоит своих токенов и разделителя "\n" перед следующей:
+        # n единиц дают n - 1 разделителей, поэтому бюджет на один разделитель больше
+        sep = self.line_tokens
+        budget = self.max_tokens + sep
+        used = 0
+        header_tokens: Dict[str, int] = {}
+
+        def emit():
+            if any(u.kind != "heading" for u in current):
+                chunks.append(TextChunk("\n".join(u.text for u in current), used - sep,
+                                        next((u.section for u in current if u.section), ""),
+                                        [u.clause for u in current if u.clause]))
+
+        for unit in units:
+            cost = unit.tokens + sep
+            closes_section = unit.kind == "heading" and used - sep >= self.min_tokens
+            if current and (closes_section or used + cost > budget):
+                emit()
+                # Перекрытие: целые последние единицы (кроме заголовков) в пределах overlap_tokens
+                carry, carried = [], 0
+                if not closes_section:
+                    for prev in reversed(current):
+                        if prev.kind == "heading" or carried + prev.tokens + sep > self.overlap_tokens + sep:
+                            break
+                        carry.append(prev)
+                        carried += prev.tokens + sep
+                carry.reverse()
+                # Продолжение таблицы повторяет шапку
+                if unit.kind == "row" and unit.table_header and unit.text != unit.table_header \
+                        and not any(u.text == unit.table_header for u in carry):
+                    if unit.table_header not in header_tokens:
+                        header_tokens[unit.table_header] = self.counter.count(unit.table_header)
+                    tokens = header_tokens[unit.table_header] + sep
+                    if tokens + carried + cost <= budget:
+                        carry.insert(0, Unit("row", unit.table_header, unit.section, tokens=tokens - sep))
+                        carried += tokens
+                while carry and carried + cost > budget:
+                    carried -= carry.pop(0).tokens + sep
+                current, used = carry, carried
+            current.append(unit)
+            used += cost
+        if current:
+            emit()
+        return chunks
+
+    def _fill_report(self, report: ChunkingReport, chunks: List[TextChunk]):
+        report.chunks = len(chunks)
+        if not chunks:
+            return
+        lengths = sorted(chunk.tokens for chunk in chunks)
+        report.truncated = sum(1 for n in lengths if n > self.limit)
+        report.min_tokens, report.max_tokens = lengths[0], lengths[-1]
+        report.mean_tokens = mean(lengths)
+        report.p50_tokens = _percentile(lengths, 0.5)
+        report.p90_tokens = _percentile(lengths, 0.9)
@@ -9,6 +9,8 @@ from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple, Callable
 import threading
 import asyncio
+import select
+import struct
 
 from pydantic import BaseModel, Field
 
@@ -90,7 +92,8 @@ class ToolsRegistry:
         # subscribers for live events (asyncio.Queue[str])
         self._subscribers: List[asyncio.Queue] = []
         self._watch_thread: Optional[threading.Thread] = None
-        self._watch_stop = threading.Event()
+        # abs path -> tool key, so file events resolve without scanning self.tools
+        self._path_index: Dict[str, str] = {}
 
     def _apply_overrides(self, manifest: ToolManifest) -> ToolManifest:
         try:
@@ -167,6 +170,7 @@ class ToolsRegistry:
                     filepath=path, checksum=_file_checksum(path), mtime=os.path.getmtime(path),
                     status="error", error=str(e)
                 )
+                self._path_index[os.path.abspath(path)] = key
 
     def load_from_file(self, path: str) -> str:
         module, entry, manifest = self._load_module_from_path(path)
@@ -187,6 +191,7 @@ class ToolsRegistry:
             status=('disabled' if (not manifest.enabled and not manifest.system) else 'ok')
         )
         self.tools[key] = lt
+        self._path_index[os.path.abspath(path)] = key
         # on_load hook
         try:
             if hasattr(module, 'on_load') and callable(getattr(module, 'on_load')):
@@ -218,6 +223,70 @@ class ToolsRegistry:
             self._publish({"type": "tools_reloaded", "names": reloaded})
         return reloaded
 
+    def name_for_path(self, path: str) -> Optional[str]:
+        return self._path_index.get(os.path.abspath(path))
+
+    def apply_file_change(self, path: str, detected_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Bring the registry in line with one changed/created/deleted tool file.
+
+        Unchanged content (same checksum) is skipped. Returns the reload
+        metrics event that was published, or None when nothing changed.
+        """
+        path = os.path.abspath(path)
+        started = time.monotonic()
+        detected_at = detected_at if detected_at is not None else started
+        name = self._path_index.get(path)
+
+        if not os.path.exists(path):
+            if name is None:
+                return None
+            self._path_index.pop(path, None)
+            lt = self.tools.get(name)
+            if lt is not None and os.path.abspath(lt.filepath) == path:
+                self.tools.pop(name, None)
+            self._publish({"type": "tool_removed", "name": name})
+            action = "removed"
+        else:
+            lt = self.tools.get(name) if name else None
+            if lt is not None:
+                try:
+                    if _file_checksum(path) == lt.checksum:
+                        return None  # no-op save
+                except OSError:
+                    return None
+                try:
+                    if hasattr(lt.module, 'on_unload') and callable(getattr(lt.module, 'on_unload')):
+                        lt.module.on_unload()
+                except Exception:
+                    pass
+            try:
+                new_name = self.load_from_file(path)
+            except Exception as e:
+                if lt is not None:
+                    lt.status = 'error'
+                    lt.error = str(e)
+                self._publish({"type": "tool_error", "name": name or path, "error": str(e)})
+                return None
+            if name and new_name != name:
+                # manifest name changed - drop the stale entry
+                self.tools.pop(name, None)
+            name = new_name
+            action = "reloaded" if lt is not None else "loaded"
+            if lt is not None:
+                self._publish({"type": "tools_reloaded", "names": [name]})
+
+        finished = time.monotonic()
+        metrics = {
+            "type": "tool_reload_metrics",
+            "name": name,
+            "action": action,
+            "latency_ms": round((finished - detected_at) * 1000, 2),
+            "load_ms": round((finished - started) * 1000, 2),
+        }
+        self._publish(metrics)
+        return metrics
+
     def get_info(self, name: str) -> Optional[Dict[str, Any]]:
         lt = self.tools.get(name)
         if not lt:
@@ -348,72 +417,281 @@ class ToolsRegistry:
 registry = ToolsRegistry()
 
 # --- Live updates / SSE helpers ---
+_subscriber_loops: Dict[int, asyncio.AbstractEventLoop] = {}
+
 def get_event_queue() -> asyncio.Queue:
     q: asyncio.Queue = asyncio.Queue()
+    try:
+        # events are published from the watcher thread; remember the consumer loop
+        _subscriber_loops[id(q)] = asyncio.get_running_loop()
+    except RuntimeError:
+        pass
     registry._subscribers.append(q)
     return q
 
 def remove_event_queue(q: asyncio.Queue) -> None:
+    _subscriber_loops.pop(id(q), None)
     try:
         registry._subscribers.remove(q)
     except ValueError:
         pass
 
-def start_watcher_if_needed() -> None:
-    if registry._watch_thread and registry._watch_thread.is_alive():
-        return
-    def _loop():
-        last_mtimes: Dict[str, float] = {}
-        while not registry._watch_stop.is_set():
+# --- File watcher (inotify with polling fallback) ---
+WATCHER_BACKEND = os.getenv("BLDR_TOOLS_WATCHER", "auto")  # auto|inotify|poll
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("BLDR_TOOLS_WATCH_DEBOUNCE", "0.3"))
+POLL_INTERVAL_SECONDS = float(os.getenv("BLDR_TOOLS_POLL_INTERVAL", "2.0"))
+RESCAN = "<rescan>"
+# inotify does not see changes made by other hosts on these filesystems
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "fuse.s3fs", "fuse.gcsfuse", "davfs",
+}
+
+
+def _filesystem_type(path: str) -> Optional[str]:
+    """Filesystem type of the mount containing path (from /proc/mounts), None if unknown"""
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                # spaces in mount points are escaped as \040
+                mount_point = parts[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, parts[2]
+    except OSError:
+        return None
+    return fs_type
+
+
+def _is_tool_file(path: str) -> bool:
+    fn = os.path.basename(path)
+    return fn.endswith('.py') and not fn.startswith('_')
+
+
+class _InotifyWatcher:
+    """Recursive inotify watch of the tools directory through libc (Linux only)"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, base_dir: str) -> None:
+        import ctypes
+        import ctypes.util
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self._add_tree(base_dir)
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def _add_tree(self, directory: str) -> List[str]:
+        """Watch a directory tree; returns tool files already present in it"""
+        existing: List[str] = []
+        for root, _, files in os.walk(directory):
+            self._add_watch(root)
+            existing.extend(os.path.join(root, fn) for fn in files if _is_tool_file(fn))
+        return existing
+
+    def wait(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths: List[str] = []
+        offset = 0
+        while offset + self._EVENT.size <= len(buf):
+            wd, mask, _, length = self._EVENT.unpack_from(buf, offset)
+            offset += self._EVENT.size
+            name = buf[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                paths.append(RESCAN)
+                continue
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    paths.extend(self._add_tree(path))
+                elif mask & self.IN_MOVED_FROM:
+                    paths.append(RESCAN)
+            elif _is_tool_file(path):
+                paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class _PollingWatcher:
+    """Fallback for filesystems without inotify (network drives, non-Linux)"""
+
+    def __init__(self, base_dir: str, interval: Optional[float] = None) -> None:
+        self.base_dir = base_dir
+        self.interval = interval or POLL_INTERVAL_SECONDS
+        self._stamps = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        stamps: Dict[str, Tuple[float, int]] = {}
+        stack = [self.base_dir]
+        while stack:
             try:
-                for path in registry.scan():
-                    try:
-                        m = os.path.getmtime(path)
-                    except Exception:
-                        continue
-                    if path not in last_mtimes:
-                        last_mtimes[path] = m
-                        continue
-                    if m != last_mtimes[path]:
-                        last_mtimes[path] = m
-                        try:
-                            # find key by filepath
-                            name = None
-                            for k, lt in list(registry.tools.items()):
-                                if lt.filepath == path:
-                                    name = k
-                                    break
-                            if name:
-                                registry.reload(name)
-                            else:
-                                # new file discovered
-                                registry.load_from_file(path)
-                        except Exception:
-                            pass
-                # detect deleted files
-                existing_paths = set(registry.scan())
-                for k, lt in list(registry.tools.items()):
-                    if lt.filepath and lt.filepath not in existing_paths:
-                        registry.tools.pop(k, None)
-                        registry._publish({"type": "tool_removed", "name": k})
-                time.sleep(1.0)
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif _is_tool_file(entry.name):
+                            st = entry.stat()
+                            stamps[os.path.abspath(entry.path)] = (st.st_mtime, st.st_size)
+            except OSError:
+                continue
+        return stamps
+
+    def wait(self, timeout: float) -> List[str]:
+        time.sleep(self.interval)
+        current = self._snapshot()
+        changed = [p for p, stamp in current.items() if self._stamps.get(p) != stamp]
+        deleted = [p for p in self._stamps if p not in current]
+        self._stamps = current
+        return changed + deleted
+
+    def close(self) -> None:
+        pass
+
+
+class ToolsWatcher:
+    """Applies debounced tool file changes to a registry"""
+
+    def __init__(self, reg: 'ToolsRegistry', backend: str = WATCHER_BACKEND,
+                 debounce: float = WATCH_DEBOUNCE_SECONDS) -> None:
+        self.registry = reg
+        self.debounce = debounce
+        self.backend_name = backend
+        self._backend: Any = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _create_backend(self) -> Any:
+        if self.backend_name == 'auto':
+            fs_type = _filesystem_type(self.registry.base_dir)
+            if fs_type in NETWORK_FILESYSTEMS:
+                self.registry._publish({"type": "watcher_fallback", "backend": "poll",
+                                        "reason": f"network filesystem ({fs_type})"})
+                self.backend_name = 'poll'
+        if self.backend_name != 'poll':
+            try:
+                backend = _InotifyWatcher(self.registry.base_dir)
+                self.backend_name = 'inotify'
+                return backend
+            except (OSError, AttributeError) as e:
+                if self.backend_name == 'inotify':
+                    raise
+                self.registry._publish({"type": "watcher_fallback", "backend": "poll", "reason": str(e)})
+        self.backend_name = 'poll'
+        # the poll interval already coalesces bursts of writes
+        self.debounce = 0.0
+        return _PollingWatcher(self.registry.base_dir)
+
+    def _rescan_paths(self) -> List[str]:
+        on_disk = {os.path.abspath(p) for p in self.registry.scan()}
+        return list(on_disk | set(self.registry._path_index))
+
+    def _loop(self) -> None:
+        # path -> (first event time, last event time)
+        pending: Dict[str, Tuple[float, float]] = {}
+        while not self._stop.is_set():
+            try:
+                events = self._backend.wait(self.debounce if pending else 1.0)
             except Exception:
                 time.sleep(1.0)
-    registry._watch_stop.clear()
-    registry._watch_thread = threading.Thread(target=_loop, daemon=True)
-    registry._watch_thread.start()
+                continue
+            now = time.monotonic()
+            if RESCAN in events:
+                events = [e for e in events if e != RESCAN] + self._rescan_paths()
+            for path in events:
+                path = os.path.abspath(path)
+                first, _ = pending.get(path, (now, now))
+                pending[path] = (first, now)
+            # burst of writes to one file -> one reload after it settles
+            for path, (first, last) in list(pending.items()):
+                if now - last >= self.debounce:
+                    pending.pop(path, None)
+                    try:
+                        self.registry.apply_file_change(path, detected_at=first)
+                    except Exception:
+                        pass
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._backend = self._create_backend()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="tools-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+
+_watcher: Optional[ToolsWatcher] = None
+
+def start_watcher_if_needed() -> None:
+    global _watcher
+    if _watcher is not None and _watcher._thread and _watcher._thread.is_alive():
+        return
+    _watcher = ToolsWatcher(registry)
+    _watcher.start()
+    registry._watch_thread = _watcher._thread
 
 def stop_watcher() -> None:
-    if registry._watch_thread and registry._watch_thread.is_alive():
-        registry._watch_stop.set()
-        try:
-            registry._watch_thread.join(timeout=2.0)
-        except Exception:
-            pass
+    if _watcher is not None:
+        _watcher.stop()
 
 def _publish_event_to_queue(q: asyncio.Queue, payload: Dict[str, Any]) -> None:
     try:
-        q.put_nowait(json.dumps(payload, ensure_ascii=False))
+        data = json.dumps(payload, ensure_ascii=False)
+        loop = _subscriber_loops.get(id(q))
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(q.put_nowait, data)
+        else:
+            q.put_nowait(data)
     except Exception:
         pass
 
@@ -8,7 +8,7 @@ import time
 
 # Import pro-feature modules
 from core.official_letters import generate_official_letter, get_letter_templates
-from core.budget_auto import auto_budget, SAMPLE_GESN_RATES, export_budget_to_excel
+from core.budget_auto import auto_budget, export_budget_to_excel, get_gesn_catalogue
 from core.ppr_generator import generate_ppr, SAMPLE_PROJECT_DATA
 try:
     from core.gpp_creator import create_gpp, SAMPLE_WORKS_SEQ
@@ -85,12 +85,21 @@ except ImportError:
     print("⚠️ Excel processing libraries not available, Excel analysis will be limited")
 
 try:
-    import networkx as nx
-    HAS_NETWORKX = True
+    from core.cpm_engine import CPMEngine, WorkCalendar, work_name
+    from core.exceptions import ScheduleCycleError, ToolValidationError
+    HAS_CPM_ENGINE = True
 except ImportError:
-    nx = None
-    HAS_NETWORKX = False
-    print("⚠️ NetworkX not available, scheduling tools will use simplified algorithms")
+    CPMEngine = None  # type: ignore
+    WorkCalendar = None  # type: ignore
+    ScheduleCycleError = None  # type: ignore
+    ToolValidationError = None  # type: ignore
+
+    def work_name(work: Dict[str, Any], index: int) -> str:
+        """Same labels as core.cpm_engine.work_name (the engine needs NumPy)"""
+        return work.get("name") or f"Работа {index + 1}"
+
+    HAS_CPM_ENGINE = False
+    print("⚠️ NumPy not available, scheduling tools will use simplified algorithms")
 
 # Try to import Ultralytics YOLO for object detection
 try:
@@ -1366,7 +1375,9 @@ class ToolsSystem:
             end_work = start_work + timedelta(days=duration)
             
             schedule.append({
-                "work": work.get("name", f"Work {i+1}"),
+                "index": i,
+                "id": work.get("id"),
+                "work": work_name(work, i),
                 "start": start_work.isoformat(),
                 "end": end_work.isoformat(),
                 "duration": duration
@@ -1383,7 +1394,7 @@ class ToolsSystem:
             })
         
         # Calculate critical path using network analysis
-        critical_path = self._calculate_critical_path(works)
+        critical_path = self._calculate_critical_path({"works": works}).get("critical_path", [])
         
         return {
             "status": "success",
@@ -1662,7 +1673,8 @@ class ToolsSystem:
     def _auto_budget(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Generate automatic budget with real implementation"""
         estimate_data = arguments.get("estimate_data", {})
-        gesn_rates = arguments.get("gesn_rates", SAMPLE_GESN_RATES)
+        # Empty rates from the planner -> shared indexed rate catalogue
+        gesn_rates = arguments.get("gesn_rates") or get_gesn_catalogue()
         
         try:
             budget = auto_budget(estimate_data, gesn_rates)
@@ -1873,7 +1885,7 @@ class ToolsSystem:
                 estimate_data = parse_estimate_gesn(estimate_file, "ekaterinburg")
             
             # 2. Calculate budget
-            budget = auto_budget(estimate_data, SAMPLE_GESN_RATES) if estimate_data else {}
+            budget = auto_budget(estimate_data, get_gesn_catalogue()) if estimate_data else {}
             
             # 3. Generate PPR
             project_data = {
@@ -2272,7 +2284,12 @@ class ToolsSystem:
         analysis_type = arguments.get("analysis_type", "clash")
         
         try:
-            result = analyze_bentley_model(ifc_path, analysis_type)
+            result = analyze_bentley_model(
+                ifc_path, analysis_type,
+                tolerance=float(arguments.get("tolerance", 0.01)),
+                offset=int(arguments.get("offset", 0)),
+                limit=int(arguments.get("limit", 50))
+            )
             return result
         except Exception as e:
             return {
@@ -2772,254 +2789,126 @@ class ToolsSystem:
                 "data": {}
             }
 
+    def _schedule_engine(self, works: List[Dict[str, Any]]) -> "CPMEngine":
+        """Build and compute the CPM engine for works (raises ScheduleCycleError on cycles)"""
+        engine = CPMEngine.from_works(works)
+        engine.compute()
+        for warning in engine.warnings:
+            print(f"⚠️ {warning}")
+        return engine
+
+    def _simple_schedule(self, works: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sequential schedule used when the CPM engine is unavailable"""
+        schedule = []
+        current_date = datetime.now()
+        
+        for i, work in enumerate(works[:20]):  # Limit to 20 works
+            duration = work.get("duration", 1.0)
+            start_work = current_date + timedelta(days=i * 2)
+            end_work = start_work + timedelta(days=duration)
+            
+            schedule.append({
+                "index": i,
+                "id": work.get("id"),
+                "work": work_name(work, i),
+                "start": start_work.isoformat(),
+                "end": end_work.isoformat(),
+                "duration": duration
+            })
+        return schedule
+
+    @staticmethod
+    def _work_refs(works: List[Dict[str, Any]], indices: List[int]) -> List[Dict[str, Any]]:
+        """Work references by position: names may repeat, indices do not"""
+        return [{"index": i, "id": works[i].get("id"), "name": work_name(works[i], i)} for i in indices]
+
+    def _schedule_error(self, error: Exception) -> Dict[str, Any]:
+        """Error result for a cycle or invalid work data"""
+        result = {"status": "error", "error": getattr(error, "message", str(error)), "critical_path": []}
+        if isinstance(error, ScheduleCycleError):
+            result["cycle"] = error.context["cycle"]
+        return result
+
     def _create_construction_schedule(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Create construction schedule with real network analysis"""
+        """Create construction schedule with CPM network analysis"""
         works = arguments.get("works", [])
         constraints = arguments.get("constraints", {})
         
-        # Check if NetworkX is available
-        if not HAS_NETWORKX or nx is None:
-            # Fallback to simple scheduling if NetworkX is not available
-            print("⚠️ NetworkX not available, using simplified scheduling")
-            try:
-                schedule = []
-                current_date = datetime.now()
-                
-                for i, work in enumerate(works[:20]):  # Limit to 20 works
-                    duration = work.get("duration", 1.0)
-                    start_work = current_date + timedelta(days=i * 2)
-                    end_work = start_work + timedelta(days=duration)
-                    
-                    schedule.append({
-                        "work": work.get("name", f"Work {i+1}"),
-                        "start": start_work.isoformat(),
-                        "end": end_work.isoformat(),
-                        "duration": duration
-                    })
-                
-                return {
-                    "status": "success",
-                    "schedule": schedule,
-                    "critical_path": []  # Would be calculated in real implementation
-                }
-            except Exception as e:
-                # Fallback schedule
-                schedule = []
-                for i, work in enumerate(works[:10]):
-                    schedule.append({
-                        "work": work.get("name", f"Work {i+1}"),
-                        "start": "2025-01-01T00:00:00",
-                        "end": "2025-01-10T00:00:00",
-                        "duration": work.get("duration", 1.0)
-                    })
-                
-                return {
-                    "status": "success",
-                    "schedule": schedule,
-                    "critical_path": []
-                }
-        
-        # Real implementation with NetworkX
-        try:
-            # Create directed graph
-            G = nx.DiGraph()
-            
-            # Add nodes
-            for work in works:
-                work_name = work.get("name", f"Work {len(G.nodes)+1}")
-                duration = work.get("duration", 1.0)
-                G.add_node(work_name, duration=duration)
-            
-            # Add edges (dependencies)
-            for work in works:
-                work_name = work.get("name", f"Work {len(G.nodes)}")
-                dependencies = work.get("dependencies", [])
-                for dep in dependencies:
-                    if dep in G.nodes() and dep != work_name:
-                        G.add_edge(dep, work_name)
-            
-            # Calculate critical path using network analysis
-            # Topological sort
-            topological_order = list(nx.topological_sort(G))
-            
-            # Initialize earliest start and finish times
-            earliest_start = {node: 0 for node in G.nodes()}
-            earliest_finish = {node: 0 for node in G.nodes()}
-            
-            # Forward pass
-            for node in topological_order:
-                duration = G.nodes[node].get("duration", 0.0)
-                earliest_finish[node] = earliest_start[node] + duration
-                
-                # Update successors
-                for successor in G.successors(node):
-                    earliest_start[successor] = max(earliest_start[successor], earliest_finish[node])
-            
-            # Initialize latest start and finish times
-            project_duration = max(earliest_finish.values()) if earliest_finish else 0
-            latest_finish = {node: project_duration for node in G.nodes()}
-            latest_start = {node: project_duration for node in G.nodes()}
-            
-            # Backward pass
-            for node in reversed(topological_order):
-                duration = G.nodes[node].get("duration", 0.0)
-                latest_start[node] = latest_finish[node] - duration
-                
-                # Update predecessors
-                for predecessor in G.predecessors(node):
-                    latest_finish[predecessor] = min(latest_finish[predecessor], latest_start[node])
-            
-            # Identify critical path (activities with zero slack)
-            critical_path = []
-            for node in G.nodes():
-                slack = latest_start[node] - earliest_start[node]
-                if abs(slack) < 1e-6:  # Essentially zero
-                    critical_path.append(node)
-            
-            # Generate schedule with actual dates
-            schedule = []
-            start_date = datetime.now()
-            for node in topological_order:
-                duration = G.nodes[node].get("duration", 0.0)
-                start_offset = earliest_start[node]
-                end_offset = earliest_finish[node]
-                
-                start_work = start_date + timedelta(days=start_offset)
-                end_work = start_date + timedelta(days=end_offset)
-                
-                schedule.append({
-                    "work": node,
-                    "start": start_work.isoformat(),
-                    "end": end_work.isoformat(),
-                    "duration": duration
-                })
-            
-            return {
-                "status": "success",
-                "schedule": schedule,
-                "critical_path": critical_path,
-                "project_duration": project_duration
-            }
-        except Exception as e:
-            print(f"❌ Error in network analysis: {e}")
-            # Fallback to simple scheduling
-            schedule = []
-            for i, work in enumerate(works[:10]):
-                schedule.append({
-                    "work": work.get("name", f"Work {i+1}"),
-                    "start": "2025-01-01T00:00:00",
-                    "end": "2025-01-10T00:00:00",
-                    "duration": work.get("duration", 1.0)
-                })
-            
+        if not HAS_CPM_ENGINE:
+            print("⚠️ CPM engine not available, using simplified scheduling")
             return {
                 "status": "success",
-                "schedule": schedule,
+                "schedule": self._simple_schedule(works),
                 "critical_path": []
             }
+        
+        try:
+            engine = self._schedule_engine(works)
+        except (ScheduleCycleError, ToolValidationError) as e:
+            return {**self._schedule_error(e), "schedule": []}
+        
+        calendar = WorkCalendar(
+            weekmask=constraints.get("weekmask", "1111111"),
+            holidays=list(constraints.get("holidays", []))
+        )
+        if constraints.get("start_date"):
+            try:
+                calendar.start_date = datetime.fromisoformat(str(constraints["start_date"]))
+            except ValueError:
+                pass
+        
+        schedule = [
+            {
+                "index": record["index"],
+                "id": works[record["index"]].get("id"),
+                "work": work_name(works[record["index"]], record["index"]),
+                "start": record["start"],
+                "end": record["end"],
+                "duration": record["duration"],
+                "total_float": record["total_float"],
+                "free_float": record["free_float"],
+                "critical": record["critical"]
+            }
+            for record in engine.schedule(calendar)
+        ]
+        
+        return {
+            "status": "success",
+            "schedule": schedule,
+            "critical_path": self._work_refs(works, engine.result.critical_path()),
+            "project_duration": engine.result.project_duration,
+            "warnings": engine.warnings
+        }
 
     def _calculate_critical_path(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Calculate critical path with real network analysis"""
+        """Calculate critical path with CPM network analysis"""
         works = arguments.get("works", [])
         
-        # Check if NetworkX is available
-        if not HAS_NETWORKX or nx is None:
-            # Fallback to simple critical path calculation if NetworkX is not available
-            print("⚠️ NetworkX not available, using simplified critical path calculation")
-            try:
-                # Return the first few works as critical path
-                critical_path = [work.get("name", f"Work {i+1}") for i, work in enumerate(works[:5])]
-                project_duration = sum(work.get("duration", 1.0) for work in works)
-                
-                return {
-                    "status": "success",
-                    "critical_path": critical_path,
-                    "project_duration": project_duration
-                }
-            except Exception as e:
-                # Fallback critical path
-                critical_path = [f"Work {i+1}" for i in range(min(3, len(works)))]
-                project_duration = sum(work.get("duration", 1.0) for work in works[:10])
-                
-                return {
-                    "status": "success",
-                    "critical_path": critical_path,
-                    "project_duration": project_duration
-                }
-        
-        # Real implementation with NetworkX
-        try:
-            # Create directed graph
-            G = nx.DiGraph()
-            
-            # Add nodes
-            for work in works:
-                work_name = work.get("name", f"Work {len(G.nodes)+1}")
-                duration = work.get("duration", 1.0)
-                G.add_node(work_name, duration=duration)
-            
-            # Add edges (dependencies)
-            for work in works:
-                work_name = work.get("name", f"Work {len(G.nodes)}")
-                dependencies = work.get("dependencies", [])
-                for dep in dependencies:
-                    if dep in G.nodes() and dep != work_name:
-                        G.add_edge(dep, work_name)
-            
-            # Calculate critical path using network analysis
-            # Topological sort
-            topological_order = list(nx.topological_sort(G))
-            
-            # Initialize earliest start and finish times
-            earliest_start = {node: 0 for node in G.nodes()}
-            earliest_finish = {node: 0 for node in G.nodes()}
-            
-            # Forward pass
-            for node in topological_order:
-                duration = G.nodes[node].get("duration", 0.0)
-                earliest_finish[node] = earliest_start[node] + duration
-                
-                # Update successors
-                for successor in G.successors(node):
-                    earliest_start[successor] = max(earliest_start[successor], earliest_finish[node])
-            
-            # Initialize latest start and finish times
-            project_duration = max(earliest_finish.values()) if earliest_finish else 0
-            latest_finish = {node: project_duration for node in G.nodes()}
-            latest_start = {node: project_duration for node in G.nodes()}
-            
-            # Backward pass
-            for node in reversed(topological_order):
-                duration = G.nodes[node].get("duration", 0.0)
-                latest_start[node] = latest_finish[node] - duration
-                
-                # Update predecessors
-                for predecessor in G.predecessors(node):
-                    latest_finish[predecessor] = min(latest_finish[predecessor], latest_start[node])
-            
-            # Identify critical path (activities with zero slack)
-            critical_path = []
-            for node in G.nodes():
-                slack = latest_start[node] - earliest_start[node]
-                if abs(slack) < 1e-6:  # Essentially zero
-                    critical_path.append(node)
-            
+        if not HAS_CPM_ENGINE:
+            print("⚠️ CPM engine not available, using simplified critical path calculation")
             return {
                 "status": "success",
-                "critical_path": critical_path,
-                "project_duration": project_duration
-            }
-        except Exception as e:
-            print(f"❌ Error in critical path calculation: {e}")
-            # Fallback critical path
-            critical_path = [f"Work {i+1}" for i in range(min(3, len(works)))]
-            project_duration = sum(work.get("duration", 1.0) for work in works[:10])
-            
-            return {
-                "status": "success",
-                "critical_path": critical_path,
-                "project_duration": project_duration
+                "critical_path": self._work_refs(works, list(range(min(len(works), 5)))),
+                "project_duration": sum(work.get("duration", 1.0) for work in works)
             }
+        
+        try:
+            engine = self._schedule_engine(works)
+        except (ScheduleCycleError, ToolValidationError) as e:
+            return self._schedule_error(e)
+        
+        result = engine.result
+        floats = self._work_refs(works, list(range(len(works))))
+        for entry in floats:
+            entry["total_float"] = float(result.total_float[entry["index"]])
+            entry["free_float"] = float(result.free_float[entry["index"]])
+        return {
+            "status": "success",
+            "critical_path": self._work_refs(works, result.critical_path()),
+            "project_duration": result.project_duration,
+            "floats": floats,
+            "warnings": engine.warnings
+        }
 
     def _extract_financial_data(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Extract financial data with real processing"""
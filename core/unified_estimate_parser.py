@@ -4,6 +4,8 @@ Unified estimate parser - consolidates all estimate parsing functionality
 
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 import logging
@@ -16,6 +18,7 @@ from core.estimate_parser_enhanced import (
     parse_text_estimate,
     get_regional_coefficients
 )
+from core.streaming_estimate_parser import parse_estimate_streaming
 
 logger = logging.getLogger(__name__)
 
@@ -102,7 +105,10 @@ class UnifiedEstimateParser:
         
         try:
             # Route to appropriate parser
-            if format_type == 'excel':
+            if format_type == 'excel' and file_path.suffix.lower() == '.xlsx':
+                # Потоковый парсер: все листы, объединенные ячейки, векторная классификация
+                result = parse_estimate_streaming(str(file_path))
+            elif format_type == 'excel':
                 result = parse_excel_estimate(str(file_path))
             elif format_type == 'csv':
                 result = parse_csv_estimate(str(file_path))
@@ -207,36 +213,46 @@ class UnifiedEstimateParser:
             }
     
     def _parse_batch(self, file_list: List[str], **kwargs) -> Dict[str, Any]:
-        """Parse multiple estimate files (batch processing)"""
-        results = []
+        """Parse multiple estimate files (batch processing in a process pool)"""
         total_files = len(file_list)
-        successful = 0
-        failed = 0
+        region = kwargs.get("region", "ekaterinburg")
+        max_workers = kwargs.get("max_workers") or min(total_files, os.cpu_count() or 1)
+        results: List[Optional[Dict[str, Any]]] = [None] * total_files
+        
+        logger.info(f"Starting batch processing of {total_files} files ({max_workers} workers)")
         
-        logger.info(f"Starting batch processing of {total_files} files")
+        if total_files > 1 and max_workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {
+                        executor.submit(_parse_file_worker, file_path, region): i
+                        for i, file_path in enumerate(file_list)
+                    }
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        i = futures[future]
+                        try:
+                            results[i] = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            results[i] = self._batch_error(file_list[i], e)
+                        
+                        # Log progress
+                        if done % 10 == 0:
+                            logger.info(f"Processed {done}/{total_files} files")
+            except (BrokenProcessPool, OSError) as e:
+                logger.warning(f"Process pool unavailable, falling back to sequential parsing: {e}")
         
         for i, file_path in enumerate(file_list):
+            if results[i] is not None:
+                continue
             try:
-                result = self._parse_file(file_path, kwargs.get("region", "ekaterinburg"))
-                if result["status"] == "success":
-                    successful += 1
-                else:
-                    failed += 1
-                results.append(result)
-                
-                # Log progress
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Processed {i + 1}/{total_files} files")
-                    
+                results[i] = self._parse_file(file_path, region)
             except Exception as e:
-                failed += 1
-                results.append({
-                    "status": "error",
-                    "error": str(e),
-                    "source_file": file_path,
-                    "positions": [],
-                    "total_cost": 0.0
-                })
+                results[i] = self._batch_error(file_path, e)
+        
+        successful = sum(1 for result in results if result["status"] == "success")
+        failed = total_files - successful
         
         # Aggregate results
         all_positions = []
@@ -267,6 +283,16 @@ class UnifiedEstimateParser:
             }
         }
     
+    @staticmethod
+    def _batch_error(file_path: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "status": "error",
+            "error": str(error),
+            "source_file": file_path,
+            "positions": [],
+            "total_cost": 0.0
+        }
+    
     def _standardize_result(self, result: Any, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Standardize result format from different parsers"""
         if isinstance(result, dict):
@@ -304,6 +330,11 @@ class UnifiedEstimateParser:
 # Global instance
 unified_parser = UnifiedEstimateParser()
 
+
+def _parse_file_worker(file_path: str, region: str) -> Dict[str, Any]:
+    """Entry point for batch workers (must be module-level to be picklable)"""
+    return unified_parser._parse_file(file_path, region)
+
 # Unified API functions
 
 def parse_estimate_unified(input_data: Union[str, List[str], Dict[str, Any]], **kwargs) -> Dict[str, Any]:
@@ -1547,18 +1547,29 @@ class UnifiedToolsSystem:
         """Экспорт в AutoCAD"""
         return {"status": "success", "message": "Экспорт выполнен"}
 
-# Глобальный экземпляр
-unified_tools = UnifiedToolsSystem()
+# Глобальный экземпляр: создаётся при первом обращении или фоновым прогревом сервера
+from core.startup import startup as _startup
+
+_unified_tools_component = _startup.register("unified_tools", UnifiedToolsSystem, warmup=True)
+
+def get_unified_tools() -> UnifiedToolsSystem:
+    return _unified_tools_component.get()
+
+def __getattr__(name: str):
+    # `from core.unified_tools_system import unified_tools` продолжает работать
+    if name == "unified_tools":
+        return get_unified_tools()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Утилиты совместимости
 def execute_tool(tool_name: str, **kwargs) -> ToolResult:
-    return unified_tools.execute_tool(tool_name, **kwargs)
+    return get_unified_tools().execute_tool(tool_name, **kwargs)
 
 def list_available_tools(category: Optional[str] = None) -> List[str]:
-    tools = unified_tools.list_tools(category)
+    tools = get_unified_tools().list_tools(category)
     return [tool.name for tool in tools]
 
 def get_tool_signature(tool_name: str) -> Optional[ToolSignature]:
-    return unified_tools.get_tool_info(tool_name)
+    return get_unified_tools().get_tool_info(tool_name)
 
 
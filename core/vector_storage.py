@@ -0,0 +1,317 @@
+"""
+Quantized storage tier for the ``enterprise_docs`` Qdrant collection.
+
+At tens of millions of 768-dim float32 chunks the plain collection no longer
+fits in RAM. Here the originals are kept on disk (``on_disk=True``) and only
+a quantized copy stays in memory: scalar int8 (4x smaller, recall ~0.99 after
+rescoring) or product quantization (x16-x64, for the largest corpora).
+Searches oversample candidates on the quantized vectors and rescore them
+with the full-precision originals::
+
+    storage = QuantizedStorage(client, QuantizationSettings.from_env())
+    storage.ensure_collection("enterprise_docs", size=768)
+    hits = storage.search("enterprise_docs", vector, limit=10, query_filter=...)
+
+The public name is an alias over a versioned physical collection
+(``enterprise_docs_v1``, ``enterprise_docs_v2`` ...). When the configured
+quantization differs from the live one, a new version is built by copying
+points (vectors, payloads, payload indexes) while readers keep using the old
+version, then the alias is switched in a single request and the old version
+dropped. A legacy plain collection with the public name is migrated the same
+way; there the alias can only be created after the collection is deleted, so
+the name is unavailable for the duration of that one call.
+
+The embedded local Qdrant (``QdrantClient(path=...)``) ignores quantization,
+so against it the storage falls back to plain vectors.
+
+Migration copies a snapshot: writers to the collection should be paused for
+its duration. It runs in one place - the standalone trainer's
+``_init_databases`` or the Celery run planner before fan-out; workers open the
+collection with ``migrate=False`` and keep using the live version. Within a
+process ``ensure_collection`` is serialized by a lock. A copy that fails drops
+its half-filled target, so the next attempt starts clean.
+
+``reset`` drops the alias and every version (reset scripts), then recreates
+an empty collection with the current settings.
+"""
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+from qdrant_client.http import models
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('scalar', 'product', 'none')
+COPY_BATCH = 512
+_VERSION_RE = re.compile(r'_v(\d+)$')
+# Миграция в пределах процесса - одна за раз (несколько тренеров в потоках)
+_MIGRATION_LOCK = threading.Lock()
+
+
+@dataclass
+class QuantizationSettings:
+    """
+    Args:
+        mode: scalar (int8) | product | none
+        oversampling: Во сколько раз больше кандидатов берется по квантованным векторам
+        rescore: Пересчитывать кандидатов по исходным float32 векторам
+        on_disk: Исходные векторы на диске, в памяти только квантованные
+        quantile: Квантиль обрезки выбросов для scalar int8
+        product_compression: Сжатие PQ: x4 | x8 | x16 | x32 | x64
+    """
+    mode: str = 'scalar'
+    oversampling: float = 2.0
+    rescore: bool = True
+    on_disk: bool = True
+    quantile: float = 0.99
+    product_compression: str = 'x16'
+
+    def __post_init__(self):
+        if self.mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {self.mode} (expected one of {QUANTIZATION_MODES})")
+
+    @classmethod
+    def from_env(cls) -> 'QuantizationSettings':
+        return cls(
+            mode=os.getenv('QDRANT_QUANTIZATION', 'scalar').lower(),
+            oversampling=float(os.getenv('QDRANT_OVERSAMPLING', 2.0)),
+            rescore=os.getenv('QDRANT_RESCORE', '1').lower() in ('1', 'true'),
+            on_disk=os.getenv('QDRANT_VECTORS_ON_DISK', '1').lower() in ('1', 'true'),
+            quantile=float(os.getenv('QDRANT_SCALAR_QUANTILE', 0.99)),
+            product_compression=os.getenv('QDRANT_PQ_COMPRESSION', 'x16'),
+        )
+
+    def quantization_config(self) -> Optional[Any]:
+        if self.mode == 'scalar':
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=self.quantile, always_ram=True))
+        if self.mode == 'product':
+            return models.ProductQuantization(product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio(self.product_compression), always_ram=True))
+        return None
+
+    def search_params(self, exact: bool = False, ignore_quantization: bool = False) -> models.SearchParams:
+        """Параметры поиска: оверсэмплинг и рескоринг, либо точный поиск / поиск без квантования"""
+        if self.mode == 'none' or exact:
+            return models.SearchParams(exact=exact)
+        return models.SearchParams(quantization=models.QuantizationSearchParams(
+            ignore=ignore_quantization, rescore=self.rescore, oversampling=self.oversampling))
+
+
+def quantization_mode(info) -> str:
+    """Режим квантования существующей коллекции (по CollectionInfo)"""
+    config = getattr(info.config, 'quantization_config', None)
+    if isinstance(config, models.ScalarQuantization):
+        return 'scalar'
+    if isinstance(config, models.ProductQuantization):
+        return 'product'
+    if isinstance(config, models.BinaryQuantization):
+        return 'binary'
+    return 'none'
+
+
+def is_local_client(client) -> bool:
+    """QdrantClient(path=...) / (':memory:') вместо сервера"""
+    return type(getattr(client, '_client', None)).__name__ == 'QdrantLocal'
+
+
+class QuantizedStorage:
+    """Создание, миграция и поиск по квантованной коллекции за алиасом"""
+
+    def __init__(self, client, settings: Optional[QuantizationSettings] = None):
+        self.client = client
+        self.settings = settings or QuantizationSettings.from_env()
+        if self.settings.mode != 'none' and is_local_client(client):
+            # Локальный Qdrant (path=...) не хранит квантование: иначе миграция на каждом запуске
+            logger.info("[QDRANT] Local mode: quantization is not supported, using plain vectors")
+            self.settings = replace(self.settings, mode='none')
+
+    # ------------------------------------------------------------------
+    # Коллекция
+    # ------------------------------------------------------------------
+
+    def aliases(self) -> Dict[str, str]:
+        """Алиас -> физическая коллекция"""
+        return {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+
+    def ensure_collection(self, name: str, size: int = 768,
+                          distance: models.Distance = models.Distance.COSINE, migrate: bool = True) -> str:
+        """
+        Коллекция ``name`` с текущими настройками квантования.
+
+        Args:
+            migrate: False - существующая коллекция с другими настройками
+                используется как есть (воркеры; миграцию делает планировщик)
+
+        Returns:
+            Имя физической коллекции, на которую указывает алиас
+        """
+        with _MIGRATION_LOCK:
+            return self._ensure_collection(name, size, distance, migrate)
+
+    def _ensure_collection(self, name: str, size: int, distance: models.Distance, migrate: bool) -> str:
+        aliases = self.aliases()
+        if name in aliases:
+            physical = aliases[name]
+            if self._matches(physical) or not self._may_migrate(name, physical, migrate):
+                return physical
+            target = self._next_version(name)
+            logger.info(f"[QDRANT] Migrating {name}: {physical} -> {target} ({self.settings.mode} quantization)")
+            copied = self._build_copy(physical, target, size, distance)
+            self._switch_alias(name, target, previous=True)
+            self.client.delete_collection(physical)
+            logger.info(f"[QDRANT] {name} -> {target}: {copied} points migrated, {physical} dropped")
+            return target
+
+        if self.client.collection_exists(name):
+            # Старая коллекция без алиаса: режим совпадает - оставляем как есть
+            if self._matches(name) or not self._may_migrate(name, name, migrate):
+                return name
+            target = self._next_version(name)
+            logger.info(f"[QDRANT] Migrating legacy collection {name} -> {target} ({self.settings.mode} quantization)")
+            copied = self._build_copy(name, target, size, distance)
+            self.client.delete_collection(name)
+            self._switch_alias(name, target, previous=False)
+            logger.info(f"[QDRANT] {name} -> {target}: {copied} points migrated")
+            return target
+
+        target = f"{name}_v1"
+        if not self.client.collection_exists(target):
+            self._create(target, size, distance)
+        self._switch_alias(name, target, previous=False)
+        logger.info(f"[QDRANT] Created {target} ({self.settings.mode} quantization) with alias {name}")
+        return target
+
+    def ensure_payload_indexes(self, name: str, fields: Sequence[str],
+                               schema: models.PayloadSchemaType = models.PayloadSchemaType.KEYWORD) -> List[str]:
+        """Keyword payload-индексы для полей фильтрации; возвращает созданные"""
+        if is_local_client(self.client):
+            # Локальный Qdrant не строит payload-индексы (только предупреждение на каждый вызов)
+            return []
+        existing = self.client.get_collection(name).payload_schema or {}
+        created = []
+        for field_name in fields:
+            if field_name in existing:
+                continue
+            self.client.create_payload_index(name, field_name=field_name, field_schema=schema, wait=True)
+            created.append(field_name)
+        if created:
+            logger.info(f"[QDRANT] Payload indexes created on {name}: {', '.join(created)}")
+        return created
+
+    def reset(self, name: str, size: int = 768, distance: models.Distance = models.Distance.COSINE) -> str:
+        """Удалить алиас ``name``, все версии ``name_vN`` и старую коллекцию, создать пустую"""
+        with _MIGRATION_LOCK:
+            if name in self.aliases():
+                self.client.update_collection_aliases(change_aliases_operations=[
+                    models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=name))])
+            for existing in [c.name for c in self.client.get_collections().collections]:
+                if existing == name or (existing.startswith(f"{name}_v") and _VERSION_RE.search(existing)):
+                    self.client.delete_collection(existing)
+                    logger.info(f"[QDRANT] Dropped {existing}")
+            return self._ensure_collection(name, size, distance, migrate=True)
+
+    def _may_migrate(self, name: str, physical: str, migrate: bool) -> bool:
+        if not migrate:
+            logger.warning(f"[QDRANT] {name} ({physical}) differs from the configured {self.settings.mode} "
+                           f"quantization; using it as is, migration runs from the run planner")
+        return migrate
+
+    def _build_copy(self, source: str, target: str, size: int, distance: models.Distance) -> int:
+        """Новая версия с копией точек; недостроенная версия удаляется"""
+        self._create(target, size, distance)
+        try:
+            return self.copy_points(source, target)
+        except BaseException:
+            logger.error(f"[QDRANT] Copy {source} -> {target} failed, dropping {target}")
+            try:
+                self.client.delete_collection(target)
+            except Exception as e:
+                logger.warning(f"[QDRANT] Could not drop {target}: {e}")
+            raise
+
+    def _matches(self, collection: str) -> bool:
+        info = self.client.get_collection(collection)
+        if quantization_mode(info) != self.settings.mode:
+            return False
+        vectors = info.config.params.vectors
+        on_disk = bool(getattr(vectors, 'on_disk', False)) if not isinstance(vectors, dict) else False
+        # Без квантования исходные векторы остаются в памяти, on_disk не сравнивается
+        return self.settings.mode == 'none' or on_disk == self.settings.on_disk
+
+    def _next_version(self, name: str) -> str:
+        versions = [0]
+        for existing in [c.name for c in self.client.get_collections().collections]:
+            if existing.startswith(f"{name}_v"):
+                match = _VERSION_RE.search(existing)
+                if match:
+                    versions.append(int(match.group(1)))
+        return f"{name}_v{max(versions) + 1}"
+
+    def _create(self, collection: str, size: int, distance: models.Distance):
+        on_disk = self.settings.on_disk and self.settings.mode != 'none'
+        self.client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(size=size, distance=distance, on_disk=on_disk),
+            quantization_config=self.settings.quantization_config(),
+        )
+
+    def _switch_alias(self, alias: str, collection: str, previous: bool):
+        operations = []
+        if previous:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection, alias_name=alias)))
+        # Удаление и создание в одном запросе - переключение атомарно для читателей
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+
+    def copy_points(self, source: str, target: str, batch_size: int = COPY_BATCH) -> int:
+        """Копирование точек и payload-индексов source -> target пачками scroll/upsert"""
+        info = self.client.get_collection(source)
+        for field_name, schema in (info.payload_schema or {}).items():
+            try:
+                self.client.create_payload_index(target, field_name=field_name, field_schema=schema.data_type)
+            except Exception as e:
+                logger.warning(f"[QDRANT] Payload index {field_name} not copied: {e}")
+
+        copied = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=source, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=True,
+            )
+            if points:
+                self.client.upsert(
+                    collection_name=target,
+                    points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                    wait=True,
+                )
+                copied += len(points)
+                if copied % (batch_size * 20) < len(points):
+                    logger.info(f"[QDRANT] {source} -> {target}: {copied} points copied")
+            if offset is None:
+                break
+        return copied
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    def search(self, collection: str, vector: List[float], limit: int = 10,
+               query_filter: Optional[models.Filter] = None, with_payload: Any = True,
+               exact: bool = False, ignore_quantization: bool = False):
+        """Поиск с оверсэмплингом по квантованным векторам и рескорингом по исходным"""
+        return self.client.search(
+            collection_name=collection,
+            query_vector=vector,
+            limit=limit,
+            query_filter=query_filter,
+            with_payload=with_payload,
+            search_params=self.settings.search_params(exact=exact, ignore_quantization=ignore_quantization),
+        )
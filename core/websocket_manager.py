@@ -1,30 +1,293 @@
-"""WebSocket connection manager for real-time updates"""
+"""WebSocket connection manager for real-time updates
+
+Broadcast hub: каждое соединение имеет ограниченную очередь отправки и
+собственную задачу-писатель, поэтому медленный клиент не задерживает
+остальных. Прогресс-сообщения с ключом (process_id) схлопываются - в очереди
+хранится только последнее состояние; при переполнении первыми отбрасываются
+самые старые прогресс-сообщения. Соединения, на которые не удаётся отправить,
+удаляются. Клиент может подписаться на топики ("process:<id>",
+"type:rag_training"), пока подписок нет - он получает все сообщения.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Union
 
 from fastapi import WebSocket
-from typing import List
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+
+class _Connection:
+    """Очередь отправки одного клиента.
+
+    Элемент очереди - слот [key, message, droppable]; слот прогресс-сообщения
+    остаётся в ``latest`` до отправки, и новое значение с тем же ключом
+    просто перезаписывает message.
+    """
+
+    __slots__ = ("websocket", "topics", "slots", "latest", "wakeup", "writer", "closed", "sent", "dropped")
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.topics: Set[str] = set()
+        self.slots: deque = deque()
+        self.latest: Dict[str, list] = {}
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+
+    def enqueue(self, message: str, key: Optional[str], progress: bool) -> bool:
+        """Поставить сообщение в очередь. False - очередь забита не-прогрессом, клиент не успевает."""
+        if key is not None:
+            slot = self.latest.get(key)
+            if slot is not None:
+                if progress:
+                    slot[1] = message
+                    return True
+                # Итоговое сообщение делает ожидающий прогресс устаревшим
+                slot[1] = None
+                del self.latest[key]
+        if len(self.slots) >= SEND_QUEUE_SIZE and not self._drop_oldest_progress():
+            return False
+        slot = [key, message, progress]
+        self.slots.append(slot)
+        if progress and key is not None:
+            self.latest[key] = slot
+        self.wakeup.set()
+        return True
+
+    def _drop_oldest_progress(self) -> bool:
+        for index, slot in enumerate(self.slots):
+            if slot[2] or slot[1] is None:
+                del self.slots[index]
+                if slot[1] is not None:
+                    self.dropped += 1
+                    if self.latest.get(slot[0]) is slot:
+                        del self.latest[slot[0]]
+                return True
+        return False
+
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self._connections: Dict[WebSocket, _Connection] = {}
+        self._topic_index: Dict[str, Set[_Connection]] = {}
+        # Клиенты без подписок получают все сообщения
+        self._wildcard: Set[_Connection] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self.evicted = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._connections)
 
     async def connect(self, websocket: WebSocket):
         try:
             await websocket.accept()
-            self.active_connections.append(websocket)
         except Exception as e:
             # If accept fails, don't add to connections
             raise e
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        conn = _Connection(websocket)
+        self._connections[websocket] = conn
+        self._wildcard.add(conn)
+        conn.writer = self._loop.create_task(self._writer(conn))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        conn = self._connections.pop(websocket, None)
+        if conn is None:
+            return
+        conn.closed = True
+        self._wildcard.discard(conn)
+        for topic in conn.topics:
+            subscribers = self._topic_index.get(topic)
+            if subscribers is not None:
+                subscribers.discard(conn)
+                if not subscribers:
+                    del self._topic_index[topic]
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return
+        for topic in topics:
+            conn.topics.add(topic)
+            self._topic_index.setdefault(topic, set()).add(conn)
+        if conn.topics:
+            self._wildcard.discard(conn)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        """Отписаться от топиков (None - от всех, клиент снова получает всё)"""
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return
+        for topic in list(conn.topics if topics is None else topics):
+            conn.topics.discard(topic)
+            subscribers = self._topic_index.get(topic)
+            if subscribers is not None:
+                subscribers.discard(conn)
+                if not subscribers:
+                    del self._topic_index[topic]
+        if not conn.topics:
+            self._wildcard.add(conn)
+
+    def handle_client_message(self, websocket: WebSocket, data: str) -> bool:
+        """Обработать управляющее сообщение клиента.
+
+        {"action": "subscribe"|"unsubscribe", "topics": [...]}; возвращает
+        True, если сообщение было управляющим.
+        """
+        if not data.startswith("{"):
+            return False
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return False
+        action = payload.get("action") if isinstance(payload, dict) else None
+        if action not in ("subscribe", "unsubscribe") or websocket not in self._connections:
+            return False
+        topics = payload.get("topics")
+        if isinstance(topics, str):
+            topics = [topics]
+        if action == "subscribe":
+            self.subscribe(websocket, topics or [])
+        else:
+            self.unsubscribe(websocket, topics)
+        self.send_to(websocket, json.dumps({"type": "subscriptions", "topics": sorted(self._connections[websocket].topics)}))
+        return True
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        self.send_to(websocket, message)
+
+    def send_to(self, websocket: WebSocket, message: str):
+        conn = self._connections.get(websocket)
+        if conn is not None and not conn.enqueue(message, None, False):
+            self._evict(conn, "send queue overflow")
+
+    def publish(self, message: str, topics: Union[str, Iterable[str], None] = None,
+                key: Optional[str] = None, progress: bool = False) -> int:
+        """
+        Разослать сообщение без ожидания отправки.
+
+        Args:
+            message: Текст сообщения
+            topics: Топик(и) сообщения; None - всем клиентам
+            key: Ключ схлопывания (например, process_id)
+            progress: Промежуточное сообщение - можно схлопнуть или отбросить
+
+        Returns:
+            Число соединений, в очередь которых попало сообщение
+        """
+        loop = self._loop
+        if loop is None or not self._connections:
+            return 0
+        if loop.is_closed():
+            return 0
+        if threading.get_ident() != self._loop_thread:
+            # Вызов из рабочего потока (обучение, Celery) - передаём в цикл событий
+            loop.call_soon_threadsafe(self.publish, message, topics, key, progress)
+            return 0
+
+        if topics is None:
+            targets = self._connections.values()
+        else:
+            if isinstance(topics, str):
+                topics = (topics,)
+            targets = set(self._wildcard)
+            for topic in topics:
+                subscribers = self._topic_index.get(topic)
+                if subscribers:
+                    targets.update(subscribers)
+
+        overflowed = []
+        delivered = 0
+        for conn in targets:
+            if conn.enqueue(message, key, progress):
+                delivered += 1
+            else:
+                overflowed.append(conn)
+        for conn in overflowed:
+            self._evict(conn, "send queue overflow")
+        return delivered
+
+    async def broadcast(self, message: str, topics: Union[str, Iterable[str], None] = None,
+                        key: Optional[str] = None, progress: bool = False):
+        self.publish(message, topics, key, progress)
+
+    def stats(self) -> Dict[str, int]:
+        conns = list(self._connections.values())
+        return {
+            "connections": len(conns),
+            "topics": len(self._topic_index),
+            "queued": sum(len(c.slots) for c in conns),
+            "sent": sum(c.sent for c in conns),
+            "dropped": sum(c.dropped for c in conns),
+            "evicted": self.evicted,
+        }
+
+    def _evict(self, conn: _Connection, reason: str):
+        if conn.closed:
+            return
+        logger.info(f"Evicting websocket connection: {reason}")
+        self.evicted += 1
+        self.disconnect(conn.websocket)
+        try:
+            asyncio.get_running_loop().create_task(self._close_quietly(conn.websocket))
+        except RuntimeError:
+            pass
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+    async def _writer(self, conn: _Connection):
+        try:
+            while not conn.closed:
+                if not conn.slots:
+                    conn.wakeup.clear()
+                    await conn.wakeup.wait()
+                    continue
+                slot = conn.slots.popleft()
+                if conn.latest.get(slot[0]) is slot:
+                    del conn.latest[slot[0]]
+                message = slot[1]
+                if message is None:
+                    continue
+                # asyncio.wait вместо wait_for: отмена писателя не теряется,
+                # даже если отправка завершилась в тот же момент
+                send = asyncio.ensure_future(conn.websocket.send_text(message))
+                try:
+                    done, _ = await asyncio.wait((send,), timeout=SEND_TIMEOUT_SECONDS)
+                except asyncio.CancelledError:
+                    send.cancel()
+                    raise
+                if not done:
+                    send.cancel()
+                    raise TimeoutError(f"send_text timed out after {SEND_TIMEOUT_SECONDS}s")
+                send.result()
+                conn.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._evict(conn, f"send failed: {e!r}")
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
 
 # Global instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
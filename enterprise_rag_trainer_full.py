@@ -12,6 +12,7 @@ import glob
 import traceback
 import re  # Single
 import math
+import contextlib
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
@@ -134,6 +135,30 @@ class Config:
     use_llm: bool = os.getenv('USE_LLM', '0').lower() in ('1', 'true')
     incremental_mode: bool = os.getenv('INCREMENTAL', '1').lower() in ('1', 'true')
     vlm_enabled: bool = os.getenv('VLM_ENABLED', '1').lower() in ('1', 'true')
+    # Сэмплирующий профилировщик обучения (core/sampling_profiler.py)
+    profile_enabled: bool = os.getenv('PROFILE_TRAINING', '0').lower() in ('1', 'true')
+    profile_dir: Path = Path(os.getenv('PROFILE_DIR', Path(os.getenv('BASE_DIR', Path.cwd() / 'data')) / 'reports' / 'profiles'))
+    # Поиск почти-дубликатов MinHash LSH (core/near_duplicates.py)
+    near_dup_enabled: bool = os.getenv('NEAR_DUP_ENABLED', '1').lower() in ('1', 'true')
+    near_dup_threshold: float = float(os.getenv('NEAR_DUP_THRESHOLD', 0.8))
+    near_dup_duplicate_threshold: float = float(os.getenv('NEAR_DUP_DUPLICATE_THRESHOLD', 0.95))
+    near_dup_chunk_threshold: float = float(os.getenv('NEAR_DUP_CHUNK_THRESHOLD', 0.9))
+    # Токенный чанкинг Stage 13 (core/token_chunker.py), длина в токенах энкодера
+    chunk_max_tokens: int = int(os.getenv('CHUNK_MAX_TOKENS', 480))
+    chunk_overlap_tokens: int = int(os.getenv('CHUNK_OVERLAP_TOKENS', 48))
+    # Квантование enterprise_docs (core/vector_storage.py): scalar | product | none
+    qdrant_quantization: str = os.getenv('QDRANT_QUANTIZATION', 'scalar').lower()
+    qdrant_oversampling: float = float(os.getenv('QDRANT_OVERSAMPLING', 2.0))
+    qdrant_vectors_on_disk: bool = os.getenv('QDRANT_VECTORS_ON_DISK', '1').lower() in ('1', 'true')
+    # Миграция при смене квантования; Celery воркеры выключают, её делает планировщик запуска
+    qdrant_migrate: bool = os.getenv('QDRANT_MIGRATE', '1').lower() in ('1', 'true')
+    # Q&A пары по чанкам через LLM (core/qa_generation.py): батчи под бюджет токенов, кэш.
+    # Выключено по умолчанию: первый прогон корпуса - один вызов GPU LLM на каждые ~QA_TOKEN_BUDGET
+    # токенов текста, заметно дольше остальных этапов; повторные прогоны идут из кэша
+    qa_generation_enabled: bool = os.getenv('QA_GENERATION', '0').lower() in ('1', 'true')
+    qa_token_budget: int = int(os.getenv('QA_TOKEN_BUDGET', 2048))
+    qa_concurrency: int = int(os.getenv('QA_CONCURRENCY', 1))
+    qa_pairs_per_chunk: int = int(os.getenv('QA_PAIRS_PER_CHUNK', 2))
 
     def __post_init__(self):
         for d in [self.log_dir, self.cache_dir, self.reports_dir, self.processed_dir]:
@@ -598,6 +623,17 @@ class SmartQueue:
 class SimpleHierarchicalChunker:
     """Встроенная реализация иерархического чанкера"""
     
+    # Паттерны заголовков компилируются один раз и объединены в одно выражение
+    HEADER_RE = re.compile('|'.join([
+        r'^\d+\.?\s+[А-ЯЁа-яё]',  # "1. Заголовок"
+        r'^\d+\.\d+\.?\s+[А-ЯЁа-яё]',  # "1.1. Подзаголовок"
+        r'^[А-ЯЁ\s]{8,}$',  # "ЗАГОЛОВОК БОЛЬШИМИ БУКВАМИ"
+        r'^ГЛАВА\s+\d+',  # "ГЛАВА 1"
+        r'^РАЗДЕЛ\s+\d+',  # "РАЗДЕЛ 1"
+        r'^Пункт\s+\d+',  # "Пункт 1"
+        r'^\d+\s+[А-ЯЁа-яё]',  # "1 Заголовок"
+    ]))
+    
     def __init__(self, target_chunk_size=1024, min_chunk_size=200, max_chunk_size=2048):
         self.target_chunk_size = target_chunk_size
         self.min_chunk_size = min_chunk_size
@@ -623,51 +659,27 @@ class SimpleHierarchicalChunker:
     def _detect_sections(self, content: str) -> List[Dict]:
         """Улучшенное обнаружение секций в тексте"""
         
-        lines = content.split('\n')
         sections = []
-        current_section = {'title': 'Начало документа', 'content': '', 'level': 0}
+        title, level, lines = 'Начало документа', 0, []
         
-        # Улучшенные паттерны для заголовков
-        header_patterns = [
-            r'^\d+\.?\s+[А-ЯЁа-яё]',  # "1. Заголовок"
-            r'^\d+\.\d+\.?\s+[А-ЯЁа-яё]',  # "1.1. Подзаголовок"
-            r'^[А-ЯЁ\s]{8,}$',  # "ЗАГОЛОВОК БОЛЬШИМИ БУКВАМИ"
-            r'^ГЛАВА\s+\d+',  # "ГЛАВА 1"
-            r'^РАЗДЕЛ\s+\d+',  # "РАЗДЕЛ 1"
-            r'^Пункт\s+\d+',  # "Пункт 1"
-            r'^\d+\s+[А-ЯЁа-яё]',  # "1 Заголовок"
-        ]
-        
-        for line in lines:
+        for line in content.split('\n'):
             line = line.strip()
             if not line:
                 continue
             
-            # Проверяем на заголовок
-            is_header = False
-            for pattern in header_patterns:
-                if re.match(pattern, line):
-                    is_header = True
-                    break
-            
-            if is_header:
+            if self.HEADER_RE.match(line):
                 # Сохраняем предыдущую секцию
-                if current_section['content'].strip():
-                    sections.append(current_section.copy())
+                if lines:
+                    sections.append({'title': title, 'content': '\n'.join(lines) + '\n', 'level': level})
                 
                 # Начинаем новую секцию
-                level = line.count('.') + 1 if '.' in line else 1
-                current_section = {
-                    'title': line[:150],
-                    'content': '',
-                    'level': level
-                }
+                title, level, lines = line[:150], (line.count('.') + 1 if '.' in line else 1), []
             else:
-                current_section['content'] += line + '\n'
+                lines.append(line)
         
         # Добавляем последнюю секцию
-        if current_section['content'].strip():
-            sections.append(current_section)
+        if lines:
+            sections.append({'title': title, 'content': '\n'.join(lines) + '\n', 'level': level})
         
         # Если секций мало - разбиваем по абзацам
         if len(sections) < 3:
@@ -682,32 +694,28 @@ class SimpleHierarchicalChunker:
         paragraphs = [p.strip() for p in content.split('\n\n') if len(p.strip()) > 50]
         
         sections = []
-        current_content = ""
+        current = []
         current_word_count = 0
-        section_num = 1
         
         for paragraph in paragraphs:
             paragraph_words = len(paragraph.split())
             
             # Когда накопилось 500+ слов - создаем секцию
-            if current_word_count + paragraph_words > 500 and current_content:
+            if current_word_count + paragraph_words > 500 and current:
                 sections.append({
-                    'title': f'Секция {section_num}',
-                    'content': current_content.strip(),
+                    'title': f'Секция {len(sections) + 1}',
+                    'content': '\n\n'.join(current),
                     'level': 1
                 })
-                current_content = paragraph + '\n\n'
-                current_word_count = paragraph_words
-                section_num += 1
-            else:
-                current_content += paragraph + '\n\n'
-                current_word_count += paragraph_words
+                current, current_word_count = [], 0
+            current.append(paragraph)
+            current_word_count += paragraph_words
         
         # Последняя секция
-        if current_content.strip():
+        if current:
             sections.append({
-                'title': f'Секция {section_num}',
-                'content': current_content.strip(),
+                'title': f'Секция {len(sections) + 1}',
+                'content': '\n\n'.join(current),
                 'level': 1
             })
         
@@ -1062,6 +1070,11 @@ class EnterpriseRAGTrainer:
             'files_processed': 0,
             'files_failed': 0,
             'files_skipped': 0,  # Новый счётчик пропущенных файлов
+            'near_duplicates': 0,
+            'redundant_chunks': 0,
+            'qa_pairs': 0,
+            'qa_cache_hits': 0,
+            'qa_cache_misses': 0,
             'total_chunks': 0,
             'total_works': 0,
             'start_time': time.time()
@@ -1070,6 +1083,15 @@ class EnterpriseRAGTrainer:
         # Инициализация улучшенных компонентов
         logger.info("Initializing enhanced components...")
         self.performance_monitor = EnhancedPerformanceMonitor()
+        self.profiler = None
+        self.near_duplicates = None  # индекс MinHash, открывается при первом документе
+        self.chunk_store = None  # тексты и метаданные чанков вне Qdrant (core/chunk_store.py)
+        self.qa_engine = None  # генерация Q&A батчами с кэшем, создается при первом документе
+        self._current_near_duplicate = None
+        self._pending_near_duplicate = None  # (file_hash, text, canonical) - индексируется после Stage 14
+        self._token_chunker = None  # пересоздаётся при смене SBERT модели (токенизатора)
+        self._token_chunker_model_name = None
+        self.last_chunking_report = {}
         # !!! ИСПРАВЛЕНИЕ: Увеличиваем кэш для 1200+ документов! !!!
         self.embedding_cache = EmbeddingCache(cache_dir=str(self.embedding_cache_dir), max_size_mb=5000)  # 5 ГБ кэша
         self.smart_queue = SmartQueue()
@@ -1939,11 +1961,14 @@ JSON:"""}
     
     def _extract_works_from_estimate_excel(self, file_path: str) -> Dict:
         """Парсинг Excel-смет для извлечения расценок и объёмов"""
+        if file_path.lower().endswith(('.xlsx', '.xlsm')):
+            return self._extract_works_from_estimate_xlsx_streaming(file_path)
+        
         try:
             import pandas as pd
             import re
             
-            # Читаем Excel файл
+            # Читаем Excel файл (.xls - openpyxl его не читает)
             excel_data = pd.read_excel(file_path, sheet_name=None)  # Все листы
             
             estimate_items = []
@@ -2070,6 +2095,59 @@ JSON:"""}
             logger.error(f"Excel estimate parsing failed: {e}")
             return {}
     
+    def _extract_works_from_estimate_xlsx_streaming(self, file_path: str) -> Dict:
+        """Потоковый парсинг .xlsx-сметы: все листы, объединенные ячейки, векторная классификация"""
+        try:
+            from core.streaming_estimate_parser import StreamingEstimateParser
+            
+            workbook = StreamingEstimateParser().parse_workbook(file_path)
+            
+            estimate_items = []
+            total_cost = 0.0
+            for position in workbook['positions']:
+                # Только строки с шифром расценки вида 08-01-001 и осмысленным наименованием
+                if not position['code_number'] or len(position['description']) < 5:
+                    continue
+                quantity = position['quantity'] or 1.0
+                total = position['total_cost'] or quantity * position['price']
+                estimate_items.append({
+                    'code': position['code'],
+                    'name': position['description'],
+                    'unit': position['unit'] or 'шт',
+                    'quantity': quantity,
+                    'price': position['price'],
+                    'total': total
+                })
+                total_cost += total
+            
+            # Номер сметы ищем в строках над заголовком таблицы
+            estimate_number = ""
+            for sheet in workbook['sheets']:
+                for line in sheet['preamble']:
+                    match = re.search(r'[А-Я]{2,}-\d+[\w.\-]*', line)
+                    if match:
+                        estimate_number = match.group(0)
+                        break
+                if estimate_number:
+                    break
+            
+            if not estimate_number:
+                content_hash = hashlib.md5(str(estimate_items).encode()).hexdigest()[:8]
+                estimate_number = f"СМ-{content_hash}"
+            
+            logger.info(f"Смета {Path(file_path).name}: {len(workbook['sheets'])} листов, "
+                        f"{len(estimate_items)} расценок")
+            return {
+                'items': estimate_items,
+                'estimate_number': estimate_number,
+                'total_cost': total_cost,
+                'sheets_processed': len(workbook['sheets'])
+            }
+            
+        except Exception as e:
+            logger.error(f"Excel estimate parsing failed: {e}")
+            return {}
+    
     def _extract_stages_from_ppr_docx(self, content: str) -> Dict:
         """Парсинг DOCX-ППР для извлечения этапов работ и технологических карт"""
         try:
@@ -3089,23 +3167,30 @@ JSON:"""}
                     logger.error(f"Failed to connect to local Qdrant: {local_err}")
                     raise local_err
             
+            from core.vector_storage import QuantizedStorage, QuantizationSettings
+            self.vector_storage = QuantizedStorage(self.qdrant, QuantizationSettings(
+                mode=self.config.qdrant_quantization,
+                oversampling=self.config.qdrant_oversampling,
+                on_disk=self.config.qdrant_vectors_on_disk,
+            ))
+            
             # Создаем коллекцию если не существует с ретри
             collection_created = False
             for attempt in range(3):  # 3 попытки создания коллекции
                 try:
                     logger.info(f"Checking/creating Qdrant collection (attempt {attempt + 1}/3)")
-                    collections = self.qdrant.get_collections().collections
-                    collection_names = [col.name for col in collections]
-                    
-                    if "enterprise_docs" not in collection_names:
-                        # !!! ИСПРАВЛЕНИЕ: Правильный размер для SBERT модели! !!!
-                        self.qdrant.create_collection(
-                            collection_name="enterprise_docs",
-                            vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE)  # 768 для DeepPavlov/rubert-base-cased
-                        )
-                        logger.info("Created Qdrant collection: enterprise_docs")
-                    else:
-                        logger.info("Qdrant collection exists: enterprise_docs")
+                    # enterprise_docs - алиас над квантованной коллекцией (core/vector_storage.py),
+                    # при смене режима квантования миграция с переключением алиаса
+                    physical = self.vector_storage.ensure_collection(
+                        "enterprise_docs", size=768,  # 768 для DeepPavlov/rubert-base-cased
+                        migrate=self.config.qdrant_migrate)
+                    logger.info(f"Qdrant collection ready: enterprise_docs -> {physical} "
+                                f"({self.vector_storage.settings.mode} quantization)")
+                    try:
+                        from core.chunk_store import PAYLOAD_FIELDS
+                        self.vector_storage.ensure_payload_indexes("enterprise_docs", PAYLOAD_FIELDS)
+                    except Exception as index_err:
+                        logger.warning(f"Qdrant payload indexes not created: {index_err}")
                     collection_created = True
                     break
                 except Exception as coll_err:
@@ -3118,11 +3203,8 @@ JSON:"""}
                 logger.error("Failed to create Qdrant collection after 3 attempts")
                 # Принудительно создаем коллекцию в последний раз
                 try:
-                    # !!! ИСПРАВЛЕНИЕ: Правильный размер для SBERT модели! !!!
-                    self.qdrant.create_collection(
-                        collection_name="enterprise_docs",
-                        vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE)  # 768 для DeepPavlov/rubert-base-cased
-                    )
+                    self.vector_storage.ensure_collection("enterprise_docs", size=768,
+                                                          migrate=self.config.qdrant_migrate)
                     logger.info("Force-created Qdrant collection: enterprise_docs")
                 except Exception as force_err:
                     logger.error(f"Failed to force-create collection: {force_err}")
@@ -3131,6 +3213,7 @@ JSON:"""}
         except Exception as e:
             logger.error(f"Failed to init Qdrant: {e}")
             self.qdrant = None
+            self.vector_storage = None
         
         # Neo4j (опционально) - БЕЗ АВТОРИЗАЦИИ
         try:
@@ -3210,6 +3293,7 @@ JSON:"""}
         logger.info(f"Max files: {max_files if max_files else 'ALL'}")
         
         start_time = time.time()
+        self._start_profiler()
         
         try:
             # ===== STAGE 0: Smart File Scanning + NTD Preprocessing =====
@@ -3247,7 +3331,8 @@ JSON:"""}
                 for attempt in range(3):
                     try:
                         # 🚀 ПОЛНЫЙ ЦИКЛ ОБУЧЕНИЯ: Используем _process_full_training_pipeline для всех этапов 0-15
-                        success = self._process_full_training_pipeline(file_path)
+                        with self._profile_document(file_path):
+                            success = self._process_full_training_pipeline(file_path)
                         
                         if success:
                             self.stats['files_processed'] += 1
@@ -3282,6 +3367,36 @@ JSON:"""}
             logger.error(f"Training failed: {e}")
             logger.error(traceback.format_exc())
             raise
+        finally:
+            self._stop_profiler()
+    
+    def _start_profiler(self):
+        """Запуск сэмплирующего профилировщика (PROFILE_TRAINING=1)"""
+        if not self.config.profile_enabled or self.profiler is not None:
+            return
+        try:
+            from core.sampling_profiler import SamplingProfiler
+            self.profiler = SamplingProfiler(str(self.config.profile_dir))
+            self.profiler.start()
+        except Exception as e:
+            logger.warning(f"[PROFILE] Profiler not started: {e}")
+            self.profiler = None
+    
+    def _profile_document(self, file_path: str):
+        """Контекст, помечающий сэмплы профилировщика текущим файлом"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.document(file_path)
+    
+    def _stop_profiler(self):
+        if self.profiler is None:
+            return
+        try:
+            run_dir = self.profiler.stop()
+            logger.info(f"[PROFILE] Flamegraph data saved to: {run_dir}")
+        except Exception as e:
+            logger.warning(f"[PROFILE] Failed to write profile: {e}")
+        self.profiler = None
     
     def _process_single_document_api(self, file_path: str) -> Optional[Dict]:
         """
@@ -3452,6 +3567,13 @@ JSON:"""}
             # Сохраняем текст для использования в извлечении ссылок на НТД
             self._current_document_text = content
             
+            # ===== STAGE 3.6: Near-duplicate Detection (MinHash LSH) =====
+            near_duplicate = self._stage3_6_near_duplicate_check(content, file_path, file_hash)
+            if near_duplicate is not None and near_duplicate.is_duplicate:
+                self.stats['files_skipped'] += 1
+                self._save_processed_file_info(file_path, file_hash, 'duplicate', 0)
+                return True
+            
             # ===== STAGE 4: Document Type Detection =====
             doc_type_info = self._stage4_document_type_detection(content, file_path)
             
@@ -3509,6 +3631,10 @@ JSON:"""}
             metadata_dict = metadata.to_dict()
             chunks = self._stage13_smart_chunking(content, structural_data, metadata_dict, doc_type_info)
             
+            # ===== STAGE 13.5: Q&A Generation =====
+            self._stage13_5_qa_generation(chunks, file_path, duplicate_result['file_hash'],
+                                          doc_type_info, type_specific_data)
+            
             # ===== STAGE 14: Save to Qdrant =====
             # Конвертируем DocumentMetadata в словарь
             metadata_dict = metadata.to_dict()
@@ -3947,8 +4073,12 @@ JSON:"""}
                     is_duplicate = True
                     # Получаем информацию о дублирующемся файле из Qdrant
                     duplicate_record = search_result[0][0]
-                    if 'file_path' in duplicate_record.payload:
-                        original_name = Path(duplicate_record.payload['file_path']).name
+                    # Путь файла хранится в chunk_store.db (в payload - только у старых точек)
+                    store = self._chunk_store()
+                    document = store.document(file_hash) if store is not None else None
+                    original_path = (document or {}).get('file_path') or duplicate_record.payload.get('file_path')
+                    if original_path:
+                        original_name = Path(original_path).name
                         duplicate_source = f" (duplicates: {original_name})"
                     else:
                         duplicate_source = " (duplicates: existing file in Qdrant)"
@@ -3982,6 +4112,77 @@ JSON:"""}
         
         return result
     
+    def _chunk_store(self):
+        """Хранилище текстов и метаданных чанков (base_dir/chunk_store.db) или None"""
+        if self.chunk_store is None:
+            try:
+                from core.chunk_store import ChunkStore
+                self.chunk_store = ChunkStore(self.base_dir / 'chunk_store.db')
+            except Exception as e:
+                logger.warning(f"[CHUNK STORE] Unavailable, chunk metadata goes into Qdrant payloads: {e}")
+                return None
+        return self.chunk_store
+    
+    def _near_duplicate_index(self):
+        """MinHash LSH индекс корпуса (base_dir/near_duplicates.db) или None"""
+        if not self.config.near_dup_enabled:
+            return None
+        if self.near_duplicates is None:
+            try:
+                from core.near_duplicates import NearDuplicateIndex
+                self.near_duplicates = NearDuplicateIndex(
+                    self.base_dir / 'near_duplicates.db',
+                    near_threshold=self.config.near_dup_threshold,
+                    duplicate_threshold=self.config.near_dup_duplicate_threshold,
+                    chunk_threshold=self.config.near_dup_chunk_threshold,
+                )
+            except Exception as e:
+                logger.warning(f"[NEAR-DUP] Index unavailable, near-duplicate detection disabled: {e}")
+                self.config.near_dup_enabled = False
+                return None
+        return self.near_duplicates
+    
+    def _stage3_6_near_duplicate_check(self, content: str, file_path: str, file_hash: str):
+        """
+        STAGE 3.6: Near-duplicate Detection
+        
+        Сравнивает нормализованный текст с корпусом по MinHash: тот же документ
+        в другом формате (скан / текстовый PDF) - duplicate, новая редакция -
+        near_duplicate со ссылкой на каноничный документ группы. Сам документ
+        попадает в индекс только после успешного сохранения на Stage 14.
+        """
+        self._current_near_duplicate = None
+        self._pending_near_duplicate = None
+        index = self._near_duplicate_index()
+        if index is None or not file_hash:
+            return None
+        
+        start_time = time.time()
+        try:
+            verdict = index.classify(file_hash, content)
+        except Exception as e:
+            logger.warning(f"[Stage 3.6/14] Near-duplicate check failed: {e}")
+            return None
+        
+        elapsed = time.time() - start_time
+        if not verdict.is_duplicate:
+            self._pending_near_duplicate = (file_hash, content, verdict.canonical)
+        if verdict.status == 'new':
+            logger.info(f"[Stage 3.6/14] NEW DOCUMENT (max similarity {verdict.similarity:.2f}, {elapsed:.2f}s)")
+            return verdict
+        
+        self.stats['near_duplicates'] += 1
+        sibling = next((pf.get('file_path') for pf in self.processed_files
+                        if isinstance(pf, dict) and pf.get('file_hash') == verdict.sibling), verdict.sibling)
+        if verdict.is_duplicate:
+            logger.info(f"[Stage 3.6/14] DUPLICATE of {Path(str(sibling)).name} "
+                        f"(similarity {verdict.similarity:.2f}), skipping stages 4-15: {Path(file_path).name}")
+        else:
+            self._current_near_duplicate = verdict
+            logger.info(f"[Stage 3.6/14] NEAR-DUPLICATE of {Path(str(sibling)).name} "
+                        f"(similarity {verdict.similarity:.2f}, canonical {verdict.canonical[:16]}...) ({elapsed:.2f}s)")
+        return verdict
+    
     def _calculate_file_hash(self, file_path: str) -> str:
         """Вычисление MD5 хеша файла"""
         
@@ -4060,7 +4261,7 @@ JSON:"""}
     def _stage3_text_extraction(self, file_path: str) -> str:
         """Unified extraction (best from duplicates + LangChain fallback)."""
         ext = Path(file_path).suffix.lower()
-        if ext not in ['.pdf', '.docx', '.doc', '.txt', '.xlsx']:
+        if ext not in ['.pdf', '.docx', '.doc', '.txt', '.xlsx', '.xlsm']:
             logger.warning(f"Unsupported ext: {ext}")
             return ''
         
@@ -4069,6 +4270,10 @@ JSON:"""}
         if file_size > 50 * 1024 * 1024:  # > 50MB
             logger.info(f"[LARGE FILE] Processing {file_size/1024/1024:.1f}MB file - expecting high-quality extraction")
         
+        # Excel: все листы потоково, таблицы с повтором заголовков (не зависит от OCR библиотек)
+        if ext in ['.xlsx', '.xlsm']:
+            return self._extract_spreadsheet_text(file_path)
+        
         if HAS_FILE_PROCESSING:
             try:
                 if ext == '.pdf':
@@ -4099,9 +4304,6 @@ JSON:"""}
                 elif ext == '.txt':
                     with open(file_path, 'r', encoding='utf-8') as f:
                         return self._clean_text(f.read())
-                elif ext == '.xlsx':
-                    df = pd.read_excel(file_path, sheet_name=0)  # First sheet
-                    return self._clean_text(df.to_string())
             except Exception as e:
                 logger.error(f"Extraction failed {ext}: {e}")
                 return ''
@@ -4111,6 +4313,30 @@ JSON:"""}
             return self._ocr_fallback(file_path)
         return ''
     
+    def _extract_spreadsheet_text(self, file_path: str) -> str:
+        """Текст всех листов Excel-книги группами строк с заголовками таблиц"""
+        try:
+            from core.spreadsheet_extractor import SpreadsheetExtractor
+            
+            extractor = SpreadsheetExtractor()
+            # Без _clean_text: он склеивает строки и убирает "|", а Stage 13 режет таблицы по строкам
+            content = extractor.extract_text(file_path)
+            stats = extractor.stats
+            logger.info(f"[EXCEL] {Path(file_path).name}: {stats.sheets} sheets, {stats.tables} tables, "
+                        f"{stats.rows} rows, {stats.groups} row groups, {stats.chars} chars")
+            return content
+        except ImportError:
+            # Без openpyxl - все листы через pandas
+            try:
+                sheets = pd.read_excel(file_path, sheet_name=None)
+                return '\n\n'.join(f"Лист «{name}»\n{frame.to_string()}" for name, frame in sheets.items())
+            except Exception as e:
+                logger.error(f"Extraction failed {file_path}: {e}")
+                return ''
+        except Exception as e:
+            logger.error(f"Extraction failed {file_path}: {e}")
+            return ''
+    
     def _ocr_fallback(self, file_path: str) -> str:
         """Unified OCR (from all duplicates)."""
         if not HAS_OCR_LIBS:
@@ -9328,13 +9554,17 @@ JSON:"""}
         chunks = []
         
         try:
-            # 🎯 СПЕЦИАЛЬНАЯ ЛОГИКА ДЛЯ НТД ДОКУМЕНТОВ
+            # 🎯 НТД документы: отдельный чанк с заголовком документа
             doc_type = doc_type_info.get('doc_type', '')
-            if doc_type in ['sp', 'gost', 'snip']:
-                logger.info(f"[Stage 13/14] [NTD] Специальный чанкинг для {doc_type}")
-                ntd_chunks = self._create_ntd_chunks(content, structural_data, metadata, doc_type_info)
-                chunks.extend(ntd_chunks)
-                logger.info(f"[Stage 13/14] [NTD] Создано {len(ntd_chunks)} чанков для НТД")
+            title = metadata.get('title', '')
+            if doc_type in ['sp', 'gost', 'snip'] and title:
+                chunks.append(DocumentChunk(
+                    content=f"Документ: {title}",
+                    chunk_id="ntd_title",
+                    metadata=metadata,
+                    section_id="Заголовок документа",
+                    chunk_type="title"
+                ))
             
             # Проверяем наличие изолированного приказа
             order_isolation = metadata.get('order_isolation')
@@ -9348,75 +9578,48 @@ JSON:"""}
                 # Используем основной контент для обычного чанкинга
                 content = order_isolation.get('main_content', content)
             
-            # 🚀 ОПТИМИЗАЦИЯ: Используем структурные данные для умного чанкинга
-            sections = structural_data.get('sections', [])
-            paragraphs = structural_data.get('paragraphs', [])
-            
-            if sections or paragraphs:
-                # Используем структурные данные для чанкинга
-                logger.info(f"[PERF] Chunking from structure: {len(sections)} sections, {len(paragraphs)} paragraphs")
-                
-                # Чанки на основе секций
-                for i, section in enumerate(sections):
-                    section_text = section.get('text', '')
-                    section_title = section.get('title', '')
-                    logger.info(f"[DEBUG] Section {i}: title='{section_title}', text_length={len(section_text)}")
-                    
-                    if section_text and len(section_text.strip()) > 50:
-                        chunk = DocumentChunk(
-                            content=section_text,
-                            chunk_id=f"section_{i}",
-                            metadata=metadata,
-                            section_id=section_title
-                        )
-                        chunks.append(chunk)
-                        logger.info(f"[DEBUG] Created chunk for section {i}: {chunk.chunk_id}")
-                    else:
-                        logger.warning(f"[DEBUG] Section {i} skipped: text too short or empty")
-                
-                # Чанки на основе параграфов
-                for i, paragraph in enumerate(paragraphs):
-                    if paragraph.get('text') and len(paragraph['text'].strip()) > 50:
-                        chunk = DocumentChunk(
-                            content=paragraph['text'],
-                            chunk_id=f"paragraph_{i}",
-                            metadata=metadata
-                        )
-                        chunks.append(chunk)
-            else:
-                # Fallback к обычному чанкингу
-                logger.info(f"[PERF] Chunking from structure: fallback to text-based chunking")
-                chunk_size = 1024
-                overlap = 50
-                
-                # Разбиваем контент на чанки
-                for i in range(0, len(content), chunk_size - overlap):
-                    chunk_text = content[i:i + chunk_size]
-                    if len(chunk_text.strip()) > 50:  # Минимальный размер чанка
-                        chunk = DocumentChunk(
-                            content=chunk_text,
-                            chunk_id=f"chunk_{i}",
-                            metadata=metadata
-                        )
-                        chunks.append(chunk)
+            # 🚀 Токенный структурный чанкинг: секции и абзацы Stage 5, иначе весь текст
+            sections = []
+            for section in structural_data.get('sections', []):
+                text = section.get('text') or section.get('content') or ''
+                if text.strip():
+                    sections.append((section.get('title', ''), text))
+            # Абзацы, которых нет в тексте секций, чанкуются отдельно. Проверка по множеству
+            # нормализованных секций, их абзацев и строк - без поиска подстроки по всему документу
+            covered = set()
+            for _, text in sections:
+                covered.add(' '.join(text.split()))
+                for block in re.split(r'\n\s*\n', text):
+                    covered.add(' '.join(block.split()))
+                covered.update(' '.join(line.split()) for line in text.splitlines())
+            paragraphs = 0
+            for paragraph in structural_data.get('paragraphs', []):
+                title, text = ('', paragraph) if isinstance(paragraph, str) else \
+                    (paragraph.get('title', ''), paragraph.get('text') or paragraph.get('content') or '')
+                normalized = ' '.join(text.split())
+                if normalized and normalized not in covered:
+                    covered.add(normalized)
+                    sections.append((title, text))
+                    paragraphs += 1
+            if not sections:
+                sections = [('', content)]
+            logger.info(f"[PERF] Chunking from structure: {len(sections) - paragraphs} sections, {paragraphs} paragraphs")
+            
+            text_chunks, report = self._get_token_chunker().chunk_sections(sections)
+            for i, text_chunk in enumerate(text_chunks):
+                chunks.append(DocumentChunk(
+                    content=text_chunk.text,
+                    chunk_id=f"chunk_{i}",
+                    metadata=metadata,
+                    section_id=text_chunk.section,
+                    chunk_type="clause" if text_chunk.clauses else "paragraph"
+                ))
             
-            # Если не создали чанки из структурных данных, используем fallback
-            if not chunks and content:
-                logger.warning(f"[DEBUG] No chunks created from structure, using fallback chunking")
-                chunk_size = 1024
-                overlap = 50
-                
-                # Разбиваем контент на чанки
-                for i in range(0, len(content), chunk_size - overlap):
-                    chunk_text = content[i:i + chunk_size]
-                    if len(chunk_text.strip()) > 50:  # Минимальный размер чанка
-                        chunk = DocumentChunk(
-                            content=chunk_text,
-                            chunk_id=f"fallback_{i}",
-                            metadata=metadata
-                        )
-                        chunks.append(chunk)
-                        logger.info(f"[DEBUG] Created fallback chunk {i}: {chunk.chunk_id}")
+            self.last_chunking_report = report.to_dict()
+            logger.info(f"[Stage 13/14] Chunk tokens: min {report.min_tokens}, p50 {report.p50_tokens}, "
+                        f"p90 {report.p90_tokens}, max {report.max_tokens}; split units {report.split_units}, "
+                        f"truncation rate {report.truncation_rate:.1%}"
+                        f"{'' if report.exact_tokens else ' (approximate token counts)'}")
             
             # 🚀 ОПТИМИЗАЦИЯ: Кэширование эмбеддингов на уровне этапа
             if hasattr(self, 'sbert_model') and self.sbert_model is not None:
@@ -9444,6 +9647,117 @@ JSON:"""}
             # 🚀 CONTEXT SWITCHING: SBERT остается загруженным для Stage 14
             logger.info(f"[VRAM MANAGER] SBERT kept loaded for Stage 14")
     
+    def _get_qa_engine(self):
+        """Движок Q&A на GPU LLM (base_dir/qa_cache.db) или None без LLM"""
+        if not self.config.qa_generation_enabled or not getattr(self, 'gpu_llm_model', None):
+            return None
+        if self.qa_engine is None:
+            try:
+                from core.qa_generation import QAGenerationEngine
+                tokenizer = self.gpu_llm_tokenizer
+                self.qa_engine = QAGenerationEngine(
+                    self._qa_llm_generate,
+                    model=self.config.llm_model,
+                    cache_path=self.base_dir / 'qa_cache.db',
+                    token_budget=self.config.qa_token_budget,
+                    pairs_per_chunk=self.config.qa_pairs_per_chunk,
+                    concurrency=self.config.qa_concurrency,
+                    count_tokens=lambda text: len(tokenizer.encode(text, add_special_tokens=False)),
+                )
+            except Exception as e:
+                logger.warning(f"[QA] Engine unavailable, LLM Q&A generation disabled: {e}")
+                self.config.qa_generation_enabled = False
+                return None
+        return self.qa_engine
+    
+    def _qa_llm_generate(self, prompt: str) -> str:
+        """Один вызов GPU LLM на батч фрагментов"""
+        inputs = self.gpu_llm_tokenizer.apply_chat_template(
+            [{"role": "user", "content": prompt}],
+            tokenize=True,
+            add_generation_prompt=True,
+            return_tensors="pt"
+        ).to(self.gpu_llm_model.device)
+        pad_token_id = self.gpu_llm_tokenizer.pad_token_id if self.gpu_llm_tokenizer.pad_token_id is not None else self.gpu_llm_tokenizer.eos_token_id
+        with torch.no_grad():
+            output = self.gpu_llm_model.generate(
+                inputs,
+                max_new_tokens=min(2048, 160 * self.config.qa_pairs_per_chunk * max(1, prompt.count('Фрагмент '))),
+                do_sample=False,
+                pad_token_id=pad_token_id,
+                eos_token_id=self.gpu_llm_tokenizer.eos_token_id,
+            )
+        return self.gpu_llm_tokenizer.decode(output[0][inputs.shape[-1]:], skip_special_tokens=True).strip()
+    
+    def _stage13_5_qa_generation(self, chunks: List[DocumentChunk], file_path: str, file_hash: str,
+                                 doc_type_info: Dict, type_specific_data: Dict) -> List[Dict]:
+        """
+        STAGE 13.5: Q&A Generation
+        
+        Шаблонные пары Stage 10 дополняются парами LLM по чанкам: чанки
+        упаковываются в промпты под бюджет токенов, результаты кэшируются по
+        хешу текста чанка, повторяющиеся вопросы документа отбрасываются.
+        Набор сохраняется в base_dir/qa_pairs/<file_hash>.json.
+        """
+        pairs = [{**pair, 'source': 'template'} for pair in (type_specific_data or {}).get('qa_pairs', [])]
+        engine = self._get_qa_engine()
+        if engine is not None and chunks:
+            try:
+                result = engine.run([{
+                    'text': chunk.content,
+                    'chunk_id': chunk.chunk_id,
+                    'source_section': chunk.section_id,
+                    'doc_type': doc_type_info.get('doc_type', 'unknown'),
+                } for chunk in chunks])
+                stats = result.stats
+                self.stats['qa_cache_hits'] += stats.cache_hits
+                self.stats['qa_cache_misses'] += stats.cache_misses
+                logger.info(f"[Stage 13.5/14] Q&A: {stats.pairs} pairs from {stats.chunks} chunks, "
+                            f"cache hits {stats.cache_hits}/{stats.cache_hits + stats.cache_misses} "
+                            f"({stats.cache_hit_rate:.0%}), {stats.batches} batches "
+                            f"({stats.failed_batches} failed, {stats.unanswered} chunks unanswered), "
+                            f"{stats.duplicates_removed} duplicate questions, "
+                            f"{stats.chunks_per_s:.1f} chunks/s ({stats.elapsed_s:.2f}s)")
+                pairs.extend(result.pairs)
+            except Exception as e:
+                logger.warning(f"[Stage 13.5/14] LLM Q&A generation failed: {e}")
+        if not pairs:
+            return []
+        
+        from core.qa_generation import dedupe_questions
+        pairs, _ = dedupe_questions(pairs)
+        self.stats['qa_pairs'] += len(pairs)
+        try:
+            qa_dir = self.base_dir / 'qa_pairs'
+            qa_dir.mkdir(parents=True, exist_ok=True)
+            with open(qa_dir / f'{file_hash}.json', 'w', encoding='utf-8') as f:
+                json.dump({'file_path': file_path, 'file_hash': file_hash, 'pairs': pairs}, f, ensure_ascii=False, indent=1)
+        except Exception as e:
+            logger.warning(f"[Stage 13.5/14] Failed to save Q&A pairs: {e}")
+        return pairs
+    
+    def _get_token_chunker(self):
+        """
+        Токенный чанкер по токенизатору SBERT модели.
+        
+        Токенизатор грузится отдельно (AutoTokenizer, на CPU): сама модель
+        выгружается из VRAM между этапами, а счёт токенов должен оставаться точным.
+        """
+        from core.token_chunker import TokenChunker, TokenCounter
+        
+        model_name = getattr(self, 'sbert_model_name', None)
+        if self._token_chunker is None or self._token_chunker_model_name != model_name:
+            model = getattr(self, 'sbert_model', None)
+            counter = TokenCounter.from_pretrained(model_name, getattr(model, 'max_seq_length', None)) \
+                if model_name else TokenCounter.from_model(model)
+            self._token_chunker = TokenChunker(
+                counter,
+                max_tokens=self.config.chunk_max_tokens,
+                overlap_tokens=self.config.chunk_overlap_tokens
+            )
+            self._token_chunker_model_name = model_name
+        return self._token_chunker
+    
     def _stage14_save_to_qdrant(self, chunks: List[DocumentChunk], file_path: str, file_hash: str, metadata: Dict[str, Any]) -> int:
         """STAGE 14: Save to Qdrant"""
         
@@ -9461,13 +9775,38 @@ JSON:"""}
                 logger.info("[Stage 14/14] No chunks to save")
                 return 0
             
+            # Отбрасываем чанки, повторяющие уже сохранённый контент (MinHash LSH)
+            chunk_filter = None
+            index = self._near_duplicate_index()
+            if index is not None and file_hash:
+                try:
+                    chunk_filter = index.filter_chunks(file_hash, [chunk.content for chunk in chunks])
+                    if chunk_filter.dropped:
+                        self.stats['redundant_chunks'] += len(chunk_filter.dropped)
+                        logger.info(f"[Stage 14/14] Dropped {len(chunk_filter.dropped)}/{len(chunks)} redundant chunks")
+                        chunks = [chunks[i] for i in chunk_filter.keep]
+                except Exception as e:
+                    logger.warning(f"[Stage 14/14] Chunk dedup failed, saving all chunks: {e}")
+                    chunk_filter = None
+            if not chunks:
+                logger.info("[Stage 14/14] All chunks are redundant, nothing to save")
+                return 0
+            near_duplicate = getattr(self, '_current_near_duplicate', None)
+            
             # 🚀 ЗАГРУЖАЕМ SBERT ДЛЯ ЭМБЕДДИНГОВ
             if not hasattr(self, 'sbert_model') or self.sbert_model is None:
                 logger.info("[Stage 14/14] Loading SBERT for embeddings...")
                 self._load_sbert_model()
             
-            # Подготавливаем точки для сохранения
+            # Точки несут только поля фильтров и chunk_key, тексты и метаданные - в chunk_store.db
+            from qdrant_client.models import PointStruct
+            from core.chunk_store import chunk_key
+            store = self._chunk_store()
+            near_duplicate_of = near_duplicate.canonical if near_duplicate is not None else None
+            
             points = []
+            stored_chunks = []
+            embedded = []  # позиции в chunks, ставшие точками
             for i, chunk in enumerate(chunks):
                 # Создаем эмбеддинг для чанка
                 if hasattr(self, 'sbert_model') and self.sbert_model is not None:
@@ -9481,27 +9820,37 @@ JSON:"""}
                     logger.warning("[Stage 14/14] SBERT model not available for embeddings")
                     continue
                 
-                # Создаем точку для Qdrant с правильным форматом
-                from qdrant_client.models import PointStruct
-                import uuid
-                
-                point = PointStruct(
-                    id=str(uuid.uuid4()),  # Уникальный ID для каждой точки
-                    vector=embedding.tolist(),
-                    payload={
+                key = chunk_key(file_hash, i, chunk.chunk_id)
+                payload = {
+                    "chunk_key": key,
+                    "file_hash": file_hash,
+                    "doc_type": metadata.get('doc_type', 'unknown'),
+                    "canonical_id": metadata.get('canonical_id', ''),
+                }
+                if store is not None:
+                    stored_chunks.append({
+                        "chunk_key": key,
+                        "position": i,
+                        "chunk_id": chunk.chunk_id,
+                        "section_id": chunk.section_id,
+                        "chunk_type": chunk.chunk_type,
+                        "content": chunk.content,
+                        "metadata": chunk.metadata,
+                    })
+                else:
+                    payload.update({
                         "content": chunk.content,
                         "file_path": file_path,
-                        "file_hash": file_hash,
                         "chunk_id": chunk.chunk_id,
                         "section_id": chunk.section_id,
                         "chunk_type": chunk.chunk_type,
                         "metadata": chunk.metadata,
-                        "doc_type": metadata.get('doc_type', 'unknown'),
-                        "canonical_id": metadata.get('canonical_id', ''),
-                        "quality_score": metadata.get('quality_score', 0.0)
-                    }
-                )
-                points.append(point)
+                        "quality_score": metadata.get('quality_score', 0.0),
+                    })
+                    if near_duplicate_of is not None:
+                        payload["near_duplicate_of"] = near_duplicate_of
+                points.append(PointStruct(id=key, vector=embedding.tolist(), payload=payload))
+                embedded.append(i)
             
             # Сохраняем точки в Qdrant
             if points:
@@ -9516,6 +9865,50 @@ JSON:"""}
                     logger.error(f"[Stage 14/14] Failed to upsert points to Qdrant: {e}")
                     return 0
             
+            # Side store - только после успешного upsert, иначе в нем остались бы чанки без точек
+            stale_keys = []
+            if points and store is not None:
+                try:
+                    stale_keys = store.save_document(file_hash, file_path, metadata, stored_chunks,
+                                                     near_duplicate_of=near_duplicate_of)
+                except Exception as e:
+                    logger.error(f"[Stage 14/14] Failed to save chunk metadata: {e}")
+                    # Точки без метаданных не должны попадать в выдачу - документ переобработается
+                    try:
+                        self.qdrant.delete(collection_name="enterprise_docs",
+                                           points_selector=models.PointIdsList(points=[p.id for p in points]))
+                    except Exception as delete_error:
+                        logger.warning(f"[Stage 14/14] Failed to remove points without metadata: {delete_error}")
+                    return 0
+            
+            # Чанки прошлой версии документа, которых больше нет
+            if stale_keys:
+                try:
+                    self.qdrant.delete(collection_name="enterprise_docs",
+                                       points_selector=models.PointIdsList(points=stale_keys))
+                    logger.info(f"[Stage 14/14] Removed {len(stale_keys)} stale points of the previous version")
+                except Exception as e:
+                    logger.warning(f"[Stage 14/14] Failed to remove stale points: {e}")
+            
+            if chunk_filter is not None and saved_count:
+                # В индекс попадают только чанки, реально сохранённые точками (keep - исходные индексы)
+                indexed = {chunk_filter.keep[i] for i in embedded}
+                chunk_filter.keep = [i for i in chunk_filter.keep if i in indexed]
+                chunk_filter.signatures = {i: s for i, s in chunk_filter.signatures.items() if i in indexed}
+                try:
+                    index.add_chunks(file_hash, chunk_filter)
+                except Exception as e:
+                    logger.warning(f"[Stage 14/14] Failed to index chunk signatures: {e}")
+            
+            # Документ становится соседом для следующих только когда его чанки сохранены
+            pending = self._pending_near_duplicate
+            if index is not None and saved_count and pending is not None and pending[0] == file_hash:
+                try:
+                    index.add_document(file_hash, pending[1], canonical=pending[2])
+                except Exception as e:
+                    logger.warning(f"[Stage 14/14] Failed to index document signature: {e}")
+                self._pending_near_duplicate = None
+            
             elapsed = time.time() - start_time
             logger.info(f"[Stage 14/14] COMPLETE - Saved {saved_count} chunks to Qdrant ({elapsed:.2f}s)")
             
@@ -9529,81 +9922,29 @@ JSON:"""}
             self._unload_sbert_model()
             logger.info(f"[VRAM MANAGER] SBERT unloaded after Stage 14")
 
-    def _create_ntd_chunks(self, content: str, structural_data: Dict, metadata: Dict, doc_type_info: Dict) -> List[DocumentChunk]:
-        """Создание чанков для НТД документов (СП, ГОСТ, СНиП)"""
-        chunks = []
-        
-        try:
-            # 1. Чанк с заголовком документа
-            title = metadata.get('title', '')
-            if title:
-                title_chunk = DocumentChunk(
-                    content=f"Документ: {title}",
-                    chunk_id="ntd_title",
-                    metadata=metadata,
-                    section_id="Заголовок документа",
-                    chunk_type="title"
-                )
-                chunks.append(title_chunk)
-                logger.info(f"[NTD] Создан чанк заголовка: {title[:50]}...")
-            
-            # 2. Чанки по секциям документа
-            sections = structural_data.get('sections', [])
-            for i, section in enumerate(sections):
-                section_text = section.get('text', '')
-                section_title = section.get('title', f'Секция {i+1}')
-                
-                if section_text and len(section_text.strip()) > 30:
-                    chunk = DocumentChunk(
-                        content=section_text,
-                        chunk_id=f"ntd_section_{i}",
-                        metadata=metadata,
-                        section_id=section_title,
-                        chunk_type="section"
-                    )
-                    chunks.append(chunk)
-                    logger.info(f"[NTD] Создан чанк секции {i}: {section_title}")
-            
-            # 3. Чанки по параграфам (если есть)
-            paragraphs = structural_data.get('paragraphs', [])
-            for i, paragraph in enumerate(paragraphs):
-                paragraph_text = paragraph.get('text', '')
-                if paragraph_text and len(paragraph_text.strip()) > 50:
-                    chunk = DocumentChunk(
-                        content=paragraph_text,
-                        chunk_id=f"ntd_paragraph_{i}",
-                        metadata=metadata,
-                        section_id=paragraph.get('title', f'Параграф {i+1}'),
-                        chunk_type="paragraph"
-                    )
-                    chunks.append(chunk)
-                    logger.info(f"[NTD] Создан чанк параграфа {i}")
-            
-            # 4. Fallback: разбиваем весь контент на чанки если нет структурных данных
-            if not chunks and content:
-                logger.warning(f"[NTD] Нет структурных данных, используем fallback чанкинг")
-                chunk_size = 1024
-                overlap = 100
-                
-                for i in range(0, len(content), chunk_size - overlap):
-                    chunk_text = content[i:i + chunk_size]
-                    if len(chunk_text.strip()) > 100:
-                        chunk = DocumentChunk(
-                            content=chunk_text,
-                            chunk_id=f"ntd_fallback_{i}",
-                            metadata=metadata,
-                            section_id="Основной текст",
-                            chunk_type="content"
-                        )
-                        chunks.append(chunk)
-                        logger.info(f"[NTD] Создан fallback чанк {i}")
-            
-            logger.info(f"[NTD] Итого создано {len(chunks)} чанков для НТД")
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"[NTD] Ошибка создания чанков для НТД: {e}")
+    def search_chunks(self, query: str, limit: int = 10, doc_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Поиск чанков в enterprise_docs: кандидаты по квантованным векторам, рескоринг по исходным"""
+        if not self.qdrant or getattr(self, 'vector_storage', None) is None:
             return []
+        if not hasattr(self, 'sbert_model') or self.sbert_model is None:
+            self._load_sbert_model()
+        vector = self.sbert_model.encode([query])[0].tolist()
+        query_filter = None
+        if doc_type:
+            query_filter = models.Filter(must=[models.FieldCondition(key="doc_type", match=models.MatchValue(value=doc_type))])
+        hits = self.vector_storage.search("enterprise_docs", vector, limit=limit, query_filter=query_filter)
+        # Тексты и метаданные top-k одним запросом к chunk_store; старые точки несут их в payload
+        store = self._chunk_store()
+        records = store.fetch(hit.payload.get("chunk_key") for hit in hits if hit.payload) if store else {}
+        results = []
+        for hit in hits:
+            payload = hit.payload or {}
+            key = payload.get("chunk_key")
+            if store and key and key not in records:
+                # Точка уже в Qdrant, метаданные еще не записаны (или запись не удалась)
+                continue
+            results.append({"id": hit.id, "score": hit.score, **payload, **records.get(key, {})})
+        return results
 
 
 if __name__ == "__main__":
@@ -20,23 +20,13 @@ def main():
         from qdrant_client import QdrantClient
         client = QdrantClient(host='localhost', port=6333)
         
-        # Удаляем коллекцию
+        # Удаляем алиас enterprise_docs со всеми версиями enterprise_docs_vN и создаем пустую
         try:
-            client.delete_collection('enterprise_docs')
-            print('✅ Коллекция enterprise_docs удалена')
+            from core.vector_storage import QuantizedStorage
+            physical = QuantizedStorage(client).reset('enterprise_docs', size=768)
+            print(f'✅ Коллекция enterprise_docs пересоздана (-> {physical})')
         except Exception as e:
-            print(f'⚠️ Ошибка удаления коллекции: {e}')
-        
-        # Создаем новую пустую коллекцию
-        try:
-            from qdrant_client.http.models import VectorParams, Distance
-            client.create_collection(
-                collection_name='enterprise_docs',
-                vectors_config=VectorParams(size=1024, distance=Distance.COSINE)
-            )
-            print('✅ Новая коллекция enterprise_docs создана')
-        except Exception as e:
-            print(f'⚠️ Ошибка создания коллекции: {e}')
+            print(f'⚠️ Ошибка пересоздания коллекции: {e}')
             
     except Exception as e:
         print(f'❌ Ошибка очистки Qdrant: {e}')
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BACKEND CLIENT FOR TELEGRAM BOT
+===============================
+Async HTTP client of the Bldr API for the Telegram bot.
+
+One shared aiohttp session (connection pool) per process; the JWT is cached
+until shortly before its ``exp`` and refreshed single-flight, so concurrent
+chats never log in twice. Large files are streamed into the JSON body as
+base64 chunks instead of being materialized as one huge string.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+try:
+    from prometheus_client import Counter, Histogram
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+
+logger = logging.getLogger(__name__)
+
+API_BASE = os.getenv('API_BASE', 'http://localhost:8000')
+API_USER = os.getenv('API_USER', 'admin')
+API_PASSWORD = os.getenv('API_PASSWORD', 'admin')
+
+POOL_SIZE = int(os.getenv('TG_BACKEND_POOL_SIZE', '32'))
+# Обновлять токен заранее, за столько секунд до истечения
+TOKEN_REFRESH_MARGIN = float(os.getenv('TG_TOKEN_REFRESH_MARGIN', '60'))
+# Время жизни токена, если в JWT нет exp
+TOKEN_DEFAULT_TTL = float(os.getenv('TG_TOKEN_DEFAULT_TTL', '1800'))
+STREAM_CHUNK_SIZE = 3 * 64 * 1024  # кратно 3, чтобы base64 кусков склеивался без паддинга
+
+# Таймауты по эндпоинтам (секунды): вход быстрый, ответ координатора - долгий
+ENDPOINT_TIMEOUTS = {
+    '/token': float(os.getenv('TG_TIMEOUT_TOKEN', '10')),
+    '/api/ai/chat': float(os.getenv('TG_TIMEOUT_CHAT', '1800')),
+    '/submit_query': float(os.getenv('TG_TIMEOUT_SUBMIT_QUERY', '1800')),
+}
+DEFAULT_TIMEOUT = float(os.getenv('TG_TIMEOUT_DEFAULT', '60'))
+CONNECT_TIMEOUT = float(os.getenv('TG_TIMEOUT_CONNECT', '10'))
+
+if HAS_PROMETHEUS:
+    REQUEST_LATENCY = Histogram(
+        'bldr_tg_backend_request_seconds', 'Latency of Telegram bot requests to the Bldr API',
+        ['endpoint'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 180, 600, 1800)
+    )
+    REQUEST_ERRORS = Counter(
+        'bldr_tg_backend_request_errors_total', 'Failed Telegram bot requests to the Bldr API',
+        ['endpoint', 'reason']
+    )
+
+
+class BackendResponse:
+    """Ответ API: тело уже прочитано, сессия свободна"""
+
+    __slots__ = ('status_code', 'text')
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class BackendClient:
+    """Shared async client of the Bldr API with JWT caching"""
+
+    def __init__(self, api_base: str = API_BASE, username: str = API_USER, password: str = API_PASSWORD,
+                 pool_size: int = POOL_SIZE):
+        self.api_base = api_base.rstrip('/')
+        self.username = username
+        self.password = password
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+        self.logins = 0
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {'requests': 0, 'errors': 0, 'total_seconds': 0.0})
+
+    # ------------------------------------------------------------------ session
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _timeout(self, path: str, timeout: Optional[float]) -> aiohttp.ClientTimeout:
+        total = timeout if timeout is not None else ENDPOINT_TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+        return aiohttp.ClientTimeout(total=total, sock_connect=CONNECT_TIMEOUT)
+
+    # -------------------------------------------------------------------- token
+
+    @staticmethod
+    def _token_expiry(token: str) -> float:
+        """Время истечения из claim exp (подпись не проверяется - это делает сервер)"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+            if exp:
+                return float(exp)
+        except (IndexError, ValueError, AttributeError):
+            pass
+        return time.time() + TOKEN_DEFAULT_TTL
+
+    def _token_valid(self) -> bool:
+        return self._token is not None and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN
+
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """Cached JWT; concurrent callers share a single login request"""
+        if not force_refresh and self._token_valid():
+            return self._token
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        stale = self._token
+        async with self._token_lock:
+            # Пока ждали блокировку, токен мог обновить другой обработчик
+            if self._token_valid() and (not force_refresh or self._token != stale):
+                return self._token
+            await self._login()
+        return self._token
+
+    async def _login(self):
+        started = time.perf_counter()
+        self.logins += 1
+        try:
+            async with self._get_session().post(
+                f"{self.api_base}/token",
+                data={"username": self.username, "password": self.password},
+                timeout=self._timeout('/token', None)
+            ) as resp:
+                text = await resp.text()
+                if resp.status != 200:
+                    self._record('/token', started, f"http_{resp.status}")
+                    logger.error(f"[TG] Login failed: {resp.status} - {text}")
+                    return
+                token = json.loads(text).get('access_token')
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self._record('/token', started, type(e).__name__)
+            logger.error(f"[TG] Error getting JWT token: {e}")
+            return
+
+        self._record('/token', started)
+        if not token:
+            logger.error("[TG] No access_token in login response")
+            return
+        self._token = token
+        self._token_expires_at = self._token_expiry(token)
+        logger.info("[TG] JWT token acquired successfully")
+
+    async def auth_headers(self) -> Dict[str, str]:
+        headers = {}
+        token = await self.get_token()
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        return headers
+
+    # ----------------------------------------------------------------- requests
+
+    async def post_json(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+                        stream_field: Optional[str] = None, stream_data: Optional[bytes] = None) -> BackendResponse:
+        """
+        POST JSON with JWT; on 401 the token is refreshed once and the request retried.
+
+        Args:
+            path: Путь эндпоинта (``/api/ai/chat``)
+            payload: Тело запроса
+            timeout: Полный таймаут; по умолчанию из ENDPOINT_TIMEOUTS
+            stream_field: Поле, в которое потоково пишется base64 от stream_data
+            stream_data: Содержимое файла
+        """
+        resp = await self._post_once(path, payload, timeout, stream_field, stream_data)
+        if resp.status_code == 401:
+            logger.warning("[TG] 401 Unauthorized, refreshing JWT and retrying once")
+            await self.get_token(force_refresh=True)
+            resp = await self._post_once(path, payload, timeout, stream_field, stream_data)
+        return resp
+
+    async def _post_once(self, path: str, payload: Dict[str, Any], timeout: Optional[float],
+                         stream_field: Optional[str], stream_data: Optional[bytes]) -> BackendResponse:
+        headers = await self.auth_headers()
+        headers['Content-Type'] = 'application/json'
+        if stream_field is not None and stream_data is not None:
+            body = _stream_json_with_base64(payload, stream_field, stream_data)
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        started = time.perf_counter()
+        try:
+            async with self._get_session().post(
+                f"{self.api_base}{path}", data=body, headers=headers, timeout=self._timeout(path, timeout)
+            ) as resp:
+                text = await resp.text()
+        except asyncio.TimeoutError:
+            self._record(path, started, 'timeout')
+            raise
+        except aiohttp.ClientError as e:
+            self._record(path, started, type(e).__name__)
+            raise
+        self._record(path, started, f"http_{resp.status}" if resp.status >= 400 else None)
+        return BackendResponse(resp.status, text)
+
+    # ------------------------------------------------------------------ metrics
+
+    def _record(self, endpoint: str, started: float, error: Optional[str] = None):
+        elapsed = time.perf_counter() - started
+        stats = self._stats[endpoint]
+        stats['requests'] += 1
+        stats['total_seconds'] += elapsed
+        if error:
+            stats['errors'] += 1
+        if HAS_PROMETHEUS:
+            REQUEST_LATENCY.labels(endpoint=endpoint).observe(elapsed)
+            if error:
+                REQUEST_ERRORS.labels(endpoint=endpoint, reason=error).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики по эндпоинтам: requests, errors, avg_seconds"""
+        return {
+            endpoint: {
+                'requests': int(s['requests']),
+                'errors': int(s['errors']),
+                'avg_seconds': s['total_seconds'] / s['requests'] if s['requests'] else 0.0,
+            }
+            for endpoint, s in self._stats.items()
+        }
+
+
+async def _stream_json_with_base64(payload: Dict[str, Any], field: str, data: bytes) -> AsyncIterator[bytes]:
+    """JSON-тело, в котором поле ``field`` - base64 от data, отдаётся кусками"""
+    rest = {k: v for k, v in payload.items() if k != field}
+    head = json.dumps(rest, ensure_ascii=False)[:-1]
+    yield (head + (', ' if rest else '') + json.dumps(field) + ': "').encode('utf-8')
+    view = memoryview(data)
+    for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield base64.b64encode(view[offset:offset + STREAM_CHUNK_SIZE])
+        await asyncio.sleep(0)
+    yield b'"}'
+
+
+_client: Optional[BackendClient] = None
+
+
+def get_backend_client() -> BackendClient:
+    """Shared client instance of the bot process"""
+    global _client
+    if _client is None:
+        _client = BackendClient()
+    return _client
+
+
+async def close_backend_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CHAT DISPATCHER FOR TELEGRAM BOT
+================================
+Per-chat ordered work queues.
+
+Each active chat gets its own queue and worker task (created on the first
+message, reaped after ``idle_timeout`` without messages), so messages of one
+chat are processed strictly in order while different chats run in parallel.
+A global semaphore caps concurrent requests to the backend, and a sliding
+window limits how many messages one user may enqueue.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv('TG_MAX_CONCURRENCY', '8'))
+CHAT_IDLE_TIMEOUT = float(os.getenv('TG_CHAT_IDLE_TIMEOUT', '300'))
+MAX_CHAT_QUEUE = int(os.getenv('TG_MAX_CHAT_QUEUE', '20'))
+USER_RATE_LIMIT = int(os.getenv('TG_USER_RATE_LIMIT', '10'))  # сообщений за окно
+USER_RATE_WINDOW = float(os.getenv('TG_USER_RATE_WINDOW', '60'))  # секунд
+
+
+class RateLimited(Exception):
+    """Пользователь превысил лимит сообщений или очередь чата переполнена"""
+
+    def __init__(self, retry_after: float, reason: str = "rate_limit"):
+        super().__init__(f"{reason}, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _ChatQueue:
+    __slots__ = ("queue", "worker", "busy")
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        self.busy = False
+
+    def depth(self) -> int:
+        return self.queue.qsize() + (1 if self.busy else 0)
+
+
+class ChatDispatcher:
+    """
+    Dispatcher of incoming messages to per-chat workers.
+
+    Args:
+        handler: Корутина обработки одного сообщения
+        max_concurrency: Одновременных запросов к API по всем чатам
+        idle_timeout: Через сколько секунд простоя воркер чата завершается
+        max_chat_queue: Максимум сообщений в очереди одного чата
+        rate_limit: Сообщений одного пользователя за окно (0 - без лимита)
+        rate_window: Окно лимита, секунд
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[Any]], max_concurrency: int = MAX_CONCURRENCY,
+                 idle_timeout: float = CHAT_IDLE_TIMEOUT, max_chat_queue: int = MAX_CHAT_QUEUE,
+                 rate_limit: int = USER_RATE_LIMIT, rate_window: float = USER_RATE_WINDOW):
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.max_chat_queue = max_chat_queue
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._chats: Dict[Hashable, _ChatQueue] = {}
+        self._user_events: Dict[Hashable, Deque[float]] = defaultdict(deque)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._chats)
+
+    def queued_total(self) -> int:
+        return sum(chat.queue.qsize() for chat in self._chats.values())
+
+    def position(self, chat_id: Hashable) -> int:
+        """Сколько сообщений чата обрабатывается или ждёт"""
+        chat = self._chats.get(chat_id)
+        return chat.depth() if chat else 0
+
+    def _check_rate(self, user_id: Optional[Hashable], now: float):
+        if not self.rate_limit or user_id is None:
+            return
+        events = self._user_events[user_id]
+        while events and now - events[0] >= self.rate_window:
+            events.popleft()
+        if len(events) >= self.rate_limit:
+            raise RateLimited(self.rate_window - (now - events[0]))
+        events.append(now)
+
+    def _sweep_idle_users(self, now: float):
+        """Убрать пользователей, у которых окно лимита опустело - иначе словарь растёт без предела"""
+        idle = [user_id for user_id, events in self._user_events.items()
+                if not events or now - events[-1] >= self.rate_window]
+        for user_id in idle:
+            del self._user_events[user_id]
+
+    async def submit(self, chat_id: Hashable, item: Any, user_id: Optional[Hashable] = None) -> int:
+        """
+        Поставить сообщение в очередь чата.
+
+        Returns:
+            Позиция сообщения: 0 - обрабатывается сразу, N - перед ним N сообщений
+
+        Raises:
+            RateLimited: лимит пользователя или переполнение очереди чата
+        """
+        now = time.monotonic()
+        chat = self._chats.get(chat_id)
+        if chat is not None and chat.queue.qsize() >= self.max_chat_queue:
+            raise RateLimited(self.rate_window, reason="chat_queue_full")
+        self._check_rate(user_id, now)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatQueue()
+        position = chat.depth()
+        if self._semaphore.locked() and position == 0:
+            # Чат свободен, но все слоты к API заняты
+            position = 1
+        chat.queue.put_nowait(item)
+        if chat.worker is None or chat.worker.done():
+            chat.worker = asyncio.get_running_loop().create_task(self._worker(chat_id, chat))
+        return position
+
+    async def _worker(self, chat_id: Hashable, chat: _ChatQueue):
+        while True:
+            try:
+                item = await asyncio.wait_for(chat.queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if chat.queue.empty():
+                    # Простаивающий чат освобождает воркер; новое сообщение создаст его заново
+                    if self._chats.get(chat_id) is chat:
+                        del self._chats[chat_id]
+                    self._sweep_idle_users(time.monotonic())
+                    return
+                continue
+            chat.busy = True
+            try:
+                async with self._semaphore:
+                    await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[TG] Error processing message for chat {chat_id}: {e}")
+            finally:
+                chat.busy = False
+                chat.queue.task_done()
+
+    async def join(self):
+        """Дождаться обработки всех поставленных сообщений"""
+        for chat in list(self._chats.values()):
+            await chat.queue.join()
+
+    async def shutdown(self):
+        for chat in list(self._chats.values()):
+            if chat.worker is not None:
+                chat.worker.cancel()
+        self._chats.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_chats": self.active_chats,
+            "queued": self.queued_total(),
+            "in_flight": sum(1 for chat in self._chats.values() if chat.busy),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
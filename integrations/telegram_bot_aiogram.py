@@ -10,8 +10,6 @@ import asyncio
 import logging
 import os
 import sys
-import base64
-import requests
 from dotenv import load_dotenv
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
@@ -43,6 +41,10 @@ except ImportError as e:
 # Load environment variables
 load_dotenv()
 
+# Backend client reads API_* from the environment, import after load_dotenv
+from integrations.backend_client import BackendResponse, get_backend_client, close_backend_client
+from integrations.chat_dispatcher import ChatDispatcher, RateLimited
+
 # (already configured above)
 
 # Bot configuration
@@ -53,42 +55,23 @@ API_PASSWORD = os.getenv('API_PASSWORD', 'admin')
 
 # Chat management
 CHAT_HISTORY = defaultdict(lambda: deque(maxlen=10))  # Last 10 messages per chat
-# MESSAGE_QUEUE will be created after aiogram imports (event loop safety)
-MESSAGE_QUEUE = None  # type: ignore
-PROCESSING_CHATS = set()  # Chats currently being processed
+# Per-chat queues are created after process_message is defined
+DISPATCHER = None  # type: ignore
 
-def get_auth_headers():
-    """Get JWT token and return headers"""
+async def get_auth_headers():
+    """Get cached JWT and return headers"""
     headers = {"Content-Type": "application/json"}
-    try:
-        login_resp = requests.post(f"{API_BASE}/token", 
-                                 data={"username": API_USER, "password": API_PASSWORD},
-                                 timeout=10)
-        if login_resp.status_code == 200:
-            token = login_resp.json().get('access_token')
-            if token:
-                headers['Authorization'] = f'Bearer {token}'
-                logger.info(f"[TG] JWT token acquired successfully")
-            else:
-                logger.error(f"[TG] No access_token in login response")
-        else:
-            logger.error(f"[TG] Login failed: {login_resp.status_code} - {login_resp.text}")
-    except Exception as e:
-        logger.error(f"[TG] Error getting JWT token: {e}")
-    
+    headers.update(await get_backend_client().auth_headers())
     return headers
 
-def post_with_auth(url: str, json_payload: dict, timeout: int = 1800) -> requests.Response:
+async def post_with_auth(path: str, json_payload: dict, timeout: Optional[float] = None,
+                         stream_field: Optional[str] = None, stream_data: Optional[bytes] = None) -> BackendResponse:
     """
-    Perform POST with JWT. If unauthorized, refresh token once and retry.
+    Perform POST with cached JWT over the shared session. If unauthorized, refresh token once and retry.
+    File bytes passed as stream_data are sent base64-encoded in stream_field without building the string in memory.
     """
-    headers = get_auth_headers()
-    resp = requests.post(url, json=json_payload, headers=headers, timeout=timeout)
-    if resp.status_code == 401:
-        logger.warning("[TG] 401 Unauthorized, refreshing JWT and retrying once")
-        headers = get_auth_headers()
-        resp = requests.post(url, json=json_payload, headers=headers, timeout=timeout)
-    return resp
+    return await get_backend_client().post_json(path, json_payload, timeout=timeout,
+                                                stream_field=stream_field, stream_data=stream_data)
 
 def escape_markdown_v2(text: str) -> str:
     """Escape text for Telegram MarkdownV2."""
@@ -259,33 +242,20 @@ def get_chat_history(chat_id: int) -> list:
 from typing import Any
 
 async def queue_message(message: Any):
-    """Add message to processing queue"""
-    await MESSAGE_QUEUE.put(message)
-    logger.info(f"[TG] Message queued for chat {message.chat.id}")
-
-async def process_message_queue():
-    """Process messages from queue"""
-    while True:
-        try:
-            message = await MESSAGE_QUEUE.get()
-            chat_id = message.chat.id
-            
-            # Skip if chat is already being processed
-            if chat_id in PROCESSING_CHATS:
-                # Re-enqueue and wait briefly to preserve order without dropping messages
-                logger.info(f"[TG] Chat {chat_id} busy, requeueing message")
-                await asyncio.sleep(0.1)
-                await MESSAGE_QUEUE.put(message)
-                continue
-                
-            PROCESSING_CHATS.add(chat_id)
-            try:
-                await process_message(message)
-            finally:
-                PROCESSING_CHATS.discard(chat_id)
-                
-        except Exception as e:
-            logger.error(f"[TG] Error in message queue processing: {e}")
+    """Add message to its chat queue and acknowledge the position if it has to wait"""
+    user_id = message.from_user.id if message.from_user else None
+    try:
+        position = await DISPATCHER.submit(message.chat.id, message, user_id=user_id)
+    except RateLimited as e:
+        logger.info(f"[TG] Message from chat {message.chat.id} rejected: {e.reason}")
+        if e.reason == "chat_queue_full":
+            await safe_reply(message, "⏳ Слишком много сообщений в очереди, дождитесь ответа на предыдущие", prefer_markdown=False)
+        else:
+            await safe_reply(message, f"⏳ Слишком много сообщений, повторите через {int(e.retry_after) + 1} с", prefer_markdown=False)
+        return
+    logger.info(f"[TG] Message queued for chat {message.chat.id}, position {position}")
+    if position > 0:
+        await safe_reply(message, f"⏳ В очереди, позиция {position}", prefer_markdown=False)
 
 # Initialize aiogram
 try:
@@ -300,10 +270,6 @@ try:
     bot = Bot(token=TELEGRAM_BOT_TOKEN)
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
-    # Now we can create the queue safely
-    if MESSAGE_QUEUE is None:
-        MESSAGE_QUEUE = asyncio.Queue()
-    
     logger.info(f"[TG] Aiogram bot initialized with token: {TELEGRAM_BOT_TOKEN[:10]}...")
     
 except ImportError as e:
@@ -356,6 +322,8 @@ async def process_message(message: types.Message):
         logger.error(f"[TG] Error processing message: {e}")
         await message.reply(f"❌ Ошибка обработки: {e}")
 
+DISPATCHER = ChatDispatcher(process_message)
+
 async def handle_text(message: types.Message):
     """Handle text messages"""
     try:
@@ -377,7 +345,6 @@ async def handle_text(message: types.Message):
             except Exception as e:
                 logger.error(f"[TG] Error getting history stats: {e}")
         
-        headers = get_auth_headers()
         payload = {
             'message': text,
             'context_search': True,
@@ -389,13 +356,13 @@ async def handle_text(message: types.Message):
                 'chat_id': message.chat.id,
                 'user_id': message.from_user.id if message.from_user else None,
                 'message_id': message.message_id,
-                'queue_position': MESSAGE_QUEUE.qsize(),
+                'queue_position': DISPATCHER.queued_total(),
                 'history_stats': history_stats
             }
         }
         
         logger.info(f"[TG] Sending to API: {API_BASE}/api/ai/chat")
-        resp = post_with_auth(f"{API_BASE}/api/ai/chat", json_payload=payload, timeout=1800)
+        resp = await post_with_auth("/api/ai/chat", json_payload=payload)
         
         if resp.status_code == 200:
             data = resp.json()
@@ -431,12 +398,9 @@ async def handle_voice(message: types.Message):
         vbuf = io.BytesIO()
         await message.bot.download(voice_file, destination=vbuf)
         voice_bytes = vbuf.getvalue()
-        voice_b64 = base64.b64encode(voice_bytes).decode('utf-8')
         
-        headers = get_auth_headers()
         payload = {
             'message': 'Голосовое сообщение',
-            'voice_data': voice_b64,
             'context_search': True,
             'max_context': 3,
             'agent_role': 'coordinator',
@@ -448,7 +412,8 @@ async def handle_voice(message: types.Message):
                 'user_id': message.from_user.id if message.from_user else None
             }
         }
-        resp = post_with_auth(f"{API_BASE}/api/ai/chat", json_payload=payload, timeout=1800)
+        resp = await post_with_auth("/api/ai/chat", json_payload=payload,
+                                    stream_field='voice_data', stream_data=voice_bytes)
         if resp.status_code == 200:
             response_data = resp.json()
             if isinstance(response_data, str):
@@ -486,12 +451,9 @@ async def handle_photo(message: types.Message):
         pbuf = io.BytesIO()
         await message.bot.download(photo_file, destination=pbuf)
         photo_bytes = pbuf.getvalue()
-        photo_b64 = base64.b64encode(photo_bytes).decode('utf-8')
         
-        headers = get_auth_headers()
         payload = {
             'message': 'Фотография',
-            'image_data': photo_b64,
             'context_search': True,
             'max_context': 3,
             'agent_role': 'coordinator',
@@ -504,7 +466,8 @@ async def handle_photo(message: types.Message):
             }
         }
         
-        resp = post_with_auth(f"{API_BASE}/api/ai/chat", json_payload=payload, timeout=1800)
+        resp = await post_with_auth("/api/ai/chat", json_payload=payload,
+                                    stream_field='image_data', stream_data=photo_bytes)
         if resp.status_code == 200:
             response_data = resp.json()
             if isinstance(response_data, str):
@@ -541,15 +504,12 @@ async def handle_document(message: types.Message):
         dbuf = io.BytesIO()
         await message.bot.download(doc_file, destination=dbuf)
         doc_bytes = dbuf.getvalue()
-        doc_b64 = base64.b64encode(doc_bytes).decode('utf-8')
         file_name = message.document.file_name or ''
         doc_type = detect_document_type(file_name, doc_bytes)
         extracted_text, extract_method = try_extract_text(doc_bytes, doc_type)
         
-        headers = get_auth_headers()
         payload = {
             'message': 'Документ',
-            'document_data': doc_b64,
             'document_name': file_name,
             'document_type': doc_type,
             'document_size': len(doc_bytes),
@@ -567,7 +527,8 @@ async def handle_document(message: types.Message):
             }
         }
         
-        resp = post_with_auth(f"{API_BASE}/api/ai/chat", json_payload=payload, timeout=1800)
+        resp = await post_with_auth("/api/ai/chat", json_payload=payload,
+                                    stream_field='document_data', stream_data=doc_bytes)
         if resp.status_code == 200:
             data = resp.json()
             if isinstance(data, str):
@@ -669,11 +630,17 @@ async def main():
     logger.info(f"[TG] API_BASE: {API_BASE}")
     logger.info(f"[TG] API_USER: {API_USER}")
     
+    metrics_port = int(os.getenv('TG_METRICS_PORT', '0'))
+    if metrics_port:
+        # Латентность и ошибки запросов к API для Prometheus
+        try:
+            from prometheus_client import start_http_server
+            start_http_server(metrics_port)
+            logger.info(f"[TG] Metrics exported on :{metrics_port}")
+        except ImportError:
+            logger.warning("[TG] prometheus_client not installed, metrics not exported")
+    
     try:
-        # Start message queue processor
-        logger.info("[TG] Starting message queue processor...")
-        queue_task = asyncio.create_task(process_message_queue())
-        
         # Start polling with error handling
         logger.info("[TG] Starting polling...")
         await dp.start_polling(bot, skip_updates=True)
@@ -683,6 +650,8 @@ async def main():
         logger.error(f"[TG] Traceback: {traceback.format_exc()}")
     finally:
         logger.info("[TG] Closing bot session...")
+        await DISPATCHER.shutdown()
+        await close_backend_client()
         await bot.session.close()
 
 if __name__ == '__main__':
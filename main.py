@@ -38,6 +38,9 @@ import uuid
 import time
 from dotenv import load_dotenv
 load_dotenv()
+from fastapi.concurrency import run_in_threadpool
+# Ленивые компоненты и замер импортов (см. /health/startup)
+from core.startup import startup, ComponentState
  # Global feature flags
 enable_meta_tools = os.getenv("ENABLE_META_TOOLS", "false").lower() == "true"
 # ===== ADAPTIVE AI CHAT (CoordinatorAgent) =====
@@ -64,21 +67,31 @@ import hashlib
 # Import websocket manager and other components
 websocket_manager = None
 try:
-    from core.websocket_manager import manager as websocket_manager
+    with startup.import_timer("core.websocket_manager"):
+        from core.websocket_manager import manager as websocket_manager
     print("Successfully imported websocket_manager")
 except ImportError as e:
     print(f"Failed to import websocket_manager: {e}")
 
-# Import unified tools system
-unified_tools = None
+# Import unified tools system (the instance is created lazily: startup.get("unified_tools"))
 try:
-    from core.unified_tools_system import unified_tools
+    with startup.import_timer("core.unified_tools_system"):
+        import core.unified_tools_system
     print("Successfully imported unified_tools_system")
 except ImportError as e:
     print(f"Failed to import unified_tools_system: {e}")
 
+# Import model manager (warmed singleton: startup.get("model_manager"), see require_component)
 try:
-    from core.projects_api import router as projects_router
+    with startup.import_timer("core.model_manager"):
+        import core.model_manager
+    print("Successfully imported model_manager")
+except ImportError as e:
+    print(f"Failed to import model_manager: {e}")
+
+try:
+    with startup.import_timer("core.projects_api"):
+        from core.projects_api import router as projects_router
 except ImportError:
     projects_router = None
 
@@ -88,41 +101,51 @@ trainer_initialized = False
 
 # Import tools API router
 try:
-    from backend.api.tools_api import router as tools_router
+    with startup.import_timer("backend.api.tools_api"):
+        from backend.api.tools_api import router as tools_router
     print("Successfully imported tools API router")
 except ImportError as e:
     print(f"Failed to import tools API router: {e}")
     tools_router = None
 
+def _create_trainer():
+    from enterprise_rag_trainer_full import EnterpriseRAGTrainer as EnterpriseRAGTrainerFull
+    base_dir = os.getenv("BASE_DIR", "I:/docs")
+    instance = EnterpriseRAGTrainerFull(base_dir=base_dir)
+    print(f"✅ Trainer initialized (BASE_DIR={base_dir})")
+    return instance
+
+# INIT_TRAINER_ON_START=true: тренер прогревается в фоне после старта сервера, не блокируя импорт
+trainer_component = startup.register(
+    "trainer", _create_trainer,
+    warmup=os.getenv("INIT_TRAINER_ON_START", "false").lower() == "true"
+)
+
 def get_trainer():
     """Ленивая инициализация тренера при первом обращении"""
     global trainer, trainer_initialized
     
-    if not trainer_initialized:
-        try:
-            from enterprise_rag_trainer_full import EnterpriseRAGTrainer as EnterpriseRAGTrainerFull
-            base_dir = os.getenv("BASE_DIR", "I:/docs")
-            trainer = EnterpriseRAGTrainerFull(base_dir=base_dir)
-            trainer_initialized = True
-            print(f"✅ Trainer initialized on demand (BASE_DIR={base_dir})")
-        except Exception as e:
-            print(f"Warning: Trainer not available: {e}")
-            trainer = None
-            trainer_initialized = True
-    
+    trainer = trainer_component.get_or_none()
+    if trainer is None:
+        print(f"Warning: Trainer not available: {trainer_component.error}")
+    trainer_initialized = trainer_component.state in (ComponentState.READY, ComponentState.FAILED)
     return trainer
 
-# Проверяем, нужно ли инициализировать тренер при запуске
-try:
-    init_trainer = os.getenv("INIT_TRAINER_ON_START", "false").lower() == "true"
-    if init_trainer:
-        trainer = get_trainer()
-        print(f"✅ Trainer initialized on startup (BASE_DIR={os.getenv('BASE_DIR', 'I:/docs')})")
-    else:
-        print("ℹ️ Skipping trainer init on startup (set INIT_TRAINER_ON_START=true to enable)")
-except Exception as e:
-    print(f"Warning: Trainer not available: {e}")
-    trainer = None
+def require_component(name: str) -> Any:
+    """Готовый компонент реестра запуска; 503, пока он прогревается или после ошибки"""
+    component = startup.components.get(name)
+    if component is None:
+        raise HTTPException(status_code=503, detail=f"Component '{name}' is not registered")
+    if component.state is ComponentState.PENDING:
+        # Прогрев ещё не запускался - запускаем в фоне, запрос не блокируем
+        startup.start_warmup()
+    if component.state is not ComponentState.READY:
+        raise HTTPException(
+            status_code=503,
+            detail={"component": name, "state": component.state.value, "error": component.error},
+            headers={"Retry-After": "5"},
+        )
+    return component.get()
 
 # Настройка логирования
 logging.basicConfig(
@@ -140,12 +163,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting SuperBuilder Tools API server...")
     
+    # Тяжёлые компоненты прогреваются в фоне - health-check отвечает сразу
+    warming = startup.start_warmup()
+    if warming:
+        logger.info(f"Warming up in background: {', '.join(warming)}")
+    
     logger.info("Server started successfully")
     yield
     
     # Shutdown
     logger.info("Shutting down SuperBuilder Tools API server...")
-    
+    startup.shutdown()
+
+    try:
+        from backend.ntd_api import close_neo4j_db
+        await close_neo4j_db()
+    except ImportError:
+        pass
+
     logger.info("Server shutdown complete")
 
 # Create FastAPI application
@@ -440,6 +475,9 @@ async def websocket_handler(websocket: WebSocket):
         while True:
             data = await websocket.receive_text()
             print(f"Received message: {data}")
+            # Подписка на топики: {"action": "subscribe", "topics": ["process:<id>"]}
+            if websocket_manager and websocket_manager.handle_client_message(websocket, data):
+                continue
             # Echo the message back (or implement your own logic)
             if websocket_manager:
                 await websocket_manager.send_personal_message(f"Echo: {data}", websocket)
@@ -623,6 +661,14 @@ async def health_check():
     except Exception as e:
         return {"status": "error", "error": str(e), "timestamp": datetime.now().isoformat()}
 
+@public_router.get("/health/startup")
+async def startup_health():
+    """Готовность ленивых компонентов, время их инициализации и медленные импорты"""
+    report = startup.status()
+    report["status"] = "ready" if report["warmup_complete"] else "warming_up"
+    report["timestamp"] = datetime.now().isoformat()
+    return report
+
 @public_router.get("/debug/health-status")
 async def debug_health_status():
     """Debug health status endpoint"""
@@ -762,7 +808,8 @@ async def debug_status_aggregator():
 @public_router.get("/tools/list")
 async def public_tools_list():
     try:
-        # Prefer unified tools registry if available
+        # Prefer unified tools registry if available (инициализация не блокирует event loop)
+        unified_tools = await run_in_threadpool(startup.get_or_none, "unified_tools")
         if unified_tools:
             utools = unified_tools.list_tools()
             tools_dict = {
@@ -827,10 +874,9 @@ async def ai_entrypoint(payload: Dict[str, Any]):
         voice_data_b64 = payload.get('voice_data')
         document_data = payload.get('document_data')
         # Initialize coordinator with real systems
-        from core.model_manager import ModelManager
         from core.tools_system import ToolsSystem
         from core.coordinator_with_tool_interfaces import CoordinatorImproved as CoordinatorWithToolInterfaces
-        model_manager = ModelManager()
+        model_manager = require_component("model_manager")
         tools_system = ToolsSystem()
         coordinator = CoordinatorWithToolInterfaces(model_manager=model_manager, tools_system=tools_system, rag_system=None)
         # Handle voice
@@ -861,6 +907,8 @@ async def ai_entrypoint(payload: Dict[str, Any]):
             except Exception as te:
                 return {"status": "error", "error": f"AI processing failed: {str(te)}"}
         return {"status": "error", "error": "No valid input provided"}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
@@ -1044,9 +1092,8 @@ async def discover_tools(category: Optional[str] = None, credentials: dict = Dep
         # Try to create ToolsSystem even if trainer is not initialized (rag_system can be None)
         try:
             from core.tools_system import ToolsSystem
-            from core.model_manager import ModelManager
 
-            model_manager = ModelManager()
+            model_manager = require_component("model_manager")
             tools_system = ToolsSystem(rag_system=trainer, model_manager=model_manager)
 
             logger.info("ToolsSystem created for discovery (rag_system={})".format("trainer" if trainer else "none"))
@@ -1074,6 +1121,8 @@ async def discover_tools(category: Optional[str] = None, credentials: dict = Dep
                     "total_count": len(filtered_tools),
                     "categories": all_categories
                 }
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error creating ToolsSystem: {e}")
         
@@ -1122,6 +1171,8 @@ async def discover_tools(category: Optional[str] = None, credentials: dict = Dep
             "total_count": len(filtered_tools),
             "categories": categories
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in tool discovery: {e}")
         return {"tools": {}, "total_count": 0, "categories": {}, "error": str(e)}
@@ -1184,101 +1235,35 @@ async def get_tool_info(tool_name: str, credentials: dict = Depends(verify_api_t
 
 # ===== PROJECTS ENDPOINTS =====
 
-try:
-    from core.projects_api import router as projects_router
-    app.include_router(projects_router, prefix="/projects", tags=["projects"])
-    logger.info("Projects API endpoints loaded successfully")
-except ImportError as e:
-    logger.warning(f"Projects API not available: {e}")
-
-# Include additional API routers from backend/api/
-try:
-    from backend.api.tools_api import router as tools_api_router
-    app.include_router(tools_api_router, prefix="/api/tools", tags=["tools-api"])
-    logger.info("Tools API endpoints loaded successfully")
-except ImportError as e:
-    logger.warning(f"Tools API not available: {e}")
-
-try:
-    from backend.api.meta_tools_api import router as meta_tools_router
-    app.include_router(meta_tools_router, prefix="/api/meta-tools", tags=["meta-tools"])
-    logger.info("Meta-Tools API endpoints loaded successfully")
-except ImportError as e:
-    logger.warning(f"Meta-Tools API not available: {e}")
-
-# Include prompts/policies settings API
-try:
-    from backend.api.prompts_api import router as prompts_api_router
-    app.include_router(prompts_api_router, tags=["settings-prompts"])
-    logger.info("Prompts/Rules settings API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Prompts/Rules API not available: {e}")
-
-# Include models assignment API
-try:
-    from backend.api.models_api import router as models_api_router
-    app.include_router(models_api_router, tags=["settings-models"])
-    logger.info("Role-Models settings API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Role-Models API not available: {e}")
-
-# Include autotest API
-try:
-    from backend.api.autotest_api import router as autotest_api_router
-    app.include_router(autotest_api_router, tags=["settings-autotest"])
-    logger.info("Autotest API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Autotest API not available: {e}")
-
-# Include tools registry API
-try:
-    from backend.api.tools_registry_api import router as tools_registry_router
-    from core.tools.registry_api import router as new_tools_registry_router
-    app.include_router(tools_registry_router, tags=["tools-registry"])
-    app.include_router(new_tools_registry_router, tags=["new-tools-registry"])
-    logger.info("Tools Registry API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Tools Registry API not available: {e}")
-
-# Include NTD API
-try:
-    from backend.ntd_api import ntd_router
-    app.include_router(ntd_router)
-    logger.info("NTD Registry API loaded successfully")
-except ImportError as e:
-    logger.warning(f"NTD Registry API not available: {e}")
-
-# Include RAG API
-try:
-    from backend.rag_api import rag_router
-    app.include_router(rag_router)
-    logger.info("RAG System API loaded successfully")
-except ImportError as e:
-    logger.warning(f"RAG System API not available: {e}")
-
-# Include Queue API
-try:
-    from backend.queue_api import queue_router
-    app.include_router(queue_router)
-    logger.info("Queue Management API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Queue Management API not available: {e}")
-
-# Include Security API
-try:
-    from backend.security_api import router as security_router
-    app.include_router(security_router)
-    logger.info("Security API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Security API not available: {e}")
+# Additional API routers: (module, router attributes, include_router kwargs, name for logs).
+# Each import is timed; imports slower than STARTUP_IMPORT_BUDGET are reported in /health/startup.
+OPTIONAL_ROUTERS = [
+    ("core.projects_api", ["router"], {"prefix": "/projects", "tags": ["projects"]}, "Projects API endpoints"),
+    ("backend.api.tools_api", ["router"], {"prefix": "/api/tools", "tags": ["tools-api"]}, "Tools API endpoints"),
+    ("backend.api.meta_tools_api", ["router"], {"prefix": "/api/meta-tools", "tags": ["meta-tools"]}, "Meta-Tools API endpoints"),
+    ("backend.api.prompts_api", ["router"], {"tags": ["settings-prompts"]}, "Prompts/Rules settings API"),
+    ("backend.api.models_api", ["router"], {"tags": ["settings-models"]}, "Role-Models settings API"),
+    ("backend.api.autotest_api", ["router"], {"tags": ["settings-autotest"]}, "Autotest API"),
+    ("backend.api.tools_registry_api", ["router"], {"tags": ["tools-registry"]}, "Tools Registry API"),
+    ("core.tools.registry_api", ["router"], {"tags": ["new-tools-registry"]}, "New Tools Registry API"),
+    ("backend.ntd_api", ["ntd_router"], {}, "NTD Registry API"),
+    ("backend.rag_api", ["rag_router"], {}, "RAG System API"),
+    ("backend.queue_api", ["queue_router"], {}, "Queue Management API"),
+    ("backend.security_api", ["router"], {}, "Security API"),
+    ("backend.tracing_api", ["router"], {}, "Tracing API"),
+]
+
+def include_optional_routers():
+    for module_name, attrs, include_kwargs, title in OPTIONAL_ROUTERS:
+        try:
+            module = startup.timed_import(module_name)
+            for attr in attrs:
+                app.include_router(getattr(module, attr), **include_kwargs)
+            logger.info(f"{title} loaded successfully")
+        except ImportError as e:
+            logger.warning(f"{title} not available: {e}")
 
-# Include Tracing API
-try:
-    from backend.tracing_api import router as tracing_router
-    app.include_router(tracing_router)
-    logger.info("Tracing API loaded successfully")
-except ImportError as e:
-    logger.warning(f"Tracing API not available: {e}")
+include_optional_routers()
 
 # ===== TRAINING ENDPOINTS =====
 
@@ -1286,6 +1271,8 @@ class TrainRequest(BaseModel):
     custom_dir: Optional[str] = None
     fast_mode: bool = False
     max_files: Optional[int] = None
+    distributed: bool = False  # Разбить корпус на Celery-задачи (core/celery_ingest.py)
+    resume_run_id: Optional[str] = None
 
 # ===== NEW RAG API MODELS =====
 
@@ -1307,6 +1294,22 @@ class ListFilesRequest(BaseModel):
 async def train_rag_system(train_data: TrainRequest, background_tasks: BackgroundTasks, credentials: dict = Depends(verify_api_token)):
     """Start RAG training with enhanced trainer"""
     try:
+        if train_data.distributed or train_data.resume_run_id:
+            from core.celery_ingest import plan_ingestion_task
+            base_dir = train_data.custom_dir or os.getenv("BASE_DIR", "I:/docs")
+            # Сканирование большого корпуса идёт на воркере, API отвечает сразу
+            run_id = train_data.resume_run_id or f"ingest-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            plan_ingestion_task.delay(base_dir, train_data.max_files, run_id)
+            return {
+                "status": "training_started",
+                "message": "Distributed RAG training planned",
+                "run_id": run_id,
+                "progress_url": f"/api/train/runs/{run_id}",
+                "base_dir": base_dir,
+                "max_files": train_data.max_files,
+                "timestamp": datetime.now().isoformat()
+            }
+
         # Import the consolidated trainer
         from enterprise_rag_trainer_full import EnterpriseRAGTrainer
         
@@ -1328,6 +1331,15 @@ async def train_rag_system(train_data: TrainRequest, background_tasks: Backgroun
         logger.error(f"Failed to start training: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/train/runs/{run_id}")
+async def distributed_training_progress(run_id: str, credentials: dict = Depends(verify_api_token)):
+    """Прогресс распределённого обучения"""
+    from core.celery_ingest import get_run_progress
+    progress = await run_in_threadpool(get_run_progress, run_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Run not found (it may still be planning)")
+    return progress
+
 # ===== NEW RAG API ENDPOINTS =====
 
 @app.post("/api/analyze-file")
@@ -1596,14 +1608,13 @@ async def ai_processing_endpoint(request_data: AICall, credentials: dict = Depen
         
         # Используем обычный координатор
         from core.coordinator_with_tool_interfaces import CoordinatorImproved as CoordinatorWithToolInterfaces
-        from core.model_manager import ModelManager
         from core.unified_tools_system import UnifiedToolsSystem
         
         task_id = f"ai_task_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        model_manager = require_component("model_manager")
         
         # Initialize coordinator with proper error handling
         try:
-            model_manager = ModelManager()
             
             # Try to get trainer instance
             trainer_instance = trainer if trainer else None
@@ -1660,7 +1671,6 @@ async def ai_processing_endpoint(request_data: AICall, credentials: dict = Depen
             # Ultimate fallback - basic AI processing
             try:
                 # Try to use model manager directly
-                model_manager = ModelManager()
                 response_text = model_manager.query("coordinator", [
                     {"role": "user", "content": request_data.prompt}
                 ])
@@ -1677,6 +1687,8 @@ async def ai_processing_endpoint(request_data: AICall, credentials: dict = Depen
                 "timestamp": datetime.now().isoformat()
             }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"AI processing failed: {e}")
         return {
@@ -2162,12 +2174,11 @@ async def ai_chat(data: ChatRequest, credentials: dict = Depends(verify_api_toke
         import sys, os, base64, tempfile
         sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-        from core.model_manager import ModelManager
         from core.unified_tools_system import UnifiedToolsSystem
         from core.agents.coordinator_agent import CoordinatorAgent
 
         # Init tools (unified) and agent; inject trainer into unified for real RAG
-        model_manager = ModelManager()
+        model_manager = require_component("model_manager")
         try:
             tools_system = UnifiedToolsSystem(rag_system=trainer, model_manager=model_manager)
         except Exception:
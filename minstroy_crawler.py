@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Конкурентный краулер каталога нормативов Минстроя
+=================================================
+
+Движок скачивания для ``MinstroyParser``: страницы-списки и PDF-файлы
+загружаются одновременно через один aiohttp-клиент.
+
+* Вежливость: не больше ``max_connections_per_host`` одновременных запросов
+  к одному хосту и не чаще одного старта запроса в ``request_delay`` секунд.
+* Пагинация: ссылки ``PAGEN_N=`` / ``page=`` внутри раздела; если видна
+  последняя страница, весь диапазон ставится в очередь сразу.
+* Манифест ``<download_dir>/manifest.json``: для каждого URL - имя файла,
+  ETag, Last-Modified, размер и SHA-256. Повторный запуск отправляет
+  условный GET (``If-None-Match`` / ``If-Modified-Since``) и получает 304
+  без тела вместо повторного скачивания.
+* Докачка: файл пишется в ``<name>.part``; после обрыва загрузка
+  продолжается запросом ``Range`` с ``If-Range`` (если файл на сервере
+  изменился, сервер вернёт его целиком).
+* SHA-256 считается потоково во время записи.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_SAVE_INTERVAL = 2.0  # секунд между сохранениями манифеста
+_PAGINATION_PARAM = re.compile(r"^(PAGEN_\d+|page)$", re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# HTML и URL
+# ---------------------------------------------------------------------------
+
+class _LinkCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href.strip())
+
+
+def is_pdf_url(url: str) -> bool:
+    """Та же эвристика, что и у MinstroyParser._is_valid_pdf_url"""
+    return url.lower().endswith(".pdf") or "pdf" in urlparse(url).path.lower()
+
+
+def _pagination_param(url: str) -> Optional[Tuple[str, int]]:
+    for key, value in parse_qsl(urlparse(url).query, keep_blank_values=True):
+        if _PAGINATION_PARAM.match(key) and value.isdigit():
+            return key, int(value)
+    return None
+
+
+def with_query_param(url: str, key: str, value: Any) -> str:
+    parts = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != key]
+    query.append((key, str(value)))
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+def extract_links(html: str, page_url: str) -> Tuple[List[str], List[str]]:
+    """
+    Ссылки страницы-списка.
+
+    Returns:
+        (PDF-ссылки, ссылки пагинации того же раздела) - абсолютные, без повторов
+    """
+    collector = _LinkCollector()
+    collector.feed(html)
+    section = urlparse(page_url)
+    pdfs: List[str] = []
+    pages: List[str] = []
+    for href in collector.hrefs:
+        if href.startswith(("#", "mailto:", "javascript:")):
+            continue
+        url = urljoin(page_url, href).split("#", 1)[0]
+        if is_pdf_url(url):
+            if url not in pdfs:
+                pdfs.append(url)
+            continue
+        parsed = urlparse(url)
+        if (parsed.netloc, parsed.path) == (section.netloc, section.path) and _pagination_param(url):
+            if url not in pages:
+                pages.append(url)
+    return pdfs, pages
+
+
+def filename_for_url(url: str) -> str:
+    """Имя файла из URL; для URL без имени - стабильное имя по хешу (нужно для докачки)"""
+    filename = os.path.basename(urlparse(url).path)
+    filename = "".join(c for c in filename if c.isalnum() or c in "._-")
+    if not filename or not filename.lower().endswith(".pdf"):
+        filename = f"document_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.pdf"
+    return filename
+
+
+# ---------------------------------------------------------------------------
+# Манифест
+# ---------------------------------------------------------------------------
+
+class DownloadManifest:
+    """JSON-манифест скачанных файлов: ``url -> {filename, etag, last_modified, size, sha256, complete}``"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._saved_at = 0.0
+        self._dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Манифест повреждён, начинаем заново: {e}")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(url)
+
+    def update(self, url: str, **fields) -> Dict[str, Any]:
+        entry = self.files.setdefault(url, {})
+        entry.update(fields)
+        entry["updated"] = datetime.now().isoformat()
+        self._dirty = True
+        return entry
+
+    def snapshot(self, force: bool = False) -> Optional[str]:
+        """JSON для записи или None, если сохранять рано; без ``force`` не чаще MANIFEST_SAVE_INTERVAL"""
+        if not self._dirty or (not force and time.monotonic() - self._saved_at < MANIFEST_SAVE_INTERVAL):
+            return None
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        return json.dumps({"version": 1, "saved": datetime.now().isoformat(), "files": self.files},
+                          ensure_ascii=False, indent=1)
+
+    def write(self, payload: str):
+        """Атомарная запись (tmp + replace)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+
+    def save(self, force: bool = False):
+        payload = self.snapshot(force)
+        if payload is not None:
+            self.write(payload)
+
+
+# ---------------------------------------------------------------------------
+# Ограничение нагрузки на хост
+# ---------------------------------------------------------------------------
+
+class _HostState:
+    __slots__ = ("semaphore", "lock", "next_start", "in_flight", "peak")
+
+    def __init__(self, connections: int):
+        self.semaphore = asyncio.Semaphore(connections)
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+        self.in_flight = 0
+        self.peak = 0
+
+
+class HostLimiter:
+    """Не больше ``connections`` запросов к хосту и пауза ``delay`` между их стартами"""
+
+    def __init__(self, connections: int, delay: float):
+        self.connections = max(1, connections)
+        self.delay = max(0.0, delay)
+        self.hosts: Dict[str, _HostState] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = urlparse(url).netloc
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = _HostState(self.connections)
+        async with state.semaphore:
+            loop = asyncio.get_running_loop()
+            async with state.lock:
+                wait = state.next_start - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                state.next_start = loop.time() + self.delay
+            state.in_flight += 1
+            state.peak = max(state.peak, state.in_flight)
+            try:
+                yield
+            finally:
+                state.in_flight -= 1
+
+
+class _DownloadRejected(Exception):
+    """Файл не подходит (размер, тип) - повторять бессмысленно"""
+
+
+# ---------------------------------------------------------------------------
+# Краулер
+# ---------------------------------------------------------------------------
+
+class MinstroyCrawler:
+    """
+    Конкурентный обход разделов и скачивание PDF.
+
+    Args:
+        config: Конфигурация MinstroyParser (используются ``download_dir``,
+            ``headers``, ``timeout``, ``retry_attempts``, ``retry_delay``,
+            ``chunk_size``, ``max_file_size``, ``skip_existing``,
+            ``max_pages_to_scan``, ``max_connections_per_host``, ``request_delay``)
+        progress: Функция ``(stats) -> None``, вызывается после каждой страницы и файла
+    """
+
+    def __init__(self, config: Dict[str, Any], progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.config = config
+        self.progress = progress
+        self.download_dir = Path(config["download_dir"])
+        self.manifest = DownloadManifest(self.download_dir / MANIFEST_NAME)
+        self.limiter = HostLimiter(int(config.get("max_connections_per_host", 4)),
+                                   float(config.get("request_delay", 0.5)))
+        self.chunk_size = int(config.get("chunk_size", 65536))
+        self.max_file_size = int(config.get("max_file_size", 100 * 1024 * 1024))
+        self.max_pages = int(config.get("max_pages_to_scan", 2000))
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._seen_pages: Set[str] = set()
+        self._seen_files: Set[str] = set()
+        self._section_pages: Dict[str, int] = {}
+        self._filenames: Dict[str, str] = {}
+        self._manifest_lock: Optional[asyncio.Lock] = None
+        self.stats: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------ entry points
+
+    def run(self, urls: List[str]) -> Dict[str, Any]:
+        """Синхронная обёртка над ``crawl``"""
+        return asyncio.run(self.crawl(urls))
+
+    async def crawl(self, urls: List[str]) -> Dict[str, Any]:
+        started = time.time()
+        # Блокировка привязана к циклу текущего запуска
+        self._manifest_lock = asyncio.Lock()
+        await asyncio.to_thread(self.download_dir.mkdir, parents=True, exist_ok=True)
+        self.stats = {
+            "total_pages": 0, "page_errors": 0, "bytes_downloaded": 0,
+            "downloaded_files": [], "skipped_files": [], "failed_files": [],
+        }
+        self._filenames = {entry["filename"]: url for url, entry in self.manifest.files.items()
+                           if entry.get("filename")}
+
+        timeout = float(self.config.get("timeout", 30))
+        headers = dict(self.config.get("headers", {}))
+        # Сжатие ломает Range-запросы и хеш по байтам файла
+        headers["Accept-Encoding"] = "identity"
+        connector = aiohttp.TCPConnector(limit_per_host=self.limiter.connections)
+        client_timeout = aiohttp.ClientTimeout(total=None, connect=timeout, sock_read=timeout)
+        try:
+            async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=client_timeout) as session:
+                self._session = session
+                for url in urls:
+                    if url:
+                        self._section_pages[url] = 0
+                        self._schedule_page(url, section=url, page_num=1)
+                while self._tasks:
+                    done, _ = await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        self._tasks.discard(task)
+                        task.result()
+        finally:
+            self._session = None
+            for task in self._tasks:
+                task.cancel()
+            await self._save_manifest(force=True)
+
+        self.stats["urls_processed"] = len(self._section_pages)
+        self.stats["duration_seconds"] = round(time.time() - started, 2)
+        self.stats["max_in_flight_per_host"] = {host: s.peak for host, s in self.limiter.hosts.items()}
+        return self.stats
+
+    def _spawn(self, coroutine):
+        self._tasks.add(asyncio.get_running_loop().create_task(coroutine))
+
+    async def _notify(self):
+        if self.progress is not None:
+            self.progress(self.stats)
+        await self._save_manifest()
+
+    async def _save_manifest(self, force: bool = False):
+        """Снимок манифеста - в цикле, запись на диск - в потоке"""
+        payload = self.manifest.snapshot(force)
+        if payload is not None:
+            async with self._manifest_lock:
+                await asyncio.to_thread(self.manifest.write, payload)
+
+    # ------------------------------------------------------------ listing pages
+
+    def _schedule_page(self, url: str, section: str, page_num: int):
+        if url in self._seen_pages or self._section_pages[section] >= self.max_pages:
+            return
+        self._seen_pages.add(url)
+        self._section_pages[section] += 1
+        self._spawn(self._crawl_page(url, section, page_num))
+
+    async def _fetch_text(self, url: str) -> Optional[str]:
+        attempts = int(self.config.get("retry_attempts", 3))
+        for attempt in range(attempts):
+            try:
+                async with self.limiter.slot(url):
+                    async with self._session.get(url) as response:
+                        response.raise_for_status()
+                        return await response.text(errors="replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Ошибка загрузки страницы {url} (попытка {attempt + 1}/{attempts}): {e}")
+                if attempt < attempts - 1:
+                    await asyncio.sleep(float(self.config.get("retry_delay", 2)))
+        return None
+
+    async def _crawl_page(self, url: str, section: str, page_num: int):
+        html = await self._fetch_text(url)
+        self.stats["total_pages"] += 1
+        if html is None:
+            self.stats["page_errors"] += 1
+            await self._notify()
+            return
+
+        pdfs, pages = extract_links(html, url)
+        for pdf_url in pdfs:
+            if pdf_url not in self._seen_files:
+                self._seen_files.add(pdf_url)
+                self._spawn(self._download(pdf_url, page_num))
+
+        # Последняя видимая страница пагинации - ставим в очередь весь диапазон сразу
+        last: Dict[str, Tuple[int, str]] = {}
+        for page_url in pages:
+            key, number = _pagination_param(page_url)
+            self._schedule_page(page_url, section, number)
+            if number > last.get(key, (0, ""))[0]:
+                last[key] = (number, page_url)
+        for key, (number, template) in last.items():
+            for n in range(2, min(number, self.max_pages) + 1):
+                self._schedule_page(with_query_param(template, key, n), section, n)
+        await self._notify()
+
+    # ------------------------------------------------------------ downloads
+
+    def _assign_filename(self, url: str) -> str:
+        filename = filename_for_url(url)
+        owner = self._filenames.get(filename)
+        if owner is not None and owner != url:
+            # Одинаковые имена в разных разделах не должны перезаписывать друг друга
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+        self._filenames[filename] = url
+        return filename
+
+    async def _record(self, kind: str, info: Dict[str, Any]):
+        self.stats[kind].append(info)
+        await self._notify()
+
+    async def _download(self, url: str, page_num: int):
+        entry = self.manifest.get(url)
+        filename = entry["filename"] if entry and entry.get("filename") else self._assign_filename(url)
+        final_path = self.download_dir / filename
+        part_path = final_path.with_name(filename + ".part")
+        skip_existing = self.config.get("skip_existing", True)
+        headers: Dict[str, str] = {}
+
+        if entry and entry.get("complete") and final_path.exists() \
+                and final_path.stat().st_size == entry.get("size"):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            if not headers and skip_existing:
+                await self._record("skipped_files", {"url": url, "filename": filename, "reason": "already_exists"})
+                return
+        elif not entry and skip_existing and final_path.exists():
+            # Файл скачан до появления манифеста
+            await self._record("skipped_files", {"url": url, "filename": filename, "reason": "already_exists"})
+            return
+
+        self.manifest.update(url, filename=filename)
+        attempts = int(self.config.get("retry_attempts", 3))
+        error = "download_failed"
+        for attempt in range(attempts):
+            resume_headers = self._resume_headers(url, part_path)
+            try:
+                result = await self._fetch_file(url, final_path, part_path, {**headers, **resume_headers})
+            except _DownloadRejected as e:
+                error = str(e)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Ошибка при скачивании {url} (попытка {attempt + 1}/{attempts}): {error}")
+                if attempt < attempts - 1:
+                    await asyncio.sleep(float(self.config.get("retry_delay", 2)))
+                continue
+
+            if result is None:
+                self.manifest.update(url, checked=datetime.now().isoformat())
+                await self._record("skipped_files", {"url": url, "filename": filename, "reason": "not_modified"})
+            else:
+                result["page_num"] = page_num
+                await self._record("downloaded_files", result)
+            return
+
+        await self._record("failed_files", {"url": url, "filename": filename, "reason": error})
+
+    def _resume_headers(self, url: str, part_path: Path) -> Dict[str, str]:
+        """Range + If-Range, если есть недокачанный файл и валидатор версии"""
+        entry = self.manifest.get(url) or {}
+        validator = entry.get("etag") or entry.get("last_modified")
+        if not validator or not part_path.exists() or part_path.stat().st_size == 0:
+            return {}
+        return {"Range": f"bytes={part_path.stat().st_size}-", "If-Range": validator}
+
+    async def _fetch_file(self, url: str, final_path: Path, part_path: Path,
+                          headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Один HTTP-запрос файла; None - не изменился (304)"""
+        async with self.limiter.slot(url):
+            async with self._session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                if response.status == 416 and "Range" in headers:
+                    # Недокачанный файл не соответствует серверу - начнём заново
+                    await asyncio.to_thread(part_path.unlink, missing_ok=True)
+                    raise aiohttp.ClientPayloadError("range not satisfiable, restarting")
+                response.raise_for_status()
+
+                resumed = response.status == 206 and "Range" in headers
+                offset = part_path.stat().st_size if resumed else 0
+                expected = response.content_length
+                if expected is not None and offset + expected > self.max_file_size:
+                    raise _DownloadRejected(f"file_too_large: {offset + expected} bytes")
+                content_type = response.headers.get("Content-Type", "").lower()
+                if "pdf" not in content_type and not url.lower().endswith(".pdf"):
+                    raise _DownloadRejected(f"not_pdf: {content_type}")
+
+                self.manifest.update(url, etag=response.headers.get("ETag"),
+                                     last_modified=response.headers.get("Last-Modified"),
+                                     complete=False)
+                sha256 = hashlib.sha256()
+                if resumed:
+                    await asyncio.to_thread(_hash_file, part_path, sha256)
+                size = offset
+                # Запись на диск - в потоке, чтобы медленный диск не останавливал остальные загрузки
+                f = await asyncio.to_thread(open, part_path, "ab" if resumed else "wb")
+                try:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+                        self.stats["bytes_downloaded"] += len(chunk)
+                        if size > self.max_file_size:
+                            await asyncio.to_thread(f.close)
+                            await asyncio.to_thread(part_path.unlink, missing_ok=True)
+                            raise _DownloadRejected(f"file_too_large: >{self.max_file_size} bytes")
+                finally:
+                    await asyncio.to_thread(f.close)
+
+        await asyncio.to_thread(os.replace, part_path, final_path)
+        digest = sha256.hexdigest()
+        self.manifest.update(url, size=size, sha256=digest, complete=True)
+        logger.info(f"Успешно скачан: {final_path.name} ({size} байт{', докачка' if resumed else ''})")
+        return {
+            "url": url,
+            "filename": final_path.name,
+            "filepath": str(final_path),
+            "size": size,
+            "sha256": digest,
+            "resumed": resumed,
+            "download_time": datetime.now().isoformat(),
+        }
+
+
+def _hash_file(path: Path, sha256) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
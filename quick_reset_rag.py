@@ -3,7 +3,7 @@
 Quick reset of RAG data (non-interactive)
 
 Actions:
-- Drop and recreate Qdrant collection `enterprise_docs`
+- Drop the `enterprise_docs` alias with all its versions and recreate it
 - Wipe Neo4j graph (DETACH DELETE all)
 - Remove local caches and trainer artifacts (JSON, PKL, reports)
 - Remove processed_files.json and file_moves.json
@@ -20,16 +20,11 @@ BASE_DIR = Path(os.getenv("BASE_DIR", "I:/docs"))
 def reset_qdrant():
     try:
         from qdrant_client import QdrantClient
-        from qdrant_client.http.models import Distance, VectorParams
+        from core.vector_storage import QuantizedStorage
         client = QdrantClient(host="localhost", port=6333)
-        cols = [c.name for c in client.get_collections().collections]
-        if "enterprise_docs" in cols:
-            client.delete_collection(collection_name="enterprise_docs")
-        client.create_collection(
-            collection_name="enterprise_docs",
-            vectors_config=VectorParams(size=1024, distance=Distance.COSINE),
-        )
-        print("✅ Qdrant: enterprise_docs reset")
+        # enterprise_docs - алиас над enterprise_docs_vN; размер как у тренера (rubert-base, 768)
+        physical = QuantizedStorage(client).reset("enterprise_docs", size=768)
+        print(f"✅ Qdrant: enterprise_docs reset (-> {physical})")
     except Exception as e:
         print(f"⚠️ Qdrant reset error: {e}")
 
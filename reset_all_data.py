@@ -11,19 +11,15 @@ from pathlib import Path
 from qdrant_client import QdrantClient
 from neo4j import GraphDatabase
 
+from core.vector_storage import QuantizedStorage
+
 def reset_qdrant():
     """Очистка Qdrant"""
     try:
         client = QdrantClient(host="localhost", port=6333)
-        client.delete_collection("enterprise_docs")
-        print("✅ Qdrant collection 'enterprise_docs' deleted")
-        
-        # Пересоздаем коллекцию
-        client.create_collection(
-            collection_name="enterprise_docs",
-            vectors_config={"size": 768, "distance": "Cosine"}
-        )
-        print("✅ Qdrant collection 'enterprise_docs' recreated")
+        # Алиас enterprise_docs и все версии enterprise_docs_vN, затем пустая коллекция с текущим квантованием
+        physical = QuantizedStorage(client).reset("enterprise_docs", size=768)
+        print(f"✅ Qdrant collection 'enterprise_docs' recreated (-> {physical})")
     except Exception as e:
         print(f"❌ Qdrant reset failed: {e}")
 
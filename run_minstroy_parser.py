@@ -13,11 +13,10 @@ def main():
     
     # Проверка зависимостей
     try:
-        import requests
-        import bs4
+        import aiohttp
     except ImportError as e:
         print(f"ОШИБКА: Отсутствует зависимость: {e}")
-        print("Установите зависимости: pip install requests beautifulsoup4")
+        print("Установите зависимости: pip install aiohttp")
         return 1
     
     # Создание парсера
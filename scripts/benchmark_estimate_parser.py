@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк потокового парсера Excel-смет.
+
+Генерирует синтетические сметы (малую, среднюю и на 100k строк) с шапкой,
+объединенными ячейками и разделами, и замеряет время, скорость и пиковую
+память StreamingEstimateParser.
+
+    python scripts/benchmark_estimate_parser.py
+    python scripts/benchmark_estimate_parser.py --sizes 500 10000 --memory --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from openpyxl import Workbook
+
+from core.streaming_estimate_parser import StreamingEstimateParser
+
+DEFAULT_SIZES = {'small': 500, 'medium': 10_000, 'large': 100_000}
+CODE_PREFIXES = ['ГЭСН', 'ГЭСНм', 'ФЕР', 'ГЭСНр']
+UNITS = ['м3', '100 м2', 'т', 'шт', 'м']
+WORKS = [
+    'Разработка грунта экскаватором',
+    'Устройство бетонной подготовки',
+    'Монтаж металлических конструкций',
+    'Устройство кирпичных стен',
+    'Установка оконных блоков',
+]
+
+
+def generate_estimate(path: str, rows: int, section_every: int = 50) -> None:
+    """Синтетическая ЛСР: шапка, заголовок, позиции ГЭСН и объединенные строки разделов"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'ЛСР'
+    ws.append(['ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ (СМЕТА) № ЛС-02-01-01'])
+    ws.merge_cells('A1:G1')
+    ws.append(['Составлен ресурсным методом в текущем уровне цен'])
+    ws.append([])
+    ws.append(['№ п/п', 'Обоснование', 'Наименование работ и затрат', 'Ед. изм.',
+               'Количество', 'Цена за ед., руб', 'Стоимость всего, руб'])
+
+    row = ws.max_row
+    for i in range(rows):
+        if i % section_every == 0:
+            row += 1
+            ws.append([None, f'Раздел {i // section_every + 1}. Земляные работы'])
+            ws.merge_cells(start_row=row, start_column=2, end_row=row, end_column=7)
+        quantity = round(1 + (i * 7) % 250 / 3, 2)
+        price = round(100 + (i * 13) % 9000, 2)
+        row += 1
+        ws.append([
+            i + 1,
+            f'{CODE_PREFIXES[i % len(CODE_PREFIXES)]}{i % 47 + 1:02d}-{i % 9 + 1:02d}-{i % 120 + 1:03d}-{i % 12 + 1:02d}',
+            f'{WORKS[i % len(WORKS)]} (позиция {i + 1})',
+            UNITS[i % len(UNITS)],
+            quantity,
+            f'{price:,.2f}'.replace(',', ' ').replace('.', ','),
+            round(quantity * price, 2),
+        ])
+    ws.append([None, 'Итого по смете'])
+    wb.save(path)
+
+
+def run_case(name: str, rows: int, workdir: str, measure_memory: bool = False) -> dict:
+    path = os.path.join(workdir, f'estimate_{name}.xlsx')
+    started = time.perf_counter()
+    generate_estimate(path, rows)
+    generation_s = time.perf_counter() - started
+
+    parser = StreamingEstimateParser()
+    started = time.perf_counter()
+    result = parser.parse_workbook(path)
+    elapsed = time.perf_counter() - started
+
+    peak = None
+    if measure_memory:
+        # tracemalloc сильно замедляет разбор, поэтому память меряется отдельным проходом
+        tracemalloc.start()
+        parser.parse_workbook(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'case': name,
+        'rows': rows,
+        'file_size_mb': round(os.path.getsize(path) / 2**20, 2),
+        'generation_s': round(generation_s, 2),
+        'parse_s': round(elapsed, 3),
+        'rows_per_s': round(rows / elapsed) if elapsed else None,
+        'positions': result['positions_count'],
+        'priced_positions': sum(1 for p in result['positions'] if p['code_number']),
+        'merged_ranges': result['merged_ranges_count'],
+        'peak_python_mb': round(peak / 2**20, 1) if peak is not None else None,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк потокового парсера смет')
+    arg_parser.add_argument('--sizes', type=int, nargs='*', help='Размеры смет в строках')
+    arg_parser.add_argument('--memory', action='store_true', help='Замерить пиковую память (tracemalloc)')
+    arg_parser.add_argument('--output', help='Сохранить результаты в JSON')
+    args = arg_parser.parse_args()
+
+    cases = DEFAULT_SIZES if not args.sizes else {f'{n}_rows': n for n in args.sizes}
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, rows in cases.items():
+            print(f'⏱️  {name}: {rows} строк...')
+            result = run_case(name, rows, workdir, measure_memory=args.memory)
+            results.append(result)
+            print(f"   {result['parse_s']} с, {result['rows_per_s']} строк/с, "
+                  f"позиций {result['positions']}, пик {result['peak_python_mb']} МБ")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'💾 Результаты сохранены: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности обучения RAG (EnterpriseRAGTrainer).
+
+Генерирует детерминированный синтетический корпус строительных документов -
+PDF и DOCX нормативов с нумерацией в стиле СП/ГОСТ, таблицами и перечнями
+работ, а также XLSX-сметы - и прогоняет по нему EnterpriseRAGTrainer.train()
+целиком: Qdrant в локальном режиме (path), Neo4j - записывающая заглушка.
+Для каждого этапа пайплайна записываются время, CPU, пиковый RSS и чанков/с;
+результат сравнивается с сохранённым базовым замером.
+
+    python scripts/benchmark_ingestion.py run --profile small --output bench.json
+    python scripts/benchmark_ingestion.py run --profile medium --baseline baseline.json
+    python scripts/benchmark_ingestion.py compare bench.json baseline.json --threshold 0.15
+    python scripts/benchmark_ingestion.py generate corpus_dir --profile large
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Размеры корпуса: документов каждого типа и объём документа
+PROFILES = {
+    'small': {'pdf': 3, 'docx': 3, 'xlsx': 2, 'sections': 6, 'points': 8, 'table_rows': 10, 'estimate_rows': 200},
+    'medium': {'pdf': 15, 'docx': 15, 'xlsx': 10, 'sections': 12, 'points': 15, 'table_rows': 30, 'estimate_rows': 2_000},
+    'large': {'pdf': 60, 'docx': 60, 'xlsx': 30, 'sections': 20, 'points': 25, 'table_rows': 60, 'estimate_rows': 20_000},
+}
+
+# Этапы пайплайна в порядке выполнения (метод тренера -> имя в отчёте)
+STAGES = [
+    ('_stage_0_smart_file_scanning_and_preprocessing', 'stage_0_scan'),
+    ('_stage1_initial_validation', 'stage_1_validation'),
+    ('_stage2_duplicate_checking', 'stage_2_duplicates'),
+    ('_stage3_text_extraction', 'stage_3_text_extraction'),
+    ('_stage3_5_text_normalization', 'stage_3_5_normalization'),
+    ('_stage4_document_type_detection', 'stage_4_doc_type'),
+    ('_stage5_structural_analysis', 'stage_5_structure'),
+    ('_stage6_regex_to_sbert', 'stage_6_regex_to_sbert'),
+    ('_stage7_sbert_markup', 'stage_7_sbert_markup'),
+    ('_stage8_metadata_extraction', 'stage_8_metadata'),
+    ('_stage9_quality_control', 'stage_9_quality'),
+    ('_stage10_type_specific_processing', 'stage_10_type_specific'),
+    ('_stage11_work_sequence_extraction', 'stage_11_work_sequences'),
+    ('_stage12_save_work_sequences', 'stage_12_save_sequences'),
+    ('_stage13_smart_chunking', 'stage_13_chunking'),
+    ('_stage14_save_to_qdrant', 'stage_14_qdrant'),
+]
+
+# Метрики сравнения: (поле, больше - хуже)
+COMPARED_METRICS = [('wall_s', True), ('cpu_s', True), ('peak_rss_mb', True), ('chunks_per_s', False)]
+
+DOC_KINDS = [
+    ('СП', '{a}.{b}330.{year}', 'Свод правил'),
+    ('ГОСТ', '{a}{b}-{year}', 'Межгосударственный стандарт'),
+    ('СНиП', '{a}.0{b}.{c}-{yy}', 'Строительные нормы и правила'),
+]
+TOPICS = [
+    'Бетонные и железобетонные конструкции', 'Организация строительства', 'Основания зданий и сооружений',
+    'Кровли', 'Изоляционные и отделочные покрытия', 'Несущие и ограждающие конструкции',
+    'Земляные сооружения, основания и фундаменты', 'Металлические конструкции',
+]
+WORKS = [
+    'Разработка грунта экскаватором', 'Устройство песчаного основания', 'Устройство бетонной подготовки',
+    'Армирование фундаментной плиты', 'Бетонирование фундаментной плиты', 'Монтаж колонн каркаса',
+    'Монтаж плит перекрытия', 'Кладка наружных стен', 'Устройство гидроизоляции', 'Устройство кровли',
+    'Монтаж оконных блоков', 'Устройство стяжки пола',
+]
+SECTION_TITLES = [
+    'Область применения', 'Нормативные ссылки', 'Термины и определения', 'Общие положения',
+    'Подготовительные работы', 'Требования к материалам', 'Производство работ', 'Контроль качества',
+    'Приемка работ', 'Требования безопасности', 'Охрана окружающей среды', 'Исполнительная документация',
+]
+UNITS = ['м3', '100 м2', 'т', 'шт', 'м']
+
+
+# ---------------------------------------------------------------- корпус
+
+def _norm_document(rng: random.Random, index: int, profile: dict) -> dict:
+    """Содержимое одного норматива: номер, разделы с пунктами, таблица и перечень работ"""
+    prefix, pattern, kind = DOC_KINDS[index % len(DOC_KINDS)]
+    year = 2010 + rng.randrange(14)
+    number = f"{prefix} " + pattern.format(a=rng.randrange(10, 80), b=rng.randrange(10, 99), c=rng.randrange(1, 9),
+                                           year=year, yy=f"{year % 100:02d}")
+    topic = TOPICS[rng.randrange(len(TOPICS))]
+    refs = [f"СП {rng.randrange(10, 80)}.{rng.randrange(10, 99)}330.{2010 + rng.randrange(14)}" for _ in range(4)]
+    sections = []
+    for s in range(profile['sections']):
+        title = SECTION_TITLES[s % len(SECTION_TITLES)]
+        points = []
+        for p in range(profile['points']):
+            work = WORKS[rng.randrange(len(WORKS))]
+            points.append(
+                f"{s + 1}.{p + 1} {work} следует выполнять в соответствии с проектом производства работ "
+                f"и требованиями {refs[rng.randrange(len(refs))]}, допускаемое отклонение "
+                f"{rng.randrange(2, 20)} мм, температура не ниже {rng.randrange(-15, 10)} °С."
+            )
+        sections.append({'title': f"{s + 1} {title}", 'points': points})
+    table = [['№', 'Наименование работ', 'Ед. изм.', 'Объем', 'Допуск, мм']]
+    for r in range(profile['table_rows']):
+        table.append([str(r + 1), WORKS[rng.randrange(len(WORKS))], UNITS[rng.randrange(len(UNITS))],
+                      f"{rng.uniform(1, 500):.2f}", str(rng.randrange(1, 30))])
+    works = [f"{n + 1}. {w}" for n, w in enumerate(rng.sample(WORKS, k=min(8, len(WORKS))))]
+    return {'number': number, 'kind': kind, 'title': f"{number} {topic}", 'topic': topic,
+            'sections': sections, 'table': table, 'works': works}
+
+
+def _document_lines(doc: dict) -> list:
+    lines = [doc['kind'].upper(), doc['number'], doc['topic'].upper(), '', 'Издание официальное', '']
+    for section in doc['sections']:
+        lines.append(section['title'])
+        lines.extend(section['points'])
+        lines.append('')
+    lines.append('Таблица 1 - Допускаемые отклонения')
+    lines.extend(' | '.join(row) for row in doc['table'])
+    lines.append('')
+    lines.append('Перечень работ')
+    lines.extend(doc['works'])
+    return lines
+
+
+def write_docx(path: str, doc: dict):
+    from docx import Document
+    document = Document()
+    document.add_heading(doc['title'], level=0)
+    document.add_paragraph(doc['kind'])
+    for section in doc['sections']:
+        document.add_heading(section['title'], level=1)
+        for point in section['points']:
+            document.add_paragraph(point)
+    document.add_paragraph('Таблица 1 - Допускаемые отклонения')
+    table = document.add_table(rows=0, cols=len(doc['table'][0]))
+    for row in doc['table']:
+        cells = table.add_row().cells
+        for cell, value in zip(cells, row):
+            cell.text = value
+    document.add_heading('Перечень работ', level=1)
+    for work in doc['works']:
+        document.add_paragraph(work, style='List Number')
+    document.core_properties.title = doc['title']
+    # Фиксированная дата - байты файла не зависят от момента генерации
+    from datetime import datetime
+    document.core_properties.created = datetime(2024, 1, 1)
+    document.core_properties.modified = datetime(2024, 1, 1)
+    document.save(path)
+
+
+def write_pdf(path: str, doc: dict, lines_per_page: int = 60):
+    import fitz
+    pdf = fitz.open()
+    lines = _document_lines(doc)
+    for start in range(0, len(lines), lines_per_page):
+        page = pdf.new_page(width=595, height=842)
+        y = 40
+        for line in lines[start:start + lines_per_page]:
+            page.insert_text((40, y), line[:110], fontname='helv', fontsize=9,
+                             encoding=fitz.TEXT_ENCODING_CYRILLIC)
+            y += 13
+    pdf.set_metadata({'title': doc['title'], 'creationDate': 'D:20240101000000', 'modDate': 'D:20240101000000'})
+    pdf.save(path, garbage=3, deflate=True, no_new_id=True)
+    pdf.close()
+
+
+def write_xlsx(path: str, rows: int, seed: int):
+    from scripts.benchmark_estimate_parser import generate_estimate
+    generate_estimate(path, rows, section_every=40 + seed % 20)
+
+
+def generate_corpus(target_dir: str, profile: str = 'small', seed: int = 42) -> dict:
+    """
+    Сгенерировать корпус; при одинаковых profile и seed содержимое документов совпадает.
+
+    Returns:
+        Манифест: файлы с типами и размерами
+    """
+    sizes = PROFILES[profile]
+    rng = random.Random(seed)
+    target = Path(target_dir)
+    (target / 'norms').mkdir(parents=True, exist_ok=True)
+    (target / 'estimates').mkdir(parents=True, exist_ok=True)
+    files = []
+
+    for i in range(sizes['pdf']):
+        doc = _norm_document(rng, i, sizes)
+        path = target / 'norms' / f"norm_{i:04d}.pdf"
+        write_pdf(str(path), doc)
+        files.append({'path': str(path), 'type': 'pdf', 'number': doc['number']})
+    for i in range(sizes['docx']):
+        doc = _norm_document(rng, sizes['pdf'] + i, sizes)
+        path = target / 'norms' / f"norm_{sizes['pdf'] + i:04d}.docx"
+        write_docx(str(path), doc)
+        files.append({'path': str(path), 'type': 'docx', 'number': doc['number']})
+    for i in range(sizes['xlsx']):
+        path = target / 'estimates' / f"estimate_{i:04d}.xlsx"
+        write_xlsx(str(path), sizes['estimate_rows'], seed + i)
+        files.append({'path': str(path), 'type': 'xlsx', 'rows': sizes['estimate_rows']})
+
+    for f in files:
+        f['size'] = os.path.getsize(f['path'])
+    return {'profile': profile, 'seed': seed, 'files': files,
+            'total_bytes': sum(f['size'] for f in files)}
+
+
+# ---------------------------------------------------------------- замер
+
+def _rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+class RSSSampler(threading.Thread):
+    """Фоновый опрос RSS; peak сбрасывается на входе в этап"""
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True, name='rss-sampler')
+        self.interval = interval
+        self.peak = _rss_bytes()
+        self._stop_event = threading.Event()
+
+    def reset(self) -> int:
+        current = _rss_bytes()
+        self.peak = current
+        return current
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = _rss_bytes()
+            if rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class StageRecorder:
+    """Оборачивает методы этапов тренера и копит по ним метрики"""
+
+    def __init__(self, sampler: RSSSampler):
+        self.sampler = sampler
+        self.stages = {name: {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0}
+                       for _, name in STAGES}
+        self.chunks = 0
+        self._depth = 0
+
+    def wrap(self, trainer):
+        for method_name, stage_name in STAGES:
+            original = getattr(trainer, method_name, None)
+            if original is None:
+                continue
+            setattr(trainer, method_name, self._instrument(stage_name, original))
+
+    def _instrument(self, stage_name: str, method):
+        def timed(*args, **kwargs):
+            # Вложенные вызовы этапов учитываются во внешнем этапе
+            outer = self._depth == 0
+            if outer:
+                self.sampler.reset()
+                cpu_started = time.process_time()
+                started = time.perf_counter()
+            self._depth += 1
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if outer:
+                    stats = self.stages[stage_name]
+                    stats['calls'] += 1
+                    stats['wall_s'] += time.perf_counter() - started
+                    stats['cpu_s'] += time.process_time() - cpu_started
+                    stats['peak_rss_mb'] = max(stats['peak_rss_mb'], max(self.sampler.peak, _rss_bytes()) / 2**20)
+            if stage_name == 'stage_13_chunking' and isinstance(result, list):
+                self.chunks += len(result)
+            return result
+        return timed
+
+    def report(self) -> dict:
+        stages = {}
+        for name, stats in self.stages.items():
+            wall = stats['wall_s']
+            stages[name] = {
+                'calls': stats['calls'],
+                'wall_s': round(wall, 4),
+                'cpu_s': round(stats['cpu_s'], 4),
+                'peak_rss_mb': round(stats['peak_rss_mb'], 1),
+                'chunks_per_s': round(self.chunks / wall, 2) if wall > 0 and self.chunks else None,
+            }
+        return stages
+
+
+class RecordingNeo4jDriver:
+    """Заглушка драйвера Neo4j: запросы только считаются, без сервера"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def session(self, **kwargs):
+        return _RecordingSession(self)
+
+    def close(self):
+        pass
+
+
+class _RecordingSession:
+    def __init__(self, driver: RecordingNeo4jDriver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **kwargs):
+        self.driver.queries += 1
+        return _EmptyResult()
+
+    def close(self):
+        pass
+
+
+class _EmptyResult:
+    def __iter__(self):
+        return iter(())
+
+    def single(self):
+        return None
+
+    def data(self):
+        return []
+
+    def consume(self):
+        return None
+
+
+def _make_trainer(workdir: Path):
+    """EnterpriseRAGTrainer на локальном Qdrant (path) и заглушке Neo4j"""
+    import enterprise_rag_trainer_full as trainer_module
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+
+    class BenchmarkTrainer(trainer_module.EnterpriseRAGTrainer):
+        def _init_databases(self):
+            # Без попыток подключиться к HTTP-серверу Qdrant и к Neo4j
+            self.qdrant = QdrantClient(path=str(workdir / 'qdrant'))
+            if not self.qdrant.collection_exists('enterprise_docs'):
+                self.qdrant.create_collection(
+                    collection_name='enterprise_docs',
+                    vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE)
+                )
+            self.neo4j = RecordingNeo4jDriver()
+
+    return BenchmarkTrainer(base_dir=str(workdir / 'data'))
+
+
+def run_benchmark(profile: str = 'small', seed: int = 42, workdir: str = None, max_files: int = None) -> dict:
+    """Сгенерировать корпус и прогнать по нему обучение; вернуть метрики этапов"""
+    own_dir = workdir is None
+    tmp = tempfile.TemporaryDirectory(prefix='bldr_ingest_bench_') if own_dir else None
+    root = Path(tmp.name if own_dir else workdir).resolve()
+    data_dir = root / 'data'
+
+    # Конфигурация тренера читается из окружения при импорте модуля
+    os.environ.update({
+        'BASE_DIR': str(data_dir),
+        'PROCESSED_DIR': str(root / 'processed'),
+        'INCREMENTAL': '0',
+        'VLM_ENABLED': '0',
+        'USE_LLM': '0',
+    })
+    previous_cwd = os.getcwd()
+    try:
+        started = time.perf_counter()
+        manifest = generate_corpus(str(data_dir), profile, seed)
+        generation_s = time.perf_counter() - started
+
+        # Лог тренера пишется в текущий каталог
+        os.chdir(root)
+        sampler = RSSSampler()
+        sampler.start()
+        started = time.perf_counter()
+        trainer = _make_trainer(root)
+        init_s = time.perf_counter() - started
+
+        recorder = StageRecorder(sampler)
+        recorder.wrap(trainer)
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        trainer.train(max_files=max_files)
+        total_s = time.perf_counter() - started
+        total_cpu_s = time.process_time() - cpu_started
+        sampler.stop()
+
+        return {
+            'profile': profile,
+            'seed': seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpu_count': os.cpu_count()},
+            'corpus': {'files': len(manifest['files']), 'total_mb': round(manifest['total_bytes'] / 2**20, 2),
+                       'generation_s': round(generation_s, 2)},
+            'trainer_init_s': round(init_s, 2),
+            'total': {
+                'wall_s': round(total_s, 3),
+                'cpu_s': round(total_cpu_s, 3),
+                'peak_rss_mb': round(max(s['peak_rss_mb'] for s in recorder.stages.values()), 1),
+                'chunks': recorder.chunks,
+                'chunks_per_s': round(recorder.chunks / total_s, 2) if total_s else None,
+                'files_processed': trainer.stats.get('files_processed', 0),
+                'files_failed': trainer.stats.get('files_failed', 0),
+                'neo4j_queries': trainer.neo4j.queries,
+            },
+            'stages': recorder.report(),
+        }
+    finally:
+        os.chdir(previous_cwd)
+        if tmp is not None:
+            tmp.cleanup()
+
+
+# ---------------------------------------------------------------- сравнение
+
+def compare_results(current: dict, baseline: dict, threshold: float = 0.15, min_wall_s: float = 0.05) -> dict:
+    """
+    Сравнить замер с базовым.
+
+    Регрессия - ухудшение метрики больше чем на threshold (доля). Этапы,
+    которые в обоих замерах быстрее min_wall_s, по времени не сравниваются:
+    на них доминирует шум.
+    """
+    rows = []
+    pairs = [('total', current.get('total', {}), baseline.get('total', {}))]
+    pairs += [(name, stats, baseline.get('stages', {}).get(name, {}))
+              for name, stats in current.get('stages', {}).items()]
+    for name, cur, base in pairs:
+        for metric, higher_is_worse in COMPARED_METRICS:
+            new, old = cur.get(metric), base.get(metric)
+            if new is None or old is None or old == 0:
+                continue
+            if metric in ('wall_s', 'cpu_s', 'chunks_per_s') and max(cur.get('wall_s') or 0, base.get('wall_s') or 0) < min_wall_s:
+                continue
+            change = (new - old) / old
+            regression = change > threshold if higher_is_worse else change < -threshold
+            rows.append({'stage': name, 'metric': metric, 'baseline': old, 'current': new,
+                         'change': round(change, 4), 'regression': regression})
+    regressions = [r for r in rows if r['regression']]
+    if current.get('profile') != baseline.get('profile'):
+        warning = f"profiles differ: {current.get('profile')} vs {baseline.get('profile')}"
+    else:
+        warning = None
+    return {'threshold': threshold, 'regressions': regressions, 'comparisons': rows, 'warning': warning}
+
+
+def print_comparison(report: dict):
+    if report['warning']:
+        print(f"⚠️  {report['warning']}")
+    for row in report['comparisons']:
+        mark = '❌' if row['regression'] else '  '
+        print(f"{mark} {row['stage']:<28} {row['metric']:<13} {row['baseline']:>10} -> {row['current']:<10} "
+              f"({row['change'] * 100:+.1f}%)")
+    if report['regressions']:
+        print(f"❌ Регрессий: {len(report['regressions'])} (порог {report['threshold'] * 100:.0f}%)")
+    else:
+        print('✅ Регрессий нет')
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк обучения RAG на синтетическом корпусе')
+    sub = arg_parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help='Только сгенерировать корпус')
+    gen.add_argument('target')
+    gen.add_argument('--profile', choices=sorted(PROFILES), default='small')
+    gen.add_argument('--seed', type=int, default=42)
+
+    run = sub.add_parser('run', help='Сгенерировать корпус и замерить обучение')
+    run.add_argument('--profile', choices=sorted(PROFILES), default='small')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--workdir', help='Рабочий каталог (по умолчанию временный)')
+    run.add_argument('--max-files', type=int)
+    run.add_argument('--output', help='Сохранить результаты в JSON')
+    run.add_argument('--baseline', help='Сравнить с базовым замером')
+    run.add_argument('--save-baseline', help='Сохранить замер как базовый')
+    run.add_argument('--threshold', type=float, default=0.15)
+
+    cmp_parser = sub.add_parser('compare', help='Сравнить два замера')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('--threshold', type=float, default=0.15)
+
+    args = arg_parser.parse_args()
+
+    if args.command == 'generate':
+        manifest = generate_corpus(args.target, args.profile, args.seed)
+        print(f"📄 {len(manifest['files'])} файлов, {manifest['total_bytes'] / 2**20:.1f} МБ -> {args.target}")
+        return
+
+    if args.command == 'compare':
+        report = compare_results(_load(args.current), _load(args.baseline), args.threshold)
+        print_comparison(report)
+        sys.exit(1 if report['regressions'] else 0)
+
+    print(f"⏱️  Профиль {args.profile}, seed {args.seed}...")
+    result = run_benchmark(args.profile, args.seed, args.workdir, args.max_files)
+    total = result['total']
+    print(f"   {total['wall_s']} с, {total['chunks']} чанков, {total['chunks_per_s']} чанков/с, "
+          f"пик {total['peak_rss_mb']} МБ")
+    for name, stats in result['stages'].items():
+        print(f"   {name:<28} {stats['wall_s']:>9} с  cpu {stats['cpu_s']:>9} с  rss {stats['peak_rss_mb']:>8} МБ")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f'💾 Результаты сохранены: {path}')
+
+    if args.baseline:
+        report = compare_results(result, _load(args.baseline), args.threshold)
+        print_comparison(report)
+        sys.exit(1 if report['regressions'] else 0)
+
+
+if __name__ == '__main__':
+    main()
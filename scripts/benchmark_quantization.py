@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк квантования enterprise_docs: полнота и задержка поиска.
+
+Запросы - случайная выборка векторов коллекции с небольшим шумом. Эталон -
+точный поиск (exact=True) по исходным векторам; с ним сравниваются
+HNSW без квантования (базовая линия), квантованный поиск без рескоринга и
+с рескорингом при разных коэффициентах оверсэмплинга.
+
+    python scripts/benchmark_quantization.py --queries 200 --k 10
+    python scripts/benchmark_quantization.py --synthetic 200000 --mode product --output bench.json
+
+Нужен сервер Qdrant: локальный режим (path=...) не поддерживает квантование.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from core.vector_storage import QuantizationSettings, QuantizedStorage, quantization_mode
+
+DEFAULT_OVERSAMPLING = [1.0, 2.0, 3.0, 4.0]
+SYNTHETIC_COLLECTION = 'bench_quantization'
+
+
+def sample_queries(client, collection: str, count: int, scan: int, noise: float, seed: int) -> list:
+    """Векторы случайных точек коллекции (из первых scan точек) с гауссовым шумом"""
+    vectors = []
+    offset = None
+    while len(vectors) < scan:
+        points, offset = client.scroll(collection_name=collection, limit=min(1000, scan - len(vectors)),
+                                       offset=offset, with_payload=False, with_vectors=True)
+        vectors.extend(p.vector for p in points)
+        if offset is None:
+            break
+    rng = np.random.default_rng(seed)
+    chosen = random.Random(seed).sample(vectors, min(count, len(vectors)))
+    queries = np.asarray(chosen, dtype=np.float32)
+    queries += rng.normal(0, noise, queries.shape).astype(np.float32)
+    return queries.tolist()
+
+
+def build_synthetic(client, settings: QuantizationSettings, points: int, dim: int, seed: int) -> str:
+    """Синтетическая коллекция: кластеры, похожие на эмбеддинги разделов одного документа"""
+    if client.collection_exists(SYNTHETIC_COLLECTION):
+        client.delete_collection(SYNTHETIC_COLLECTION)
+    storage = QuantizedStorage(client, settings)
+    storage._create(SYNTHETIC_COLLECTION, dim, models.Distance.COSINE)
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 1, (max(1, points // 200), dim)).astype(np.float32)
+    batch = 2000
+    for start in range(0, points, batch):
+        n = min(batch, points - start)
+        vectors = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.4, (n, dim)).astype(np.float32)
+        client.upsert(SYNTHETIC_COLLECTION, points=models.Batch(
+            ids=list(range(start, start + n)), vectors=vectors.tolist()), wait=False)
+
+    # Ждем, пока оптимизатор построит HNSW и квантованные векторы
+    while client.get_collection(SYNTHETIC_COLLECTION).status != models.CollectionStatus.GREEN:
+        time.sleep(1)
+    return SYNTHETIC_COLLECTION
+
+
+def run_variant(client, collection: str, queries: list, truth: list, k: int, params) -> dict:
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        hits = client.search(collection_name=collection, query_vector=query, limit=k,
+                             with_payload=False, search_params=params)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len({h.id for h in hits} & expected) / max(1, len(expected)))
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'recall_at_k': round(float(np.mean(recalls)), 4),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+        'qps': round(len(queries) / float(np.sum(latencies)), 1),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк квантования Qdrant')
+    arg_parser.add_argument('--host', default=os.getenv('QDRANT_HOST', 'localhost'))
+    arg_parser.add_argument('--port', type=int, default=int(os.getenv('QDRANT_PORT', 6333)))
+    arg_parser.add_argument('--collection', default='enterprise_docs')
+    arg_parser.add_argument('--synthetic', type=int, help='Построить синтетическую коллекцию из N векторов')
+    arg_parser.add_argument('--dim', type=int, default=768)
+    arg_parser.add_argument('--mode', default='scalar', choices=['scalar', 'product'],
+                            help='Режим квантования синтетической коллекции')
+    arg_parser.add_argument('--queries', type=int, default=200)
+    arg_parser.add_argument('--scan', type=int, default=20000, help='Из скольких точек выбирать запросы')
+    arg_parser.add_argument('--noise', type=float, default=0.02)
+    arg_parser.add_argument('--k', type=int, default=10)
+    arg_parser.add_argument('--oversampling', type=float, nargs='*', default=DEFAULT_OVERSAMPLING)
+    arg_parser.add_argument('--seed', type=int, default=42)
+    arg_parser.add_argument('--output', help='Сохранить результаты в JSON')
+    args = arg_parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port, timeout=60.0)
+    collection = args.collection
+    if args.synthetic:
+        print(f'🧪 Синтетическая коллекция: {args.synthetic} x {args.dim}, {args.mode}...')
+        collection = build_synthetic(client, QuantizationSettings(mode=args.mode), args.synthetic, args.dim, args.seed)
+
+    info = client.get_collection(collection)
+    mode = quantization_mode(info)
+    print(f'📦 {collection}: {info.points_count} точек, квантование {mode}')
+
+    queries = sample_queries(client, collection, args.queries, args.scan, args.noise, args.seed)
+    truth = []
+    for query in queries:
+        hits = client.search(collection_name=collection, query_vector=query, limit=args.k,
+                             with_payload=False, search_params=models.SearchParams(exact=True))
+        truth.append({h.id for h in hits})
+
+    variants = {'hnsw_unquantized': models.SearchParams(
+        quantization=models.QuantizationSearchParams(ignore=True))}
+    if mode != 'none':
+        variants['quantized_no_rescore'] = models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=False))
+        for factor in args.oversampling:
+            variants[f'quantized_rescore_x{factor:g}'] = QuantizationSettings(
+                mode='scalar', oversampling=factor).search_params()
+
+    results = {'collection': collection, 'points': info.points_count, 'quantization': mode,
+               'queries': len(queries), 'k': args.k, 'variants': {}}
+    for name, params in variants.items():
+        result = run_variant(client, collection, queries, truth, args.k, params)
+        results['variants'][name] = result
+        print(f"   {name:<26} recall@{args.k} {result['recall_at_k']:.4f}  "
+              f"p50 {result['p50_ms']} мс  p95 {result['p95_ms']} мс  {result['qps']} q/s")
+
+    if args.synthetic:
+        client.delete_collection(collection)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'💾 Результаты сохранены: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
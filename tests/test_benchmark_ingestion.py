@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Тесты бенчмарка обучения RAG (scripts/benchmark_ingestion.py)
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_ingestion import PROFILES, _norm_document, compare_results
+
+
+def test_corpus_content_is_deterministic():
+    docs_a = [_norm_document(random.Random(7), i, PROFILES['small']) for i in range(3)]
+    docs_b = [_norm_document(random.Random(7), i, PROFILES['small']) for i in range(3)]
+    assert docs_a == docs_b
+    assert [d['number'].split()[0] for d in docs_a] == ['СП', 'ГОСТ', 'СНиП']
+    assert len(docs_a[0]['table']) == PROFILES['small']['table_rows'] + 1
+
+
+def test_compare_flags_regressions():
+    baseline = {'profile': 'small',
+                'total': {'wall_s': 10.0, 'peak_rss_mb': 500.0, 'chunks_per_s': 100.0},
+                'stages': {'stage_13_chunking': {'wall_s': 2.0, 'cpu_s': 2.0},
+                           'stage_1_validation': {'wall_s': 0.001}}}
+    current = {'profile': 'small',
+               'total': {'wall_s': 10.5, 'peak_rss_mb': 650.0, 'chunks_per_s': 80.0},
+               'stages': {'stage_13_chunking': {'wall_s': 3.0, 'cpu_s': 2.1},
+                          'stage_1_validation': {'wall_s': 0.004}}}
+    report = compare_results(current, baseline, threshold=0.15)
+    flagged = {(r['stage'], r['metric']) for r in report['regressions']}
+    # Шумные микро-этапы не сравниваются по времени
+    assert flagged == {('total', 'peak_rss_mb'), ('total', 'chunks_per_s'), ('stage_13_chunking', 'wall_s')}
+    assert report['warning'] is None
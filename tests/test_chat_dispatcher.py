@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Тесты очередей чатов Telegram-бота (integrations/chat_dispatcher.py)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from integrations.chat_dispatcher import ChatDispatcher, RateLimited
+
+
+def test_chats_run_in_parallel_and_keep_order():
+    async def scenario():
+        done = []
+
+        async def handler(item):
+            chat, n, delay = item
+            await asyncio.sleep(delay)
+            done.append((chat, n))
+
+        dispatcher = ChatDispatcher(handler, max_concurrency=50, rate_limit=0)
+        started = time.perf_counter()
+        # Долгий запрос в чате "slow" не задерживает остальные чаты
+        assert await dispatcher.submit("slow", ("slow", 0, 0.5)) == 0
+        assert await dispatcher.submit("slow", ("slow", 1, 0.0)) == 1
+        for chat in range(30):
+            for n in range(3):
+                await dispatcher.submit(chat, (chat, n, 0.02))
+        while len([d for d in done if d[0] != "slow"]) < 90:
+            await asyncio.sleep(0.01)
+        assert time.perf_counter() - started < 0.4
+        await dispatcher.join()
+        for chat in list(range(30)) + ["slow"]:
+            assert [n for c, n in done if c == chat] == sorted(n for c, n in done if c == chat)
+        assert dispatcher.stats()["processed"] == 92
+        await dispatcher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_semaphore_limits_backend_concurrency():
+    async def scenario():
+        in_flight = peak = 0
+
+        async def handler(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        dispatcher = ChatDispatcher(handler, max_concurrency=3, rate_limit=0)
+        positions = [await dispatcher.submit(chat, chat) for chat in range(10)]
+        await dispatcher.join()
+        assert peak == 3
+        assert positions[0] == 0
+        await dispatcher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_and_idle_reaping():
+    async def scenario():
+        async def handler(item):
+            if item == "boom":
+                raise RuntimeError("backend down")
+
+        dispatcher = ChatDispatcher(handler, rate_limit=3, rate_window=60, idle_timeout=0.05)
+        for n in range(3):
+            await dispatcher.submit(1, n, user_id=42)
+        with pytest.raises(RateLimited) as exc:
+            await dispatcher.submit(1, "late", user_id=42)
+        assert 0 < exc.value.retry_after <= 60
+        await dispatcher.submit(2, "boom", user_id=7)
+
+        await dispatcher.join()
+        await asyncio.sleep(0.2)
+        # Простаивающие воркеры завершены, ошибка обработчика не остановила чат
+        assert dispatcher.active_chats == 0
+        assert dispatcher.stats()["failed"] == 1
+        assert await dispatcher.submit(2, "again", user_id=7) == 0
+        await dispatcher.join()
+        await dispatcher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_idle_users_are_forgotten():
+    async def scenario():
+        async def handler(item):
+            pass
+
+        dispatcher = ChatDispatcher(handler, rate_limit=5, rate_window=0.05, idle_timeout=0.05)
+        for user_id in range(10):
+            await dispatcher.submit(user_id, "hi", user_id=user_id)
+        await dispatcher.join()
+        await asyncio.sleep(0.2)
+        # Окна лимита пусты, чаты простаивают - пользователи не копятся
+        assert dispatcher.active_chats == 0 and not dispatcher._user_events
+        await dispatcher.shutdown()
+
+    asyncio.run(scenario())
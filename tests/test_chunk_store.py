@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тесты хранилища текстов и метаданных чанков (core/chunk_store.py)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.chunk_store import ChunkStore, chunk_key
+
+
+DOC_METADATA = {
+    'doc_type': 'sp',
+    'canonical_id': 'СП 48.13330.2019',
+    'quality_score': 0.9,
+    'sections': [{'title': '1 Область применения', 'children': []}],
+    'works': ['Устройство фундаментов', 'Монтаж конструкций'],
+}
+
+
+def _chunks(file_hash, count):
+    chunks = []
+    for i in range(count):
+        metadata = dict(DOC_METADATA)
+        if i == 1:
+            metadata['table_number'] = 3
+        chunks.append({'chunk_key': chunk_key(file_hash, i, f'c{i}'), 'position': i, 'chunk_id': f'c{i}',
+                       'section_id': '1', 'chunk_type': 'paragraph', 'content': f'Текст {i}',
+                       'metadata': metadata})
+    return chunks
+
+
+def test_document_metadata_stored_once(tmp_path):
+    store = ChunkStore(tmp_path / 'chunk_store.db')
+    chunks = _chunks('h1', 3)
+    assert store.save_document('h1', '/docs/sp48.pdf', DOC_METADATA, chunks, near_duplicate_of='h0') == []
+
+    # Чанк хранит только отличия от метаданных документа
+    overrides = dict(store.store.execute('SELECT chunk_id, metadata FROM chunks'))
+    assert overrides['c0'] is None and overrides['c1'] == '{"table_number":3}'
+
+    records = store.fetch([chunks[1]['chunk_key'], chunks[0]['chunk_key'], 'missing'])
+    assert set(records) == {chunks[0]['chunk_key'], chunks[1]['chunk_key']}
+    record = records[chunks[1]['chunk_key']]
+    assert record['content'] == 'Текст 1' and record['file_path'] == '/docs/sp48.pdf'
+    assert record['metadata']['works'] == DOC_METADATA['works'] and record['metadata']['table_number'] == 3
+    assert record['canonical_id'] == 'СП 48.13330.2019' and record['near_duplicate_of'] == 'h0'
+    assert store.document('h1')['file_path'] == '/docs/sp48.pdf'
+
+
+def test_reingestion_returns_stale_keys(tmp_path):
+    store = ChunkStore(tmp_path / 'chunk_store.db')
+    first = _chunks('h1', 4)
+    store.save_document('h1', '/docs/a.pdf', DOC_METADATA, first)
+
+    second = _chunks('h1', 2)
+    stale = store.save_document('h1', '/docs/a.pdf', DOC_METADATA, second)
+    # Ключи детерминированы: первые два чанка перезаписаны, два лишних устарели
+    assert [c['chunk_key'] for c in second] == [c['chunk_key'] for c in first[:2]]
+    assert sorted(stale) == sorted(c['chunk_key'] for c in first[2:])
+    assert len(store.fetch(c['chunk_key'] for c in first)) == 2
+
+    assert sorted(store.delete_document('h1')) == sorted(c['chunk_key'] for c in second)
+    assert store.document('h1') is None
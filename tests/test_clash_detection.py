@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Тесты поиска коллизий по 3D габаритам (core/clash_detection.py)
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.clash_detection import ElementBoxes, candidate_pairs, detect_clashes
+
+
+def _boxes(spec):
+    ids = [s[0] for s in spec]
+    return ElementBoxes.from_arrays(ids, ["IfcWall"] * len(spec), [s[1] for s in spec], [s[2] for s in spec])
+
+
+def test_floors_do_not_clash():
+    boxes = _boxes([
+        ("wall_1", (0, 0, 0), (5, 0.3, 3)),
+        ("wall_2", (0, 0, 3), (5, 0.3, 6)),        # этажом выше - касание, не коллизия
+        ("duct", (2, -1, 1), (2.5, 1, 1.5)),       # пересекает стену первого этажа
+    ])
+    result = detect_clashes(boxes, tolerance=0.01)
+    assert result["clash_count"] == 1
+    clash = result["clashes"][0]
+    assert {clash["element1_id"], clash["element2_id"]} == {"wall_1", "duct"}
+    assert clash["penetration"] == 0.3
+
+
+def test_negative_tolerance_finds_clearance_violations():
+    boxes = _boxes([
+        ("pipe", (0, 0, 0), (1, 1, 1)),
+        ("cable_tray", (1.05, 0, 0), (2, 1, 1)),
+    ])
+    assert detect_clashes(boxes, tolerance=0.01)["clash_count"] == 0
+    assert detect_clashes(boxes, tolerance=-0.1)["clash_count"] == 1
+
+
+def test_sweep_matches_brute_force_and_pages():
+    rng = np.random.default_rng(3)
+    n = 600
+    mins = rng.uniform(0, 30, (n, 3))
+    maxs = mins + rng.uniform(0.1, 2, (n, 3))
+    boxes = ElementBoxes.from_arrays([f"e{i}" for i in range(n)], ["IfcBeam"] * n, mins, maxs)
+
+    found = set(map(tuple, candidate_pairs(boxes, 0.01).tolist()))
+    expected = set()
+    for i in range(n):
+        overlap = np.minimum(maxs[i], maxs[i + 1:]) - np.maximum(mins[i], mins[i + 1:])
+        expected.update((i, i + 1 + j) for j in np.flatnonzero((overlap > 0.01).all(axis=1)))
+    assert found == expected
+
+    first = detect_clashes(boxes, offset=0, limit=10)
+    second = detect_clashes(boxes, offset=first["next_offset"], limit=10)
+    assert first["clash_count"] == len(expected)
+    assert first["clashes"][0]["penetration"] >= first["clashes"][-1]["penetration"]
+    assert not {(c["element1_id"], c["element2_id"]) for c in first["clashes"]} & \
+        {(c["element1_id"], c["element2_id"]) for c in second["clashes"]}
+
+
+def test_large_model_is_fast():
+    rng = np.random.default_rng(5)
+    n = 40000
+    mins = rng.uniform(0, 1000, (n, 3))
+    mins[:, 2] = rng.integers(0, 10, n) * 3.0
+    maxs = mins + rng.uniform(0.1, 3, (n, 3))
+    maxs[:, 2] = mins[:, 2] + 2.9
+    boxes = ElementBoxes.from_arrays([str(i) for i in range(n)], ["IfcWall"] * n, mins, maxs)
+
+    started = time.perf_counter()
+    result = detect_clashes(boxes, limit=20)
+    assert time.perf_counter() - started < 5.0
+    assert len(result["clashes"]) == 20
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Тесты движка критического пути (core/cpm_engine.py)
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cpm_engine import CPMEngine, WorkCalendar, work_name
+from core.exceptions import ScheduleCycleError, ToolValidationError
+
+
+def _works():
+    return [
+        {"name": "Котлован", "duration": 5},
+        {"name": "Фундамент", "duration": 10, "deps": ["Котлован"]},
+        {"name": "Стены", "duration": 15, "deps": ["Фундамент"]},
+        {"name": "Кровля", "duration": 7, "deps": ["Стены"]},
+        {"name": "Сети", "duration": 4, "deps": ["Фундамент"]},
+    ]
+
+
+def test_finish_to_start_floats():
+    engine = CPMEngine.from_works(_works())
+    result = engine.compute()
+
+    assert result.project_duration == 37
+    assert result.critical_path() == [0, 1, 2, 3]
+    assert result.total_float[4] == 18
+    assert result.free_float[4] == 18
+    assert result.early_start.tolist() == [0, 5, 15, 30, 15]
+
+
+def test_link_types_and_lags():
+    works = [
+        {"id": "A", "duration": 10},
+        {"id": "B", "duration": 4, "dependencies": [{"id": "A", "type": "SS", "lag": 2}]},
+        {"id": "C", "duration": 3, "dependencies": [{"id": "A", "type": "FF", "lag": 1}]},
+        {"id": "D", "duration": 2, "dependencies": [{"id": "A", "type": "SF", "lag": 5}]},
+    ]
+    result = CPMEngine.from_works(works).compute()
+
+    assert result.early_start.tolist() == [0, 2, 8, 3]
+    assert result.project_duration == 11
+    # C заканчивается последней, A связана с ней FF+1 - обе критические
+    assert result.critical_path() == [0, 2]
+    assert result.total_float[1] == 5
+
+
+def test_cycle_is_reported_with_path():
+    works = [
+        {"name": "A", "duration": 1, "deps": ["C"]},
+        {"name": "B", "duration": 1, "deps": ["A"]},
+        {"name": "C", "duration": 1, "deps": ["B"]},
+        {"name": "D", "duration": 1},
+    ]
+    with pytest.raises(ScheduleCycleError) as exc:
+        CPMEngine.from_works(works)
+    cycle = exc.value.cycle
+    assert cycle[0] == cycle[-1] and set(cycle) == {"A", "B", "C"}
+
+
+def test_duplicate_names_do_not_merge_tasks():
+    works = [
+        {"name": "Монтаж", "duration": 3},
+        {"name": "Проверка", "duration": 1, "deps": ["Монтаж"]},
+        {"name": "Монтаж", "duration": 2, "deps": ["Проверка"]},
+    ]
+    engine = CPMEngine.from_works(works)
+    result = engine.compute()
+
+    assert engine.n == 3
+    assert result.project_duration == 6
+    assert any("Повторяющиеся" in w for w in engine.warnings)
+
+
+def test_unnamed_works_and_invalid_lag():
+    works = [{"duration": 2}, {"duration": 1, "deps": ["Работа 1"]}]
+    engine = CPMEngine.from_works(works)
+    assert engine.compute().project_duration == 3
+    assert engine.keys == [work_name(works[0], 0), work_name(works[1], 1)] == ["Работа 1", "Работа 2"]
+
+    works[1]["deps"] = [{"name": "Работа 1", "lag": "два дня"}]
+    with pytest.raises(ToolValidationError) as exc:
+        CPMEngine.from_works(works)
+    assert exc.value.context["parameter"] == "works[1].dependencies.lag"
+
+
+def test_incremental_update_matches_full_recompute():
+    rng = np.random.default_rng(7)
+    n = 2000
+    src = rng.integers(0, n - 1, 6000)
+    dst = src + rng.integers(1, 50, 6000)
+    keep = dst < n
+    args = (rng.integers(1, 10, n), src[keep], dst[keep], rng.integers(0, 4, keep.sum()), rng.integers(-2, 3, keep.sum()))
+
+    engine = CPMEngine(*args)
+    engine.compute()
+    for task in rng.integers(0, n, 20):
+        incremental = engine.update_duration(int(task), float(rng.integers(1, 20)))
+        full = CPMEngine(engine.durations.copy(), *args[1:]).compute()
+        assert incremental.project_duration == full.project_duration
+        assert np.allclose(incremental.early_start, full.early_start)
+        assert np.allclose(incremental.late_finish, full.late_finish)
+        assert np.allclose(incremental.total_float, full.total_float)
+
+
+def test_calendar_skips_weekends():
+    engine = CPMEngine.from_works([{"name": "A", "duration": 3}, {"name": "B", "duration": 2, "deps": ["A"]}])
+    # Пятница: три рабочих дня заканчиваются в среду
+    calendar = WorkCalendar(start_date=datetime(2025, 1, 3), weekmask="1111100")
+    schedule = {r["index"]: r for r in engine.schedule(calendar)}
+    assert schedule[1]["start"].startswith("2025-01-08")
+
+
+def test_large_schedule_performance():
+    n = 20000
+    rng = np.random.default_rng(1)
+    src = np.arange(n - 1)
+    dst = src + 1
+    extra_src = rng.integers(0, n - 100, 40000)
+    extra_dst = extra_src + rng.integers(1, 100, 40000)
+    started = time.perf_counter()
+    engine = CPMEngine(rng.integers(1, 5, n), np.concatenate([src, extra_src]), np.concatenate([dst, extra_dst]))
+    result = engine.compute()
+    assert time.perf_counter() - started < 5.0
+    assert len(result.critical_path()) > 0
+
+
+def test_gpp_creator_uses_engine():
+    from core.gpp_creator import create_gpp
+
+    gpp = create_gpp(_works())
+    assert gpp["critical_path"] == ["TASK_001", "TASK_002", "TASK_003", "TASK_004"]
+    assert gpp["project_duration"] == 37
+    assert len(gpp["links"]) == 4
+
+
+def test_gpp_creator_degrades_on_invalid_lag():
+    from core.gpp_creator import create_gpp
+
+    works = [{"name": "Фундамент", "duration": 2},
+             {"name": "Стены", "duration": 3, "deps": [{"name": "Фундамент", "lag": "два дня"}]}]
+    gpp = create_gpp(works)
+    # Без расчета сети - последовательная раскладка и предупреждение вместо исключения
+    assert [task["id"] for task in gpp["tasks"]] == ["TASK_001", "TASK_002"]
+    assert gpp["critical_path"] == [] and gpp["links"] == []
+    assert "works[1].dependencies.lag" in gpp["warnings"][0]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тесты реестра распределённого обучения (core/ingest_ledger.py)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ingest_ledger import IngestLedger, make_batches, scan_corpus
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _corpus(root):
+    (root / "sp").mkdir(parents=True)
+    (root / "tmp").mkdir()
+    for n in range(5):
+        (root / "sp" / f"doc{n}.pdf").write_bytes(b"x" * 2048)
+    (root / "sp" / "tiny.pdf").write_bytes(b"x")
+    (root / "sp" / "image.png").write_bytes(b"x" * 2048)
+    (root / "tmp" / "draft.docx").write_bytes(b"x" * 2048)
+
+
+def test_scan_filters_like_trainer_and_batches(tmp_path):
+    _corpus(tmp_path)
+    files = scan_corpus(str(tmp_path))
+    assert [os.path.basename(p) for p, _ in files] == [f"doc{n}.pdf" for n in range(5)]
+    assert len(scan_corpus(str(tmp_path), max_files=2)) == 2
+    assert [len(b) for b in make_batches(files, 2)] == [2, 2, 1]
+
+
+def test_counts_are_idempotent_and_run_resumes(tmp_path):
+    _corpus(tmp_path)
+    ledger = IngestLedger(fakeredis.FakeRedis(decode_responses=True))
+    files = scan_corpus(str(tmp_path))
+    pending, done = ledger.pending(files)
+    assert len(pending) == 5 and done == 0
+    ledger.create_run("r1", str(tmp_path), len(files), done, 3)
+
+    (p0, f0), (p1, f1), (p2, f2) = files[:3]
+    ledger.record("r1", p0, f0, "processed", chunks=10, works=2)
+    # Повторная доставка той же задачи не удваивает счётчики
+    ledger.record("r1", p0, f0, "processed", chunks=10, works=2)
+    ledger.record("r1", p1, f1, "failed", error="boom")
+    ledger.record("r1", p2, f2, "skipped")
+
+    progress = ledger.progress("r1")
+    assert (progress["processed"], progress["failed"], progress["skipped"]) == (1, 1, 1)
+    assert progress["chunks"] == 10 and progress["works"] == 2 and progress["remaining"] == 2
+    assert ledger.failures("r1")[0]["error"] == "boom"
+
+    # Возобновление: в план попадают только неуспешные и необработанные файлы
+    pending, done = ledger.pending(files)
+    assert [p for p, _ in pending] == [p1] + [p for p, _ in files[3:]]
+    assert done == 2
+    ledger.create_run("r1", str(tmp_path), len(files), done, 2)
+    ledger.record("r1", p1, f1, "processed", chunks=4)
+    summary = ledger.finish_run("r1", [{"worker": "gpu-1", "elapsed_seconds": 3.0}, None])
+    assert summary["failed"] == 0 and summary["processed"] == 2 and summary["chunks"] == 14
+    assert summary["status"] == "completed" and summary["resumes"] == 1
+    assert summary["workers"] == ["gpu-1"]
+
+    # Изменённый файл снова становится кандидатом
+    os.utime(p0, ns=(1, 1))
+    pending, _ = ledger.pending(scan_corpus(str(tmp_path)))
+    assert p0 in [p for p, _ in pending]
+
+
+def test_claims_exclude_other_workers_but_allow_redelivery():
+    ledger = IngestLedger(fakeredis.FakeRedis(decode_responses=True))
+    assert ledger.claim("doc", "task-a")
+    assert not ledger.claim("doc", "task-b")
+    assert ledger.claim("doc", "task-a")
+    ledger.release("doc")
+    assert ledger.claim("doc", "task-b")
+
+
+def test_failed_batch_still_returns_and_errback_finishes_run(tmp_path, monkeypatch):
+    pytest.importorskip("celery")
+    from core import celery_ingest
+    from core.startup import ComponentUnavailable
+
+    _corpus(tmp_path)
+    ledger = IngestLedger(fakeredis.FakeRedis(decode_responses=True))
+    files = scan_corpus(str(tmp_path))
+    ledger.create_run("run1", str(tmp_path), len(files), 0, 1)
+    monkeypatch.setattr(celery_ingest, "get_ledger", lambda: ledger)
+
+    def unavailable():
+        raise ComponentUnavailable("ingest_trainer", "CUDA out of memory")
+
+    monkeypatch.setattr(celery_ingest._trainer_component, "get", unavailable)
+    # Тренер недоступен - документы пакета помечены проваленными, результат все равно возвращен
+    result = celery_ingest.ingest_batch_task.apply(args=("run1", [list(f) for f in files[:2]])).get()
+    assert result["outcomes"] == {"failed": 2} and "trainer unavailable" in result["error"]
+    assert ledger.progress("run1")["failed"] == 2
+
+    # Упавший заголовок chord'а: errback закрывает прогон
+    summary = celery_ingest.fail_ingestion_task(None, RuntimeError("worker lost"), None, "run1")
+    assert summary["status"] == "failed" and ledger.progress("run1")["status"] == "failed"
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Тесты конкурентного краулера Минстроя (minstroy_crawler.py) на локальном HTTP-сервере
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiohttp")
+
+from minstroy_crawler import MinstroyCrawler, extract_links
+
+# Каталог: 3 страницы раздела по 2 документа, на первой странице видна только ссылка на вторую и последнюю
+PDFS = {f"/upload/iblock/sp_{n:02d}.pdf": (b"%PDF-1.4 " + bytes([n]) * 40000) for n in range(1, 7)}
+
+
+def listing(page: int) -> str:
+    docs = sorted(PDFS)[(page - 1) * 2:page * 2]
+    links = "".join(f'<a href="{path}">Скачать</a>' for path in docs)
+    pager = "" if page != 1 else '<a href="/docs/?t=76&PAGEN_1=2">2</a><a href="/docs/?t=76&PAGEN_1=3">Последняя</a>'
+    return f"<html><body><div>Документы</div>{links}{pager}<a href='#top'>up</a></body></html>"
+
+
+class CatalogueHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            server.requests.append((self.path, dict(self.headers)))
+        try:
+            time.sleep(server.latency)
+            url = urlparse(self.path)
+            if url.path == "/docs/":
+                body = listing(int(parse_qs(url.query).get("PAGEN_1", ["1"])[0])).encode("utf-8")
+                self._send(200, body, {"Content-Type": "text/html; charset=utf-8"})
+            elif url.path in PDFS:
+                self._send_pdf(url.path, PDFS[url.path])
+            else:
+                self._send(404, b"", {})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_pdf(self, path, data):
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        headers = {"Content-Type": "application/pdf", "ETag": etag, "Accept-Ranges": "bytes"}
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            headers["Content-Range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+            self._send(206, data[start:], headers)
+            return
+        self._send(200, data, headers)
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def catalogue():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogueHandler)
+    server.lock = threading.Lock()
+    server.in_flight = server.peak = 0
+    server.requests = []
+    server.latency = 0.05
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_crawler(server, download_dir, **overrides):
+    config = {
+        "download_dir": str(download_dir),
+        "headers": {"User-Agent": "test"},
+        "timeout": 5,
+        "retry_attempts": 2,
+        "retry_delay": 0,
+        "max_connections_per_host": 3,
+        "request_delay": 0,
+        **overrides,
+    }
+    return MinstroyCrawler(config), f"http://127.0.0.1:{server.server_address[1]}/docs/?t=76"
+
+
+def test_extract_links_keeps_section_pagination():
+    pdfs, pages = extract_links(listing(1) + '<a href="/news/?PAGEN_1=5">x</a>', "http://host/docs/?t=76")
+    assert pdfs == ["http://host/upload/iblock/sp_01.pdf", "http://host/upload/iblock/sp_02.pdf"]
+    assert pages == ["http://host/docs/?t=76&PAGEN_1=2", "http://host/docs/?t=76&PAGEN_1=3"]
+
+
+def test_crawl_downloads_concurrently_with_manifest(catalogue, tmp_path):
+    crawler, section = make_crawler(catalogue, tmp_path)
+    stats = crawler.run([section])
+
+    assert stats["total_pages"] == 3
+    assert len(stats["downloaded_files"]) == 6 and not stats["failed_files"]
+    # Запросы идут параллельно, но не больше лимита на хост
+    assert 2 <= catalogue.peak <= 3
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))["files"]
+    for path, data in PDFS.items():
+        entry = manifest[f"http://127.0.0.1:{catalogue.server_address[1]}{path}"]
+        assert entry["complete"] and entry["etag"]
+        assert entry["sha256"] == hashlib.sha256(data).hexdigest()
+        assert (tmp_path / entry["filename"]).read_bytes() == data
+
+    # Повторный запуск: условные запросы, тела не передаются
+    catalogue.requests.clear()
+    stats = make_crawler(catalogue, tmp_path)[0].run([section])
+    assert not stats["downloaded_files"] and stats["bytes_downloaded"] == 0
+    assert [f["reason"] for f in stats["skipped_files"]] == ["not_modified"] * 6
+    assert all("If-None-Match" in headers for path, headers in catalogue.requests if path.endswith(".pdf"))
+
+
+def test_interrupted_download_resumes_with_range(catalogue, tmp_path):
+    crawler, section = make_crawler(catalogue, tmp_path)
+    crawler.run([section])
+    base = f"http://127.0.0.1:{catalogue.server_address[1]}"
+    url = base + "/upload/iblock/sp_03.pdf"
+    data = PDFS["/upload/iblock/sp_03.pdf"]
+
+    # Имитация обрыва: финального файла нет, есть половина в .part
+    (tmp_path / "sp_03.pdf").unlink()
+    (tmp_path / "sp_03.pdf.part").write_bytes(data[:15000])
+
+    catalogue.requests.clear()
+    stats = make_crawler(catalogue, tmp_path)[0].run([section])
+    [resumed] = stats["downloaded_files"]
+    assert resumed["url"] == url and resumed["resumed"]
+    assert resumed["sha256"] == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "sp_03.pdf").read_bytes() == data
+    assert stats["bytes_downloaded"] == len(data) - 15000
+    [(_, headers)] = [r for r in catalogue.requests if r[0].endswith("sp_03.pdf")]
+    assert headers["Range"] == "bytes=15000-"
+
+
+def test_politeness_delay_spaces_requests(catalogue, tmp_path):
+    catalogue.latency = 0
+    crawler, section = make_crawler(catalogue, tmp_path, request_delay=0.05)
+    started = time.perf_counter()
+    crawler.run([section])
+    # 3 страницы + 6 файлов, старты разнесены на 50 мс
+    assert time.perf_counter() - started >= 8 * 0.05
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тесты кеша клиентов моделей при параллельных запросах (core/model_manager.py)
+"""
+
+import os
+import sys
+import threading
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import MODELS_CONFIG
+from core.model_manager import ModelManager
+
+
+class FakeChatOpenAI:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+def test_parallel_specialists_do_not_corrupt_cache(monkeypatch):
+    monkeypatch.setitem(sys.modules, "langchain_openai", types.SimpleNamespace(ChatOpenAI=FakeChatOpenAI))
+    manager = ModelManager()
+    roles = [role for role in MODELS_CONFIG if role != "coordinator"][:4]
+    errors = []
+    missing = []
+
+    def worker(role):
+        try:
+            for _ in range(200):
+                if manager.get_model_client(role) is None:
+                    missing.append(role)
+                manager.get_model_stats()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(role,)) for role in roles * 2]
+    # Частое переключение потоков делает гонку воспроизводимой
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    # Специалисты выгружают друг друга, но без гонок: ошибок и пропавших клиентов нет
+    assert errors == [] and missing == []
+    assert set(manager.last_access) == set(manager.model_cache)
+    assert sum(1 for key in manager.model_cache if not key.startswith("coordinator_")) <= 1
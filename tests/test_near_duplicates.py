@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тесты поиска почти-дубликатов MinHash LSH (core/near_duplicates.py)
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.near_duplicates import MinHasher, NearDuplicateIndex, jaccard
+
+WORDS = ("бетон арматура опалубка плита колонна фундамент нагрузка прочность класс марка "
+         "сечение пролёт расчёт защитный слой толщина сварка анкеровка стык каркас сетка").split()
+
+
+def make_text(seed: int, words: int = 600) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 50)) for _ in range(words))
+
+
+def edit(text: str, share: float, seed: int) -> str:
+    """Заменить долю слов - имитация новой редакции"""
+    rng = random.Random(seed)
+    words = text.split()
+    for i in rng.sample(range(len(words)), int(len(words) * share)):
+        words[i] = "изменено" + str(i)
+    return " ".join(words)
+
+
+def test_signature_estimates_jaccard():
+    hasher = MinHasher()
+    text = make_text(1)
+    # Разметка и регистр не влияют на подпись
+    assert jaccard(hasher.signature(text), hasher.signature(text.upper().replace(" ", " \n, "))) == 1.0
+    assert jaccard(hasher.signature(text), hasher.signature(make_text(2))) < 0.1
+    assert hasher.signature("  ...  ") is None
+
+
+def test_classify_documents_persists_index(tmp_path):
+    db = tmp_path / "near_duplicates.db"
+    index = NearDuplicateIndex(db)
+    original = make_text(10)
+    assert index.classify("sp_original", original).status == "new"
+    index.add_document("sp_original", original)
+    assert index.classify("other", make_text(11)).status == "new"
+    index.add_document("other", make_text(11))
+
+    # Скан того же документа: отличается только разметкой; classify ничего не индексирует
+    scan_text = original.replace(" ", "  \n")
+    scan = index.classify("sp_scan", scan_text)
+    assert scan.status == "duplicate" and scan.sibling == "sp_original"
+    assert index.stats() == {"documents": 2, "chunks": 0}
+    index.add_document("sp_scan", scan_text, canonical=scan.canonical)
+    index.close()
+
+    # Индекс переживает перезапуск; новая редакция ссылается на каноничный документ
+    index = NearDuplicateIndex(db)
+    verdict = index.classify("sp_2024", edit(original, 0.02, seed=3))
+    assert verdict.status == "near_duplicate"
+    assert 0.8 <= verdict.similarity < 0.95
+    assert verdict.canonical == "sp_original"
+    # Повторная обработка того же файла не считается дубликатом самого себя
+    assert index.classify("sp_original", original).sibling != "sp_original"
+    assert index.stats() == {"documents": 3, "chunks": 0}
+
+
+def test_filter_chunks_drops_redundant_content(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "near_duplicates.db")
+    first = [make_text(seed, 80) for seed in (20, 21, 22)]
+    result = index.filter_chunks("doc_a", first + [first[0], "Документ: СП 63"])
+    # Повтор внутри документа отброшен, короткий заголовок оставлен
+    assert result.keep == [0, 1, 2, 4]
+    assert [(i, key) for i, key, _ in result.dropped] == [(3, "doc_a#0")]
+    index.add_chunks("doc_a", result)
+
+    second = [first[1], make_text(23, 80), first[2].replace(" ", "\n")]
+    result = index.filter_chunks("doc_b", second)
+    assert result.keep == [1]
+    assert sorted(key for _, key, _ in result.dropped) == ["doc_a#1", "doc_a#2"]
+
+    # Переобработка doc_a не выбрасывает его собственные чанки
+    assert index.filter_chunks("doc_a", first).keep == [0, 1, 2]
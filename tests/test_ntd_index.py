@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Тесты индекса нормативной базы (core/ntd_index.py)
+"""
+
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ntd_index import NTDIndex, normalize_ntd_code
+
+Doc = namedtuple("Doc", "code title description category year status")
+
+DOCS = [
+    Doc("СП 63.13330.2012", "Бетонные и железобетонные конструкции", "", "construction", 2012, "Устарел"),
+    Doc("СП 63.13330.2018", "Бетонные и железобетонные конструкции. Основные положения", "", "construction", 2018, "Актуальный"),
+    Doc("СП 45.13330.2017", "Земляные сооружения, основания и фундаменты", "", "construction", 2017, "Обязательный"),
+    Doc("ГОСТ Р 21.1101-2013", "Система проектной документации для строительства", "Основные требования", "documentation", 2013, "Актуальный"),
+    Doc("СНиП 3.03.01-87", "Несущие и ограждающие конструкции", "", "construction", 1987, "Устарел"),
+]
+
+
+def test_code_normalization_and_editions():
+    index = NTDIndex.build(DOCS)
+    assert normalize_ntd_code("sp_63.13330.2018") == normalize_ntd_code("СП63.13330.2018") == "СП 63.13330.2018"
+    assert index.lookup("gost r 21.1101-2013") == "ГОСТ Р 21.1101-2013"
+    assert index.lookup("снип 3.03.01-87") == "СНиП 3.03.01-87"
+    # Без года - лучшая редакция
+    assert index.lookup("СП 63.13330") == "СП 63.13330.2018"
+    assert index.lookup("СП 63.13330.2003") is None
+    assert index.editions("СП 63.13330.2012") == ["СП 63.13330.2018", "СП 63.13330.2012"]
+    assert index.code_prefix("СП") == ["СП 63.13330.2018", "СП 45.13330.2017", "СП 63.13330.2012"]
+
+
+def test_ranked_search():
+    index = NTDIndex.build(DOCS)
+    assert index.search("железобетонные конструкции") == ["СП 63.13330.2018", "СП 63.13330.2012"]
+    # Начало слова: "конструк" находит и "конструкции"
+    assert set(index.search("конструк")) == {"СП 63.13330.2018", "СП 63.13330.2012", "СНиП 3.03.01-87"}
+    assert index.search("СП 63") == ["СП 63.13330.2018", "СП 63.13330.2012"]
+    assert index.search("требования") == ["ГОСТ Р 21.1101-2013"]
+    assert index.search("конструкции", category="documentation") == []
+
+
+def test_code_search_from_segment():
+    index = NTDIndex.build(DOCS + [DOCS[1]])
+    # Повтор документа в базе не дублирует результаты
+    assert index.search("СП 63.13330.2018") == ["СП 63.13330.2018"]
+    assert index.search("63.13330") == ["СП 63.13330.2018", "СП 63.13330.2012"]
+    assert index.search("13330") == ["СП 63.13330.2018", "СП 45.13330.2017", "СП 63.13330.2012"]
+    assert index.search("21.1101") == index.search("Р 21.1101") == ["ГОСТ Р 21.1101-2013"]
+    assert index.search("03.01-87") == ["СНиП 3.03.01-87"]
+    assert index.search("3330") == []
+
+
+def test_index_cache_and_lookup_speed(tmp_path):
+    docs = [Doc(f"СП {n}.13330.{2000 + n % 25}", f"Свод правил номер {n} по проектированию зданий",
+                "", "construction", 2000 + n % 25, "Актуальный") for n in range(20000)]
+    json_path = tmp_path / "ntd_full_db.json"
+    json_path.write_text(json.dumps([d._asdict() for d in docs]), encoding="utf-8")
+
+    built = NTDIndex.load_or_build(json_path, docs)
+    assert (tmp_path / "ntd_full_db.index.pkl").exists()
+    cached = NTDIndex.load(json_path)
+    assert cached is not None and cached.sorted_codes == built.sorted_codes
+
+    started = time.perf_counter()
+    for n in range(0, 20000, 20):
+        assert cached.lookup(f"sp {n}.13330") == docs[n].code
+    assert (time.perf_counter() - started) / 1000 < 0.001
+
+    # Изменённый JSON того же размера и с тем же mtime - кэш устарел
+    stat = json_path.stat()
+    content = json_path.read_text(encoding="utf-8")
+    json_path.write_text(content.replace("13330.2001", "13330.2002", 1), encoding="utf-8")
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert json_path.stat().st_size == stat.st_size
+    assert NTDIndex.load(json_path) is None
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тесты пакетного upsert реестра НТД (core/ntd_registry_store.py)
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ntd_registry_store import RegistryStore
+
+SCHEMA = """
+CREATE TABLE ntd_registry_test (
+    canonical_id VARCHAR(255) PRIMARY KEY,
+    ntd_synonyms TEXT,
+    source_url VARCHAR(500),
+    status_rag VARCHAR(20) DEFAULT 'NOT_ON_DISK',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+COLUMNS = ("canonical_id", "ntd_synonyms", "source_url")
+
+
+def row(n, url="https://minstroyrf.gov.ru/docs/{n}", synonyms=()):
+    return {"canonical_id": f"СП {n}.13330.2020", "ntd_synonyms": json.dumps(list(synonyms), ensure_ascii=False),
+            "source_url": url.format(n=n)}
+
+
+def test_pragmas_and_exact_counts(tmp_path):
+    store = RegistryStore(str(tmp_path / "registry.db"))
+    store.executescript(SCHEMA)
+    assert store.execute("PRAGMA journal_mode")[0][0] == "wal"
+    assert store.execute("PRAGMA synchronous")[0][0] == 1  # NORMAL
+
+    result = store.upsert("ntd_registry_test", "canonical_id", [row(n) for n in range(100)],
+                          columns=COLUMNS, touch="created_at", batch_size=30)
+    assert (result.inserted, result.updated, result.unchanged) == (100, 0, 0)
+
+    store.conn.execute("UPDATE ntd_registry_test SET status_rag = 'ON_DISK', created_at = '2020-01-01'")
+    rows = [row(n) for n in range(90)]                                   # 0..89 без изменений
+    rows += [row(n, url="https://gost.ru/{n}") for n in range(90, 100)]   # 90..99 новый URL
+    rows += [row(n) for n in range(100, 120)]                            # 20 новых
+    rows += [row(5, synonyms=["СНиП 3.03.01-87"]), {"canonical_id": "", "source_url": "x"}]
+    result = store.upsert("ntd_registry_test", "canonical_id", rows, columns=COLUMNS,
+                          touch="created_at", batch_size=25)
+    # Повтор ключа 5 внутри вызова: побеждает последняя версия (с синонимом)
+    assert result.to_dict() == {"inserted": 20, "updated": 11, "unchanged": 89, "skipped": 2,
+                                "failed": 0, "written": 31}
+
+    status, created = store.execute(
+        "SELECT status_rag, created_at FROM ntd_registry_test WHERE canonical_id = 'СП 95.13330.2020'")[0]
+    assert status == "ON_DISK" and created != "2020-01-01"
+    untouched = store.execute("SELECT created_at FROM ntd_registry_test WHERE canonical_id = 'СП 1.13330.2020'")
+    assert untouched[0][0] == "2020-01-01"
+    assert store.execute("SELECT COUNT(*) FROM ntd_registry_test")[0][0] == 120
+
+
+def test_failing_row_is_isolated(tmp_path):
+    store = RegistryStore(str(tmp_path / "registry.db"))
+    store.executescript(SCHEMA.replace("source_url VARCHAR(500)", "source_url VARCHAR(500) NOT NULL"))
+    rows = [row(1), row(2), {"canonical_id": "ГОСТ 1", "ntd_synonyms": "[]", "source_url": None}, row(3)]
+    result = store.upsert("ntd_registry_test", "canonical_id", rows, columns=COLUMNS)
+    assert (result.inserted, result.failed) == (3, 1)
+
+
+def test_bulk_upsert_is_fast(tmp_path):
+    store = RegistryStore(str(tmp_path / "registry.db"))
+    store.executescript(SCHEMA)
+    rows = [row(n) for n in range(50000)]
+    started = time.perf_counter()
+    store.upsert("ntd_registry_test", "canonical_id", rows, columns=COLUMNS, touch="created_at")
+    result = store.upsert("ntd_registry_test", "canonical_id", rows, columns=COLUMNS, touch="created_at")
+    assert result.unchanged == 50000
+    assert time.perf_counter() - started < 10
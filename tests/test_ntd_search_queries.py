@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тесты построения запросов полнотекстового поиска НТД (backend/ntd_api.py)
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fastapi")
+
+from backend import ntd_api
+from backend.ntd_api import build_fulltext_query, build_network_query, NTD_MAX_NETWORK_DEPTH
+
+
+def test_fulltext_query_escapes_and_prefixes():
+    assert build_fulltext_query("СП 63.133") == "СП AND 63.133*"
+    assert build_fulltext_query("ГОСТ 31937-2011") == "ГОСТ AND 31937\\-2011*"
+    assert build_fulltext_query('бетон (B25) "тяжелый"') == 'бетон AND \\(B25\\) AND \\"тяжелый\\"*'
+    assert build_fulltext_query("   ") == ""
+
+
+def test_network_query_depth_is_capped():
+    assert "[*1..2]" in build_network_query(2)
+    assert f"[*1..{NTD_MAX_NETWORK_DEPTH}]" in build_network_query(50)
+    assert "[*1..1]" in build_network_query(0)
+    assert "LIMIT $path_limit" in build_network_query(2)
+
+
+def test_index_creation_retried_with_backoff(monkeypatch):
+    results = [False, False, True]
+    calls = []
+    now = [1000.0]
+
+    async def fake_ensure(driver):
+        calls.append(now[0])
+        return results[len(calls) - 1]
+
+    monkeypatch.setattr(ntd_api, "ensure_ntd_indexes", fake_ensure)
+    monkeypatch.setattr(ntd_api.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ntd_api, "_indexes_ready", False)
+    monkeypatch.setattr(ntd_api, "_indexes_retry_at", 0.0)
+    monkeypatch.setattr(ntd_api, "_indexes_retry_delay", 1.0)
+
+    async def requests_at(*times):
+        for moment in times:
+            now[0] = moment
+            await ntd_api._ensure_indexes_with_backoff(object())
+
+    # Неудача в 1000 - повтор не раньше 1001, вторая неудача - не раньше 1003
+    asyncio.run(requests_at(1000.0, 1000.5, 1001.0, 1002.0, 1003.0, 1010.0))
+    assert calls == [1000.0, 1001.0, 1003.0]
+    assert ntd_api._indexes_ready
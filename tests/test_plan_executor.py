@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Тесты параллельного выполнения плана координатора (core/plan_executor.py)
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.plan_executor import PlanExecutor, infer_dependencies, run_parallel
+
+
+class RecordingTracer:
+    def __init__(self):
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def start_span(self, operation_name, trace_type, parent_span_id=None, metadata=None, tags=None):
+        with self._lock:
+            span_id = f"s{len(self.spans)}"
+            self.spans[span_id] = {"name": operation_name, "parent": parent_span_id, "meta": dict(metadata or {})}
+        return span_id
+
+    def finish_span(self, span_id, status=None, error=None, metadata=None):
+        self.spans[span_id]["status"] = status.value
+        self.spans[span_id]["meta"].update(metadata or {})
+
+
+PLAN = [
+    {"id": "rag", "name": "search_rag_database", "arguments": {"query": "СП 45.13330"}},
+    {"name": "parse_gesn_estimate", "arguments": {"file_path": "smeta.xlsx"}},
+    {"name": "monte_carlo_sim", "arguments": {"project_data": "$parse_gesn_estimate.total",
+                                              "note": "по ${rag.count} нормам"}},
+    {"name": "create_document", "arguments": {"text": "{{ step_2 }}"}, "depends_on": ["rag"]},
+]
+
+
+def test_dependencies_from_references():
+    assert infer_dependencies(PLAN) == [set(), set(), {0, 1}, {0, 2}]
+    # Ссылки вперёд и на себя игнорируются - цикл невозможен
+    assert infer_dependencies([{"name": "a", "arguments": {"x": "$b"}}, {"name": "b", "arguments": {"y": "$b"}}]) == [set(), set()]
+
+
+def test_independent_steps_run_concurrently_and_outputs_flow():
+    calls = {}
+
+    def run_step(name, arguments):
+        calls[name] = arguments
+        time.sleep(0.2)
+        results = {"search_rag_database": {"count": 3}, "parse_gesn_estimate": {"total": 125000.0},
+                   "monte_carlo_sim": {"p90": 150000.0}, "create_document": "doc.docx"}
+        return {"status": "success", "result": results[name]}
+
+    tracer = RecordingTracer()
+    started = time.perf_counter()
+    results = PlanExecutor(run_step, max_workers=4, tracer=tracer, parent_span_id="plan").execute(PLAN)
+    elapsed = time.perf_counter() - started
+
+    # Цепочка из трёх уровней, а не сумма четырёх шагов
+    assert 0.6 <= elapsed < 0.75
+    assert [r["tool_name"] for r in results] == [s["name"] for s in PLAN]
+    assert calls["monte_carlo_sim"] == {"project_data": 125000.0, "note": "по 3 нормам"}
+    assert calls["create_document"] == {"text": {"p90": 150000.0}}
+    # Свободных воркеров хватает: шаг начинается сразу после отправки
+    assert results[2]["depends_on"] == [0, 1] and results[2]["queue_ms"] < 50
+    assert all(span["parent"] == "plan" and span["status"] == "completed" for span in tracer.spans.values())
+
+
+def test_timeout_and_failed_dependency_skip():
+    release = threading.Event()
+
+    def run_step(name, arguments):
+        if name == "slow":
+            release.wait(2)
+        if name == "broken":
+            raise RuntimeError("boom")
+        return {"status": "success", "result": name}
+
+    plan = [
+        {"name": "slow", "arguments": {}, "timeout": 0.1},
+        {"name": "broken", "arguments": {}},
+        {"name": "after_broken", "arguments": {"x": "$broken"}},
+        {"name": "after_slow", "arguments": {}, "depends_on": ["slow"]},
+        {"name": "free", "arguments": {}},
+    ]
+    started = time.perf_counter()
+    results = PlanExecutor(run_step).execute(plan)
+    release.set()
+    assert time.perf_counter() - started < 0.5
+    assert [r["status"] for r in results] == ["timeout", "error", "skipped", "skipped", "success"]
+    assert results[1]["result"] == "boom"
+
+
+def test_timeout_counts_from_step_start():
+    def run_step(name, arguments):
+        time.sleep(0.3)
+        return {"status": "success", "result": name}
+
+    plan = [{"name": f"t{i}", "arguments": {}, "timeout": 0.5} for i in range(4)]
+    results = PlanExecutor(run_step, max_workers=2).execute(plan)
+
+    # t2/t3 ждут свободного воркера ~0.3 с, но это не расходует их таймаут
+    assert [r["status"] for r in results] == ["success"] * 4
+    assert results[2]["queue_ms"] >= 250 and results[2]["duration_ms"] < 450
+
+
+def test_run_parallel_respects_semaphore():
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def call(n):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        if n == 3:
+            raise ValueError("llm down")
+        return n
+
+    results = run_parallel([lambda n=n: call(n) for n in range(6)], semaphore=threading.BoundedSemaphore(2))
+    assert peak == 2
+    assert results[:3] == [0, 1, 2] and isinstance(results[3], ValueError) and results[4:] == [4, 5]
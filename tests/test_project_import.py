@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Тесты импорта папки проекта (core/project_import.py)
+"""
+
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.project_import import ContentStore, ProjectImporter, hash_file
+from core.process_tracker import ProcessTracker
+
+
+def _detect(name, header):
+    if name.endswith(".xlsx"):
+        return "smeta"
+    if name.endswith(".pdf"):
+        return "rd"
+    return "other"
+
+
+class RecordingDriver:
+    """Neo4j driver, запоминающий пакеты UNWIND"""
+
+    def __init__(self):
+        self.batches = []
+        self.files = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        if "UNWIND" in query:
+            self.batches.append(len(params["rows"]))
+            self.files.extend(params["rows"])
+            return []
+        return [{"digest": f["digest"], "relative_path": f["relative_path"]} for f in self.files]
+
+
+def _make_tree(root, count, prefix="file"):
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "nested").mkdir(exist_ok=True)
+    for n in range(count):
+        folder = root / "nested" if n % 2 else root
+        ext = (".pdf", ".xlsx", ".txt")[n % 3]
+        (folder / f"{prefix}{n}{ext}").write_bytes(f"content {n % 7}".encode() * 100)
+
+
+def test_content_stored_once_and_reimport_skips(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    driver = RecordingDriver()
+    tracker = ProcessTracker()
+    importer = ProjectImporter(store, _detect, driver=driver, workers=4, batch_size=5, tracker=tracker)
+    _make_tree(tmp_path / "src", 21)
+
+    first = importer.import_directory("p1", str(tmp_path / "src"), process_id="imp1")
+    assert first["added"] == 21 and first["scanned"] == 21
+    # 7 разных содержимых на 3 расширения - объектов не больше 21, но повторы не копируются
+    objects = [p for p in (tmp_path / "store" / "objects").rglob("*") if p.is_file()]
+    assert len(objects) == len({(f["digest"], os.path.splitext(f["path"])[1]) for f in first["files"]})
+    assert first["deduplicated"] == 21 - len(objects)
+    assert driver.batches == [5, 5, 5, 5, 1]
+    assert first["smeta_count"] == 7 and first["rd_count"] == 7
+    assert tracker.get_process("imp1").status.value == "completed"
+
+    for info in first["files"]:
+        assert hash_file(info["path"])[0] == info["digest"]
+
+    # Повторный импорт: ничего не копируется и не пишется, хеши берутся из кеша
+    second = importer.import_directory("p1", str(tmp_path / "src"))
+    assert second["added"] == 0 and second["skipped"] == 21
+    assert second["bytes_stored"] == 0 and len(driver.files) == 21
+
+
+def test_changed_file_is_rehashed(tmp_path):
+    store = ContentStore(str(tmp_path / "store"), link_mode="copy")
+    importer = ProjectImporter(store, _detect, workers=2)
+    src = tmp_path / "src"
+    src.mkdir()
+    target = src / "smeta.xlsx"
+    target.write_bytes(b"v1")
+    first = importer.import_directory("p", str(src))
+    assert first["store_methods"]["copy"] == 1
+
+    target.write_bytes(b"version 2")
+    os.utime(target, ns=(1, 1))
+    second = importer.import_directory("p", str(src))
+    assert second["files"][0]["digest"] == hashlib.sha256(b"version 2").hexdigest()
+    # Копия в хранилище не зависит от последующих правок исходника
+    with open(first["files"][0]["path"], "rb") as f:
+        assert f.read() == b"v1"
+    assert store.is_object(second["files"][0]["path"]) and not store.is_object(str(target))
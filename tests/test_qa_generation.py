@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты батчевой генерации Q&A с кэшем (core/qa_generation.py)
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.qa_generation import QAGenerationEngine, dedupe_questions, parse_completion
+
+
+def _chunk(i):
+    text = (f"Пункт {i}. Бетонную смесь укладывают слоями толщиной не более {20 + i} см "
+            f"с уплотнением глубинными вибраторами, перерыв между слоями не более {i + 1} ч.")
+    return {'text': text, 'chunk_id': f'c{i}'}
+
+
+class FakeModel:
+    """Отвечает по вопросу на каждый фрагмент промпта"""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        fragments = re.findall(r'Фрагмент (\d+):\nПункт (\d+)\.', prompt)
+        return 'Ответ: ' + json.dumps([
+            {'fragment': int(n), 'question': f'Какова толщина слоя в пункте {p}?', 'answer': f'Не более {20 + int(p)} см'}
+            for n, p in fragments
+        ], ensure_ascii=False)
+
+
+def test_batches_under_budget_and_cache(tmp_path):
+    model = FakeModel()
+    engine = QAGenerationEngine(model, model='fake', cache_path=tmp_path / 'qa_cache.db',
+                                token_budget=400, concurrency=3)
+    chunks = [_chunk(i) for i in range(10)]
+
+    result = engine.run(chunks)
+    stats = result.stats
+    assert stats.chunks == 10 and stats.cache_misses == 10 and stats.cache_hits == 0
+    # Несколько фрагментов в промпте, но каждый промпт в пределах бюджета
+    assert 1 < stats.batches < 10 and len(model.prompts) == stats.batches
+    assert all(engine.count_tokens(prompt) <= 400 for prompt in model.prompts)
+    assert stats.pairs == 10 and stats.failed_batches == 0
+    assert {p['chunk_id'] for p in result.pairs} == {f'c{i}' for i in range(10)}
+
+    # Повторный прогон: все из кэша, модель не вызывается
+    calls = len(model.prompts)
+    again = engine.run(chunks + [_chunk(10)])
+    assert again.stats.cache_hits == 10 and again.stats.cache_misses == 1
+    assert len(model.prompts) == calls + 1 and again.stats.pairs == 11
+
+    # Другая версия промпта - кэш не совпадает
+    other = QAGenerationEngine(model, model='fake', cache_path=tmp_path / 'qa_cache.db',
+                               prompt_version='qa-batch-v2', token_budget=400)
+    assert other.run(chunks[:2]).stats.cache_hits == 0
+
+
+def test_unparsable_batch_is_not_cached(tmp_path):
+    engine = QAGenerationEngine(lambda prompt: 'не JSON', model='fake', cache_path=tmp_path / 'qa_cache.db')
+    result = engine.run([_chunk(1)])
+    assert result.pairs == [] and result.stats.failed_batches == 1
+
+    engine.generate = FakeModel()
+    assert engine.run([_chunk(1)]).stats.pairs == 1
+
+
+def test_unanswered_fragments_are_retried(tmp_path):
+    class SkippingModel(FakeModel):
+        """Пропускает фрагменты с нечётными пунктами"""
+
+        def __call__(self, prompt):
+            answer = json.loads(super().__call__(prompt)[len('Ответ: '):])
+            return json.dumps([p for p in answer if int(p['question'].split()[-1].rstrip('?')) % 2 == 0],
+                              ensure_ascii=False)
+
+    engine = QAGenerationEngine(SkippingModel(), model='fake', cache_path=tmp_path / 'qa_cache.db', token_budget=400)
+    chunks = [_chunk(i) for i in range(6)]
+    first = engine.run(chunks)
+    assert first.stats.pairs == 3 and first.stats.unanswered == 3
+
+    # Отвеченные - из кэша, пропущенные снова уходят в модель
+    engine.generate = FakeModel()
+    second = engine.run(chunks)
+    assert second.stats.cache_hits == 3 and second.stats.cache_misses == 3
+    assert second.stats.pairs == 6 and second.stats.unanswered == 0
+
+
+def test_dedupe_and_parse():
+    pairs, removed = dedupe_questions([
+        {'question': 'Какова толщина слоя бетона?'},
+        {'question': 'какова толщина слоя бетона'},
+        {'question': 'Толщина слоя бетона какова?'},
+        {'question': 'Каков перерыв между слоями?'},
+    ])
+    assert [p['question'] for p in pairs] == ['Какова толщина слоя бетона?', 'Каков перерыв между слоями?']
+    assert removed == 2
+
+    parsed = parse_completion('[{"fragment": 2, "question": "В?", "answer": "О"}, {"fragment": 9, "question": "X", "answer": "Y"}]', 2)
+    assert parsed == {0: [], 1: [{'question': 'В?', 'answer': 'О'}]}
+    assert parse_completion('нет массива', 1) is None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Тесты индекса очереди Celery (core/queue_index.py)
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.queue_index import QueueIndex, meta_key, state_bucket, RESULT_KEY_PREFIX
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_state_buckets():
+    assert state_bucket("PENDING") == "active"
+    assert state_bucket("RETRY") == "active"
+    assert state_bucket("SUCCESS") == "completed"
+    assert state_bucket("FAILURE") == "failed"
+    assert state_bucket("REVOKED") == "revoked"
+
+
+def test_counters_follow_transitions():
+    index = QueueIndex(fakeredis.FakeRedis(decode_responses=True))
+    index.record_state("t1", "PENDING", "core.tasks.parse_estimate", timestamp=1.0)
+    index.record_state("t1", "STARTED", timestamp=2.0)
+    index.record_state("t2", "PENDING", "core.tasks.parse_estimate", timestamp=3.0)
+    index.record_state("t1", "SUCCESS", timestamp=4.0)
+    index.record_state("t1", "SUCCESS", timestamp=5.0)
+
+    counters = index.counters()
+    assert counters["total"] == 2
+    assert counters["active"] == 1 and counters["completed"] == 1
+    assert counters["tools"]["parse_estimate"]["completed"] == 1
+
+
+def test_cursor_pagination_and_rebuild():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    for i in range(25):
+        client.set(f"{RESULT_KEY_PREFIX}job{i}", json.dumps({
+            "status": "SUCCESS" if i % 5 else "FAILURE",
+            "result": {"progress": 100},
+            "date_done": f"2025-01-01T00:00:{i:02d}",
+            "name": "core.celery_norms.update_norms_task",
+        }))
+
+    index = QueueIndex(client)
+    assert index.rebuild(batch_size=7) == 25
+    assert index.counters()["failed"] == 5
+
+    seen, cursor = [], None
+    while True:
+        jobs, cursor = index.page(finished=True, limit=10, cursor=cursor)
+        seen.extend(job["id"] for job in jobs)
+        if cursor is None:
+            break
+    assert seen == [f"job{i}" for i in range(24, -1, -1)]
+
+
+def test_active_from_sets_and_lost_tasks():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    index = QueueIndex(client)
+    now = time.time()
+    index.record_state("lost", "STARTED", "core.tasks.parse_estimate", timestamp=now - 10 * 24 * 3600)
+    index.record_state("t1", "STARTED", "core.tasks.parse_estimate", timestamp=now)
+    index.record_state("old", "STARTED", "core.tasks.parse_estimate", timestamp=now - 10 * 24 * 3600)
+    client.delete(meta_key("lost"))
+
+    # Потерянная задача (старше TTL, метаданные истекли) не считается активной
+    counters = index.counters()
+    assert counters["active"] == 2 and counters["tools"]["parse_estimate"]["active"] == 2
+
+    # Метаданные истекли, задача еще в индексе - повторно в total не попадает
+    client.delete(meta_key("t1"))
+    index.record_state("t1", "SUCCESS", "core.tasks.parse_estimate", timestamp=now + 1)
+    counters = index.counters()
+    assert counters["total"] == 3 and counters["active"] == 1 and counters["completed"] == 1
+
+
+def test_cursor_keeps_equal_timestamps_and_filters_before_limit():
+    index = QueueIndex(fakeredis.FakeRedis(decode_responses=True))
+    for i in range(12):
+        index.record_state(f"job{i:02d}", "REVOKED" if i % 3 == 0 else "SUCCESS", "core.tasks.x", timestamp=100.0)
+
+    seen, cursor = [], None
+    while True:
+        jobs, cursor = index.page(finished=True, limit=5, cursor=cursor, with_results=False,
+                                  statuses={"SUCCESS", "FAILURE"})
+        assert len(jobs) == 5 or cursor is None
+        seen.extend(job["id"] for job in jobs)
+        if cursor is None:
+            break
+    assert seen == [f"job{i:02d}" for i in range(11, -1, -1) if i % 3]
+
+    with pytest.raises(ValueError):
+        index.page(cursor="100.0")
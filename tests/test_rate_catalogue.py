@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Тесты каталога расценок ГЭСН/ФЕР/ТЕР (core/rate_catalogue.py)
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rate_catalogue import RateCatalogue, catalogue_from_mapping, normalize_code
+
+CSV_HEADER = "code,base_rate,materials_cost,labor_cost,equipment_cost,description\n"
+
+
+def _write_rates(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(CSV_HEADER)
+        for row in rows:
+            f.write(",".join(str(v) for v in row) + "\n")
+
+
+def test_normalize_code():
+    assert normalize_code("ГЭСН 08-01-001-01") == "ГЭСН:8-1-1-1"
+    assert normalize_code("гэсн8-1-1-1") == "ГЭСН:8-1-1-1"
+    assert normalize_code("ГЭСНм 8-6-1.1") == "ГЭСНм:8-6-1.1"
+    assert normalize_code("08-01-001") == ":8-1-1"
+    assert normalize_code("без номера") == ""
+
+
+def test_exact_prefix_and_parent_lookup(tmp_path):
+    path = str(tmp_path / "gesn_rates.csv")
+    _write_rates(path, [
+        ("ГЭСН 08-01-001-01", 15000, 8000, 5000, 2000, "Устройство бетонной подготовки"),
+        ("ГЭСН 08-01-002-01", 25000, 15000, 7000, 3000, "Устройство монолитных бетонных конструкций"),
+        ("ГЭСН 08-10-001-01", 9000, 1000, 7000, 1000, "Кладка стен из кирпича"),
+    ])
+    catalogue = RateCatalogue([path])
+
+    match = catalogue.lookup("ГЭСН 8-1-1-1")
+    assert match.match_type == "exact" and match.rate["base_rate"] == 15000.0
+    assert catalogue.get("ГЭСН 08-01-001-01")["description"] == "Устройство бетонной подготовки"
+    # Номер без префикса сборника
+    assert catalogue.lookup("08-01-002-01").match_type == "number"
+    # ``in`` следует тем же правилам, что и get()
+    assert "08-01-002-01" in catalogue and "ГЭСН 99-01-001-01" not in catalogue
+
+    prefix = [m.code for m in catalogue.lookup_prefix("ГЭСН 08-01")]
+    assert prefix == ["ГЭСН 08-01-001-01", "ГЭСН 08-01-002-01"]
+
+    parent = catalogue.resolve("ГЭСН 08-01-001-01.3")
+    assert parent.match_type == "parent" and parent.code == "ГЭСН 08-01-001-01"
+
+
+def test_fuzzy_name_and_batch(tmp_path):
+    path = str(tmp_path / "gesn_rates.csv")
+    _write_rates(path, [
+        (f"ГЭСН 08-01-{i:03d}-01", 100 + i, 0, 0, 0, f"Работа номер {i}") for i in range(1, 3000)
+    ] + [("ГЭСН 11-01-011-01", 500, 0, 0, 0, "Устройство стяжек цементных толщиной 20 мм")])
+    catalogue = RateCatalogue([path])
+
+    fuzzy = catalogue.resolve("", "устройство цементной стяжки толщиной 20 мм")
+    assert fuzzy is not None and fuzzy.code == "ГЭСН 11-01-011-01"
+    assert catalogue.resolve("", "совершенно посторонний текст") is None
+
+    positions = [{"code": f"ГЭСН 8-1-{i}-1"} for i in range(1, 3000)] * 2
+    started = time.perf_counter()
+    matches = catalogue.resolve_batch(positions)
+    assert time.perf_counter() - started < 1.0
+    assert all(m is not None and m.match_type == "exact" for m in matches)
+
+
+def test_reload_on_file_change(tmp_path):
+    path = str(tmp_path / "fer_rates.csv")
+    _write_rates(path, [("08-01-001-01", 100, 0, 0, 0, "Бетонная подготовка")])
+    catalogue = RateCatalogue([path], check_interval=0)
+    # Код без префикса получает сборник по имени файла
+    assert catalogue.lookup("ФЕР 08-01-001-01").rate["base_rate"] == 100.0
+
+    _write_rates(path, [("08-01-001-01", 250, 0, 0, 0, "Бетонная подготовка")])
+    os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    assert catalogue.lookup("ФЕР 08-01-001-01").rate["base_rate"] == 250.0
+    assert catalogue.stats["loads"] == 2
+
+
+def test_auto_budget_uses_catalogue():
+    from core.budget_auto import auto_budget
+
+    rates = {"ГЭСН 8-1-1": {"base_rate": 100.0, "materials_cost": 0, "labor_cost": 0, "equipment_cost": 0}}
+    budget = auto_budget({"positions": [{"code": "ГЭСН 08-01-001", "quantity": 2}]}, rates)
+    assert budget["sections"][0]["base_rate"] == 100.0
+
+
+def test_mapping_catalogue_is_cached():
+    rates = {"ГЭСН 8-1-1": {"base_rate": 100.0}}
+    catalogue = catalogue_from_mapping(rates)
+    assert catalogue_from_mapping(rates) is catalogue
+
+    # Изменение словаря - индекс перестраивается
+    rates["ГЭСН 8-1-1"]["base_rate"] = 120.0
+    rebuilt = catalogue_from_mapping(rates)
+    assert rebuilt is not catalogue and rebuilt.get("ГЭСН 8-1-1")["base_rate"] == 120.0
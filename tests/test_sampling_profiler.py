@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Тесты сэмплирующего профилировщика обучения (core/sampling_profiler.py)
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sampling_profiler import SamplingProfiler
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def _stage5_structural_analysis(seconds):
+    return _busy(seconds)
+
+
+def _stage3_5_text_normalization(seconds):
+    return _busy(seconds)
+
+
+def test_samples_tagged_with_stage_and_written(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), interval=0.002)
+    profiler.start()
+    with profiler.document("/data/sp_48.pdf"):
+        _stage3_5_text_normalization(0.05)
+        _stage5_structural_analysis(0.15)
+    run_dir = profiler.stop()
+
+    summary = json.loads((run_dir / "summary.json").read_text(encoding="utf-8"))
+    stages = summary["stages"]
+    assert stages["_stage5_structural_analysis"] > stages["_stage3_5_text_normalization"] > 0
+    assert summary["documents"][0]["document"] == "/data/sp_48.pdf"
+    hot = summary["hot_functions"]["_stage5_structural_analysis"][0]["function"]
+    assert hot.startswith("_busy (test_sampling_profiler.py")
+
+    lines = (run_dir / "run.collapsed").read_text(encoding="utf-8").splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("_stage5_structural_analysis;") and "_busy" in line for line in lines)
+
+
+def test_slow_capture_keeps_only_slow_documents(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), interval=0.002, capture="slow", slow_seconds=0.08)
+    profiler.start()
+    for n in range(3):
+        with profiler.document(f"fast_{n}.docx"):
+            _stage5_structural_analysis(0.01)
+    with profiler.document("slow.pdf"):
+        _stage5_structural_analysis(0.12)
+    run_dir = profiler.stop()
+
+    summary = json.loads((run_dir / "summary.json").read_text(encoding="utf-8"))
+    assert [d["document"] for d in summary["documents"]] == ["slow.pdf"]
+    assert summary["kept_samples"] == summary["documents"][0]["samples"] < summary["samples"]
+    docs = list((run_dir / "docs").iterdir())
+    assert len(docs) == 1 and docs[0].name.endswith("slow.pdf.collapsed")
+
+
+def test_percentile_threshold_needs_history(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), capture="slow", slow_percentile=0.95)
+    assert profiler.slow_threshold() is None
+    profiler.durations.extend(float(n) for n in range(1, 101))
+    assert profiler.slow_threshold() == 96.0
+
+
+def test_no_samples_lost_between_documents(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), interval=0.0005, max_overhead=1.0)
+    profiler.start()
+    for i in range(200):
+        with profiler.document(f"/data/doc_{i}.pdf"):
+            _busy(0.002)
+    run_dir = profiler.stop()
+
+    # Каждый сэмпл попал либо в документ (и слит в запуск), либо сразу в запуск
+    summary = json.loads((run_dir / "summary.json").read_text(encoding="utf-8"))
+    assert summary["samples"] == summary["kept_samples"] > 0
+    assert sum(d["samples"] for d in summary["documents"]) <= summary["kept_samples"]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Тесты извлечения текста из Excel-книг (core/spreadsheet_extractor.py)
+"""
+
+import os
+import sys
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.spreadsheet_extractor import SpreadsheetExtractor, format_cell
+
+
+def _make_workbook(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'ЛСР'
+    ws['A1'] = 'ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ № ЛС-02-01'
+    ws.merge_cells('A1:D1')
+    ws.append(['Шифр', 'Наименование работ', 'Ед. изм.', 'Количество'])
+    ws.append([1, 2, 3, 4])
+    for i in range(5):
+        ws.append([f'ГЭСН 08-01-001-0{i + 1}', f'Работа {i + 1}', 'м3', 10.0 * (i + 1)])
+
+    second = wb.create_sheet('Ведомость ресурсов')
+    second.append(['Ресурс', 'Ед.', 'Всего'])
+    second.append(['Бетон В25', 'м3', 120])
+    second.append([])
+    second.append(['Примечание: объемы по проекту'])
+
+    hidden = wb.create_sheet('Служебный')
+    hidden.append(['секрет', 'значение'])
+    hidden.sheet_state = 'hidden'
+    wb.save(path)
+
+
+def test_all_sheets_with_repeated_headers(tmp_path):
+    path = str(tmp_path / 'estimate.xlsx')
+    _make_workbook(path)
+
+    extractor = SpreadsheetExtractor(rows_per_group=2)
+    groups = list(extractor.iter_row_groups(path))
+
+    lsr = [g for g in groups if g.sheet == 'ЛСР']
+    assert [len(g.rows) for g in lsr] == [2, 2, 1]
+    assert all(g.header == ['Шифр', 'Наименование работ', 'Ед. изм.', 'Количество'] for g in lsr)
+    # Строка нумерации колонок пропущена, название сметы - в преамбуле первой группы
+    assert lsr[0].first_row == 4 and lsr[-1].last_row == 8
+    assert lsr[0].preamble == ['ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ № ЛС-02-01']
+    assert lsr[1].rows[0] == ['ГЭСН 08-01-001-03', 'Работа 3', 'м3', '30']
+    assert '| Шифр | Наименование работ | Ед. изм. | Количество |' in lsr[2].text
+
+    resources = [g for g in groups if g.sheet == 'Ведомость ресурсов']
+    assert resources[0].header == ['Ресурс', 'Ед.', 'Всего']
+    # Область после пустой строки в пределах ширины таблицы - её продолжение
+    assert len(resources) == 2 and resources[-1].table == resources[0].table
+    assert resources[-1].rows == [['Примечание: объемы по проекту', '', '']]
+
+    assert not any(g.sheet == 'Служебный' for g in groups)
+    assert extractor.stats.sheets == 2 and extractor.stats.tables == 2
+    assert extractor.stats.rows == 7
+
+
+def test_text_limit(tmp_path):
+    path = str(tmp_path / 'estimate.xlsx')
+    _make_workbook(path)
+
+    full = SpreadsheetExtractor().extract_text(path)
+    extractor = SpreadsheetExtractor(rows_per_group=1, max_chars=300)
+    text = extractor.extract_text(path)
+
+    assert 'Лист «ЛСР»' in full and 'Лист «Ведомость ресурсов»' in full
+    assert len(text) <= 300 + 10 and extractor.stats.truncated
+
+
+def test_format_cell():
+    assert format_cell(12.0) == '12'
+    assert format_cell(0.125) == '0.125'
+    assert format_cell(None) == ''
+    assert format_cell('Бетон\nтяжелый  В25') == 'Бетон тяжелый В25'
+
+
+def test_merged_row_without_header(tmp_path):
+    path = str(tmp_path / 'notes.xlsx')
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Пояснения'
+    ws['A1'] = 'Сметная стоимость определена в текущих ценах'
+    ws.merge_cells('A1:C1')
+    wb.save(path)
+
+    groups = list(SpreadsheetExtractor().iter_row_groups(path))
+    assert len(groups) == 1 and not groups[0].header
+    # Значение объединенной строки выводится один раз
+    assert groups[0].text.splitlines()[-1] == 'Сметная стоимость определена в текущих ценах'
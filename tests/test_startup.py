@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Тесты ленивой инициализации компонентов (core/startup.py)
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.startup import ComponentState, ComponentUnavailable, StartupRegistry
+
+
+def test_component_created_once_under_concurrency():
+    registry = StartupRegistry()
+    created = []
+
+    def factory():
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+
+    component = registry.register("model_manager", factory)
+    assert component.state is ComponentState.PENDING and not created
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("model_manager"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1 and all(r is created[0] for r in results)
+    status = registry.status()["components"]["model_manager"]
+    assert status["state"] == "ready" and status["init_seconds"] >= 0.05
+
+
+def test_failed_component_reports_error_and_retries():
+    registry = StartupRegistry()
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("neo4j down")
+        return "driver"
+
+    component = registry.register("neo4j", factory, retry_after=0.05)
+    assert registry.get_or_none("neo4j") is None
+    with pytest.raises(ComponentUnavailable):
+        registry.get("neo4j")
+    assert len(attempts) == 1
+    assert registry.status()["components"]["neo4j"]["error"] == "ConnectionError: neo4j down"
+
+    time.sleep(0.06)
+    assert registry.get("neo4j") == "driver" and component.ready
+
+
+def test_warmup_runs_in_background_and_imports_are_timed():
+    registry = StartupRegistry(import_budget=0.0)
+    release = threading.Event()
+    registry.register("trainer", lambda: release.wait(2) and "trainer", warmup=True)
+    registry.register("rarely_used", lambda: "x")
+
+    started = time.perf_counter()
+    assert registry.start_warmup() == ["trainer"]
+    # Прогрев не блокирует вызывающего
+    assert time.perf_counter() - started < 0.5
+    assert registry.status()["warmup_complete"] is False
+
+    release.set()
+    deadline = time.time() + 2
+    while not registry.components["trainer"].ready and time.time() < deadline:
+        time.sleep(0.01)
+    status = registry.status()
+    assert status["warmup_complete"] is True
+    assert status["components"]["rarely_used"]["state"] == "pending"
+
+    assert registry.timed_import("json").__name__ == "json"
+    with pytest.raises(ImportError):
+        registry.timed_import("surely_missing_module_xyz")
+    assert [i["module"] for i in status["slow_imports"]] == []
+    report = registry.status()
+    assert [i["module"] for i in report["slow_imports"]] == ["json", "surely_missing_module_xyz"]
+    assert report["failed_imports"][0]["module"] == "surely_missing_module_xyz"
+    registry.shutdown()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Тесты потокового парсера Excel-смет (core/streaming_estimate_parser.py)
+"""
+
+import os
+import sys
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.streaming_estimate_parser import StreamingEstimateParser, parse_estimate_streaming
+
+
+def _make_workbook(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'ЛСР'
+    ws['A1'] = 'ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ № ЛС-02-01'
+    ws.merge_cells('A1:F1')
+    ws.append([])
+    ws.append(['Шифр', 'Наименование работ', 'Ед. изм.', 'Количество', 'Цена', 'Сумма'])
+    ws.append(['ГЭСН 08-01-001-01', 'Устройство бетонного фундамента', 'м3', 100, 15000, None])
+    ws.append(['ГЭСН 08-01-001-02', None, 'м3', '50', '1 200,50', None])
+    ws.merge_cells('B4:B5')
+    ws.append(['ФССЦ 04.1.02.05', 'Бетон тяжелый В25', 'м3', 10, 5000, 50000])
+    ws.append(['ИТОГО', 'По смете', None, None, None, 1610025])
+
+    second = wb.create_sheet('Ресурсы')
+    second.append(['Код', 'Наименование', 'Ед.изм', 'Кол-во', 'Цена', 'Всего'])
+    second.append(['ФЕР 01-01-003-01', 'Разработка грунта', '1000 м3', 2, 3000, 6000])
+    wb.save(path)
+
+
+def test_merged_cells_and_header_detection(tmp_path):
+    path = str(tmp_path / 'estimate.xlsx')
+    _make_workbook(path)
+
+    result = parse_estimate_streaming(path)
+    lsr = result['sheets'][0]
+
+    assert lsr['header_row'] == 3
+    assert lsr['columns']['code'] == 0 and lsr['columns']['total'] == 5
+    assert lsr['preamble'] == ['ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ № ЛС-02-01']
+    assert result['merged_ranges_count'] == 2
+
+    positions = [p for p in result['positions'] if p['sheet'] == 'ЛСР']
+    assert [p['row_number'] for p in positions] == [4, 5, 6]
+    # Описание из объединенной ячейки B4:B5 попадает во вторую строку
+    assert positions[1]['description'] == 'Устройство бетонного фундамента'
+    # Числа, записанные текстом, и восстановление суммы как количество * цена
+    assert positions[1]['price'] == 1200.5
+    assert positions[1]['total_cost'] == 50 * 1200.5
+    assert positions[0]['total_cost'] == 1500000.0
+
+
+def test_codes_units_and_types(tmp_path):
+    path = str(tmp_path / 'estimate.xlsx')
+    _make_workbook(path)
+
+    positions = parse_estimate_streaming(path)['positions']
+    by_code = {p['code']: p for p in positions}
+
+    assert by_code['ГЭСН 08-01-001-01']['code_prefix'] == 'ГЭСН'
+    assert by_code['ГЭСН 08-01-001-01']['code_number'] == '08-01-001-01'
+    assert by_code['ГЭСН 08-01-001-01']['unit'] == 'м³'
+    assert by_code['ГЭСН 08-01-001-01']['type'] == 'work'
+    assert by_code['ФССЦ 04.1.02.05']['type'] == 'material'
+    assert by_code['ФЕР 01-01-003-01']['sheet'] == 'Ресурсы'
+    assert 'ИТОГО' not in by_code
+
+
+def test_sheet_filter_and_small_chunks(tmp_path):
+    path = str(tmp_path / 'estimate.xlsx')
+    _make_workbook(path)
+
+    # Блоки по одной строке дают тот же результат, что и один большой блок
+    result = StreamingEstimateParser(chunk_rows=1).parse_workbook(path, sheet_names=['ЛСР'])
+    assert [s['sheet'] for s in result['sheets']] == ['ЛСР']
+    assert result['positions_count'] == 3
+    assert result['total_cost'] == 1500000.0 + 50 * 1200.5 + 50000
+
+
+def test_parse_sheet_frame_vectorized():
+    frame = pd.DataFrame({
+        0: ['ТЕР 06-01-015-10', '', None],
+        1: ['Монтаж опалубки', 'Раздел 2', None],
+        2: ['100 м2', None, None],
+        3: [2, None, None],
+        4: [700, None, None],
+    })
+    roles = {'code': 0, 'description': 1, 'unit': 2, 'quantity': 3, 'price': 4}
+
+    parsed = StreamingEstimateParser().parse_sheet_frame(frame, roles)
+
+    assert len(parsed) == 2
+    assert parsed.iloc[0]['total_cost'] == 1400.0
+    assert parsed.iloc[0]['unit'] == 'м²'
+    assert parsed.iloc[1]['code_number'] == ''
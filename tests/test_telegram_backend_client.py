@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты клиента API для Telegram-бота (integrations/backend_client.py)
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+import integrations.backend_client as backend_module
+from integrations.backend_client import BackendClient
+
+
+def _jwt(exp):
+    def part(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+    return f"{part({'alg': 'HS256'})}.{part({'sub': 'admin', 'exp': exp})}.sig"
+
+
+async def _serve(state):
+    async def token(request):
+        state["logins"] += 1
+        await asyncio.sleep(0.05)
+        return web.json_response({"access_token": _jwt(time.time() + state["ttl"])})
+
+    async def chat(request):
+        if state["reject_next"]:
+            state["reject_next"] = False
+            return web.json_response({"detail": "expired"}, status=401)
+        body = await request.json()
+        state["bodies"].append(body)
+        return web.json_response({"response": f"ok {body.get('message')}"})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/token", token)
+    app.router.add_post("/api/ai/chat", chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_token_cached_and_refreshed_single_flight():
+    async def scenario():
+        state = {"logins": 0, "ttl": 3600, "reject_next": False, "bodies": []}
+        runner, base = await _serve(state)
+        client = BackendClient(api_base=base)
+        try:
+            responses = await asyncio.gather(*[
+                client.post_json("/api/ai/chat", {"message": n}) for n in range(20)
+            ])
+            assert all(r.status_code == 200 for r in responses)
+            assert state["logins"] == 1
+
+            # Токен отклонён сервером - одно обновление и повтор
+            state["reject_next"] = True
+            resp = await client.post_json("/api/ai/chat", {"message": "again"})
+            assert resp.json() == {"response": "ok again"}
+            assert state["logins"] == 2
+
+            # Токен близок к истечению - обновляется заранее
+            client._token_expires_at = time.time() + backend_module.TOKEN_REFRESH_MARGIN / 2
+            await client.post_json("/api/ai/chat", {"message": "late"})
+            assert state["logins"] == 3
+
+            stats = client.stats()
+            assert stats["/api/ai/chat"]["requests"] == 23
+            assert stats["/api/ai/chat"]["errors"] == 1
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_large_file_streamed_as_base64_field(monkeypatch):
+    monkeypatch.setattr(backend_module, "STREAM_CHUNK_SIZE", 3 * 1000)
+
+    async def scenario():
+        state = {"logins": 0, "ttl": 3600, "reject_next": False, "bodies": []}
+        runner, base = await _serve(state)
+        client = BackendClient(api_base=base)
+        data = os.urandom(100_001)
+        try:
+            resp = await client.post_json(
+                "/api/ai/chat", {"message": "Документ", "document_name": "смета.pdf"},
+                stream_field="document_data", stream_data=data
+            )
+            assert resp.status_code == 200
+            body = state["bodies"][0]
+            assert body["document_name"] == "смета.pdf"
+            assert base64.b64decode(body["document_data"]) == data
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тесты токенного структурного чанкера (core/token_chunker.py)
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.token_chunker import TokenChunker, TokenCounter
+
+
+class WordTokenizer:
+    """Токенизатор-слово: один токен на слово, как у HF токенизатора по интерфейсу"""
+    model_max_length = 64
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        self.calls += 1
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class Model:
+    def __init__(self, max_seq_length=64):
+        self.tokenizer = WordTokenizer()
+        self.max_seq_length = max_seq_length
+
+
+def clause(number: str, words: int) -> str:
+    return f"{number} " + " ".join(f"слово{i}" for i in range(words))
+
+
+def test_clauses_are_packed_without_splitting():
+    model = Model()
+    chunker = TokenChunker(TokenCounter.from_model(model), max_tokens=40, overlap_tokens=0)
+    text = "\n".join([
+        "РАЗДЕЛ 8 Бетонные конструкции",
+        clause("8.3.4", 14),
+        "продолжение пункта 8.3.4 на новой строке",
+        "",
+        "- первый короткий пункт перечня",
+        "",
+        "- второй короткий пункт перечня",
+        clause("8.3.5", 12),
+        clause("8.3.6", 20),
+    ])
+    chunks, report = chunker.chunk(text)
+
+    # Перечень остаётся в пункте 8.3.4, пункты не разрезаются
+    assert [c.clauses for c in chunks] == [["8.3.4"], ["8.3.5", "8.3.6"]]
+    assert "второй короткий пункт перечня" in chunks[0].text
+    assert chunks[0].text.startswith("РАЗДЕЛ 8")
+    assert all(c.tokens <= 40 for c in chunks)
+    assert all(c.section == "РАЗДЕЛ 8 Бетонные конструкции" for c in chunks)
+    assert report.chunks == 2 and report.truncated == 0 and report.exact_tokens
+    # Токенизатор вызывается пакетно, а не на каждую строку
+    assert model.tokenizer.calls == 1
+
+
+def test_long_clause_split_at_sentences_and_overlap():
+    chunker = TokenChunker(TokenCounter.from_model(Model()), max_tokens=30, overlap_tokens=12)
+    sentences = " ".join(f"Предложение номер {i} про армирование плиты." for i in range(12))
+    chunks, report = chunker.chunk(f"5.2.1 {sentences}")
+
+    assert report.split_units == 1
+    assert all(c.tokens <= 30 for c in chunks)
+    assert chunks[0].text.startswith("5.2.1 Предложение")
+    assert all(c.text.startswith("5.2.1 (продолжение) Предложение") for c in chunks[1:])
+
+    # Перекрытие: последние целые пункты предыдущего чанка повторяются в следующем
+    chunks, _ = chunker.chunk("\n".join(clause(f"5.3.{n}", 5) for n in range(1, 9)))
+    assert [c.clauses for c in chunks[:2]] == [["5.3.1", "5.3.2", "5.3.3", "5.3.4", "5.3.5"],
+                                               ["5.3.4", "5.3.5", "5.3.6", "5.3.7", "5.3.8"]]
+
+
+def test_table_rows_repeat_header_and_report_without_tokenizer():
+    rows = ["| Класс | Прочность |"] + [f"| B{n} | {n * 1.1:.1f} МПа |" for n in range(10, 60, 5)]
+    chunker = TokenChunker(TokenCounter(), max_tokens=40, overlap_tokens=0)
+    chunks, report = chunker.chunk_sections([("Таблица 6.8", "\n".join(rows))])
+
+    assert len(chunks) > 1
+    assert all(c.text.split("\n")[0].endswith("| Класс | Прочность |") or c.text.startswith("Таблица")
+               for c in chunks)
+    assert chunks[1].text.startswith("| Класс | Прочность |")
+    assert not report.exact_tokens and report.min_tokens <= report.p50_tokens <= report.max_tokens <= 40
+    assert report.to_dict()["truncation_rate"] == 0
+    # Недоступный токенизатор - приближённый счёт, а не ошибка
+    assert not TokenCounter.from_pretrained("/nonexistent/sbert").exact
+
+
+class NewlineTokenizer(WordTokenizer):
+    """Перевод строки - отдельный токен, как у части BPE токенизаторов"""
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        self.calls += 1
+        return {"input_ids": [re.findall(r"\S+|\n", text) for text in texts]}
+
+
+def test_separator_tokens_count_towards_budget():
+    model = Model()
+    model.tokenizer = NewlineTokenizer()
+    counter = TokenCounter.from_model(model)
+    chunker = TokenChunker(counter, max_tokens=30, overlap_tokens=8)
+    # Короткие пункты: без учёта "\n" в чанк влезло бы на треть больше строк
+    chunks, _ = chunker.chunk("\n".join(clause(f"4.{n}", 2) for n in range(1, 40)))
+
+    assert len(chunks) > 1
+    assert all(counter.count(c.text) == c.tokens <= 30 for c in chunks)
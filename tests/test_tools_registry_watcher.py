@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Тесты отслеживания изменений файлов инструментов (core/tools_registry.py)
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.tools_registry import ToolsRegistry, ToolsWatcher
+
+TOOL_TEMPLATE = '''
+manifest = {{
+    "name": "echo_tool", "version": "{version}", "title": "Echo", "description": "Echo",
+    "category": "custom", "ui_placement": "tools", "entrypoint": "echo_tool:execute",
+}}
+
+def execute(**kwargs):
+    return {{"status": "success", "data": {{"version": "{version}"}}}}
+'''
+
+
+def _write_tool(path, version):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(TOOL_TEMPLATE.format(version=version))
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _collect_events(registry):
+    events = []
+    registry._publish = events.append
+    return events
+
+
+def test_apply_file_change_skips_noop_saves(tmp_path):
+    registry = ToolsRegistry(base_dir=str(tmp_path))
+    events = _collect_events(registry)
+    path = str(tmp_path / "echo_tool.py")
+    _write_tool(path, "1.0.0")
+
+    loaded = registry.apply_file_change(path)
+    assert loaded["action"] == "loaded" and registry.name_for_path(path) == "echo_tool"
+
+    # Сохранение без изменений содержимого не вызывает перезагрузку
+    os.utime(path, None)
+    assert registry.apply_file_change(path) is None
+
+    _write_tool(path, "1.1.0")
+    reloaded = registry.apply_file_change(path)
+    assert reloaded["action"] == "reloaded" and reloaded["latency_ms"] >= 0
+    assert registry.tools["echo_tool"].manifest.version == "1.1.0"
+
+    os.remove(path)
+    assert registry.apply_file_change(path)["action"] == "removed"
+    assert "echo_tool" not in registry.tools
+    assert any(e["type"] == "tool_reload_metrics" for e in events)
+
+
+@pytest.mark.parametrize("backend", ["inotify", "poll"])
+def test_watcher_debounces_burst_of_writes(tmp_path, backend, monkeypatch):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    monkeypatch.setattr("core.tools_registry.POLL_INTERVAL_SECONDS", 0.2)
+    registry = ToolsRegistry(base_dir=str(tmp_path))
+    events = _collect_events(registry)
+    path = str(tmp_path / "echo_tool.py")
+    _write_tool(path, "1.0.0")
+    registry.load_all()
+
+    watcher = ToolsWatcher(registry, backend=backend, debounce=0.2)
+    watcher.start()
+    try:
+        for minor in range(5):
+            _write_tool(path, f"2.{minor}.0")
+        assert _wait_for(lambda: registry.tools["echo_tool"].manifest.version == "2.4.0")
+        time.sleep(0.5)
+        metrics = [e for e in events if e["type"] == "tool_reload_metrics"]
+        assert len(metrics) == 1
+
+        nested = tmp_path / "norms"
+        nested.mkdir()
+        _write_tool(str(nested / "other_tool.py"), "1.0.0")
+        assert _wait_for(lambda: registry.name_for_path(str(nested / "other_tool.py")) == "echo_tool")
+    finally:
+        watcher.stop()
+    assert watcher.backend_name == backend
+
+
+def test_network_filesystem_falls_back_to_polling(tmp_path, monkeypatch):
+    monkeypatch.setattr("core.tools_registry._filesystem_type", lambda path: "nfs4")
+    registry = ToolsRegistry(base_dir=str(tmp_path))
+    events = _collect_events(registry)
+
+    watcher = ToolsWatcher(registry, backend="auto")
+    watcher.start()
+    watcher.stop()
+    # inotify не видит изменений с других хостов - сразу опрос
+    assert watcher.backend_name == "poll"
+    assert events[0]["type"] == "watcher_fallback" and "nfs4" in events[0]["reason"]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Тесты квантованного хранилища Qdrant (core/vector_storage.py)
+"""
+
+import os
+import sys
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.vector_storage import QuantizationSettings, QuantizedStorage, quantization_mode
+
+
+def _legacy_collection(client, points=30):
+    client.create_collection(
+        'enterprise_docs', vectors_config=models.VectorParams(size=4, distance=models.Distance.COSINE))
+    client.upsert('enterprise_docs', points=[
+        models.PointStruct(id=i, vector=[1.0, i / 10, 0.5, (i % 3) / 3], payload={'file_hash': f'h{i % 5}'})
+        for i in range(points)
+    ])
+
+
+def test_new_collection_behind_alias():
+    client = QdrantClient(':memory:')
+    storage = QuantizedStorage(client, QuantizationSettings(mode='scalar'))
+    # Локальный Qdrant не поддерживает квантование
+    assert storage.settings.mode == 'none'
+
+    assert storage.ensure_collection('enterprise_docs', size=4) == 'enterprise_docs_v1'
+    assert storage.aliases() == {'enterprise_docs': 'enterprise_docs_v1'}
+    assert quantization_mode(client.get_collection('enterprise_docs_v1')) == 'none'
+    # Повторный вызов ничего не меняет
+    assert storage.ensure_collection('enterprise_docs', size=4) == 'enterprise_docs_v1'
+
+
+def test_legacy_migration_and_mode_switch(monkeypatch):
+    client = QdrantClient(':memory:')
+    _legacy_collection(client)
+
+    storage = QuantizedStorage(client, QuantizationSettings(mode='scalar', oversampling=3.0))
+    # Без квантования старая коллекция подходит как есть
+    assert storage.ensure_collection('enterprise_docs', size=4) == 'enterprise_docs'
+
+    # Конфигурация отличается (на сервере - другой режим квантования)
+    monkeypatch.setattr(QuantizedStorage, '_matches', lambda self, collection: False)
+    assert storage.ensure_collection('enterprise_docs', size=4) == 'enterprise_docs_v1'
+    assert storage.aliases() == {'enterprise_docs': 'enterprise_docs_v1'}
+    assert client.count('enterprise_docs').count == 30
+
+    hits = storage.search('enterprise_docs', [1.0, 0.5, 0.5, 0.0], limit=3,
+                          query_filter=models.Filter(must=[models.FieldCondition(
+                              key='file_hash', match=models.MatchValue(value='h0'))]))
+    assert hits and all(hit.payload['file_hash'] == 'h0' for hit in hits)
+
+    # Следующая миграция: новая версия, алиас переключен, старая удалена
+    assert storage.ensure_collection('enterprise_docs', size=4) == 'enterprise_docs_v2'
+    assert storage.aliases() == {'enterprise_docs': 'enterprise_docs_v2'}
+    assert not client.collection_exists('enterprise_docs_v1')
+    assert client.count('enterprise_docs').count == 30
+
+
+def test_failed_copy_drops_target_and_workers_do_not_migrate(monkeypatch):
+    client = QdrantClient(':memory:')
+    storage = QuantizedStorage(client, QuantizationSettings(mode='none'))
+    storage.ensure_collection('enterprise_docs', size=4)
+    monkeypatch.setattr(QuantizedStorage, '_matches', lambda self, collection: False)
+
+    # Воркер: коллекция с другими настройками используется как есть
+    assert storage.ensure_collection('enterprise_docs', size=4, migrate=False) == 'enterprise_docs_v1'
+
+    def broken_copy(self, source, target, batch_size=512):
+        raise ConnectionError('qdrant went away')
+
+    monkeypatch.setattr(QuantizedStorage, 'copy_points', broken_copy)
+    with pytest.raises(ConnectionError):
+        storage.ensure_collection('enterprise_docs', size=4)
+    assert not client.collection_exists('enterprise_docs_v2')
+    assert storage.aliases() == {'enterprise_docs': 'enterprise_docs_v1'}
+
+
+def test_reset_drops_alias_and_versions():
+    client = QdrantClient(':memory:')
+    _legacy_collection(client)
+    client.create_collection('enterprise_docs_v3', vectors_config=models.VectorParams(
+        size=4, distance=models.Distance.COSINE))
+    storage = QuantizedStorage(client, QuantizationSettings(mode='none'))
+
+    assert storage.reset('enterprise_docs', size=4) == 'enterprise_docs_v1'
+    assert sorted(c.name for c in client.get_collections().collections) == ['enterprise_docs_v1']
+    assert storage.aliases() == {'enterprise_docs': 'enterprise_docs_v1'}
+    assert client.count('enterprise_docs').count == 0
+
+
+def test_search_params():
+    params = QuantizationSettings(mode='scalar', oversampling=4.0).search_params()
+    assert params.quantization.rescore and params.quantization.oversampling == 4.0
+    assert QuantizationSettings(mode='scalar').search_params(exact=True).exact
+    assert QuantizationSettings(mode='none').search_params().quantization is None
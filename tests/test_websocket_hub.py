@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Тесты хаба рассылки WebSocket (core/websocket_manager.py)
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fastapi")
+
+import core.websocket_manager as ws_module
+from core.websocket_manager import ConnectionManager
+from core.process_tracker import ProcessTracker, ProcessType, ProcessStatus
+
+
+class FakeSocket:
+    """Клиент с управляемой скоростью приёма"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.fail:
+            raise ConnectionResetError("client gone")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+async def _drain():
+    await asyncio.sleep(0.05)
+
+
+def test_slow_and_dead_clients_do_not_block_others():
+    async def scenario():
+        hub = ConnectionManager()
+        fast, slow, dead = FakeSocket(), FakeSocket(delay=10), FakeSocket(fail=True)
+        for ws in (fast, slow, dead):
+            await hub.connect(ws)
+
+        await hub.broadcast("hello")
+        await _drain()
+        assert fast.received == ["hello"]
+        assert dead not in hub.active_connections and dead.closed
+        assert len(hub.active_connections) == 2
+        for ws in hub.active_connections:
+            hub.disconnect(ws)
+
+    asyncio.run(scenario())
+
+
+def test_progress_is_coalesced_and_dropped_first(monkeypatch):
+    monkeypatch.setattr(ws_module, "SEND_QUEUE_SIZE", 4)
+
+    async def scenario():
+        hub = ConnectionManager()
+        ws = FakeSocket()
+        await hub.connect(ws)
+        # Писатель ещё не запускался - все сообщения копятся в очереди
+        for progress in range(50):
+            hub.publish(f"p{progress}", key="job-1", progress=True)
+        for n in range(4):
+            hub.publish(f"p-other{n}", key=f"job-{n + 2}", progress=True)
+        hub.publish("done", key="job-1")
+        await _drain()
+        # Прогресс job-1 схлопнут в одно сообщение, при переполнении отброшены
+        # самые старые прогресс-сообщения, финальный статус доставлен
+        assert ws.received == ["p-other1", "p-other2", "p-other3", "done"]
+        assert hub.stats()["dropped"] == 2 and hub.stats()["evicted"] == 0
+        hub.disconnect(ws)
+
+        # Очередь, забитая не-прогрессом, означает безнадёжно отставшего клиента
+        stuck = FakeSocket(delay=10)
+        await hub.connect(stuck)
+        for n in range(10):
+            hub.publish(f"event{n}")
+        assert stuck not in hub.active_connections
+        assert hub.stats()["evicted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_topic_subscriptions_and_process_tracker():
+    async def scenario():
+        hub = ConnectionManager()
+        watcher, everyone = FakeSocket(), FakeSocket()
+        await hub.connect(watcher)
+        await hub.connect(everyone)
+        assert hub.handle_client_message(watcher, json.dumps({"action": "subscribe", "topics": ["process:a"]}))
+        assert not hub.handle_client_message(watcher, "ping")
+
+        tracker = ProcessTracker(websocket_manager=hub)
+        tracker.start_process("a", ProcessType.RAG_TRAINING, "train a")
+        tracker.start_process("b", ProcessType.AI_TASK, "task b")
+        for progress in range(1, 101):
+            tracker.update_process("a", status=ProcessStatus.RUNNING, progress=progress)
+        tracker.update_process("a", status=ProcessStatus.COMPLETED, progress=100)
+        await _drain()
+
+        watched = [json.loads(m) for m in watcher.received[1:]]
+        assert {m["process_id"] for m in watched} == {"a"}
+        assert watched[-1]["status"] == "completed" and watched[-1]["event"] == "updated"
+        assert json.loads(everyone.received[0])["event"] == "started"
+        assert len(watched) < 10
+        assert {json.loads(m)["process_id"] for m in everyone.received} == {"a", "b"}
+        for ws in (watcher, everyone):
+            hub.disconnect(ws)
+
+    asyncio.run(scenario())
+
+
+def test_fanout_to_thousand_clients_is_fast():
+    async def scenario():
+        hub = ConnectionManager()
+        sockets = [FakeSocket() for _ in range(1000)]
+        for ws in sockets:
+            await hub.connect(ws)
+        await _drain()
+
+        timings = []
+        for tick in range(20):
+            started = time.perf_counter()
+            hub.publish(f"tick{tick}", key="job", progress=True)
+            timings.append(time.perf_counter() - started)
+            await _drain()
+        assert sorted(timings)[len(timings) // 2] < 0.005
+        assert all(ws.received and ws.received[-1] == "tick19" for ws in sockets)
+        for ws in sockets:
+            hub.disconnect(ws)
+
+    asyncio.run(scenario())
@@ -7,19 +7,51 @@ from core.tools.base_tool import ToolManifest, ToolInterface, ToolParam, ToolPar
 coordinator_interface = ToolInterface(
     purpose="Анализ 3D модели Bentley для выявления коллизий",
     input_requirements={
-        # TODO: Добавить параметры инструмента
-        "param1": ToolParam(
-            name="param1",
+        "ifc_path": ToolParam(
+            name="ifc_path",
             type=ToolParamType.STRING,
             required=True,
-            description="Описание параметра"
+            description="Путь к IFC файлу (в т.ч. сводной модели)"
+        ),
+        "analysis_type": ToolParam(
+            name="analysis_type",
+            type=ToolParamType.ENUM,
+            required=False,
+            default="clash",
+            description="Тип анализа",
+            enum=[
+                {"value": "clash", "label": "Коллизии"},
+                {"value": "quantity", "label": "Объемы"},
+                {"value": "compliance", "label": "Соответствие"}
+            ]
+        ),
+        "tolerance": ToolParam(
+            name="tolerance",
+            type=ToolParamType.NUMBER,
+            required=False,
+            default=0.01,
+            description="Минимальное взаимное проникновение элементов, м (отрицательное - проверка зазора)"
+        ),
+        "offset": ToolParam(
+            name="offset",
+            type=ToolParamType.NUMBER,
+            required=False,
+            default=0,
+            description="Смещение страницы коллизий"
+        ),
+        "limit": ToolParam(
+            name="limit",
+            type=ToolParamType.NUMBER,
+            required=False,
+            default=50,
+            description="Размер страницы коллизий"
         )
     },
     execution_flow=[
         "1. Валидация входных параметров",
-        "2. Выполнение основной логики",
-        "3. Обработка результатов",
-        "4. Возврат результата"
+        "2. Параллельная триангуляция элементов модели",
+        "3. Построение 3D индекса габаритов и поиск пересечений",
+        "4. Возврат страницы коллизий, отсортированных по глубине проникновения"
     ],
     output_format={
         "structure": {
@@ -35,25 +67,25 @@ coordinator_interface = ToolInterface(
     usage_guidelines={
         "for_coordinator": [
             "Используйте для анализ 3d модели bentley для выявления коллизий",
-            "Передавайте корректные параметры",
+            "Для следующей страницы передайте offset = next_offset",
             "Обрабатывайте результаты"
         ],
         "for_models": [
-            "Инструмент возвращает структурированный результат",
+            "clash_count - полное число коллизий, clashes - текущая страница",
             "Используйте metadata для дополнительной информации"
         ]
     },
     integration_notes={
-        "dependencies": ["Core system"],
-        "performance": "Средняя скорость выполнения: 1-3 секунды",
+        "dependencies": ["ifcopenshell", "numpy"],
+        "performance": "Секунды для моделей в десятки тысяч элементов",
         "reliability": "Высокая",
-        "scalability": "Поддерживает стандартные нагрузки"
+        "scalability": "Триангуляция в несколько процессов, поиск O(n log n)"
     }
 )
 
 manifest = ToolManifest(
     name="analyze_bentley_model",
-    version="1.0.0",
+    version="1.1.0",
     title="🔧 Analyze Bentley Model",
     description="Анализ 3D модели Bentley для выявления коллизий",
     category="bim",
@@ -61,18 +93,7 @@ manifest = ToolManifest(
     enabled=True,
     system=False,
     entrypoint="tools.bim.analyze_bentley_model:execute",
-    params=[
-        ToolParam(
-            name="param1",
-            type=ToolParamType.STRING,
-            required=True,
-            description="Описание параметра",
-            ui={
-                "placeholder": "Введите значение...",
-                "maxLength": 500
-            }
-        )
-    ],
+    params=list(coordinator_interface.input_requirements.values()),
     outputs=["result", "metadata"],
     permissions=["filesystem:read", "network:out"],
     tags=["bim", "enterprise"],
@@ -84,14 +105,14 @@ manifest = ToolManifest(
     documentation={
         "examples": [
             {
-                "title": "Пример использования",
-                "param1": "значение",
-                "description": "Описание примера"
+                "title": "Поиск коллизий",
+                "ifc_path": "models/federated.ifc",
+                "description": "Первые 50 коллизий с проникновением больше 1 см"
             }
         ],
         "tips": [
-            "Будьте точны в параметрах",
-            "Проверяйте результаты"
+            "Отрицательный tolerance находит элементы ближе заданного зазора",
+            "Проемы (IfcOpeningElement) в проверке не участвуют"
         ]
     },
     coordinator_interface=coordinator_interface
@@ -100,28 +121,50 @@ manifest = ToolManifest(
 def execute(**kwargs) -> Dict[str, Any]:
     """Execute analyze_bentley_model with enterprise-level features."""
     start_time = time.time()
-    
+
     try:
         # Validate and parse parameters
-        param1 = kwargs.get('param1', '').strip()
-        if not param1:
+        ifc_path = str(kwargs.get('ifc_path', '')).strip()
+        if not ifc_path:
             return {
                 'status': 'error',
-                'error': 'Параметр param1 не может быть пустым',
+                'error': 'Параметр ifc_path не может быть пустым',
                 'execution_time': time.time() - start_time
             }
-        
-        # TODO: Implement tool logic here
+
+        from core.autocad_bentley import analyze_bentley_model
+
+        analysis = analyze_bentley_model(
+            ifc_path,
+            kwargs.get('analysis_type', 'clash'),
+            tolerance=float(kwargs.get('tolerance', 0.01)),
+            offset=int(kwargs.get('offset', 0)),
+            limit=int(kwargs.get('limit', 50))
+        )
+        if analysis.get('status') != 'success':
+            return {
+                'status': 'error',
+                'error': analysis.get('error', 'Ошибка анализа модели'),
+                'execution_time': time.time() - start_time
+            }
+
+        clash_analysis = analysis.get('clash_analysis')
+        summary = f"Элементов: {analysis['element_count']}"
+        if clash_analysis is not None:
+            summary += f", коллизий: {clash_analysis['clash_count']}"
+
         result = {
-            'result': f'Обработано: {param1}',
+            'result': summary,
+            'analysis': analysis,
             'metadata': {
                 'processed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'input_length': len(param1)
+                'ifc_path': ifc_path,
+                'element_count': analysis['element_count']
             }
         }
-        
+
         execution_time = time.time() - start_time
-        
+
         return {
             'status': 'success',
             'data': result,
@@ -131,10 +174,10 @@ def execute(**kwargs) -> Dict[str, Any]:
             'result_content': result['result'],
             'metadata': result['metadata']
         }
-        
+
     except Exception as e:
-        return { 
-            'status': 'error', 
+        return {
+            'status': 'error',
             'error': str(e),
             'execution_time': time.time() - start_time
         }
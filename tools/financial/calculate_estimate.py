@@ -5,6 +5,7 @@ import re
 import os
 from datetime import datetime
 from core.tools.base_tool import ToolManifest, ToolInterface, ToolParam, ToolParamType
+from core.rate_catalogue import RateCatalogue, catalogue_from_mapping, get_rate_catalogue
 
 # Создаем Pydantic модели для универсального представления
 coordinator_interface = ToolInterface(
@@ -320,36 +321,14 @@ def execute(**kwargs) -> Dict[str, Any]:
         }
 
 
-def _load_gesn_rates() -> Dict[str, Any]:
-    """Load GESN rates from database or file."""
-    # Try to load from RAG database first
-    try:
-        from core.unified_tools_system import execute_tool as unified_exec
-        result = unified_exec('search_rag_database', {
-            'query': 'ГЭСН расценки нормы',
-            'doc_types': ['norms'],
-            'k': 50
-        })
-        
-        if result.get('status') == 'success':
-            gesn_rates = {}
-            for item in result.get('results', []):
-                content = item.get('content', '')
-                # Extract GESN codes and rates from content
-                codes = re.findall(r'ГЭСН\s+(\d+(?:-\d+)*(?:\.\d+)*)', content)
-                for code in codes:
-                    gesn_rates[f"ГЭСН {code}"] = {
-                        'base_rate': 1500.0,  # Default rate
-                        'materials_cost': 800.0,
-                        'labor_cost': 500.0,
-                        'equipment_cost': 200.0
-                    }
-            return gesn_rates
-    except Exception as e:
-        print(f"⚠️ Не удалось загрузить расценки из RAG: {e}")
+def _load_gesn_rates() -> RateCatalogue:
+    """Load GESN rates from the shared indexed rate catalogue."""
+    catalogue = get_rate_catalogue()
+    if len(catalogue):
+        return catalogue
     
     # Fallback to default rates
-    return {
+    return RateCatalogue.from_mapping({
         "ГЭСН 8-6-1.1": {
             "base_rate": 1500.0,
             "materials_cost": 800.0,
@@ -362,7 +341,7 @@ def _load_gesn_rates() -> Dict[str, Any]:
             "labor_cost": 600.0,
             "equipment_cost": 200.0
         }
-    }
+    })
 
 
 def _get_regional_coefficients() -> Dict[str, float]:
@@ -376,7 +355,7 @@ def _get_regional_coefficients() -> Dict[str, float]:
     }
 
 
-def _calculate_comprehensive_estimate(estimate_data: Dict[str, Any], gesn_rates: Dict[str, Any],
+def _calculate_comprehensive_estimate(estimate_data: Dict[str, Any], gesn_rates: Any,
                                     regional_coefficients: Dict[str, float], overheads_percentage: float,
                                     profit_percentage: float, include_breakdown: bool) -> Dict[str, Any]:
     """Calculate comprehensive estimate with all factors."""
@@ -391,20 +370,18 @@ def _calculate_comprehensive_estimate(estimate_data: Dict[str, Any], gesn_rates:
     
     calculated_positions = []
     
-    for position in positions:
+    # Resolve rates for all positions in one batch (exact, parent/child code, name)
+    catalogue = gesn_rates if isinstance(gesn_rates, RateCatalogue) else catalogue_from_mapping(gesn_rates)
+    matches = catalogue.resolve_batch(positions)
+    
+    for position, match in zip(positions, matches):
         position_code = position.get('code', '')
         quantity = position.get('quantity', 1.0)
         unit = position.get('unit', 'шт')
         description = position.get('description', '')
         
         # Get rate data
-        rate_data = gesn_rates.get(position_code, {})
-        if not rate_data:
-            # Try to find similar code
-            for code, data in gesn_rates.items():
-                if position_code in code or code in position_code:
-                    rate_data = data
-                    break
+        rate_data = match.rate if match else {}
         
         # Calculate position costs
         base_rate = rate_data.get('base_rate', 0.0)